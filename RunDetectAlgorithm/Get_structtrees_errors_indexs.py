@@ -25,6 +25,13 @@ from tqdm import tqdm
 
 from mdsConn import MdsTree
 
+# 通道定位索引与后端共用（backend/channel_locator.json）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+from backend.api.channel_locator import ChannelLocator
+from backend.api.shared_signal import SharedSignalSet, untrack_attached_memory
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO, 
@@ -100,6 +107,50 @@ DBS = {
 # 并发通道数限制
 MAX_CONCURRENT_CHANNELS = 50  # 可根据服务器实际能力调整
 
+# 需要辅助通道的算法: 算法名 -> 辅助通道名
+AUX_CHANNELS = {
+    'error_axuv_Detector_channel_damage': 'ECRH0_UA',
+    'error_sxr_spectra_saturation': 'IP',
+}
+
+def get_detect_type(channel_name):
+    """通道名对应的算法类型（algorithm_channel_map 的键）"""
+    channel_type = remove_digits(channel_name).upper()
+    if channel_type == 'MIR':
+        channel_type = 'Mirnov'
+    if channel_type in ['MP', 'FLUX', 'IPF']:
+        return 'MP'
+    return channel_type
+
+def share_aux_channels(shot_num, DB, channels, algorithm_channel_map, signals):
+    """
+    读取这批通道的算法需要的辅助通道（如 ECRH0_UA、IP），每个辅助通道只读取一次并放入共享内存，
+    各通道的工作进程直接映射使用，不再各自从 MDSplus 重复读取
+    返回 {辅助通道名: SharedSignal}；读取失败或没有数据的辅助通道不在其中，由 process_channel 自行读取
+    """
+    detect_types = {get_detect_type(channel_name) for channel_name in channels}
+    needed = sorted({aux_name for error, aux_name in AUX_CHANNELS.items()
+                     if any(error in algorithm_channel_map.get(detect_type, {}) for detect_type in detect_types)})
+    if not needed:
+        return {}
+    aux_signals = {}
+    tree = None
+    try:
+        tree = MdsTree(shot_num, dbname=DB, path=DBS[DB]['path'], subtrees=DBS[DB]['subtrees'])
+        for aux_name in needed:
+            _, aux_data = tree.getData(aux_name)
+            if len(aux_data) > 0:
+                aux_signals[aux_name] = signals.share(aux_data)
+    except Exception as e:
+        logger.warning(f"读取炮号 {shot_num} 在 {DB} 数据库的辅助通道失败，由各通道自行读取: {e}")
+    finally:
+        if tree is not None:
+            try:
+                tree.close()
+            except:
+                pass
+    return aux_signals
+
 # 预加载算法模块
 def preload_algorithms(algorithm_channel_map):
     """预加载所有算法模块，避免重复导入"""
@@ -116,7 +167,9 @@ def preload_algorithms(algorithm_channel_map):
 
 # 处理单个通道的函数
 def process_channel(channel_args):
-    shot_num, DB, channel_name, tree_path, subtrees, algorithm_channel_map, lock_id = channel_args
+    shot_num, DB, channel_name, tree_path, subtrees, algorithm_channel_map, lock_id = channel_args[:7]
+    # 共享内存中的辅助通道 {辅助通道名: SharedSignal}，见 share_aux_channels
+    aux_signals = channel_args[7] if len(channel_args) > 7 else {}
     
     # 添加随机延迟，避免同时连接
     delay = random.uniform(0.5, 1.5)
@@ -157,6 +210,8 @@ def process_channel(channel_args):
     
     # 为批量插入准备的数据
     error_data_list = []
+    # 映射的共享内存辅助通道，处理结束后关闭
+    aux_views = []
     
     try:
         detect_type = channel_type
@@ -200,18 +255,23 @@ def process_channel(channel_args):
         if channel_type == 'TS':
             X_unit = 'ns'
         
-        # 预先获取可能需要的辅助通道数据
+        # 预先获取可能需要的辅助通道数据，优先映射主进程放入共享内存的数据（只读，不复制）
         aux_channel_data = {}
-        if 'error_axuv_Detector_channel_damage' in algorithm_channel_map.get(detect_type, {}) or 'error_sxr_spectra_saturation' in algorithm_channel_map.get(detect_type, {}):
+        for aux_name, aux_signal in aux_signals.items():
+            try:
+                aux_view = aux_signal.attach()
+            except FileNotFoundError:
+                continue
+            aux_views.append(aux_view)
+            aux_channel_data[aux_name] = aux_view.array
+        missing_aux = [aux_name for error, aux_name in AUX_CHANNELS.items()
+                       if error in algorithm_channel_map.get(detect_type, {}) and aux_name not in aux_channel_data]
+        if missing_aux:
             for retry in range(max_retries):
                 try:
-                    if 'error_axuv_Detector_channel_damage' in algorithm_channel_map.get(detect_type, {}):
-                        _, aux_data = tree.getData('ECRH0_UA')
-                        aux_channel_data['ECRH0_UA'] = aux_data
-                    
-                    if 'error_sxr_spectra_saturation' in algorithm_channel_map.get(detect_type, {}):
-                        _, aux_data = tree.getData('IP')
-                        aux_channel_data['IP'] = aux_data
+                    for aux_name in missing_aux:
+                        _, aux_data = tree.getData(aux_name)
+                        aux_channel_data[aux_name] = aux_data
                     break
                 except Exception as e:
                     if retry < max_retries - 1:
@@ -347,6 +407,9 @@ def process_channel(channel_args):
                 tree.close()
             except:
                 pass
+        aux_channel_data = None
+        for aux_view in aux_views:
+            aux_view.close()
     
     return temp, error_data_list
 
@@ -384,6 +447,8 @@ def RUN(shot_list, channel_list, db_name, reset=False):
         algorithm_channel_map = json.load(f)
     detect_channel_type_list = algorithm_channel_map.keys()
     DB_list = ["exl50u", "eng50u"]
+    # 记录每个炮号各通道所在的树，供后端读取通道数据时直接定位
+    channel_locator = ChannelLocator()
 
     all_struct_tree = []  # 所有炮号的结构树
     shot_range = list(range(shot_list[0], shot_list[1] + 1))
@@ -455,7 +520,9 @@ def RUN(shot_list, channel_list, db_name, reset=False):
                 
             try:
                 tree = MdsTree(shot_num, dbname=DB, path=DBS[DB]['path'], subtrees=DBS[DB]['subtrees'])
-                channel_pool = tree.formChannelPool()
+                channel_subtrees = tree.formChannelSubtreeMap()
+                channel_pool = list(channel_subtrees)
+                channel_locator.record_many(shot_num, DB, channel_subtrees)
                 channels_count = 0
                 
                 if len(channel_list) == 0:
@@ -471,6 +538,7 @@ def RUN(shot_list, channel_list, db_name, reset=False):
             except Exception as e:
                 logger.warning(f"统计炮号{str(shot_num)}时发生异常: {e}")
     
+    channel_locator.save()
     print(f"总计需要处理 {len(shot_range)} 个炮号, {total_channels} 个通道")
     processed_channels = 0
     
@@ -519,8 +587,10 @@ def RUN(shot_list, channel_list, db_name, reset=False):
                     delay = random.uniform(1.0, 3.0)
                     time.sleep(delay)
                     tree = MdsTree(shot_num, dbname=DB, path=DBS[DB]['path'], subtrees=DBS[DB]['subtrees'])
-                    channel_pool = tree.formChannelPool()
+                    channel_subtrees = tree.formChannelSubtreeMap()
+                    channel_pool = list(channel_subtrees)
                     tree.close()
+                    channel_locator.record_many(shot_num, DB, channel_subtrees)
                     break
                 except Exception as e:
                     error_msg = str(e)
@@ -560,92 +630,100 @@ def RUN(shot_list, channel_list, db_name, reset=False):
             # 并发通道处理，限制最大并发数
             batch_size = 100  # 每批处理的通道数
             
-            for batch_idx in range(0, len(channels_to_process), batch_size):
-                batch_channels = channels_to_process[batch_idx:batch_idx + batch_size]
+            # 辅助通道在本炮号、本数据库内只读取一次，通过共享内存交给各通道的工作进程，处理完本数据库后释放
+            aux_shared = SharedSignalSet()
+            aux_signals = share_aux_channels(shot_num, DB, channels_to_process, algorithm_channel_map, aux_shared)
+            
+            try:
+                for batch_idx in range(0, len(channels_to_process), batch_size):
+                    batch_channels = channels_to_process[batch_idx:batch_idx + batch_size]
                 
-                # 准备多进程处理的参数
-                channel_args = [(shot_num, DB, channel_name, DBS[DB]['path'], DBS[DB]['subtrees'], algorithm_channel_map, idx) 
-                                for idx, channel_name in enumerate(batch_channels)]
+                    # 准备多进程处理的参数
+                    channel_args = [(shot_num, DB, channel_name, DBS[DB]['path'], DBS[DB]['subtrees'], algorithm_channel_map, idx,
+                                     aux_signals)
+                                    for idx, channel_name in enumerate(batch_channels)]
                 
-                # 用进程池限制最大并发通道数
-                with mp.Pool(processes=MAX_CONCURRENT_CHANNELS) as pool:
-                    for result in tqdm(
-                        pool.imap(process_channel, channel_args),
-                        total=len(channel_args),
-                        desc=f"  处理炮号 {shot_num} 在 {DB} 数据库的通道 ({batch_idx+1}-{min(batch_idx+batch_size, len(channels_to_process))})"
-                    ):
-                        processed_channels += 1
-                        data_statistics["total_channels_processed"] += 1
-                        data_statistics["by_db"][DB]["processed"] += 1
-                        data_statistics["by_shot"][str(shot_num)]["processed"] += 1
+                    # 用进程池限制最大并发通道数
+                    with mp.Pool(processes=MAX_CONCURRENT_CHANNELS, initializer=untrack_attached_memory) as pool:
+                        for result in tqdm(
+                            pool.imap(process_channel, channel_args),
+                            total=len(channel_args),
+                            desc=f"  处理炮号 {shot_num} 在 {DB} 数据库的通道 ({batch_idx+1}-{min(batch_idx+batch_size, len(channels_to_process))})"
+                        ):
+                            processed_channels += 1
+                            data_statistics["total_channels_processed"] += 1
+                            data_statistics["by_db"][DB]["processed"] += 1
+                            data_statistics["by_shot"][str(shot_num)]["processed"] += 1
                         
-                        channel_data, error_list = result
+                            channel_data, error_list = result
                         
-                        if channel_data:
-                            # 添加到临时数据中
-                            pending_struct_tree_items.append(channel_data)
-                            combined_shot_struct_tree.append(channel_data)
-                            all_struct_tree.append(channel_data)
+                            if channel_data:
+                                # 添加到临时数据中
+                                pending_struct_tree_items.append(channel_data)
+                                combined_shot_struct_tree.append(channel_data)
+                                all_struct_tree.append(channel_data)
                             
-                            # 更新统计数据
-                            status = channel_data.get('status', 'unknown')
-                            data_statistics["status_counts"][status] += 1
-                            data_statistics["by_db"][DB]["status_counts"][status] += 1
-                            data_statistics["by_shot"][str(shot_num)]["status_counts"][status] += 1
+                                # 更新统计数据
+                                status = channel_data.get('status', 'unknown')
+                                data_statistics["status_counts"][status] += 1
+                                data_statistics["by_db"][DB]["status_counts"][status] += 1
+                                data_statistics["by_shot"][str(shot_num)]["status_counts"][status] += 1
                             
-                            # 记录问题通道的详细信息
-                            if status != 'success' and status in data_statistics["problem_channels"]:
-                                channel_info = {
-                                    "shot_number": str(shot_num),
-                                    "db_name": DB,
-                                    "channel_name": channel_data.get("channel_name", ""),
-                                    "channel_type": channel_data.get("channel_type", ""),
-                                    "message": channel_data.get("status_message", "")
-                                }
-                                data_statistics["problem_channels"][status].append(channel_info)
+                                # 记录问题通道的详细信息
+                                if status != 'success' and status in data_statistics["problem_channels"]:
+                                    channel_info = {
+                                        "shot_number": str(shot_num),
+                                        "db_name": DB,
+                                        "channel_name": channel_data.get("channel_name", ""),
+                                        "channel_type": channel_data.get("channel_type", ""),
+                                        "message": channel_data.get("status_message", "")
+                                    }
+                                    data_statistics["problem_channels"][status].append(channel_info)
                         
-                        if error_list:
-                            pending_error_items.extend(error_list)
-                            combined_error_data.extend(error_list)
+                            if error_list:
+                                pending_error_items.extend(error_list)
+                                combined_error_data.extend(error_list)
                         
-                        # 每秒检查一次是否需要写入数据
-                        current_time = time.time()
-                        if current_time - last_write_time >= 1.0 and (pending_struct_tree_items or pending_error_items):
-                            # 写入结构树数据
-                            if pending_struct_tree_items:
-                                try:
-                                    # 合并更新操作，仅添加新处理的通道数据
-                                    struct_trees_collection.update_one(
-                                        {"shot_number": str(shot_num)},
-                                        {"$push": {"struct_tree": {"$each": pending_struct_tree_items}}},
-                                        upsert=True
-                                    )
-                                    print(f"已将炮号 {shot_num} 的 {len(pending_struct_tree_items)} 个处理完成的通道结构添加到MongoDB")
-                                    pending_struct_tree_items = []  # 清空待写入的数据
-                                except Exception as e:
-                                    logger.error(f"保存炮号 {shot_num} 的部分结构树到MongoDB时发生异常: {e}")
-                            
-                            # 写入错误数据
-                            if pending_error_items:
-                                operations = []
-                                for item in pending_error_items:
-                                    operations.append(
-                                        UpdateMany(
-                                            item["query"],
-                                            {"$set": {"data": item["data"]}},
+                            # 每秒检查一次是否需要写入数据
+                            current_time = time.time()
+                            if current_time - last_write_time >= 1.0 and (pending_struct_tree_items or pending_error_items):
+                                # 写入结构树数据
+                                if pending_struct_tree_items:
+                                    try:
+                                        # 合并更新操作，仅添加新处理的通道数据
+                                        struct_trees_collection.update_one(
+                                            {"shot_number": str(shot_num)},
+                                            {"$push": {"struct_tree": {"$each": pending_struct_tree_items}}},
                                             upsert=True
                                         )
-                                    )
-                                
-                                if operations:
-                                    try:
-                                        errors_collection.bulk_write(operations)
-                                        print(f"已将炮号 {shot_num} 的 {len(operations)} 个错误数据项写入MongoDB")
-                                        pending_error_items = []  # 清空待写入的错误数据
+                                        print(f"已将炮号 {shot_num} 的 {len(pending_struct_tree_items)} 个处理完成的通道结构添加到MongoDB")
+                                        pending_struct_tree_items = []  # 清空待写入的数据
                                     except Exception as e:
-                                        logger.error(f"批量写入错误数据到MongoDB失败: {e}")
+                                        logger.error(f"保存炮号 {shot_num} 的部分结构树到MongoDB时发生异常: {e}")
+                            
+                                # 写入错误数据
+                                if pending_error_items:
+                                    operations = []
+                                    for item in pending_error_items:
+                                        operations.append(
+                                            UpdateMany(
+                                                item["query"],
+                                                {"$set": {"data": item["data"]}},
+                                                upsert=True
+                                            )
+                                        )
+                                
+                                    if operations:
+                                        try:
+                                            errors_collection.bulk_write(operations)
+                                            print(f"已将炮号 {shot_num} 的 {len(operations)} 个错误数据项写入MongoDB")
+                                            pending_error_items = []  # 清空待写入的错误数据
+                                        except Exception as e:
+                                            logger.error(f"批量写入错误数据到MongoDB失败: {e}")
                             
-                            last_write_time = current_time  # 更新上次写入时间
+                                last_write_time = current_time  # 更新上次写入时间
+            finally:
+                aux_shared.close()
             
             end = time.time()
             print(f'  已完成 {DB} 数据库处理，运行时间: {round(end-start, 2)}s')
@@ -149,6 +149,17 @@ class MdsTree:
 
         return channels
 
+    def formChannelSubtreeMap(self):
+        """ 构建通道池并记录每个通道所在的子树，返回 {通道名: 子树}，用于填充通道定位索引 """
+        channel_subtrees = {}
+        for subTree in self.subtrees:
+            sub_nodes = self.tree.getNode(r'\TOP.{}'.format(subTree)).getNodeWild("***")
+            for node in sub_nodes:
+                if str(node.usage) == 'SIGNAL' and len(node.tags) > 0:
+                    channel_subtrees.setdefault(node.name.strip(), subTree)
+
+        return channel_subtrees
+
     def close(self):
         self.tree.close()
 
@@ -1,8 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
+from django.conf import settings
 from MDSplus import Tree, mdsExceptions, Connection
 
+# 表示通道没有数据的异常；其余异常（连接断开、树文件不可读等）说明树句柄可能已不可用
+MDS_NO_DATA_ERRORS = (mdsExceptions.TreeNODATA, mdsExceptions.TreeNNF, mdsExceptions.TdiINVCLADSC)
+
 def judge_data(npary):
     """ 判断MDSplus返回数据是否是一维数据 """
     if len(npary.shape) == 1:
@@ -35,6 +44,10 @@ class MdsConn:
         self.conn.closeAllTrees()
         self.conn.disconnect()
 
+    def close(self):
+        """ 与 MdsTree.close 一致，句柄池关闭句柄时调用 """
+        self.closeConn()
+
     def setTimeContext(self, begin, end, delta):
         """ 设置起止时间及采样率，参数单位s """
         timeContext = 'SetTimeContext({},{},{})'.format(begin, end, delta)
@@ -120,14 +133,50 @@ class MdsConn:
 
         return result
 
+    def unpackPackage(self, package, channel):
+        """
+        从已执行的GetMany包中取出单个通道数据，返回格式与getOneData一致
+        """
+        try:
+            data_x = package.get(f'{channel}_dim').data()
+            data_y = package.get(f'{channel}_value').data()
+            unit = package.get(f'{channel}_unit')
+            unit = '' if unit == ' ' else str(unit)
+            data_x, err_x = judge_data(np.asarray(data_x))
+            data_y, err_y = judge_data(np.asarray(data_y))
+            message = err_x + err_y
+        except Exception as e:
+            data_x, data_y, unit = np.array([]), np.array([]), ''
+            message = f'Check {channel} find that {str(e)}'
+
+        return {'data_x': data_x, 'data_y': data_y, 'unit': unit, 'message': message, }
+
+    def getManyChannels(self, shot, channels, begin='', end='', delta='', isOpenTree=True):
+        """
+        一次GetMany()请求获取同一炮号、同一时间上下文下的多个通道数据
+        isOpenTree 为 False 时使用已打开的树（句柄池中的连接在取出时已打开该炮号的树）
+        return {channel: {data_x, data_y, unit, message}, ...}
+        """
+        if isOpenTree:
+            self.openTree(int(shot))
+        self.setTimeContext(begin, end, delta)
+        package = self.initPackage()
+        for channel in channels:
+            self.formPackage(package, channel)
+        package.execute()
+
+        return {channel: self.unpackPackage(package, channel) for channel in channels}
+
 
 class MdsTree:
     """ 构建MDSplus.Tree的一些常用方法 """
 
-    def __init__(self, shot, dbname, path, subtrees):
+    def __init__(self, shot, dbname, path, subtrees, strict=False):
         self.shot = shot
         self.dbname = dbname
         self.subtrees = subtrees
+        # strict 为 True 时 getData 只把 MDS_NO_DATA_ERRORS 当作无数据，其余异常原样抛出（树句柄池使用）
+        self.strict = strict
         self.tree = Tree(self.dbname, self.shot, path=path)
 
     def formChannelPool(self):
@@ -139,6 +188,17 @@ class MdsTree:
 
         return channels
 
+    def formChannelSubtreeMap(self):
+        """ 构建通道池并记录每个通道所在的子树，返回 {通道名: 子树}，用于填充通道定位索引 """
+        channel_subtrees = {}
+        for subTree in self.subtrees:
+            sub_nodes = self.tree.getNode(r'\TOP.{}'.format(subTree)).getNodeWild("***")
+            for node in sub_nodes:
+                if str(node.usage) == 'SIGNAL' and len(node.tags) > 0:
+                    channel_subtrees.setdefault(node.name.strip(), subTree)
+
+        return channel_subtrees
+
     def close(self):
         self.tree.close()
 
@@ -188,6 +248,8 @@ class MdsTree:
             data_x, data_y, unit = [], [], ''
         except Exception as e:
             # print('Check {} find that {}'.format(channel_name, str(e)))
+            if self.strict and not isinstance(e, MDS_NO_DATA_ERRORS):
+                raise
             data_x, data_y, unit = [], [], ''
 
         return data_x, data_y, unit
@@ -217,4 +279,137 @@ def formChaPool(dbname, shot, path, subtrees):
     return channels
 
 
+# 全局树句柄池（进程内唯一），树句柄的键为 (dbname, shot)，连接句柄的键为 (dbname, shot, 'conn')
+# 同一炮号的多个通道共享已打开的树，避免每次请求都通过 192.168.20.x:: 重新打开。
+# 一个树句柄同一时刻只给一个线程使用（时间上下文是句柄上的状态），同一炮号的并发读取各自取出一个句柄，
+# 池中没有空闲句柄时新开一个，用完放回；读取出错的句柄直接关闭，不放回池中。
+# 批量接口使用的 MdsConn 连接（已打开该炮号的树，用于 GetMany）与树句柄共用同一个池和容量上限
+MDS_TREE_POOL_MAX_SIZE = getattr(settings, 'MDS_TREE_POOL_MAX_SIZE', 32)  # 最多保留的空闲句柄数
+MDS_TREE_POOL_IDLE_SECONDS = getattr(settings, 'MDS_TREE_POOL_IDLE_SECONDS', 300)  # 空闲超过该时间的句柄会被关闭
 
+_MDS_TREE_POOL = OrderedDict()  # {键: [(MdsTree 或 MdsConn, 放回时间), ...]}，按最近使用排序
+_MDS_TREE_POOL_LOCK = threading.Lock()
+_MDS_TREE_POOL_STATS = {'opened': 0, 'reused': 0, 'closed': 0, 'broken': 0, 'in_use': 0}
+
+
+def _close_tree(tree):
+    try:
+        tree.close()
+    except Exception:
+        pass
+    _MDS_TREE_POOL_STATS['closed'] += 1
+
+
+def _idle_tree_count():
+    return sum(len(handles) for handles in _MDS_TREE_POOL.values())
+
+
+def _shrink_mds_tree_pool():
+    """ 关闭空闲超时的句柄，并在超出容量时按最久未使用淘汰（调用方需持有池锁） """
+    now = time.time()
+    for key in list(_MDS_TREE_POOL.keys()):
+        handles = _MDS_TREE_POOL[key]
+        for tree, returned in [item for item in handles if now - item[1] > MDS_TREE_POOL_IDLE_SECONDS]:
+            handles.remove((tree, returned))
+            _close_tree(tree)
+        if not handles:
+            del _MDS_TREE_POOL[key]
+    while _MDS_TREE_POOL and _idle_tree_count() > MDS_TREE_POOL_MAX_SIZE:
+        key = next(iter(_MDS_TREE_POOL))
+        handles = _MDS_TREE_POOL[key]
+        tree, _ = handles.pop(0)
+        _close_tree(tree)
+        if not handles:
+            del _MDS_TREE_POOL[key]
+
+
+@contextmanager
+def _checkout_pooled(key, open_handle):
+    """ 从池中取出键为 key 的空闲句柄，没有时调用 open_handle() 新开；使用中出现异常时关闭句柄，否则放回 """
+    with _MDS_TREE_POOL_LOCK:
+        _shrink_mds_tree_pool()
+        handles = _MDS_TREE_POOL.get(key)
+        tree = handles.pop()[0] if handles else None
+        if handles is not None and not handles:
+            del _MDS_TREE_POOL[key]
+        _MDS_TREE_POOL_STATS['in_use'] += 1
+        if tree is not None:
+            _MDS_TREE_POOL_STATS['reused'] += 1
+
+    try:
+        if tree is None:
+            tree = open_handle()
+            with _MDS_TREE_POOL_LOCK:
+                _MDS_TREE_POOL_STATS['opened'] += 1
+        try:
+            yield tree
+        except Exception:
+            with _MDS_TREE_POOL_LOCK:
+                _MDS_TREE_POOL_STATS['broken'] += 1
+                _close_tree(tree)
+            tree = None
+            raise
+    finally:
+        with _MDS_TREE_POOL_LOCK:
+            _MDS_TREE_POOL_STATS['in_use'] -= 1
+            if tree is not None:
+                _MDS_TREE_POOL.setdefault(key, []).append((tree, time.time()))
+                _MDS_TREE_POOL.move_to_end(key)
+            _shrink_mds_tree_pool()
+
+
+@contextmanager
+def checkout_mds_tree(shot, dbname, path, subtrees):
+    """
+    从树句柄池中取出 MdsTree，用法:
+        with checkout_mds_tree(shot, DB, path, subtrees) as tree:
+            data_x, data_y, unit = tree.getData(channel_name)
+    取出的树为 strict 模式: 通道没有数据时 getData 返回空数据，其他读取错误抛出异常。
+    使用过程中出现异常时关闭该句柄，不放回池中，下次重新打开
+    """
+    with _checkout_pooled((dbname, int(shot)),
+                          lambda: MdsTree(shot, dbname=dbname, path=path, subtrees=subtrees, strict=True)) as tree:
+        yield tree
+
+
+def _open_mds_conn(shot, dbname, addr):
+    conn = MdsConn(dbname, addr)
+    try:
+        conn.openTree(int(shot))
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+@contextmanager
+def checkout_mds_conn(shot, dbname, addr):
+    """
+    从句柄池中取出已打开 dbname 树第 shot 炮的 MdsConn，用于 GetMany() 批量读取，用法:
+        with checkout_mds_conn(shot, DB, addr) as conn:
+            channels = conn.getManyChannels(shot, channel_names, begin, end, delta, isOpenTree=False)
+    GetMany() 请求本身失败（连接断开等）时抛出异常，该连接被关闭，不放回池中
+    """
+    with _checkout_pooled((dbname, int(shot), 'conn'), lambda: _open_mds_conn(shot, dbname, addr)) as conn:
+        yield conn
+
+
+def close_all_mds_trees():
+    """ 关闭池中所有空闲的句柄 """
+    with _MDS_TREE_POOL_LOCK:
+        for handles in _MDS_TREE_POOL.values():
+            for tree, _ in handles:
+                _close_tree(tree)
+        _MDS_TREE_POOL.clear()
+
+
+def mds_tree_pool_stats():
+    """ 返回句柄池统计信息 """
+    with _MDS_TREE_POOL_LOCK:
+        return {
+            'size': _idle_tree_count(),
+            'max_size': MDS_TREE_POOL_MAX_SIZE,
+            'idle_seconds': MDS_TREE_POOL_IDLE_SECONDS,
+            'keys': ['/'.join(str(part) for part in key) for key in _MDS_TREE_POOL.keys()],
+            **_MDS_TREE_POOL_STATS,
+        }
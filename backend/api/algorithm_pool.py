@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+导入算法的隔离执行进程池
+
+用户上传的 Python 算法原先在服务进程中直接执行，慢算法会占住请求线程，占用大量内存的算法会拖垮整个服务，
+CPU 密集的算法也只能用到一个核。本模块把导入算法的调用交给常驻的工作进程:
+    - 工作进程在第一次调用时按 ALGORITHM_WORKERS 一次性启动（spawn），之后常驻；每个进程有自己的
+      FunctionRegistry，算法模块只在首次调用或文件内容变化时执行
+    - 通道数组通过共享内存传递（见 api.shared_signal）: 父进程把数组复制到共享内存块，只发送 SharedSignal 句柄，
+      工作进程映射后再转换为算法需要的列表，大数组不经过 pickle
+    - 每次调用有超时（ALGORITHM_CALL_TIMEOUT 秒），超时或任务被取消时终止该工作进程并启动新的进程替换
+    - 工作进程用 RLIMIT_AS 限制地址空间: 上限为进程启动完成时已占用的地址空间加 ALGORITHM_MEMORY_LIMIT，
+      超过后算法收到 MemoryError，该进程报告错误后退出并被替换
+    - 并发数即工作进程数，所有进程都忙时调用方最多排队 ALGORITHM_QUEUE_TIMEOUT 秒；工作进程降低调度优先级，
+      不与服务进程争抢 CPU
+ALGORITHM_WORKERS 为 0 时不启用进程池，由调用方在服务进程中直接执行（原行为）。
+
+每个服务进程有各自的进程池。本模块不依赖 Django。
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from api.function_registry import FunctionRegistry
+from api.shared_signal import SharedSignal, SharedSignalSet, untrack_attached_memory
+
+try:
+    import resource
+except ImportError:  # Windows 下不限制内存
+    resource = None
+
+# 超过该字节数的数组通过共享内存传递，更小的数组直接随消息 pickle
+SHARED_MIN_BYTES = 64 * 1024
+# 工作进程的 nice 值增量
+WORKER_NICE = 5
+# 等待结果、排队时检查任务取消的间隔（秒）
+_WAIT_INTERVAL = 0.5
+
+
+class AlgorithmError(Exception):
+    """ 导入算法执行失败（算法抛出异常、超时、工作进程退出等） """
+
+
+class AlgorithmTimeout(AlgorithmError):
+    """ 导入算法执行超时 """
+
+
+class AlgorithmBusy(AlgorithmError):
+    """ 所有工作进程都忙，排队超时 """
+
+
+def _share_arrays(args, signals):
+    """ 把参数中（含通道数据字典中）的大数值数组放入 signals（SharedSignalSet），替换为句柄 """
+    def share(value):
+        if not isinstance(value, np.ndarray) or value.dtype.hasobject or value.nbytes < SHARED_MIN_BYTES:
+            return value
+        return signals.share(value)
+
+    return [{key: share(item) for key, item in arg.items()} if isinstance(arg, dict) else share(arg) for arg in args]
+
+
+def _attach_arrays(args):
+    """ 工作进程中映射共享内存，按算法的约定把数组转换为列表 """
+    def attach(value):
+        if isinstance(value, SharedSignal):
+            with value.attach() as array:
+                return array.tolist()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        return value
+
+    return [{key: attach(item) for key, item in arg.items()} if isinstance(arg, dict) else attach(arg) for arg in args]
+
+
+def _address_space_bytes():
+    """ 当前进程已占用的地址空间（Linux），无法获取时返回 0 """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _limit_worker(memory_limit):
+    """ 降低工作进程优先级并限制地址空间 """
+    if hasattr(os, 'nice'):
+        try:
+            os.nice(WORKER_NICE)
+        except OSError:
+            pass
+    if resource is not None and memory_limit:
+        limit = _address_space_bytes() + int(memory_limit)
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError) as e:
+            print(f"设置算法进程内存上限失败: {e}")
+
+
+def _worker_main(conn, functions_file, media_root, memory_limit):
+    """ 工作进程: 循环接收 (文件路径, 函数名, 参数)，返回 ('ok', 函数名, 结果) 或 ('error', 信息, 是否需要重启) """
+    untrack_attached_memory()
+    _limit_worker(memory_limit)
+    registry = FunctionRegistry(functions_file, media_root)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        path, function_name, args = message
+        try:
+            name, func = registry.resolve(path, function_name)
+            reply = ('ok', name, func(*_attach_arrays(args)))
+        except MemoryError:
+            limit = f"（{memory_limit / 1024 ** 2:.0f}MB）" if memory_limit else ''
+            reply = ('error', f"算法内存占用超过上限{limit}", True)
+        except BaseException as e:
+            reply = ('error', f"{type(e).__name__}: {e}", False)
+        try:
+            conn.send(reply)
+        except Exception as e:  # 结果无法序列化
+            conn.send(('error', f"算法结果无法传回: {type(e).__name__}: {e}", False))
+        if reply[0] == 'error' and reply[2]:
+            return
+
+
+class _Worker:
+    def __init__(self, context, functions_file, media_root, memory_limit):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, functions_file, media_root, memory_limit),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class AlgorithmPool:
+    """ 常驻工作进程池，每个工作进程同一时间只执行一个调用 """
+
+    def __init__(self, functions_file, media_root, workers, call_timeout=300, memory_limit=None, queue_timeout=30):
+        self.functions_file = str(functions_file)
+        self.media_root = str(media_root)
+        self.workers = max(int(workers), 0)
+        self.call_timeout = call_timeout
+        self.memory_limit = memory_limit
+        self.queue_timeout = queue_timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._idle = queue.Queue()
+        self._all = []
+        self._started = False
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.shared_bytes = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _new_worker(self):
+        worker = _Worker(self._context, self.functions_file, self.media_root, self.memory_limit)
+        with self._lock:
+            self._all.append(worker)
+        return worker
+
+    def _replace(self, worker, kill=True):
+        """ 终止工作进程并启动新的进程放回空闲队列 """
+        worker.stop(kill=kill)
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+            self.restarts += 1
+            started = self._started
+        if started:
+            self._idle.put(self._new_worker())
+
+    def start(self):
+        """ 启动全部工作进程（首次调用时自动执行） """
+        with self._lock:
+            if self._started or not self.enabled:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            self._idle.put(self._new_worker())
+
+    def shutdown(self):
+        with self._lock:
+            self._started = False
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.stop()
+        self._idle = queue.Queue()
+
+    def _acquire(self, check):
+        deadline = time.monotonic() + self.queue_timeout
+        while True:
+            try:
+                worker = self._idle.get(timeout=max(min(_WAIT_INTERVAL, deadline - time.monotonic()), 0))
+            except queue.Empty:
+                if check is not None:
+                    check()
+                if time.monotonic() >= deadline:
+                    raise AlgorithmBusy(f"算法执行进程全忙（{self.workers} 个），排队超过 {self.queue_timeout} 秒")
+                continue
+            if worker.process.is_alive():
+                return worker
+            self._replace(worker)
+
+    def call(self, path, function_name, args, timeout=None, check=None):
+        """
+        在工作进程中执行文件 path 中的函数（function_name 不存在时使用第一个函数），返回 (函数名, 结果)
+        args 中的 NumPy 数组（包括通道数据字典中的数组）经共享内存传递，算法收到的是列表
+        check() 在等待期间定期调用，抛出异常（如 TaskCancelled）时终止该次调用
+        失败时抛出 AlgorithmError；check() 抛出的异常原样传出
+        """
+        self.start()
+        timeout = self.call_timeout if timeout is None else timeout
+        worker = self._acquire(check)
+        signals = SharedSignalSet()
+        healthy = True  # 消息发出前失败时工作进程仍可复用
+        try:
+            message = (os.path.abspath(path), function_name, _share_arrays(args, signals))
+            with self._lock:
+                self.calls += 1
+                self.shared_bytes += signals.nbytes
+            healthy = False
+            worker.conn.send(message)
+            deadline = time.monotonic() + timeout if timeout else None
+            while not worker.conn.poll(_WAIT_INTERVAL):
+                if check is not None:
+                    check()
+                if deadline is not None and time.monotonic() >= deadline:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise AlgorithmTimeout(f"算法执行超时（{timeout} 秒）")
+            try:
+                status, value, extra = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                raise AlgorithmError(f"算法执行进程异常退出（可能超过内存上限）: {e}")
+            healthy = status == 'ok' or not extra
+            if status != 'ok':
+                raise AlgorithmError(value)
+            return value, extra
+        except AlgorithmError:
+            with self._lock:
+                self.failures += 1
+            raise
+        finally:
+            signals.close()
+            if healthy:
+                self._idle.put(worker)
+            else:
+                self._replace(worker, kill=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'started': self._started,
+                'idle': self._idle.qsize(),
+                'calls': self.calls,
+                'failures': self.failures,
+                'timeouts': self.timeouts,
+                'restarts': self.restarts,
+                'shared_bytes': self.shared_bytes,
+            }
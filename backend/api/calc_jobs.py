@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+批量表达式计算任务
+
+同一个表达式模板（如 "IP - MP01" 或 "IP_{shot} - MP01_{shot}"，见 expression_plan.expand_template）
+在一组炮号上求值:
+    - 每个炮号交给进程池中的一个工作进程求值。工作进程常驻，跨炮号、跨任务复用自身的编译计划缓存、
+      派生结果缓存和 MDSplus 树连接；原始信号通过磁盘缓存在进程之间共享
+    - 工作进程把结果直接写入任务目录，只向父进程返回摘要，大数组不经过进程间传输
+    - 每完成一个炮号即更新任务状态并通知等待中的流式响应，客户端无需等待全部炮号完成
+
+任务保存在 CALC_JOB_DIR/<job_id>/ 下，服务重启后仍可按任务 ID 和炮号读取结果（保留策略同 calc_tasks）:
+    job.json      任务元数据与每个炮号的状态摘要
+    <炮号>.npz    该炮号的结果（y，及 x 或 t0/dt/n）
+"""
+
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+from api import time_axis
+from api.calc_tasks import CALC_TASK_RESULT_MAX_BYTES, CALC_TASK_TTL, register_sweeper, sweep_task_dirs
+from api.expression_parser import ExpressionParser
+from api.expression_plan import expand_template
+from api.function_registry import FunctionRegistry
+from api.signal_access import get_channel
+
+# 工作进程数
+CALC_BATCH_WORKERS = getattr(settings, 'CALC_BATCH_WORKERS', max(1, min(4, (os.cpu_count() or 2) - 1)))
+# 单个任务允许的最大炮号数
+CALC_BATCH_MAX_SHOTS = getattr(settings, 'CALC_BATCH_MAX_SHOTS', 500)
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def parse_shots(value):
+    """
+    解析炮号列表，支持整数列表或字符串 "240830-240840,240850"
+    返回去重后保持原顺序的整数列表，格式错误或数量超过 CALC_BATCH_MAX_SHOTS 时抛出 ValueError
+    """
+    if value is None or value == '' or value == []:
+        raise ValueError("缺少炮号列表 shots")
+    items = value.split(',') if isinstance(value, str) else list(value)
+    shots = []
+    for item in items:
+        text = str(item).strip()
+        if not text:
+            continue
+        match = re.fullmatch(r'(\d+)\s*-\s*(\d+)', text)
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            if end < start:
+                raise ValueError(f"炮号区间起点大于终点: {text}")
+            if end - start + 1 > CALC_BATCH_MAX_SHOTS:
+                raise ValueError(f"炮号数量超过上限 {CALC_BATCH_MAX_SHOTS}")
+            shots.extend(range(start, end + 1))
+        elif text.isdigit():
+            shots.append(int(text))
+        else:
+            raise ValueError(f"无效的炮号: {text}")
+    shots = list(dict.fromkeys(shots))
+    if not shots:
+        raise ValueError("缺少炮号列表 shots")
+    if len(shots) > CALC_BATCH_MAX_SHOTS:
+        raise ValueError(f"炮号数量超过上限 {CALC_BATCH_MAX_SHOTS}")
+    return shots
+
+
+def write_result(job_dir, shot, result):
+    """ 将单个炮号的求值结果写入任务目录（先写临时文件再原子替换），返回数据点数 """
+    y_values = np.asarray(result['Y_value'])
+    arrays = {'y': y_values, 'channel_name': np.array(str(result.get('channel_name', '')))}
+    if time_axis.is_implicit(result):
+        axis = result['X_axis']
+        arrays['axis'] = np.array([float(axis['t0']), float(axis['dt']), float(axis['n'])])
+    else:
+        arrays['x'] = np.asarray(result.get('X_value', []))
+    path = os.path.join(job_dir, f'{shot}.npz')
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return int(y_values.size)
+
+
+_function_registry = None
+
+
+def _worker_function_registry():
+    """ 工作进程的导入函数清单，首次使用时创建 """
+    global _function_registry
+    if _function_registry is None:
+        _function_registry = FunctionRegistry(os.path.join(settings.MEDIA_ROOT, 'imported_functions.json'),
+                                              settings.MEDIA_ROOT)
+    return _function_registry
+
+
+def _execute_imported_function(data):
+    """
+    表达式调用导入函数时才导入 views（MATLAB 引擎、算法进程池等），
+    只含通道运算和内置函数的表达式不加载 views
+    """
+    from api.views import execute_function
+    return execute_function(data)
+
+
+def _evaluate_shot(job_dir, template, shot, sample_freq, align_mode, align_dt):
+    """ 在工作进程中对单个炮号求值，结果写入任务目录，返回摘要 """
+    start = time.time()
+    expression = expand_template(template, shot)
+    try:
+        parser = ExpressionParser(lambda key: get_channel(key, sample_freq=sample_freq, x_encoding='implicit', fields='x,y'),
+                                  cache_context=(float(sample_freq), 'implicit', align_mode, align_dt),
+                                  align_mode=align_mode, align_dt=align_dt,
+                                  function_registry=_worker_function_registry(),
+                                  execute_function=_execute_imported_function)
+        result = parser.parse(expression)
+        result['channel_name'] = expression
+        points = write_result(job_dir, shot, result)
+        return {'shot': shot, 'status': 'done', 'expression': expression, 'points': points,
+                'elapsed': round(time.time() - start, 3)}
+    except Exception as e:
+        return {'shot': shot, 'status': 'failed', 'expression': expression, 'error': str(e),
+                'elapsed': round(time.time() - start, 3)}
+
+
+def _init_worker():
+    """ 工作进程以 spawn 方式启动，需要先初始化 Django """
+    import django
+    django.setup()
+
+
+class CalcJobStore:
+    """ 基于文件的批量计算任务存储，进行中的任务同时保存在内存中并在每个炮号完成时通知等待者 """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._jobs = {}  # 本进程中创建的任务 {job_id: job}
+
+    def job_dir(self, job_id):
+        if not _JOB_ID_RE.match(str(job_id)):
+            raise ValueError(f"无效的任务ID: {job_id}")
+        return os.path.join(self.root, job_id)
+
+    def _write(self, job):
+        """ 原子写入任务元数据，调用方需持有锁 """
+        path = os.path.join(self.job_dir(job['job_id']), 'job.json')
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def sweep(self):
+        """ 按 CALC_TASK_TTL 和 CALC_TASK_RESULT_MAX_BYTES 清理过期任务（由后台清理线程定期调用） """
+        removed = sweep_task_dirs(self.root, 'job.json', CALC_TASK_TTL, CALC_TASK_RESULT_MAX_BYTES, ('completed',))
+        with self._lock:
+            for job_id in removed:
+                self._jobs.pop(job_id, None)
+        if removed:
+            print(f"清理过期批量计算任务: {len(removed)} 个")
+        return removed
+
+    def create(self, template, shots, params):
+        """ 创建任务，所有炮号处于 pending 状态 """
+        register_sweeper(self.sweep)
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        now = time.time()
+        job = {
+            'job_id': job_id,
+            'template': template,
+            'params': params,
+            'status': 'running',
+            'created': now,
+            'updated': now,
+            'total': len(shots),
+            'finished': 0,
+            'failed': 0,
+            'shots': {str(shot): {'shot': shot, 'status': 'pending'} for shot in shots},
+            'order': [],  # 按完成顺序记录的炮号，供流式响应按顺序推送
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._write(job)
+        return job
+
+    def finish_shot(self, job_id, summary):
+        """ 记录单个炮号的求值摘要，全部完成时任务状态变为 completed """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:  # 已被清理
+                return
+            job['shots'][str(summary['shot'])] = summary
+            job['order'].append(summary['shot'])
+            job['finished'] += 1
+            if summary['status'] != 'done':
+                job['failed'] += 1
+            job['updated'] = time.time()
+            if job['finished'] >= job['total']:
+                job['status'] = 'completed'
+            try:
+                self._write(job)
+            except OSError as e:
+                print(f"写入批量计算任务状态失败: {job_id}, {e}")
+            self._changed.notify_all()
+
+    def load(self, job_id):
+        """ 读取任务元数据，不存在时返回 None """
+        job_dir = self.job_dir(job_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return json.loads(json.dumps(job))
+        try:
+            with open(os.path.join(job_dir, 'job.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def read_result(self, job_id, shot):
+        """ 读取单个炮号的结果，返回通道数据字典（X_axis 或 X_value, Y_value），不存在时返回 None """
+        path = os.path.join(self.job_dir(job_id), f'{int(shot)}.npz')
+        try:
+            with np.load(path) as data:
+                y_values = data['y']
+                result = {'channel_name': str(data['channel_name'])}
+                if 'axis' in data:
+                    t0, dt, n = data['axis']
+                    result['X_axis'] = {'t0': float(t0), 'dt': float(dt), 'n': int(n)}
+                else:
+                    result['X_value'] = data['x']
+        except FileNotFoundError:
+            return None
+        if y_values.ndim == 0:
+            result['Y_value'] = y_values.item()
+            result['is_constant'] = True
+        else:
+            result['Y_value'] = y_values
+        return result
+
+    def iter_events(self, job_id, timeout=None):
+        """ 按完成顺序逐个产出炮号摘要，直到任务全部完成；timeout 秒内没有新结果时结束 """
+        sent = 0
+        while True:
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return
+                if sent >= len(job['order']) and job['status'] == 'running':
+                    if not self._changed.wait(timeout) and sent >= len(job['order']):
+                        return
+                pending = [dict(job['shots'][str(shot)]) for shot in job['order'][sent:]]
+                done = job['status'] != 'running'
+            for summary in pending:
+                sent += 1
+                yield summary
+            if done and sent >= len(job['order']):
+                return
+
+
+job_store = CalcJobStore(getattr(settings, 'CALC_JOB_DIR', settings.BASE_DIR / 'calc_jobs'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """ 懒创建常驻进程池；使用 spawn 避免在多线程的服务进程中 fork """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=CALC_BATCH_WORKERS,
+                                        mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker)
+        return _pool
+
+
+def _reset_pool(pool):
+    """ 工作进程异常退出后进程池不可再用，下次提交时重新创建 """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def submit_job(template, shots, sample_freq=1.0, align_mode=time_axis.DEFAULT_ALIGN_MODE, align_dt=None):
+    """ 创建批量计算任务并把每个炮号提交到进程池，立即返回任务元数据 """
+    params = {'sample_freq': sample_freq, 'align_mode': align_mode, 'align_dt': align_dt}
+    job = job_store.create(template, shots, params)
+    job_id = job['job_id']
+    job_dir = job_store.job_dir(job_id)
+    pool = _get_pool()
+
+    def on_done(future, shot):
+        try:
+            summary = future.result()
+        except BrokenProcessPool as e:
+            _reset_pool(pool)
+            summary = {'shot': shot, 'status': 'failed', 'error': f"计算进程异常退出: {e}"}
+        except BaseException as e:
+            summary = {'shot': shot, 'status': 'failed', 'error': str(e)}
+        job_store.finish_shot(job_id, summary)
+
+    for shot in shots:
+        try:
+            future = pool.submit(_evaluate_shot, job_dir, template, shot, sample_freq, align_mode, align_dt)
+        except (BrokenProcessPool, RuntimeError) as e:
+            _reset_pool(pool)
+            job_store.finish_shot(job_id, {'shot': shot, 'status': 'failed', 'error': f"提交计算任务失败: {e}"})
+            continue
+        future.add_done_callback(lambda f, shot=shot: on_done(f, shot))
+    return job_store.load(job_id)
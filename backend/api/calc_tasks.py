@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""
+计算任务执行器
+
+operator_strs 的计算在有界线程池中执行，HTTP 请求只负责提交任务（async=true 时立即返回任务ID）:
+    - 进度按阶段计算: 准备 → 获取通道数据 → 计算 → 整理结果，每个阶段内部按实际完成的通道数、
+      计划节点数推进，而不是固定的百分比
+    - 取消: 任意服务进程在任务目录写入 cancel 标记，执行任务的进程在阶段切换、每个通道读取完成、
+      每个运算节点完成时检查标记并中止（正在执行的单次 MDSplus 读取会先执行完；导入函数在算法进程池中执行时
+      立即终止该工作进程，见 api.algorithm_pool）
+    - 内存统计: 任务持有的通道数据和中间结果按字节累计，超过 CALC_TASK_MAX_MEMORY 时中止任务
+    - 保留策略: 任务状态和结果超过 CALC_TASK_TTL 秒未更新即删除，结果总大小超过
+      CALC_TASK_RESULT_MAX_BYTES 时从最旧的已结束任务开始删除；由后台清理线程每 CALC_TASK_SWEEP_INTERVAL 秒执行
+    - 进度推送: 每次状态更新通过 Channels 通道层发送到组 calc_task_<task_id>，
+      由 api.websocket.ProgressConsumer 推送给订阅的客户端
+
+任务状态保存在文件中（CALC_TASK_DIR/<task_id>/），多个服务进程共享，进度查询、取消请求和结果读取
+可以由与执行任务不同的进程处理:
+    task.json     任务状态（status, step, progress, memory_bytes, error, ...）
+    result.json   计算结果（已序列化的响应体）
+    cancel        取消标记
+"""
+
+import json
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import orjson
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    from asgiref.sync import async_to_sync
+    from channels.layers import get_channel_layer
+except ImportError:  # 未安装 channels 时不推送进度，客户端回退到轮询
+    get_channel_layer = None
+
+# 同时执行的计算任务数，以及允许排队等待的任务数
+CALC_TASK_WORKERS = getattr(settings, 'CALC_TASK_WORKERS', 4)
+CALC_TASK_MAX_PENDING = getattr(settings, 'CALC_TASK_MAX_PENDING', 16)
+# 单个任务允许持有的数据量（通道数据与中间结果）
+CALC_TASK_MAX_MEMORY = getattr(settings, 'CALC_TASK_MAX_MEMORY', 4 * 1024 ** 3)
+# 任务状态与结果的保留时间和结果总大小上限
+CALC_TASK_TTL = getattr(settings, 'CALC_TASK_TTL', 1800)
+CALC_TASK_RESULT_MAX_BYTES = getattr(settings, 'CALC_TASK_RESULT_MAX_BYTES', 2 * 1024 ** 3)
+
+# 阶段及其在总进度中的占比
+TASK_STAGES = (
+    ('prepare', '准备', 10),
+    ('fetch', '获取通道数据', 50),
+    ('compute', '计算', 30),
+    ('finalize', '整理结果', 10),
+)
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+_TASK_ID_RE = re.compile(r'^[0-9a-fA-F-]{32,36}$')
+# 进度写入文件的最小间隔，阶段切换和任务结束时总是立即写入
+_PROGRESS_WRITE_INTERVAL = 0.2
+# 后台清理线程的执行间隔
+CALC_TASK_SWEEP_INTERVAL = getattr(settings, 'CALC_TASK_SWEEP_INTERVAL', 60)
+
+
+class TaskCancelled(Exception):
+    """ 任务已被取消 """
+
+
+class TaskQueueFull(RuntimeError):
+    """ 排队的任务数已达上限 """
+
+
+def _is_file_backed(array):
+    """ 数组是否为磁盘缓存的内存映射（或其视图），其页面由操作系统按需换入换出 """
+    base = array
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            return True
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def value_nbytes(value):
+    """ 估算通道数据字典或数组占用的字节数，内存映射的数组不计入 """
+    if isinstance(value, np.ndarray):
+        return 0 if _is_file_backed(value) else int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(value_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value)
+    return 0
+
+
+def progress_group(task_id):
+    """ 任务进度推送使用的通道层组名 """
+    return f'calc_task_{task_id}'
+
+
+def publish_task_state(state):
+    """ 通过通道层把任务状态推送给订阅该任务的 WebSocket 客户端，推送失败不影响计算 """
+    if get_channel_layer is None:
+        return
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    try:
+        async_to_sync(layer.group_send)(progress_group(state['task_id']), {'type': 'task.progress', 'task': state})
+    except Exception as e:
+        print(f"推送计算任务进度失败: {state.get('task_id')}, {e}")
+
+
+_sweepers = []  # 后台清理线程定期调用的清理函数
+_sweeper_lock = threading.Lock()
+_sweeper_thread = None
+
+
+def register_sweeper(fn):
+    """ 注册由后台清理线程定期调用的清理函数，并确保清理线程已启动 """
+    global _sweeper_thread
+    with _sweeper_lock:
+        if fn not in _sweepers:
+            _sweepers.append(fn)
+        if _sweeper_thread is None:
+            _sweeper_thread = threading.Thread(target=_sweep_loop, name='calc-task-sweeper', daemon=True)
+            _sweeper_thread.start()
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(CALC_TASK_SWEEP_INTERVAL)
+        with _sweeper_lock:
+            sweepers = list(_sweepers)
+        for fn in sweepers:
+            try:
+                fn()
+            except Exception as e:
+                print(f"清理过期计算任务出错: {e}")
+
+
+def _dir_size(path):
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass
+    return total
+
+
+def sweep_task_dirs(root, meta_name, ttl, max_bytes, finished_statuses=FINISHED_STATUSES):
+    """
+    清理任务目录: 已结束且超过 ttl 秒未更新的任务、超过 2*ttl 秒未更新的未结束任务（执行进程已退出）被删除；
+    剩余已结束任务的总大小超过 max_bytes 时从最旧的开始删除
+    返回被删除的任务ID列表
+    """
+    removed = []
+    finished = []
+    total_bytes = 0
+    now = time.time()
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return removed
+    for name in names:
+        path = os.path.join(root, name)
+        meta_path = os.path.join(path, meta_name)
+        try:
+            mtime = os.path.getmtime(meta_path)
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                status = json.load(f).get('status')
+        except (OSError, ValueError):
+            # 元数据缺失或损坏（写入中途退出），按目录时间判断
+            try:
+                mtime, status = os.path.getmtime(path), None
+            except OSError:
+                continue
+        is_finished = status in finished_statuses
+        age = now - mtime
+        if age > (ttl if is_finished else 2 * ttl):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+            continue
+        size = _dir_size(path)
+        total_bytes += size
+        if is_finished:
+            finished.append((mtime, name, path, size))
+    for mtime, name, path, size in sorted(finished):
+        if total_bytes <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+        total_bytes -= size
+    return removed
+
+
+class TaskStore:
+    """ 基于文件的任务状态存储，多个服务进程共享 """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._lock = threading.Lock()
+
+    def task_dir(self, task_id):
+        if not _TASK_ID_RE.match(str(task_id)):
+            raise ValueError(f"无效的任务ID: {task_id}")
+        return os.path.join(self.root, task_id)
+
+    def _path(self, task_id, name):
+        return os.path.join(self.task_dir(task_id), name)
+
+    def _write_json(self, task_id, state):
+        path = self._path(task_id, 'task.json')
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def create(self, task_id=None, **fields):
+        """ 创建任务（task_id 为空时生成新ID），返回任务状态 """
+        register_sweeper(self.sweep)
+        task_id = task_id or str(uuid.uuid4())
+        os.makedirs(self.task_dir(task_id), exist_ok=True)
+        now = timezone.now().isoformat()
+        state = {
+            'task_id': task_id,
+            'status': 'initialized',
+            'step': '任务已创建',
+            'progress': 0,
+            'memory_bytes': 0,
+            'start_time': now,
+            'last_update': now,
+        }
+        state.update(fields)
+        with self._lock:
+            self._write_json(task_id, state)
+        return state
+
+    def _read(self, task_id):
+        try:
+            with open(self._path(task_id, 'task.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def load(self, task_id):
+        """ 读取任务状态，不存在时返回 None；存在取消标记的未结束任务显示为 cancelling """
+        state = self._read(task_id)
+        if state is not None and state.get('status') not in FINISHED_STATUSES and self.is_cancelled(task_id):
+            state['status'] = 'cancelling'
+        return state
+
+    def update(self, task_id, **fields):
+        """ 更新任务状态字段，任务不存在时忽略，返回更新后的状态 """
+        with self._lock:
+            state = self._read(task_id)
+            if state is None:
+                return None
+            state.update(fields)
+            state['last_update'] = timezone.now().isoformat()
+            self._write_json(task_id, state)
+        publish_task_state(state)
+        return state
+
+    def request_cancel(self, task_id):
+        """ 请求取消任务，任务不存在或已结束时返回 False """
+        state = self.load(task_id)
+        if state is None or state['status'] in FINISHED_STATUSES:
+            return False
+        with open(self._path(task_id, 'cancel'), 'w') as f:
+            f.write(timezone.now().isoformat())
+        state['status'] = 'cancelling'
+        publish_task_state(state)
+        return True
+
+    def is_cancelled(self, task_id):
+        return os.path.exists(self._path(task_id, 'cancel'))
+
+    def write_result(self, task_id, body):
+        """ 保存已序列化的结果，返回字节数 """
+        path = self._path(task_id, 'result.json')
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        return len(body)
+
+    def read_result(self, task_id):
+        """ 读取已序列化的结果，不存在时返回 None """
+        try:
+            with open(self._path(task_id, 'result.json'), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def sweep(self):
+        """ 按保留策略清理过期任务（由后台清理线程定期调用） """
+        removed = sweep_task_dirs(self.root, 'task.json', CALC_TASK_TTL, CALC_TASK_RESULT_MAX_BYTES)
+        if removed:
+            print(f"清理过期计算任务: {len(removed)} 个")
+        return removed
+
+
+class TaskContext:
+    """ 传给计算函数的任务上下文: 报告阶段进度、累计内存、检查取消 """
+
+    def __init__(self, store, task_id):
+        self.store = store
+        self.task_id = task_id
+        self.memory_bytes = 0
+        self.peak_memory_bytes = 0
+        self._lock = threading.Lock()
+        self._stage_start = 0
+        self._stage_weight = 0
+        self._step = ''
+        self._progress = 0
+        self._last_write = 0.0
+
+    def check(self):
+        """ 任务已被取消时抛出 TaskCancelled """
+        if self.store.is_cancelled(self.task_id):
+            raise TaskCancelled("计算任务已取消")
+
+    def _write(self, force=False):
+        now = time.time()
+        if not force and now - self._last_write < _PROGRESS_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        self.store.update(self.task_id, status='processing', step=self._step, progress=self._progress,
+                          memory_bytes=self.memory_bytes, peak_memory_bytes=self.peak_memory_bytes)
+
+    def stage(self, name, step=None):
+        """ 进入阶段 name（见 TASK_STAGES），step 为显示的步骤描述 """
+        self.check()
+        start = 0
+        for key, label, weight in TASK_STAGES:
+            if key == name:
+                with self._lock:
+                    self._stage_start, self._stage_weight = start, weight
+                    self._step = step or label
+                    self._progress = max(self._progress, start)
+                self._write(force=True)
+                return
+            start += weight
+        raise ValueError(f"未知的任务阶段: {name}")
+
+    def advance(self, done, total, step=None):
+        """ 当前阶段已完成 done/total """
+        with self._lock:
+            if step:
+                self._step = step
+            fraction = min(max(done / total, 0.0), 1.0) if total else 1.0
+            self._progress = max(self._progress, int(self._stage_start + self._stage_weight * fraction))
+        self._write()
+        self.check()
+
+    def account(self, nbytes):
+        """ 累计任务持有的数据量（可为负数表示释放），超过 CALC_TASK_MAX_MEMORY 时抛出 MemoryError """
+        with self._lock:
+            self.memory_bytes += int(nbytes)
+            self.peak_memory_bytes = max(self.peak_memory_bytes, self.memory_bytes)
+            memory_bytes = self.memory_bytes
+        if memory_bytes > CALC_TASK_MAX_MEMORY:
+            raise MemoryError(f"计算任务数据量超过上限: {memory_bytes / 1024 ** 2:.1f}MB > "
+                              f"{CALC_TASK_MAX_MEMORY / 1024 ** 2:.0f}MB")
+
+
+class CalcTaskExecutor:
+    """ 有界的计算任务执行器，超过 CALC_TASK_WORKERS + CALC_TASK_MAX_PENDING 个未完成任务时拒绝提交 """
+
+    def __init__(self, store, max_workers=CALC_TASK_WORKERS, max_pending=CALC_TASK_MAX_PENDING):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='calc-task')
+        self._lock = threading.Lock()
+        self._contexts = {}  # 本进程中未完成的任务 {task_id: TaskContext 或 None（排队中）}
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+
+    def submit(self, task_id, fn):
+        """
+        提交任务，fn(ctx) 返回可用 orjson 序列化的响应数据
+        返回 Future，结果为 (状态, 序列化后的响应体或错误信息)
+        """
+        with self._lock:
+            if len(self._contexts) >= self.max_workers + self.max_pending:
+                self.rejected += 1
+                raise TaskQueueFull(f"计算任务过多（{len(self._contexts)} 个未完成），请稍后重试")
+            self._contexts[task_id] = None
+        self.store.update(task_id, status='queued', step='排队等待计算', progress=0)
+        return self._pool.submit(self._run, task_id, fn)
+
+    def _run(self, task_id, fn):
+        ctx = TaskContext(self.store, task_id)
+        with self._lock:
+            self._contexts[task_id] = ctx
+        try:
+            ctx.check()
+            payload = fn(ctx)
+            ctx.stage('finalize', '保存计算结果')
+            body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+            result_bytes = self.store.write_result(task_id, body)
+            self.store.update(task_id, status='completed', step='计算完成', progress=100,
+                              memory_bytes=0, peak_memory_bytes=ctx.peak_memory_bytes, result_bytes=result_bytes)
+            self._count('completed')
+            return 'completed', body
+        except TaskCancelled as e:
+            self.store.update(task_id, status='cancelled', step='计算已取消', memory_bytes=0,
+                              peak_memory_bytes=ctx.peak_memory_bytes)
+            self._count('cancelled')
+            return 'cancelled', str(e)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self.store.update(task_id, status='failed', step=f'计算出错: {e}', progress=0, error=str(e),
+                              memory_bytes=0, peak_memory_bytes=ctx.peak_memory_bytes)
+            self._count('failed')
+            return 'failed', str(e)
+        finally:
+            with self._lock:
+                self._contexts.pop(task_id, None)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """ 返回本进程执行器的统计信息 """
+        with self._lock:
+            running = [ctx for ctx in self._contexts.values() if ctx is not None]
+            return {
+                'max_workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'running': len(running),
+                'queued': len(self._contexts) - len(running),
+                'memory_bytes': sum(ctx.memory_bytes for ctx in running),
+                'completed': self.completed,
+                'failed': self.failed,
+                'cancelled': self.cancelled,
+                'rejected': self.rejected,
+            }
+
+
+task_store = TaskStore(getattr(settings, 'CALC_TASK_DIR', settings.BASE_DIR / 'calc_tasks'))
+executor = CalcTaskExecutor(task_store)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+通道定位索引
+
+记录 (炮号区间, 通道名) -> (树名, 子树)，用于读取通道数据时直接打开正确的树，
+而不必按 exl50u、eng50u 的顺序逐个尝试。
+
+索引由两处填充:
+    1. 异常检测流水线在处理每个炮号时调用 formChannelSubtreeMap() 得到的通道列表
+    2. 后端读取通道时，逐个尝试找到数据后回填
+连续炮号映射到同一 (树, 子树) 时合并为一个区间，文件格式:
+    {"version": 1, "channels": {"IP": [[起始炮号, 结束炮号, 树名, 子树], ...], ...}}
+
+本模块不依赖 Django，流水线和后端共用同一个索引文件；写入时加文件锁并与磁盘内容合并，
+多个进程可以同时更新。
+"""
+
+import bisect
+import json
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不加文件锁，仍保证原子替换
+    fcntl = None
+
+LOCATOR_VERSION = 1
+
+# 默认索引文件位于 backend/ 目录下
+DEFAULT_LOCATOR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'channel_locator.json')
+
+
+def _add_shot(ranges, shot, tree, subtree):
+    """
+    将单个炮号加入通道的区间列表（按起始炮号排序），相邻且目标相同的区间自动合并
+    返回列表是否发生变化
+    """
+    if not subtree:
+        # 未知子树（后端逐个尝试得到的记录）取同一树中最近区间的子树
+        same_tree = [r for r in ranges if r[2] == tree]
+        if same_tree:
+            subtree = min(same_tree, key=lambda r: min(abs(shot - r[0]), abs(shot - r[1])))[3]
+    starts = [r[0] for r in ranges]
+    pos = bisect.bisect_right(starts, shot) - 1
+    if pos >= 0 and ranges[pos][0] <= shot <= ranges[pos][1]:
+        if ranges[pos][2] == tree and ranges[pos][3] == subtree:
+            return False
+        # 同一炮号的归属发生变化，拆分原区间
+        start, end, old_tree, old_subtree = ranges.pop(pos)
+        pieces = []
+        if start < shot:
+            pieces.append([start, shot - 1, old_tree, old_subtree])
+        pieces.append([shot, shot, tree, subtree])
+        if shot < end:
+            pieces.append([shot + 1, end, old_tree, old_subtree])
+        ranges[pos:pos] = pieces
+    else:
+        ranges.insert(pos + 1, [shot, shot, tree, subtree])
+
+    # 与前后区间合并
+    i = next(k for k, r in enumerate(ranges) if r[0] <= shot <= r[1])
+    if i + 1 < len(ranges):
+        nxt = ranges[i + 1]
+        if nxt[0] == ranges[i][1] + 1 and nxt[2:] == ranges[i][2:]:
+            ranges[i][1] = nxt[1]
+            del ranges[i + 1]
+    if i > 0:
+        prev = ranges[i - 1]
+        if prev[1] + 1 == ranges[i][0] and prev[2:] == ranges[i][2:]:
+            prev[1] = ranges[i][1]
+            del ranges[i]
+    return True
+
+
+class ChannelLocator:
+    """ 持久化的通道定位索引 """
+
+    def __init__(self, path=DEFAULT_LOCATOR_PATH):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._channels = {}   # {通道名: [[start, end, tree, subtree], ...]}
+        self._pending = []    # 尚未写入磁盘的记录 [(通道名, 炮号, 树名, 子树)]
+        self._mtime = None
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+
+    def _reload_if_changed(self):
+        """ 索引文件被其他进程更新后重新加载 """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                channels = json.load(f).get('channels', {})
+        except (OSError, ValueError) as e:
+            print(f"读取通道定位索引失败: {self.path}, {e}")
+            return
+        # 本进程尚未写入的记录在新数据上重放
+        for channel_name, shot, tree, subtree in self._pending:
+            _add_shot(channels.setdefault(channel_name, []), shot, tree, subtree)
+        self._channels = channels
+        self._mtime = mtime
+
+    def locate(self, channel_name, shot):
+        """
+        查找通道所在的树
+        返回 (树名, 子树, exact)；exact=False 表示该炮号不在已知区间内，结果取自最近炮号区间（仅作为优先尝试的提示）
+        完全未知的通道返回 None
+        """
+        channel_name = str(channel_name).upper()
+        shot = int(shot)
+        with self._lock:
+            self._reload_if_changed()
+            ranges = self._channels.get(channel_name)
+            if not ranges:
+                self.misses += 1
+                return None
+            pos = bisect.bisect_right([r[0] for r in ranges], shot) - 1
+            if pos >= 0 and shot <= ranges[pos][1]:
+                self.hits += 1
+                return ranges[pos][2], ranges[pos][3], True
+            # 取距离最近的区间
+            candidates = [r for r in (ranges[pos] if pos >= 0 else None,
+                                      ranges[pos + 1] if pos + 1 < len(ranges) else None) if r]
+            nearest = min(candidates, key=lambda r: min(abs(shot - r[0]), abs(shot - r[1])))
+            self.misses += 1
+            return nearest[2], nearest[3], False
+
+    def record(self, shot, channel_name, tree, subtree=''):
+        """ 记录单个通道的位置，调用 save() 后写入磁盘 """
+        self.record_many(shot, tree, {channel_name: subtree})
+
+    def record_many(self, shot, tree, channel_subtrees):
+        """ 记录某炮号某个树中的所有通道，channel_subtrees 为 {通道名: 子树} 或通道名列表 """
+        shot = int(shot)
+        if not isinstance(channel_subtrees, dict):
+            channel_subtrees = {name: '' for name in channel_subtrees}
+        with self._lock:
+            self._reload_if_changed()
+            for channel_name, subtree in channel_subtrees.items():
+                channel_name = str(channel_name).upper()
+                subtree = subtree or ''
+                if _add_shot(self._channels.setdefault(channel_name, []), shot, tree, subtree):
+                    self._pending.append((channel_name, shot, tree, subtree))
+                    self.updates += 1
+
+    def save(self):
+        """ 将新记录与磁盘上的索引合并后原子写入 """
+        with self._lock:
+            if not self._pending:
+                return False
+            lock_file = None
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                if fcntl is not None:
+                    lock_file = open(self.path + '.lock', 'w')
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._mtime = None
+                self._reload_if_changed()
+                tmp_path = f'{self.path}.{uuid.uuid4().hex}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'version': LOCATOR_VERSION, 'channels': self._channels}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._mtime = os.path.getmtime(self.path)
+                self._pending = []
+                return True
+            except OSError as e:
+                print(f"写入通道定位索引失败: {self.path}, {e}")
+                return False
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def stats(self):
+        """ 返回索引统计信息 """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'channels': len(self._channels),
+                'ranges': sum(len(r) for r in self._channels.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'updates': self.updates,
+                'pending': len(self._pending),
+            }
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+分块求值
+
+全分辨率（sample_mode=full 或很高的 sample_freq）下，evaluate_plan 会同时持有每个操作数、每个中间结果
+以及对齐时插值得到的完整数组，多个长通道的表达式可能占用数倍于结果的内存。
+本模块按结果时间轴把计划分成若干块求值，结果直接写入预先分配的输出数组:
+    1. 布局: 按依赖顺序确定每个节点的时间轴（与 ExpressionParser 两两对齐的规则一致）和元数据，不计算数值
+    2. 逐块: 对结果时间轴上的第 [j0, j1) 个点，递归求出各节点在对应下标区间上的数值；
+       需要插值的子节点只计算覆盖该区间的一段，插值公式与 time_axis.resample_values 相同，结果逐位一致
+通道数值来自磁盘缓存的内存映射时按块读取，峰值内存约为每个操作数几块的大小加一份结果。
+
+仅适用于所有通道都是隐式（均匀）时间轴、且不含 FFT/Pca 等需要完整信号的函数的计划；
+其余情况返回 None，由调用方使用 evaluate_plan。本模块不依赖 Django。
+"""
+
+import numpy as np
+
+from api import time_axis
+
+# 每块的结果点数
+DEFAULT_CHUNK_POINTS = 1 << 20
+
+
+def _derived_meta(operand, **fields):
+    """ 以操作数的元数据为基础（不含数值）构造运算结果的元数据，与 ExpressionParser 中 operand.copy() 一致 """
+    meta = {key: value for key, value in operand.items() if key not in ('Y_value', 'resample')}
+    meta.update(fields)
+    return meta
+
+
+def plan_layout(plan, parser):
+    """
+    确定计划中每个节点的时间轴与元数据，返回 {节点规范文本: 元数据}
+    常量节点（含常量之间的运算）的元数据即其值；通道节点为通道数据本身（Y_value 为完整数组或内存映射）；
+    运算节点额外记录 'resample'（是否插值到公共网格）
+    计划不适合分块求值时返回 None
+    """
+    if plan.root.op in ('const', 'channel'):
+        return None
+    if any(node.op == 'call' for node in plan.nodes):
+        return None
+    binary_ops = {
+        '+': parser.add_operands,
+        '-': parser.subtract_operands,
+        '*': parser.multiply_operands,
+        '/': parser.divide_operands,
+        '&': parser.and_operands,
+        '|': parser.or_operands,
+    }
+    metas = {}
+    for node in plan.nodes:
+        if node.op == 'const':
+            metas[node.key] = {
+                'X_value': [],
+                'Y_value': float(node.value),
+                'channel_name': node.value,
+                'is_constant': True
+            }
+            continue
+        if node.op == 'channel':
+            data = parser._get_channel_data_safely(node.value)
+            if not time_axis.is_implicit(data) or time_axis.channel_length(data) < 2:
+                return None
+            metas[node.key] = data
+            continue
+
+        args = [metas[arg.key] for arg in node.args]
+        if all(arg.get('is_constant', False) for arg in args):
+            # 常量之间的运算直接求值（包括除数为0的报错）
+            metas[node.key] = parser.not_operand(args[0]) if node.op == 'not' \
+                else binary_ops[node.value](args[0], args[1])
+            continue
+        if node.op == 'not':
+            metas[node.key] = _derived_meta(args[0], channel_name=f"(!{args[0].get('channel_name', 'unknown')})",
+                                            is_expression_result=True)
+            continue
+
+        left, right = args
+        if node.value == '/' and right.get('is_constant', False) and right['Y_value'] == 0:
+            raise ValueError("除数不能为0")
+        left_name = left.get('channel_name', str(left.get('Y_value')))
+        right_name = right.get('channel_name', str(right.get('Y_value')))
+        fields = {'channel_name': f"({left_name}{node.value}{right_name})", 'is_expression_result': True,
+                  'resample': False}
+        if right.get('is_constant', False):
+            meta = _derived_meta(left, **fields)
+        elif left.get('is_constant', False):
+            meta = _derived_meta(right, **fields)
+        else:
+            if parser.align_mode == 'truncate' or (parser.align_dt is None and time_axis.same_grid(left, right)):
+                n = min(time_axis.channel_length(left), time_axis.channel_length(right))
+                axis = time_axis.truncate_x(left, n)['X_axis']
+            else:
+                axis = time_axis.common_axis(left, right, parser.align_mode, parser.align_dt)
+                fields['resample'] = True
+            meta = _derived_meta(left, **fields)
+            meta['X_axis'] = axis
+        if time_axis.channel_length(meta) < 2:
+            return None
+        metas[node.key] = meta
+    return metas
+
+
+class _ChunkEvaluator:
+    """ 在给定的下标区间上求节点的数值，一个块内相同 (节点, 区间) 只计算一次 """
+
+    def __init__(self, metas, elementwise_ops):
+        self.metas = metas
+        self.ops = elementwise_ops
+        self.memo = {}
+
+    def values(self, node, j0, j1):
+        """ 节点在自身时间轴第 [j0, j1) 个点上的数值；常量返回标量 """
+        meta = self.metas[node.key]
+        if meta.get('is_constant', False):
+            return meta['Y_value']
+        memo_key = (node.key, j0, j1)
+        value = self.memo.get(memo_key)
+        if value is not None:
+            return value
+        if node.op == 'channel':
+            value = np.asarray(meta['Y_value'][j0:j1])
+        elif node.op == 'not':
+            value = np.equal(self.values(node.args[0], j0, j1), 0).astype(np.int64)
+        else:
+            left, right = node.args
+            value = self.ops[node.value](self.operand(left, meta, j0, j1),
+                                         self.operand(right, meta, j0, j1))
+        self.memo[memo_key] = value
+        return value
+
+    def operand(self, child, parent_meta, j0, j1):
+        """ 子节点在父节点时间轴第 [j0, j1) 个点上的数值，需要时线性插值 """
+        child_meta = self.metas[child.key]
+        if child_meta.get('is_constant', False) or not parent_meta.get('resample'):
+            return self.values(child, j0, j1)
+        axis = parent_meta['X_axis']
+        source = child_meta['X_axis']
+        n_source = int(source['n'])
+        # 与 time_axis.resample_values 相同的计算，只取覆盖本块的源区间
+        grid = float(axis['t0']) + float(axis['dt']) * np.arange(j0, j1, dtype=np.float64)
+        pos = np.clip((grid - float(source['t0'])) / float(source['dt']), 0, n_source - 1)
+        idx = np.minimum(pos.astype(np.int64), n_source - 2)
+        frac = pos - idx
+        k0 = int(idx[0])
+        values = np.asarray(self.values(child, k0, int(idx[-1]) + 2))
+        idx -= k0
+        return values[idx] * (1.0 - frac) + values[idx + 1] * frac
+
+
+def evaluate_plan_chunked(plan, parser, chunk_points=DEFAULT_CHUNK_POINTS, min_points=0, on_chunk=None):
+    """
+    按块对计划求值，结果写入预先分配的数组
+    parser 为 ExpressionParser，提供通道数据（_get_channel_data_safely）、对齐参数和逐点运算（ELEMENTWISE_OPS）
+    结果点数少于 min_points 或计划不适合分块求值时返回 None（已获取的通道数据由 parser 保留，调用方可继续使用）
+    on_chunk(done, total) 在每块完成后调用，用于报告进度，可抛出异常中止求值
+    返回根节点结果（新字典），格式与 evaluate_plan 一致
+    """
+    metas = plan_layout(plan, parser)
+    if metas is None:
+        return None
+    root_meta = metas[plan.root.key]
+    if root_meta.get('is_constant', False):
+        return dict(root_meta)
+    n = time_axis.channel_length(root_meta)
+    if n < min_points:
+        return None
+
+    chunk_points = max(int(chunk_points), 1)
+    total = (n + chunk_points - 1) // chunk_points
+    out = None
+    for done, j0 in enumerate(range(0, n, chunk_points), 1):
+        j1 = min(j0 + chunk_points, n)
+        # 每块使用新的求值器，上一块的中间结果随之释放
+        chunk = _ChunkEvaluator(metas, parser.ELEMENTWISE_OPS).values(plan.root, j0, j1)
+        if out is None:
+            out = np.empty(n, dtype=np.asarray(chunk).dtype)
+        out[j0:j1] = chunk
+        if on_chunk is not None:
+            on_chunk(done, total)
+
+    result = {key: value for key, value in root_meta.items() if key != 'resample'}
+    result['Y_value'] = out
+    return result
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+降采样算法
+
+所有算法均基于 NumPy 实现（LTTB 逐桶迭代，每个桶内的计算向量化），不依赖 Django，可被检测流水线和适配器直接导入。
+目标点数统一按 "时间跨度 × 目标频率" 计算，与原 downsample_to_frequency 一致。
+
+可选算法（downsample_algo= 参数）:
+    extrema  特征保留降采样（默认）：均匀采样点 + 局部极值点，与原实现输出完全一致
+    minmax   每个桶保留最小值点和最大值点，输出点数固定为目标点数
+    lttb     Largest-Triangle-Three-Buckets，视觉形状保持最好，输出点数固定为目标点数
+"""
+
+import numpy as np
+
+DOWNSAMPLE_ALGORITHMS = ('extrema', 'minmax', 'lttb')
+DEFAULT_DOWNSAMPLE_ALGORITHM = 'extrema'
+
+
+def target_sample_count(x_values, target_freq):
+    """ 根据时间跨度和目标频率计算降采样后的点数 """
+    x_values = np.asarray(x_values)
+    time_span = float(np.max(x_values)) - float(np.min(x_values))
+    return int(time_span * target_freq)
+
+
+def window_extrema_indices(y_values, window_size):
+    """
+    查找局部极值点下标
+    检查 i = w, 2w, 3w, ... (i < n - w)，若 y[i] 等于窗口 y[i-w:i+w] 的最大值或最小值则保留。
+    窗口 [i-w, i+w) 恰好由第 k-1 和第 k 个长度为 w 的块组成（i = k*w），
+    因此先按块求最大/最小值，再取相邻两块的较大/较小者，无需逐个窗口切片。
+    """
+    y_values = np.asarray(y_values)
+    n = len(y_values)
+    w = int(window_size)
+    n_blocks = n // w
+    if n_blocks < 2:
+        return np.empty(0, dtype=np.int64)
+    blocks = y_values[:n_blocks * w].reshape(n_blocks, w)
+    block_max = blocks.max(axis=1)
+    block_min = blocks.min(axis=1)
+    # 候选点 k*w 需满足 k*w < n - w
+    k = np.arange(1, n_blocks)
+    k = k[k * w < n - w]
+    centers = y_values[k * w]
+    window_max = np.maximum(block_max[k - 1], block_max[k])
+    window_min = np.minimum(block_min[k - 1], block_min[k])
+    return (k * w)[(centers == window_max) | (centers == window_min)].astype(np.int64)
+
+
+def extrema_downsample(x_values, y_values, n_samples):
+    """ 特征保留降采样：均匀采样点 + 局部极值点（原 downsample_to_frequency 的向量化实现） """
+    n = len(x_values)
+    sample_ratio = n // n_samples
+
+    if sample_ratio <= 10:
+        # 对于小幅度降采样，直接等间隔采样
+        indices = np.linspace(0, n - 1, n_samples).astype(int)
+        return x_values[indices], y_values[indices]
+
+    # 步骤1: 均匀采样作为基础点集
+    base_indices = np.arange(0, n, sample_ratio)
+    if len(base_indices) > n_samples:
+        base_indices = base_indices[:n_samples]
+
+    # 步骤2: 局部极值点，窗口大小根据降采样比例自适应调整
+    window_size = max(min(sample_ratio // 2, 20), 2)
+    extrema_indices = window_extrema_indices(y_values, window_size)
+
+    # 步骤3: 合并基础点集和特征点集，确保不超过目标点数
+    all_indices = np.unique(np.concatenate([base_indices, extrema_indices]))
+    if len(all_indices) > n_samples:
+        remaining_slots = n_samples - len(extrema_indices)
+        if remaining_slots > 0:
+            # 保留所有特征点，从基础点集中均匀抽取剩余点位
+            candidates = base_indices[np.isin(base_indices, extrema_indices, invert=True)]
+            if len(candidates) > remaining_slots:
+                step = len(candidates) // remaining_slots
+                candidates = candidates[::step][:remaining_slots]
+            final_indices = np.sort(np.concatenate([extrema_indices, candidates]))
+        else:
+            # 特征点已超过目标点数，对特征点均匀下采样
+            step = len(extrema_indices) // n_samples
+            final_indices = extrema_indices[::step][:n_samples]
+    else:
+        final_indices = all_indices
+        if len(final_indices) < n_samples:
+            # 点数不足时从未选中的点中均匀补充
+            mask = np.ones(n, dtype=bool)
+            mask[final_indices] = False
+            remaining_indices = np.flatnonzero(mask)
+            to_add = n_samples - len(final_indices)
+            if len(remaining_indices) > to_add:
+                step = len(remaining_indices) // to_add
+                extra_indices = remaining_indices[::step][:to_add]
+                final_indices = np.sort(np.concatenate([final_indices, extra_indices]))
+
+    return x_values[final_indices], y_values[final_indices]
+
+
+def _bucket_argextrema(y_values, start, n_buckets, bucket_size):
+    """ 对从 start 开始的 n_buckets 个等长桶分别求最小值和最大值下标 """
+    blocks = y_values[start:start + n_buckets * bucket_size].reshape(n_buckets, bucket_size)
+    offsets = start + np.arange(n_buckets) * bucket_size
+    return offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)
+
+
+def minmax_downsample(x_values, y_values, n_samples):
+    """
+    每个桶保留最小值点和最大值点（按时间先后排列），输出恰好 n_samples 个点
+    n_samples 为奇数时额外保留最后一个点；末尾不足整桶的点并入最后一个桶
+    """
+    n = len(x_values)
+    n_buckets = n_samples // 2
+    if n_buckets == 0:
+        indices = np.linspace(0, n - 1, n_samples).astype(int)
+        return x_values[indices], y_values[indices]
+    bucket_size = n // n_buckets
+    min_idx, max_idx = _bucket_argextrema(y_values, 0, n_buckets, bucket_size)
+    tail_start = n_buckets * bucket_size
+    if tail_start < n:
+        # 最后一个桶包含剩余的点
+        last_start = tail_start - bucket_size
+        tail = y_values[last_start:]
+        min_idx[-1] = last_start + int(np.argmin(tail))
+        max_idx[-1] = last_start + int(np.argmax(tail))
+    first = np.minimum(min_idx, max_idx)
+    second = np.maximum(min_idx, max_idx)
+    indices = np.column_stack([first, second]).ravel()
+    if n_samples % 2:
+        indices = np.append(indices, n - 1)
+    return x_values[indices], y_values[indices]
+
+
+def lttb_downsample(x_values, y_values, n_samples):
+    """
+    Largest-Triangle-Three-Buckets 降采样（Steinarsson 2013），输出恰好 n_samples 个点（首尾点固定保留）
+    中间点分成 n_samples - 2 个桶，每个桶选取与 "上一个桶选中的点" 和 "下一个桶质心" 构成三角形面积最大的点；
+    最后一个桶的 "下一桶" 为末点。
+    上一个选中点决定下一个桶的三角形，选点只能逐桶迭代；循环次数为输出点数，
+    桶边界、质心和桶内面积都用 NumPy 计算。
+    """
+    n = len(x_values)
+    if n_samples >= n:
+        return x_values, y_values
+    if n_samples < 3:
+        indices = np.linspace(0, n - 1, max(n_samples, 1)).astype(int)
+        return x_values[indices], y_values[indices]
+
+    x = np.asarray(x_values, dtype=np.float64)
+    y = np.asarray(y_values, dtype=np.float64)
+    n_buckets = n_samples - 2
+    # 中间点 [1, n-1) 分成 n_buckets 个桶，第 i 个桶为 [floor(i*every)+1, floor((i+1)*every)+1)；
+    # n_buckets <= n - 3，每个桶至少有一个点
+    every = (n - 2) / n_buckets
+    edges = (np.arange(n_buckets + 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # 每个桶的质心（按桶分段求和），最后一个桶之后为末点
+    counts = edges[1:] - edges[:-1]
+    sum_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sum_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    next_x = np.append((sum_x / counts)[1:], x[-1]).tolist()
+    next_y = np.append((sum_y / counts)[1:], y[-1]).tolist()
+    starts = edges[:-1].tolist()
+    stops = edges[1:].tolist()
+
+    # 含 NaN 的面积视为最小，保证每个桶都能选出一个点（数据全部有限时面积不会是 NaN，跳过该检查）
+    finite = bool(np.isfinite(sum_x).all() and np.isfinite(sum_y).all()
+                  and np.isfinite([x[0], y[0], x[-1], y[-1]]).all())
+
+    indices = np.empty(n_samples, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    ax, ay = float(x[0]), float(y[0])
+    for b in range(n_buckets):
+        start, stop = starts[b], stops[b]
+        # 三角形 (a, i, c) 面积的两倍
+        cx, cy = next_x[b], next_y[b]
+        area = np.abs((ax - cx) * (y[start:stop] - ay) - (ax - x[start:stop]) * (cy - ay))
+        if not finite:
+            area[np.isnan(area)] = -np.inf
+        # 面积相同时取第一个点
+        a = start + int(area.argmax())
+        indices[b + 1] = a
+        ax, ay = float(x[a]), float(y[a])
+    return x_values[indices], y_values[indices]
+
+
+def downsample_to_frequency(x_values, y_values, target_freq=1000, algo=DEFAULT_DOWNSAMPLE_ALGORITHM):
+    """
+    对数据进行降采样到指定频率
+
+    Args:
+        x_values: 时间序列数据的X值（时间值）
+        y_values: 对应的Y值
+        target_freq: 目标频率，默认1000Hz (1KHz)
+        algo: 降采样算法，见 DOWNSAMPLE_ALGORITHMS
+
+    Returns:
+        降采样后的x_values和y_values
+    """
+    if algo not in DOWNSAMPLE_ALGORITHMS:
+        raise ValueError(f"不支持的降采样算法: {algo}，可选: {', '.join(DOWNSAMPLE_ALGORITHMS)}")
+    if len(x_values) <= target_freq:
+        return x_values, y_values
+
+    x_values = np.asarray(x_values)
+    y_values = np.asarray(y_values)
+    n_samples = target_sample_count(x_values, target_freq)
+
+    # 如果目标点数比原始点数多，直接返回原始数据
+    if n_samples >= len(x_values) or n_samples <= 0:
+        return x_values, y_values
+
+    if algo == 'minmax':
+        new_times, new_values = minmax_downsample(x_values, y_values, n_samples)
+    elif algo == 'lttb':
+        new_times, new_values = lttb_downsample(x_values, y_values, n_samples)
+    else:
+        new_times, new_values = extrema_downsample(x_values, y_values, n_samples)
+
+    print(f"{algo} 降采样: 从 {len(x_values)} 点 降至 {len(new_times)} 点")
+    return new_times, new_values
@@ -0,0 +1,1047 @@
+# -*- coding: utf-8 -*-
+"""
+表达式解析与求值
+
+ExpressionParser 解析通道运算表达式（如 "IP - MP01 * 2"、"FFT(IP)"、"[Python]func(IP, 3)"）并计算结果:
+可编译的表达式使用 api.expression_plan 的计划 DAG 求值（长信号按 api.chunked_eval 分块），其余逐词解析求值。
+内置函数（FFT/Welch/STFT/Pca）在本模块中实现；导入函数由调用方通过 function_registry 和 execute_function 提供，
+未提供时表达式中不能调用导入函数。
+
+本模块没有导入时的副作用（不连接 MongoDB、不启动 MATLAB 引擎、不创建算法进程池），
+批量计算的工作进程（api.calc_jobs）直接导入本模块，不加载 views。
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+from django.conf import settings
+
+from api import calc_tasks, time_axis
+from api.chunked_eval import DEFAULT_CHUNK_POINTS, evaluate_plan_chunked
+from api.expression_plan import (BUILTIN_FUNCTIONS, compile_expression, evaluate_plan, is_channel_key,
+                                 required_channel_keys)
+from api.expression_plan import tokenize as tokenize_expression
+from api.signal_cache import DerivedResultCache
+from api.sliding_pca import sliding_window_pca
+from api.spectral import (DEFAULT_OVERLAP, DEFAULT_SEGMENT_LENGTH, DEFAULT_WINDOW, amplitude_spectrum, fast_length,
+                          stft_spectrogram, welch_spectrum)
+
+
+def _safe_divide(a, b):
+    """逐点除法，除数为0的点结果为inf（与表达式解析器原有行为一致）"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    out = np.full(np.broadcast(a, b).shape, np.inf)
+    return np.divide(a, b, out=out, where=(b != 0))
+
+def _logical_and(a, b):
+    """逐点逻辑与，非0视为真，结果为1或0"""
+    return np.logical_and(np.not_equal(a, 0), np.not_equal(b, 0)).astype(np.int64)
+
+def _logical_or(a, b):
+    """逐点逻辑或，非0视为真，结果为1或0"""
+    return np.logical_or(np.not_equal(a, 0), np.not_equal(b, 0)).astype(np.int64)
+
+# 表达式求值前并发预取通道数据的最大线程数
+EXPRESSION_PREFETCH_WORKERS = 6
+# 分块求值（见 api.chunked_eval）每块的结果点数，以及 sample_mode 不是 full 时自动改用分块求值的结果点数下限
+EXPRESSION_CHUNK_POINTS = getattr(settings, 'EXPRESSION_CHUNK_POINTS', DEFAULT_CHUNK_POINTS)
+EXPRESSION_CHUNK_THRESHOLD = getattr(settings, 'EXPRESSION_CHUNK_THRESHOLD', 4 * DEFAULT_CHUNK_POINTS)
+# 表达式计划中运算节点的求值结果缓存，键为 (节点规范文本,) + cache_context
+expression_result_cache = DerivedResultCache(getattr(settings, 'EXPRESSION_CACHE_MAX_BYTES', 256 * 1024 ** 2))
+# 通道频谱缓存（FFT/Welch/STFT 的全频段结果），键为 (函数名, 通道键, cache_context, 分段参数)，不同频率上限共用同一条目
+spectrum_cache = DerivedResultCache(getattr(settings, 'SPECTRUM_CACHE_MAX_BYTES', 128 * 1024 ** 2))
+
+class ExpressionParser:
+    # 二元运算符对应的逐点运算，op(a, b) 接收标量或 NumPy 数组
+    ELEMENTWISE_OPS = {
+        '+': np.add,
+        '-': np.subtract,
+        '*': np.multiply,
+        '/': _safe_divide,
+        '&': _logical_and,
+        '|': _logical_or,
+    }
+
+    def __init__(self, get_channel_data_func, cache_context=None,
+                 align_mode=time_axis.DEFAULT_ALIGN_MODE, align_dt=None, task=None, chunk_min_points=None,
+                 function_registry=None, execute_function=None):
+        # get_channel_data_func(channel_key) 返回通道数据字典（见 api.signal_access.get_channel），失败时抛出异常
+        self.get_channel_data_func = get_channel_data_func
+        # 导入函数清单（api.function_registry.FunctionRegistry）和执行函数（views.execute_function），均提供时才能调用导入函数
+        self.function_registry = function_registry
+        self.execute_function = execute_function
+        # cache_context 为影响运算结果的参数（如 (采样率, 时间轴编码, 对齐方式, 对齐间隔)），提供时缓存运算节点的求值结果
+        self.cache_context = cache_context
+        # 两个通道运算时的时间轴对齐方式，见 api.time_axis.align_pair
+        self.align_mode, self.align_dt = time_axis.parse_align(align_mode, align_dt)
+        # 后台计算任务的上下文（api.calc_tasks.TaskContext），用于报告进度、累计内存和响应取消
+        self.task = task
+        # 可编译的表达式结果点数不少于该值时分块求值（见 api.chunked_eval），None 表示不分块
+        self.chunk_min_points = chunk_min_points
+        self.tokens = []
+        self.current = 0
+        self.context_stack = []  # 用于跟踪解析上下文
+        self._prefetched = {}  # {通道键: Future}，由 prefetch_channels 填充
+        self._channels = {}  # {通道键: 通道数据}，同一通道在一次求值中只获取一次
+    
+    def parse(self, expression):
+        """
+        解析表达式并计算结果
+        可编译的表达式（不含导入函数）使用缓存的计划 DAG 求值，相同子表达式只计算一次，
+        运算节点的结果按 cache_context 缓存；其余表达式逐词解析求值
+        设置了 chunk_min_points 且结果未缓存时按块求值，不保留完整的中间结果
+        后台任务中 task.account 记录当前持有的数据量: 通道数据和中间结果在最后一个使用者求值后释放，
+        求值结束时只计入返回的结果
+        """
+        try:
+            result = self._evaluate(expression)
+        finally:
+            self._release_channels()
+        if self.task is not None:
+            self.task.account(calc_tasks.value_nbytes(result))
+        return result
+
+    def _evaluate(self, expression):
+        plan = compile_expression(expression)
+        if plan is not None:
+            chunked = self.chunk_min_points is not None and not (
+                self.cache_context is not None
+                and expression_result_cache.contains((plan.root.key,) + tuple(self.cache_context)))
+            keys = plan.channel_keys if chunked else required_channel_keys(plan, expression_result_cache, self.cache_context)
+            self._stage('fetch')
+            self.prefetch_channels(keys)
+            self._stage('compute')
+            if chunked:
+                result = evaluate_plan_chunked(plan, self, EXPRESSION_CHUNK_POINTS, self.chunk_min_points,
+                                               on_chunk=self._chunk_progress())
+                if result is not None:
+                    if self.cache_context is not None:
+                        expression_result_cache.put((plan.root.key,) + tuple(self.cache_context), result)
+                    return dict(result)
+            return evaluate_plan(plan, self, expression_result_cache, self.cache_context,
+                                 on_node=self._plan_progress(plan), on_release=self._plan_release)
+        self.tokenize(expression)
+        self._stage('fetch')
+        self.prefetch_channels(self.collect_channel_keys())
+        self._stage('compute')
+        self.current = 0
+        return self.expression()
+
+    def _stage(self, name):
+        """后台任务中进入下一个阶段"""
+        if self.task is not None:
+            self.task.stage(name)
+
+    def _plan_progress(self, plan):
+        """返回 evaluate_plan 的节点回调：按已完成的运算节点数推进计算阶段，并累计中间结果占用的内存（由 _plan_release 扣除）"""
+        if self.task is None:
+            return None
+        total = sum(1 for node in plan.nodes if node.op not in ('const', 'channel'))
+        done = [0]
+
+        def on_node(node, value):
+            done[0] += 1
+            self.task.account(calc_tasks.value_nbytes(value))
+            self.task.advance(done[0], total, f'计算 {done[0]}/{total}')
+        return on_node
+
+    def _plan_release(self, node, value):
+        """evaluate_plan 的释放回调：通道节点释放已获取的通道数据，运算节点扣除中间结果的内存"""
+        if node.op == 'channel':
+            self._release_channel(node.value)
+        elif node.op != 'const' and self.task is not None:
+            self.task.account(-calc_tasks.value_nbytes(value))
+
+    def _release_channel(self, channel_key):
+        """不再持有通道数据（包括预取结果），扣除获取时累计的内存"""
+        self._prefetched.pop(channel_key, None)
+        channel_data = self._channels.pop(channel_key, None)
+        if channel_data is not None and self.task is not None:
+            self.task.account(-calc_tasks.value_nbytes(channel_data))
+
+    def _release_channels(self):
+        for channel_key in list(self._channels):
+            self._release_channel(channel_key)
+        self._prefetched = {}
+
+    def _chunk_progress(self):
+        """返回 evaluate_plan_chunked 的分块回调：按已完成的块数推进计算阶段"""
+        if self.task is None:
+            return None
+        return lambda done, total: self.task.advance(done, total, f'分块计算 {done}/{total}')
+
+    def collect_channel_keys(self):
+        """
+        收集表达式中求值时需要实际数据的通道键（按出现顺序去重）
+        导入函数中单独作为参数的通道键只以字符串传递，由导入函数自行获取，不需要预取
+        """
+        keys = []
+        function_stack = []  # 每层括号是否为导入函数的参数列表
+        for index, token in enumerate(self.tokens):
+            prev_token = self.tokens[index - 1] if index > 0 else None
+            next_token = self.tokens[index + 1] if index + 1 < len(self.tokens) else None
+            if token == '(':
+                is_function = prev_token is not None and (prev_token[0].isalpha() or prev_token[0] == '_')
+                has_prefix = index > 1 and self.tokens[index - 2] in ('[Python]', '[Matlab]')
+                function_stack.append(is_function and (has_prefix or prev_token not in BUILTIN_FUNCTIONS))
+            elif token == ')':
+                if function_stack:
+                    function_stack.pop()
+            elif is_channel_key(token) and next_token != '(':
+                single_imported_argument = function_stack and function_stack[-1] \
+                    and prev_token in ('(', ',') and next_token in (')', ',', None)
+                if not single_imported_argument and token not in keys:
+                    keys.append(token)
+        return keys
+
+    def prefetch_channels(self, keys):
+        """
+        求值前用有限大小的线程池并发获取表达式中的所有通道数据，表达式耗时约为最慢的单个通道而非所有通道之和
+        获取失败的通道在求值时由 _get_channel_data_safely 按原有方式处理
+        """
+        self._prefetched = {}
+        if len(keys) < 2:
+            return
+        prefetch_start_time = time.time()
+        with ThreadPoolExecutor(max_workers=min(EXPRESSION_PREFETCH_WORKERS, len(keys))) as executor:
+            self._prefetched = {key: executor.submit(self.get_channel_data_func, key) for key in keys}
+            if self.task is not None:
+                # 每完成一个通道推进一次进度；任务被取消时放弃尚未开始的读取
+                try:
+                    for done, _ in enumerate(as_completed(self._prefetched.values()), 1):
+                        self.task.advance(done, len(keys), f'获取通道数据 {done}/{len(keys)}')
+                except calc_tasks.TaskCancelled:
+                    for future in self._prefetched.values():
+                        future.cancel()
+                    raise
+        print(f"预取 {len(keys)} 个通道数据耗时: {time.time() - prefetch_start_time:.2f}秒")
+    
+    def tokenize(self, expression):
+        """将表达式分词 - 增强版支持函数前缀"""
+        self.tokens = tokenize_expression(expression)
+        return self.tokens
+    
+    def expression(self):
+        """解析逻辑或运算（最低优先级）"""
+        return self.logical_or()
+
+    def logical_or(self):
+        """解析逻辑或运算 (|)"""
+        result = self.logical_and()
+
+        while self.current < len(self.tokens) and self.tokens[self.current] == '|':
+            operator = self.tokens[self.current]
+            self.current += 1
+            right = self.logical_and()
+            result = self.or_operands(result, right)
+
+        return result
+
+    def logical_and(self):
+        """解析逻辑与运算 (&)"""
+        result = self.arithmetic_expression()
+
+        while self.current < len(self.tokens) and self.tokens[self.current] == '&':
+            operator = self.tokens[self.current]
+            self.current += 1
+            right = self.arithmetic_expression()
+            result = self.and_operands(result, right)
+
+        return result
+
+    def arithmetic_expression(self):
+        """解析加减运算"""
+        result = self.term()
+
+        while self.current < len(self.tokens) and self.tokens[self.current] in ['+', '-']:
+            operator = self.tokens[self.current]
+            self.current += 1
+            right = self.term()
+
+            if operator == '+':
+                result = self.add_operands(result, right)
+            elif operator == '-':
+                result = self.subtract_operands(result, right)
+
+        return result
+
+    def add_operands(self, left, right):
+        """执行加法运算，支持通道数据与常量的运算"""
+        return self._binary_operation(left, right, '+', self.ELEMENTWISE_OPS['+'])
+
+    def subtract_operands(self, left, right):
+        """执行减法运算，支持通道数据与常量的运算"""
+        return self._binary_operation(left, right, '-', self.ELEMENTWISE_OPS['-'])
+
+    def term(self):
+        """解析乘除运算"""
+        result = self.factor()
+
+        while self.current < len(self.tokens) and self.tokens[self.current] in ['*', '/']:
+            operator = self.tokens[self.current]
+            self.current += 1
+            right = self.factor()
+
+            if operator == '*':
+                result = self.multiply_operands(result, right)
+            elif operator == '/':
+                result = self.divide_operands(result, right)
+
+        return result
+
+    def multiply_operands(self, left, right):
+        """执行乘法运算，支持通道数据与常量的运算"""
+        return self._binary_operation(left, right, '*', self.ELEMENTWISE_OPS['*'])
+
+    def divide_operands(self, left, right):
+        """执行除法运算，支持通道数据与常量的运算；除数为常量0时报错，通道中为0的点结果为inf"""
+        if right.get('is_constant', False) and right['Y_value'] == 0:
+            raise ValueError("除数不能为0")
+        return self._binary_operation(left, right, '/', self.ELEMENTWISE_OPS['/'])
+
+    def and_operands(self, left, right):
+        """执行逻辑与运算，支持通道数据与常量的运算，非0视为真，结果为1或0"""
+        return self._binary_operation(left, right, '&', self.ELEMENTWISE_OPS['&'])
+
+    def or_operands(self, left, right):
+        """执行逻辑或运算，支持通道数据与常量的运算，非0视为真，结果为1或0"""
+        return self._binary_operation(left, right, '|', self.ELEMENTWISE_OPS['|'])
+
+    def not_operand(self, operand):
+        """执行逻辑非运算：0变为1，非0变为0"""
+        operand_name = operand.get('channel_name', 'unknown')
+        if operand.get('is_constant', False):
+            return {
+                'X_value': [],
+                'Y_value': 1 if operand['Y_value'] == 0 else 0,
+                'channel_name': f"(!{operand_name})",
+                'is_constant': True
+            }
+        result = operand.copy()
+        result['Y_value'] = np.equal(self._operand_values(operand), 0).astype(np.int64)
+        result['channel_name'] = f"(!{operand_name})"
+        result['is_expression_result'] = True  # 标记为表达式结果
+        print(f"逻辑非运算结果: channel_name={result['channel_name']}, 数据点数={len(result['Y_value'])}")
+        return result
+
+    @staticmethod
+    def _operand_values(operand):
+        """操作数的数值：常量返回标量，通道数据返回 NumPy 数组（已是数组时不复制）"""
+        value = operand['Y_value']
+        if operand.get('is_constant', False):
+            return value
+        return value if isinstance(value, np.ndarray) else np.asarray(value, dtype=np.float64)
+
+    def _binary_operation(self, left, right, symbol, op):
+        """
+        通用二元运算，op(a, b) 接收标量或 NumPy 数组
+        常量与常量得到常量；常量与通道按广播计算；两个通道按 align_mode 对齐到公共时间轴后计算
+        """
+        left_constant = left.get('is_constant', False)
+        right_constant = right.get('is_constant', False)
+        left_name = left.get('channel_name', str(left.get('Y_value')))
+        right_name = right.get('channel_name', str(right.get('Y_value')))
+        channel_name = f"({left_name}{symbol}{right_name})"
+
+        # 如果两个都是常量，返回常量结果
+        if left_constant and right_constant:
+            value = op(left['Y_value'], right['Y_value'])
+            return {
+                'X_value': [],
+                'Y_value': value.item() if isinstance(value, (np.ndarray, np.generic)) else value,
+                'channel_name': channel_name,
+                'is_constant': True
+            }
+
+        if right_constant:
+            result = left.copy()
+            result['Y_value'] = op(self._operand_values(left), right['Y_value'])
+        elif left_constant:
+            result = right.copy()
+            result['Y_value'] = op(left['Y_value'], self._operand_values(right))
+        else:
+            # 两个都是通道数据，时间轴相同时按较短长度截断，否则插值到公共网格
+            x_fields, left_values, right_values = time_axis.align_pair(
+                left, self._operand_values(left), right, self._operand_values(right),
+                self.align_mode, self.align_dt)
+            result = left.copy()
+            result.pop('X_value', None)
+            result.pop('X_axis', None)
+            result.update(x_fields)
+            result['Y_value'] = op(left_values, right_values)
+
+        result['channel_name'] = channel_name
+        result['is_expression_result'] = True  # 标记为表达式结果
+        print(f"{symbol} 运算结果: channel_name={channel_name}, 数据点数={len(result['Y_value'])}")
+        return result
+
+    def factor(self):
+        """解析括号、通道标识符、数字常量和函数调用（支持前缀），以及一元非运算符"""
+        if self.current < len(self.tokens):
+            token = self.tokens[self.current]
+
+            # 处理一元非运算符
+            if token == '!':
+                self.current += 1
+                operand = self.factor()
+                return self.not_operand(operand)
+
+            # 处理括号表达式
+            elif token == '(':
+                self.current += 1
+                result = self.expression()
+
+                # 必须有匹配的右括号
+                if self.current < len(self.tokens) and self.tokens[self.current] == ')':
+                    self.current += 1
+                    return result
+                else:
+                    raise ValueError("缺少右括号")
+
+            # 处理数字常量
+            elif self.is_number(token):
+                self.current += 1
+                # 返回数字常量，格式与通道数据一致
+                return {
+                    'X_value': [],  # 数字常量没有X轴数据
+                    'Y_value': float(token),  # 数字常量作为标量值
+                    'channel_name': str(token),
+                    'is_constant': True  # 标记为常量
+                }
+
+            # 处理函数类型前缀
+            elif token in ['[Python]', '[Matlab]']:
+                prefix = token
+                self.current += 1
+                
+                # 下一个token应该是函数名
+                if self.current < len(self.tokens):
+                    function_name = self.tokens[self.current]
+                    # 检查是否是函数调用（有左括号）
+                    if (self.current + 1 < len(self.tokens) and 
+                        self.tokens[self.current + 1] == '('):
+                        return self.parse_function_call(function_name, prefix)
+                    else:
+                        raise ValueError(f"期望在 {prefix} 后有函数调用")
+                else:
+                    raise ValueError(f"期望在 {prefix} 后有函数名")
+
+            # 处理通道标识符或函数调用（无前缀）
+            elif token.isalpha() or '_' in token:
+                # 检查是否是函数调用
+                if self.current + 1 < len(self.tokens) and self.tokens[self.current + 1] == '(':
+                    return self.parse_function_call(token)
+                else:
+                    self.current += 1
+                    # 处理通道标识符
+                    channel_key = token
+
+                    # 检查是否是通道键格式（通道名_炮号）
+                    if '_' in channel_key and len(channel_key.split('_')) == 2:
+                        # 根据上下文决定处理方式
+                        if self.should_return_channel_string():
+                            # 在导入函数参数中，返回通道名字符串
+                            print(f"导入函数参数 - 识别通道键: {channel_key}，返回通道名字符串")
+                            return {
+                                'X_value': [],
+                                'Y_value': channel_key,  # 使用通道名作为值
+                                'channel_name': channel_key,
+                                'is_constant': False,
+                                'is_channel_name': True  # 标记这是一个通道名参数
+                            }
+                        else:
+                            # 在表达式运算或内置函数中，获取实际通道数据
+                            print(f"表达式运算 - 识别通道键: {channel_key}，获取通道数据")
+                            result = self._get_channel_data_safely(channel_key)
+                            print(f"factor方法返回的通道数据: channel_name={result.get('channel_name')}, is_constant={result.get('is_constant')}")
+                            return result
+                    else:
+                        # 不是标准通道键格式，尝试获取通道数据
+                        return self._get_channel_data_safely(channel_key)
+    
+    def _get_channel_data_safely(self, channel_key):
+        """安全地获取通道数据，失败时回退到通道名字符串"""
+        if channel_key in self._channels:
+            return dict(self._channels[channel_key])
+        try:
+            if self.task is not None:
+                self.task.check()
+            # 进程内直接获取 NumPy 数组，运算结果在响应时才转换；已预取的通道直接使用预取结果（失败时重新抛出异常）
+            future = self._prefetched.get(channel_key)
+            channel_data = dict(future.result()) if future is not None else self.get_channel_data_func(channel_key)
+
+            # 检查返回的数据是否有效
+            if 'error' in channel_data:
+                raise ValueError(f"获取通道 {channel_key} 数据失败: {channel_data['error']}")
+
+            # 确保返回的数据包含所需的键（时间轴可以是显式 X_value 或隐式 X_axis）
+            if ('X_value' not in channel_data and 'X_axis' not in channel_data) or 'Y_value' not in channel_data:
+                raise ValueError(f"通道 {channel_key} 返回数据格式不正确，缺少 X_value 或 Y_value")
+
+            # 标记为通道数据
+            channel_data['is_constant'] = False
+            
+            # 确保channel_name字段正确设置
+            if 'channel_name' not in channel_data:
+                channel_data['channel_name'] = channel_key
+            
+            print(f"成功获取通道 {channel_key} 数据，数据点数: {len(channel_data.get('Y_value', []))}")
+            print(f"通道数据的channel_name: {channel_data.get('channel_name')}")
+            if self.task is not None:
+                self.task.account(calc_tasks.value_nbytes(channel_data))
+            self._channels[channel_key] = channel_data
+            return dict(channel_data)
+
+        except (calc_tasks.TaskCancelled, MemoryError):
+            raise
+        except Exception as e:
+            # 获取通道数据失败时，根据上下文决定处理方式
+            if self.should_return_channel_string():
+                print(f"导入函数参数 - 获取通道 {channel_key} 数据失败: {str(e)}，回退到通道名字符串")
+                return {
+                    'X_value': [],
+                    'Y_value': channel_key,  # 使用通道名作为值
+                    'channel_name': channel_key,
+                    'is_constant': False,
+                    'is_channel_name': True  # 标记这是一个通道名参数
+                }
+            else:
+                # 在表达式运算中，失败就是失败
+                print(f"表达式运算 - 获取通道 {channel_key} 数据失败: {str(e)}")
+                raise ValueError(f"获取通道 {channel_key} 数据失败: {str(e)}")
+
+        raise ValueError(f"意外的标记: {self.tokens[self.current] if self.current < len(self.tokens) else 'EOF'}")
+
+    def is_number(self, token):
+        """检查token是否是数字"""
+        try:
+            float(token)
+            return True
+        except ValueError:
+            return False
+    
+    def parse_function_call(self, function_name, prefix=None):
+        """解析函数调用 - 增强版支持前缀和嵌套表达式"""
+        self.current += 1  # 跳过函数名
+        
+        if self.current >= len(self.tokens) or self.tokens[self.current] != '(':
+            raise ValueError(f"函数 {function_name} 缺少左括号")
+        
+        self.current += 1  # 跳过左括号
+        
+        # 推入函数调用上下文
+        context_info = {
+            'type': 'function_call',
+            'function_name': function_name,
+            'prefix': prefix,
+            'is_imported_function': bool(prefix or function_name not in BUILTIN_FUNCTIONS)
+        }
+        self.context_stack.append(context_info)
+        
+        # 解析参数列表
+        args = []
+        arg_index = 0
+        while self.current < len(self.tokens) and self.tokens[self.current] != ')':
+            if self.tokens[self.current] == ',':
+                self.current += 1  # 跳过逗号
+                arg_index += 1
+                continue
+            
+            # 推入参数上下文
+            param_context = {
+                'type': 'function_argument',
+                'function_name': function_name,
+                'arg_index': arg_index,
+                'is_imported_function': context_info['is_imported_function']
+            }
+            self.context_stack.append(param_context)
+            
+            # 解析参数 - 支持完整的表达式（包括嵌套函数调用）
+            arg = self.expression()
+            
+            # 弹出参数上下文
+            self.context_stack.pop()
+            
+            args.append(arg)
+            
+            # 如果下一个token是逗号，继续解析下一个参数
+            if (self.current < len(self.tokens) and 
+                self.tokens[self.current] == ','):
+                continue
+            # 如果下一个token是右括号，结束参数解析
+            elif (self.current < len(self.tokens) and 
+                  self.tokens[self.current] == ')'):
+                break
+            else:
+                # 如果既不是逗号也不是右括号，可能有语法错误
+                if self.current < len(self.tokens):
+                    raise ValueError(f"函数 {function_name} 参数解析错误，意外的token: {self.tokens[self.current]}")
+                else:
+                    raise ValueError(f"函数 {function_name} 参数解析未完成")
+        
+        if self.current >= len(self.tokens) or self.tokens[self.current] != ')':
+            raise ValueError(f"函数 {function_name} 缺少右括号")
+        
+        self.current += 1  # 跳过右括号
+        
+        # 弹出函数调用上下文
+        self.context_stack.pop()
+        
+        # 调用相应的函数处理
+        return self.call_function(function_name, args, prefix)
+    
+    def should_return_channel_string(self):
+        """判断当前上下文是否应该返回通道名字符串而不是通道数据"""
+        # 检查是否在导入函数的参数中，且这个参数是单独的通道名
+        for context in reversed(self.context_stack):
+            if context.get('type') == 'function_argument':
+                # 如果是导入函数的参数
+                if context.get('is_imported_function', False):
+                    # 需要进一步检查是否是单独的通道名（非表达式）
+                    return self._is_single_channel_argument()
+        return False
+    
+    def _is_single_channel_argument(self):
+        """检查当前是否是单独的通道名参数（非表达式）"""
+        # 如果下一个token是运算符，说明这是表达式的一部分
+        if self.current < len(self.tokens):
+            next_token = self.tokens[self.current]
+            if next_token in ['+', '-', '*', '/', '(']:
+                return False  # 这是表达式，不是单独的通道名
+        
+        # 检查前一个token是否是运算符
+        if self.current > 1:
+            prev_token = self.tokens[self.current - 2]  # current已经+1了，所以-2
+            if prev_token in ['+', '-', '*', '/', ')']:
+                return False  # 这是表达式的一部分
+        
+        return True  # 看起来是单独的通道名
+    
+    def is_in_expression_context(self):
+        """判断是否在表达式运算上下文中（需要实际数据）"""
+        # 如果没有函数上下文，或者在内置函数中，都需要实际数据
+        for context in reversed(self.context_stack):
+            if context.get('type') == 'function_argument':
+                # 在内置函数参数中，需要实际数据
+                return not context.get('is_imported_function', False)
+        return True  # 默认需要实际数据
+    
+    def parse_function_argument(self):
+        """专门用于解析函数参数 - 对于导入函数，通道名参数返回字符串表示"""
+        if self.current < len(self.tokens):
+            token = self.tokens[self.current]
+
+            # 处理括号表达式
+            if token == '(':
+                self.current += 1
+                result = self.expression()
+
+                # 必须有匹配的右括号
+                if self.current < len(self.tokens) and self.tokens[self.current] == ')':
+                    self.current += 1
+                    return result
+                else:
+                    raise ValueError("缺少右括号")
+
+            # 处理数字常量
+            elif self.is_number(token):
+                self.current += 1
+                # 返回数字常量，格式与通道数据一致
+                return {
+                    'X_value': [],  # 数字常量没有X轴数据
+                    'Y_value': float(token),  # 数字常量作为标量值
+                    'channel_name': str(token),
+                    'is_constant': True  # 标记为常量
+                }
+
+            # 处理函数类型前缀
+            elif token in ['[Python]', '[Matlab]']:
+                prefix = token
+                self.current += 1
+                
+                # 下一个token应该是函数名
+                if self.current < len(self.tokens):
+                    function_name = self.tokens[self.current]
+                    # 检查是否是函数调用（有左括号）
+                    if (self.current + 1 < len(self.tokens) and 
+                        self.tokens[self.current + 1] == '('):
+                        return self.parse_function_call(function_name, prefix)
+                    else:
+                        raise ValueError(f"期望在 {prefix} 后有函数调用")
+                else:
+                    raise ValueError(f"期望在 {prefix} 后有函数名")
+
+            # 处理通道标识符或函数调用（无前缀）
+            elif token.isalpha() or '_' in token:
+                # 检查是否是函数调用
+                if self.current + 1 < len(self.tokens) and self.tokens[self.current + 1] == '(':
+                    return self.parse_function_call(token)
+                else:
+                    # 对于导入函数的参数，如果看起来是通道名，直接返回通道名字符串
+                    self.current += 1
+                    return {
+                        'X_value': [],
+                        'Y_value': token,  # 直接使用token作为值
+                        'channel_name': token,
+                        'is_constant': False,
+                        'is_channel_name': True  # 标记这是一个通道名参数
+                    }
+
+        raise ValueError(f"意外的标记: {self.tokens[self.current] if self.current < len(self.tokens) else 'EOF'}")
+    
+    def call_function(self, function_name, args, prefix=None):
+        """调用函数（内置函数或导入函数）"""
+        # 如果有前缀，说明是导入函数
+        if prefix:
+            return self.call_imported_function(function_name, args, prefix)
+        else:
+            # 检查是否是内置函数
+            if function_name in BUILTIN_FUNCTIONS:
+                return self.call_builtin_function(function_name, args)
+            else:
+                # 可能是无前缀的导入函数，尝试调用
+                return self.call_imported_function(function_name, args, None)
+    
+    def call_builtin_function(self, function_name, args):
+        """调用内置函数"""
+        if function_name == 'FFT':
+            return self.fft_function(args)
+        elif function_name == 'Pca':
+            return self.pca_function(args)
+        elif function_name == 'Welch':
+            return self.welch_function(args)
+        elif function_name == 'STFT':
+            return self.stft_function(args)
+        else:
+            raise ValueError(f"未知的内置函数: {function_name}")
+    
+    def call_imported_function(self, function_name, args, prefix=None):
+        """调用导入函数 - 重写版本支持正确的参数处理"""
+        try:
+            if self.function_registry is None or self.execute_function is None:
+                raise ValueError("当前环境不支持调用导入函数")
+
+            # 从导入函数清单中查找函数信息（清单缓存在 function_registry 中，文件变化时才重新读取）
+            if not self.function_registry.exists():
+                raise ValueError("导入函数配置文件不存在")
+
+            # 根据前缀优先选择对应类型的函数
+            matched_func = self.function_registry.find(function_name, prefix)
+            if not matched_func:
+                raise ValueError(f"未找到导入函数: {function_name}")
+
+            # 构建函数调用的参数数据 - 重写版本
+            parameters = []
+            parameter_strings = []  # 用于构建函数调用字符串
+            
+            print(f"导入函数 {function_name} 参数调试:")
+            for i, arg in enumerate(args):
+                print(f"  参数 {i}: 类型={type(arg)}")
+                if isinstance(arg, dict):
+                    print(f"    字典键: {list(arg.keys())}")
+                    print(f"    is_constant: {arg.get('is_constant', 'None')}")
+                    print(f"    is_channel_name: {arg.get('is_channel_name', 'None')}")
+                    print(f"    is_expression_result: {arg.get('is_expression_result', 'None')}")
+                    print(f"    channel_name: {arg.get('channel_name', 'None')}")
+                    print(f"    function_type: {arg.get('function_type', 'None')}")
+            
+            for arg in args:
+                if arg.get('is_constant', False):
+                    # 常量参数直接使用数值
+                    param_value = arg['Y_value']
+                    parameters.append(param_value)
+                    parameter_strings.append(str(param_value))
+                    
+                elif arg.get('is_channel_name', False):
+                    # 通道名参数直接使用通道名字符串
+                    channel_name = arg['channel_name']
+                    parameters.append(channel_name)
+                    parameter_strings.append(channel_name)
+                    
+                elif arg.get('is_expression_result', False):
+                    # 这是表达式运算的结果，使用表达式字符串作为标识符
+                    expr_str = arg.get('channel_name', 'expression_result')
+                    parameters.append(expr_str)
+                    parameter_strings.append(expr_str)
+                    print(f"处理表达式结果参数: {expr_str}")
+                    
+                elif arg.get('function_type') == 'imported':
+                    # 这是一个导入函数的执行结果，传递函数调用字符串
+                    func_str = arg.get('channel_name', 'unknown_function')
+                    parameters.append(func_str)
+                    parameter_strings.append(func_str)
+                    
+                elif arg.get('function_type') == 'FFT':
+                    # 这是FFT函数的结果，传递函数调用字符串
+                    func_str = arg.get('channel_name', 'FFT_result')
+                    parameters.append(func_str)
+                    parameter_strings.append(func_str)
+                    
+                else:
+                    # 通道数据或其他类型 - 对于导入函数，应该传递通道名而不是数据
+                    if 'channel_name' in arg:
+                        channel_name = arg['channel_name']
+                        # 检查是否是通道键格式（通道名_炮号）
+                        if '_' in channel_name and not channel_name.startswith('('):
+                            # 这看起来像是通道键，直接使用
+                            parameters.append(channel_name)
+                            parameter_strings.append(channel_name)
+                        else:
+                            # 这是其他类型的数据，使用通道名或标识符
+                            parameters.append(channel_name)
+                            parameter_strings.append(channel_name)
+                    else:
+                        # 回退到未知标识符
+                        parameters.append('unknown')
+                        parameter_strings.append('unknown')
+
+            # 构建函数调用字符串
+            if prefix:
+                original_func_str = f"{prefix}{function_name}({','.join(parameter_strings)})"
+            else:
+                original_func_str = f"{function_name}({','.join(parameter_strings)})"
+
+            print(f"调用导入函数: {original_func_str}")
+            print(f"参数列表: {parameters}")
+
+            # 准备调用execute_function的数据
+            execute_data = {
+                "matched_function": matched_func,
+                "target_file_name": function_name,
+                "parameters": parameters,
+                "original_func_str": original_func_str,
+                "check": self.task.check if self.task is not None else None
+            }
+
+            # 调用execute_function执行导入函数
+            result = self.execute_function(execute_data)
+
+            if 'error' in result:
+                raise ValueError(f"执行导入函数失败: {result['error']}")
+
+            # 处理返回结果
+            if 'result' in result:
+                function_result = result['result']
+                # 确保返回格式与通道数据一致
+                if not isinstance(function_result, dict):
+                    # 如果返回的不是字典，转换为标准格式
+                    return {
+                        'X_value': [],
+                        'Y_value': function_result,
+                        'channel_name': original_func_str,
+                        'is_constant': True
+                    }
+                else:
+                    # 确保有必要的键
+                    if 'X_value' not in function_result:
+                        function_result['X_value'] = []
+                    if 'Y_value' not in function_result:
+                        function_result['Y_value'] = []
+                    if 'channel_name' not in function_result:
+                        function_result['channel_name'] = original_func_str
+                    
+                    function_result['is_constant'] = False
+                    function_result['function_type'] = 'imported'
+                    print(f"导入函数 {function_name} 执行成功，返回数据点数: {len(function_result.get('Y_value', []))}")
+                    return function_result
+            else:
+                raise ValueError("导入函数返回结果格式错误")
+
+        except calc_tasks.TaskCancelled:
+            raise
+        except Exception as e:
+            print(f"调用导入函数 {function_name} 失败: {str(e)}")
+            raise ValueError(f"调用导入函数 {function_name} 失败: {str(e)}")
+    
+    def _builtin_params(self, function_name, args, specs):
+        """
+        解析内置函数第2个及之后的数值常量参数
+        specs 为 ((参数说明, 默认值, 类型), ...)，返回按顺序的参数值列表
+        """
+        params = []
+        for index, (label, default, cast) in enumerate(specs, 1):
+            if len(args) <= index:
+                params.append(default)
+            elif args[index].get('is_constant', False):
+                params.append(cast(args[index]['Y_value']))
+            else:
+                raise ValueError(f"{function_name}函数的第{index + 1}个参数（{label}）必须是数值常量")
+        return params
+
+    def _spectrum_input(self, function_name, args):
+        """频谱类内置函数的输入通道，返回 (通道数据, 采样间隔)"""
+        if len(args) < 1:
+            raise ValueError(f"{function_name}函数至少需要1个参数（通道数据）")
+        channel_data = args[0]
+        if channel_data.get('is_constant', False):
+            raise ValueError(f"{function_name}函数的第一个参数必须是通道数据，不能是常量")
+        if len(channel_data['Y_value']) < 2:
+            raise ValueError(f"数据点数太少，无法进行{function_name}分析")
+        # 隐式时间轴直接使用 dt，无需展开
+        return channel_data, time_axis.channel_dt(channel_data)
+
+    def _cached_spectrum(self, function_name, channel_data, params, compute, max_freq):
+        """
+        返回频谱计算结果 compute(max_freq) 的元组，前两项为频率轴和按频率点排列的数值，其余项与频率无关
+        输入为本次求值获取的原始通道且提供了 cache_context 时，按 (函数名, 通道键, cache_context, params)
+        缓存全频段结果，不同频率上限的请求直接截取已缓存的结果
+        """
+        channel_key = channel_data.get('channel_name')
+        if self.cache_context is None or channel_data.get('is_expression_result') or channel_key not in self._channels:
+            return compute(max_freq)
+        cache_key = (function_name, channel_key, tuple(self.cache_context), tuple(params))
+        cached = spectrum_cache.get(cache_key)
+        if cached is None:
+            cached = compute(None)
+            for item in cached:
+                item.flags.writeable = False
+            spectrum_cache.put(cache_key, cached)
+        if not max_freq or max_freq <= 0:
+            return cached
+        n_bins = int(np.searchsorted(cached[0], max_freq * (1 + 1e-12), side='right'))
+        return (cached[0][:n_bins], cached[1][:n_bins]) + tuple(cached[2:])
+
+    def fft_function(self, args):
+        """FFT函数实现: FFT(通道, 频率上限=1000Hz)，返回单边幅度谱，见 api.spectral.amplitude_spectrum"""
+        channel_data, dt = self._spectrum_input('FFT', args)
+        
+        # 获取频率限制参数（可选，<=0 表示不限制）
+        frequency_limit, = self._builtin_params('FFT', args, (('频率限制', 1000.0, float),))
+        
+        # 执行FFT（rfft，变换长度补零到 next_fast_len）
+        freq, amplitude = self._cached_spectrum(
+            'FFT', channel_data, (), lambda max_freq: amplitude_spectrum(channel_data['Y_value'], dt, max_freq),
+            frequency_limit)
+        
+        return {
+            'X_value': freq,
+            'Y_value': amplitude,
+            'channel_name': f"FFT({channel_data.get('channel_name', 'unknown')})",
+            'X_unit': 'Hz',
+            'Y_unit': 'Amplitude',
+            'is_constant': False,
+            'function_type': 'FFT'
+        }
+
+    def welch_function(self, args):
+        """Welch函数实现: Welch(通道, 分段长度=256, 重叠比例=0.5, 频率上限=0)，返回 Hann 窗平均功率谱密度"""
+        channel_data, dt = self._spectrum_input('Welch', args)
+        segment_length, overlap, frequency_limit = self._builtin_params('Welch', args, (
+            ('分段长度', DEFAULT_SEGMENT_LENGTH, int), ('重叠比例', DEFAULT_OVERLAP, float), ('频率限制', 0.0, float)))
+        
+        freq, psd = self._cached_spectrum(
+            'Welch', channel_data, (segment_length, overlap),
+            lambda max_freq: welch_spectrum(channel_data['Y_value'], dt, segment_length, overlap, max_freq),
+            frequency_limit)
+        
+        return {
+            'X_value': freq,
+            'Y_value': psd,
+            'channel_name': f"Welch({channel_data.get('channel_name', 'unknown')})",
+            'X_unit': 'Hz',
+            'Y_unit': 'PSD',
+            'is_constant': False,
+            'function_type': 'Welch',
+            'spectral_info': {
+                'segment_length': segment_length,
+                'overlap': overlap,
+                'n_fft': fast_length(segment_length),
+                'window': DEFAULT_WINDOW
+            }
+        }
+
+    def stft_function(self, args):
+        """
+        STFT函数实现: STFT(通道, 分段长度=256, 重叠比例=0.5, 频率上限=0)
+        Y_value 为每个分段幅度最大的频率（随时间变化的主频），完整的时频谱在 spectrogram 字段中
+        （freq 为频率轴，magnitude 形状为 (频率点数, 分段数)）
+        """
+        channel_data, dt = self._spectrum_input('STFT', args)
+        segment_length, overlap, frequency_limit = self._builtin_params('STFT', args, (
+            ('分段长度', DEFAULT_SEGMENT_LENGTH, int), ('重叠比例', DEFAULT_OVERLAP, float), ('频率限制', 0.0, float)))
+        
+        def compute(max_freq):
+            times, freq, magnitude = stft_spectrogram(channel_data['Y_value'], dt, segment_length, overlap, max_freq)
+            return freq, magnitude, times
+        freq, magnitude, times = self._cached_spectrum('STFT', channel_data, (segment_length, overlap), compute,
+                                                       frequency_limit)
+        
+        # 分段中心时间是均匀的，使用隐式时间轴
+        t_start = float(time_axis.x_value_at(channel_data, 0))
+        step = float(times[1] - times[0]) if len(times) > 1 else dt
+        dominant = freq[np.argmax(magnitude, axis=0)] if len(freq) else np.zeros(len(times))
+        
+        return {
+            'X_axis': {'t0': t_start + float(times[0]), 'dt': step, 'n': len(times)},
+            'Y_value': np.ascontiguousarray(dominant),
+            'channel_name': f"STFT({channel_data.get('channel_name', 'unknown')})",
+            'X_unit': 's',
+            'Y_unit': 'Hz',
+            'is_constant': False,
+            'function_type': 'STFT',
+            'spectrogram': {
+                'freq': freq,
+                'magnitude': magnitude
+            },
+            'spectral_info': {
+                'segment_length': segment_length,
+                'overlap': overlap,
+                'n_fft': fast_length(segment_length),
+                'window': DEFAULT_WINDOW
+            }
+        }
+    
+    def pca_function(self, args):
+        """
+        PCA函数实现: Pca(通道, 主成分数=2, 窗口大小=100, 步长=1)
+        对滑动窗口做PCA并返回第一主成分投影，窗口按批计算，见 api.sliding_pca
+        """
+        if len(args) < 1:
+            raise ValueError("PCA函数至少需要1个参数（通道数据）")
+        
+        # 获取通道数据
+        channel_data = args[0]
+        if channel_data.get('is_constant', False):
+            raise ValueError("PCA函数的第一个参数必须是通道数据，不能是常量")
+        
+        # 获取主成分数量、窗口大小、步长参数（可选）
+        n_components, window_size, stride = self._builtin_params('PCA', args, (
+            ('主成分数量', 2, int), ('窗口大小', 100, int), ('步长', 1, int)))
+        
+        # 执行PCA分析，第一主成分按批写入结果数组
+        first_component, explained_variance_ratio, batched = sliding_window_pca(
+            channel_data['Y_value'], n_components, window_size, stride,
+            on_batch=self.task.check if self.task is not None else None)
+        n_windows = len(first_component)
+        
+        # 对应的时间轴（窗口中心时间）: 第 i 个窗口的中心下标为 i*stride + window_size//2
+        center_offset = window_size // 2
+        if time_axis.is_implicit(channel_data):
+            axis = channel_data['X_axis']
+            x_fields = {'X_axis': {'t0': time_axis.x_value_at(channel_data, center_offset),
+                                   'dt': float(axis['dt']) * stride, 'n': n_windows}}
+        else:
+            x_values = np.asarray(channel_data['X_value'], dtype=np.float64)
+            x_fields = {'X_value': np.ascontiguousarray(x_values[center_offset:center_offset + (n_windows - 1) * stride + 1:stride])}
+        
+        # 返回第一主成分
+        result = {
+            'Y_value': first_component,
+            'channel_name': f"PCA({channel_data.get('channel_name', 'unknown')})",
+            'X_unit': 's',
+            'Y_unit': 'PC1',
+            'is_constant': False,
+            'function_type': 'PCA',
+            'pca_info': {
+                'explained_variance_ratio': explained_variance_ratio.tolist(),
+                'n_components': n_components,
+                'window_size': window_size,
+                'stride': stride,
+                'n_windows': n_windows,
+                'batched': batched
+            }
+        }
+        result.update(x_fields)
+        return result
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+表达式编译计划
+
+operator_strs 每次请求都会重新分词、解析表达式，表达式中重复出现的子表达式（同一通道、同一个 FFT(x)）
+也会被重复计算。本模块把表达式编译为不可变的计划 DAG:
+    - 结构相同的子表达式共享同一个节点（hash-consing），每个节点在一次求值中只计算一次
+    - 计划按规范化后的表达式文本缓存（LRU），重复请求无需重新解析
+    - 每个节点的规范文本（如 "(IP_1000+MP01_1000)"）与表达式文本无关，
+      因此修改表达式的其他部分后，未变化的子树仍可命中求值结果缓存
+
+只编译由通道、数字常量、运算符 + - * / & | ! 和内置函数（BUILTIN_FUNCTIONS）组成的表达式；
+包含导入函数（[Python]/[Matlab] 前缀或非内置函数名）的表达式返回 None，由 ExpressionParser 逐词解析求值。
+本模块不依赖 Django，求值时的运算由调用方传入的 ExpressionParser 完成，保证结果与逐词解析完全一致。
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 内置函数（由 ExpressionParser.call_builtin_function 实现）
+BUILTIN_FUNCTIONS = ('FFT', 'Pca', 'Welch', 'STFT')
+FUNCTION_PREFIXES = ('[Python]', '[Matlab]')
+
+# 编译计划缓存的最大条数
+PLAN_CACHE_SIZE = 256
+
+# 批量计算的表达式模板中表示炮号的占位符，见 expand_template
+SHOT_PLACEHOLDER = '{shot}'
+
+
+def tokenize(expression):
+    """将表达式分词 - 支持函数前缀 [Python] / [Matlab]"""
+    # 去除多余的空格但保留函数调用中的逗号分隔符
+    expression = ' '.join(expression.split())
+
+    tokens = []
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+
+        # 跳过空格
+        if char == ' ':
+            i += 1
+            continue
+
+        # 处理函数类型前缀 [Python] 或 [Matlab]
+        if char == '[':
+            start = i
+            # 查找配对的右括号
+            bracket_count = 1
+            i += 1
+            while i < len(expression) and bracket_count > 0:
+                if expression[i] == '[':
+                    bracket_count += 1
+                elif expression[i] == ']':
+                    bracket_count -= 1
+                i += 1
+
+            # 检查是否是函数类型前缀
+            prefix = expression[start:i]
+            if prefix in FUNCTION_PREFIXES:
+                tokens.append(prefix)
+            else:
+                # 如果不是已知的前缀，按字符处理
+                tokens.append('[')
+                i = start + 1
+            continue
+
+        # 处理运算符和括号
+        if char in "+-*/(),&|!":
+            tokens.append(char)
+            i += 1
+        # 处理数字（包括小数）
+        elif char.isdigit() or char == '.':
+            start = i
+            # 继续读取数字和小数点
+            while i < len(expression) and (expression[i].isdigit() or expression[i] == '.'):
+                i += 1
+            token = expression[start:i]
+            # 验证是否是有效的数字
+            try:
+                float(token)
+                tokens.append(token)
+            except ValueError:
+                # 如果不是有效数字，按字符处理
+                tokens.append(char)
+                i = start + 1
+        # 处理标识符（通道标识符和函数名）
+        elif char.isalpha() or char == '_':
+            start = i
+            # 继续读取直到遇到非标识符字符
+            while i < len(expression) and (expression[i].isalnum() or expression[i] == '_'):
+                i += 1
+            tokens.append(expression[start:i])
+        else:
+            i += 1
+
+    return tokens
+
+
+def expand_template(template, shot):
+    """
+    将表达式模板展开为某一炮号的表达式
+    模板中含 {shot} 占位符时直接替换（如 "IP_{shot} - MP01_{shot}"）；
+    否则为所有不带炮号的通道名补上炮号（如 "IP - MP01" -> "IP_1000 - MP01_1000"），
+    已带炮号的通道键（如基准炮 "IP_999"）和函数名保持不变
+    """
+    if SHOT_PLACEHOLDER in template:
+        return template.replace(SHOT_PLACEHOLDER, str(shot))
+    tokens = tokenize(template)
+    expanded = []
+    for i, token in enumerate(tokens):
+        is_name = (token[0].isalpha() or token[0] == '_') and not is_channel_key(token)
+        is_function = i + 1 < len(tokens) and tokens[i + 1] == '('
+        expanded.append(f"{token}_{shot}" if is_name and not is_function else token)
+    return ' '.join(expanded)
+
+
+def normalize_expression(expression):
+    """ 规范化表达式文本（按词重新拼接），空白不同的表达式得到同一个计划 """
+    return ' '.join(tokenize(expression))
+
+
+def is_channel_key(token):
+    """ 是否为 通道名_炮号 格式的通道键 """
+    return (token[0].isalpha() or token[0] == '_') and '_' in token and len(token.split('_')) == 2
+
+
+class PlanNode:
+    """
+    计划中的一个节点（不可变）
+    op: 'const' 数字常量, 'channel' 通道, 'binary' 二元运算, 'not' 逻辑非, 'call' 内置函数
+    value: 常量/通道的原始文本、运算符或函数名
+    args: 子节点元组
+    key: 规范文本，结构相同的子表达式 key 相同
+    """
+    __slots__ = ('op', 'value', 'args', 'key')
+
+    def __init__(self, op, value, args, key):
+        object.__setattr__(self, 'op', op)
+        object.__setattr__(self, 'value', value)
+        object.__setattr__(self, 'args', args)
+        object.__setattr__(self, 'key', key)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PlanNode is immutable')
+
+    def __repr__(self):
+        return f'PlanNode({self.key})'
+
+
+class ExpressionPlan:
+    """ 编译后的表达式: root 为根节点，nodes 为去重后按依赖顺序排列的全部节点（子节点在前） """
+
+    def __init__(self, text, root, nodes):
+        self.text = text
+        self.root = root
+        self.nodes = tuple(nodes)
+        self.channel_keys = tuple(node.value for node in self.nodes if node.op == 'channel')
+
+
+class _Unsupported(Exception):
+    """ 表达式包含无法编译的部分（导入函数等） """
+
+
+class _PlanCompiler:
+    """ 递归下降编译器，语法与 ExpressionParser 一致: | < & < +- < */ < 一元! / 括号 / 函数调用 """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.current = 0
+        self.nodes = OrderedDict()  # {key: PlanNode}，同时用于 hash-consing 和记录依赖顺序
+
+    def _peek(self):
+        return self.tokens[self.current] if self.current < len(self.tokens) else None
+
+    def _node(self, op, value, args, key):
+        node = self.nodes.get(key)
+        if node is None:
+            node = PlanNode(op, value, tuple(args), key)
+            self.nodes[key] = node
+        return node
+
+    def _binary(self, symbol, left, right):
+        return self._node('binary', symbol, (left, right), f"({left.key}{symbol}{right.key})")
+
+    def compile(self):
+        root = self.logical_or()
+        if self.current != len(self.tokens):
+            raise _Unsupported(self.tokens[self.current])
+        return root
+
+    def logical_or(self):
+        result = self.logical_and()
+        while self._peek() == '|':
+            self.current += 1
+            result = self._binary('|', result, self.logical_and())
+        return result
+
+    def logical_and(self):
+        result = self.arithmetic_expression()
+        while self._peek() == '&':
+            self.current += 1
+            result = self._binary('&', result, self.arithmetic_expression())
+        return result
+
+    def arithmetic_expression(self):
+        result = self.term()
+        while self._peek() in ('+', '-'):
+            symbol = self.tokens[self.current]
+            self.current += 1
+            result = self._binary(symbol, result, self.term())
+        return result
+
+    def term(self):
+        result = self.factor()
+        while self._peek() in ('*', '/'):
+            symbol = self.tokens[self.current]
+            self.current += 1
+            result = self._binary(symbol, result, self.factor())
+        return result
+
+    def factor(self):
+        token = self._peek()
+        if token is None:
+            raise ValueError("表达式不完整")
+        if token == '!':
+            self.current += 1
+            operand = self.factor()
+            return self._node('not', '!', (operand,), f"(!{operand.key})")
+        if token == '(':
+            self.current += 1
+            result = self.logical_or()
+            if self._peek() != ')':
+                raise ValueError("缺少右括号")
+            self.current += 1
+            return result
+        if token in FUNCTION_PREFIXES:
+            raise _Unsupported(token)
+        try:
+            float(token)
+            self.current += 1
+            return self._node('const', token, (), token)
+        except ValueError:
+            pass
+        if token.isalpha() or '_' in token:
+            if self.current + 1 < len(self.tokens) and self.tokens[self.current + 1] == '(':
+                return self.function_call(token)
+            if not is_channel_key(token):
+                raise _Unsupported(token)
+            self.current += 1
+            return self._node('channel', token, (), token)
+        raise _Unsupported(token)
+
+    def function_call(self, function_name):
+        if function_name not in BUILTIN_FUNCTIONS:
+            raise _Unsupported(function_name)
+        self.current += 2  # 跳过函数名和左括号
+        args = []
+        while self._peek() != ')':
+            if self._peek() is None:
+                raise ValueError(f"函数 {function_name} 缺少右括号")
+            if self._peek() == ',':
+                self.current += 1
+                continue
+            args.append(self.logical_or())
+            if self._peek() not in (',', ')'):
+                raise ValueError(f"函数 {function_name} 参数解析错误，意外的token: {self._peek()}")
+        self.current += 1
+        return self._node('call', function_name, args, f"{function_name}({','.join(arg.key for arg in args)})")
+
+
+_plan_cache = OrderedDict()  # {规范化表达式: ExpressionPlan 或 None（无法编译）}
+_plan_cache_lock = threading.Lock()
+_plan_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def compile_expression(expression):
+    """
+    编译表达式，返回 ExpressionPlan；包含导入函数等无法编译的部分或存在语法错误时返回 None，
+    由 ExpressionParser 逐词解析（语法错误的报错与原来一致）
+    结果按规范化后的表达式文本缓存
+    """
+    text = normalize_expression(expression)
+    with _plan_cache_lock:
+        if text in _plan_cache:
+            _plan_cache.move_to_end(text)
+            _plan_cache_stats['hits'] += 1
+            return _plan_cache[text]
+        _plan_cache_stats['misses'] += 1
+
+    compiler = _PlanCompiler(text.split(' ') if text else [])
+    try:
+        root = compiler.compile()
+        plan = ExpressionPlan(text, root, compiler.nodes.values())
+    except (_Unsupported, ValueError):
+        plan = None
+
+    with _plan_cache_lock:
+        _plan_cache[text] = plan
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def plan_cache_stats():
+    """ 返回编译计划缓存统计信息 """
+    with _plan_cache_lock:
+        lookups = _plan_cache_stats['hits'] + _plan_cache_stats['misses']
+        return {
+            'entries': len(_plan_cache),
+            'max_entries': PLAN_CACHE_SIZE,
+            'hits': _plan_cache_stats['hits'],
+            'misses': _plan_cache_stats['misses'],
+            'hit_rate': _plan_cache_stats['hits'] / lookups if lookups else 0.0,
+        }
+
+
+def _freeze(value):
+    """ 缓存的求值结果被多个请求共享，数组设为只读 """
+    for item in value.values():
+        if isinstance(item, np.ndarray):
+            item.flags.writeable = False
+    return value
+
+
+def required_channel_keys(plan, result_cache=None, cache_context=None):
+    """ 求值 plan 实际需要读取的通道键：已缓存结果的子树不再需要其中的通道 """
+    needed = []
+    visited = set()
+    stack = [plan.root]
+    while stack:
+        node = stack.pop()
+        if node.key in visited:
+            continue
+        visited.add(node.key)
+        if node.op == 'channel':
+            needed.append(node.value)
+        elif node.op != 'const':
+            if result_cache is not None and cache_context is not None \
+                    and result_cache.contains((node.key,) + tuple(cache_context)):
+                continue
+            stack.extend(node.args)
+    return [key for key in plan.channel_keys if key in needed]
+
+
+def evaluate_plan(plan, parser, result_cache=None, cache_context=None, on_node=None, on_release=None):
+    """
+    对计划求值，共享的节点只计算一次
+    parser 为 ExpressionParser，负责读取通道（_get_channel_data_safely）和执行运算，保证与逐词解析结果一致
+    result_cache 为 DerivedResultCache，cache_context 为影响结果的参数（炮号、采样率等），
+    两者都提供时运算节点的结果按 (节点规范文本,) + cache_context 缓存
+    on_node(node, value) 在每个运算节点得到结果（计算或命中缓存）后调用，用于报告进度，可抛出异常中止求值
+    节点的最后一个使用者求值完成后，求值过程不再持有该节点的结果，此时调用 on_release(node, value)；
+    求值结束时对仍持有的节点（含根节点，以及因上层命中缓存而未被使用的节点）依次调用
+    返回根节点结果（新字典，可由调用方修改）
+    """
+    binary_ops = {
+        '+': parser.add_operands,
+        '-': parser.subtract_operands,
+        '*': parser.multiply_operands,
+        '/': parser.divide_operands,
+        '&': parser.and_operands,
+        '|': parser.or_operands,
+    }
+    use_cache = result_cache is not None and cache_context is not None
+    values = {}
+    # 每个节点尚未求值的使用者数（同一父节点使用两次计两次）
+    consumers = {}
+    for node in plan.nodes:
+        for arg in node.args:
+            consumers[arg.key] = consumers.get(arg.key, 0) + 1
+
+    def release(node):
+        consumers[node.key] -= 1
+        if consumers[node.key] == 0 and node.key in values:
+            value = values.pop(node.key)
+            if on_release is not None:
+                on_release(node, value)
+
+    def evaluate(node):
+        value = values.get(node.key)
+        if value is not None:
+            return value
+        cache_key = (node.key,) + tuple(cache_context) if use_cache else None
+        if node.op == 'const':
+            value = {
+                'X_value': [],  # 数字常量没有X轴数据
+                'Y_value': float(node.value),  # 数字常量作为标量值
+                'channel_name': node.value,
+                'is_constant': True  # 标记为常量
+            }
+        elif node.op == 'channel':
+            value = parser._get_channel_data_safely(node.value)
+        else:
+            value = result_cache.get(cache_key) if use_cache else None
+            if value is None:
+                args = [evaluate(arg) for arg in node.args]
+                if node.op == 'binary':
+                    value = binary_ops[node.value](args[0], args[1])
+                elif node.op == 'not':
+                    value = parser.not_operand(args[0])
+                else:
+                    value = parser.call_builtin_function(node.value, args)
+                del args
+                for arg in node.args:
+                    release(arg)
+                if use_cache:
+                    result_cache.put(cache_key, _freeze(value))
+            if on_node is not None:
+                on_node(node, value)
+        values[node.key] = value
+        return value
+
+    # 从根节点递归求值，已缓存结果的子树不会被展开
+    result = dict(evaluate(plan.root))
+    if on_release is not None:
+        for node in plan.nodes:
+            if node.key in values:
+                on_release(node, values.pop(node.key))
+    return result
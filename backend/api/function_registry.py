@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+导入算法注册表
+
+表达式、异常检测和批量计算中每次调用导入的 Python 算法，原实现都要重新读取并解析 imported_functions.json、
+对上传的文件执行 spec_from_file_location + exec_module，再用 inspect.getmembers 查找函数。
+本模块把这两部分缓存在进程内:
+    - 函数清单: 按清单文件的 (mtime, 大小) 判断是否变化，变化后才重新读取
+    - 算法模块: 按文件路径缓存已执行的模块及其中的函数；文件的 (mtime, 大小) 变化时计算内容哈希，
+      内容确实改变才重新执行模块（仅被 touch 的文件不会重新加载）
+调用方通过 resolve() 直接得到可调用的函数对象。
+
+上传和删除算法后调用 invalidate()，避免同一时间戳精度内的修改被漏检。
+模块以 imported_<哈希> 为名执行，不加入 sys.modules，不同文件中的同名函数互不影响。
+
+本模块不依赖 Django。
+"""
+
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import threading
+
+
+def _stat_key(path):
+    """ 文件的 (mtime_ns, 大小)，文件不存在时返回 None """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _extension_of(prefix):
+    """ 表达式中的函数前缀对应的文件扩展名 """
+    if prefix == '[Python]':
+        return '.py'
+    if prefix == '[Matlab]':
+        return '.m'
+    return None
+
+
+class _LoadedModule:
+    """ 已执行的算法模块及其中按名称排序的函数（与 inspect.getmembers 的顺序一致） """
+
+    def __init__(self, stat_key, digest, module):
+        self.stat_key = stat_key
+        self.digest = digest
+        self.module = module
+        self.functions = dict(inspect.getmembers(module, inspect.isfunction))
+
+
+class FunctionRegistry:
+    """ 导入算法的函数清单与模块缓存 """
+
+    def __init__(self, functions_file, media_root):
+        self.functions_file = str(functions_file)
+        self.media_root = str(media_root)
+        self._lock = threading.RLock()
+        self._entries = []
+        self._entries_key = None
+        self._modules = {}  # {文件绝对路径: _LoadedModule}
+        self.entry_loads = 0
+        self.module_loads = 0
+        self.module_hits = 0
+
+    def _reload_if_changed(self):
+        """ 清单文件变化后重新读取，调用方需持有锁 """
+        stat_key = _stat_key(self.functions_file)
+        if stat_key == self._entries_key:
+            return
+        entries = []
+        if stat_key is not None:
+            try:
+                with open(self.functions_file, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"读取导入函数清单失败: {self.functions_file}, {e}")
+                return
+        if not isinstance(entries, list):
+            print(f"导入函数清单格式错误（应为列表）: {self.functions_file}")
+            entries = []
+        invalid = [entry for entry in entries if not isinstance(entry, dict)]
+        if invalid:
+            print(f"警告：跳过 {len(invalid)} 个无效的函数条目（不是字典类型）")
+        self._entries = [entry for entry in entries if isinstance(entry, dict)]
+        self._entries_key = stat_key
+        self.entry_loads += 1
+
+    def exists(self):
+        return _stat_key(self.functions_file) is not None
+
+    def entries(self):
+        """ 返回函数清单（列表为副本，条目字典与缓存共享，调用方不应修改） """
+        with self._lock:
+            self._reload_if_changed()
+            return list(self._entries)
+
+    def find(self, function_name, prefix=None):
+        """
+        按函数名查找清单条目，prefix 为 '[Python]' / '[Matlab]' 时优先选择对应类型的文件，
+        没有该类型时使用第一个同名条目；找不到返回 None
+        """
+        matches = [entry for entry in self.entries() if entry.get('name') == function_name]
+        extension = _extension_of(prefix)
+        if extension:
+            for entry in matches:
+                if entry.get('file_path', '').endswith(extension):
+                    return entry
+        return matches[0] if matches else None
+
+    def find_by_file(self, file_name, extension=None):
+        """ 按上传文件名（不含扩展名）查找清单条目，指定 extension 时同时匹配扩展名；找不到返回 None """
+        for entry in self.entries():
+            file_path = entry.get('file_path', '')
+            if os.path.splitext(os.path.basename(file_path))[0] != file_name:
+                continue
+            if extension and not file_path.endswith(extension):
+                continue
+            return entry
+        return None
+
+    def full_path(self, entry):
+        """ 清单条目对应文件的绝对路径 """
+        return os.path.join(self.media_root, entry.get('file_path', ''))
+
+    def load_module(self, path):
+        """ 返回已执行的模块，文件内容变化时重新执行；文件不存在时抛出 FileNotFoundError """
+        path = os.path.abspath(path)
+        with self._lock:
+            return self._load(path).module
+
+    def _load(self, path):
+        """ 调用方需持有锁 """
+        stat_key = _stat_key(path)
+        if stat_key is None:
+            self._modules.pop(path, None)
+            raise FileNotFoundError(f"算法文件不存在: {path}")
+        loaded = self._modules.get(path)
+        if loaded is not None and loaded.stat_key == stat_key:
+            self.module_hits += 1
+            return loaded
+        digest = _file_hash(path)
+        if loaded is not None and loaded.digest == digest:
+            loaded.stat_key = stat_key
+            self.module_hits += 1
+            return loaded
+        spec = importlib.util.spec_from_file_location(f"imported_{digest[:12]}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        loaded = _LoadedModule(stat_key, digest, module)
+        self._modules[path] = loaded
+        self.module_loads += 1
+        print(f"加载导入算法模块: {path}，函数: {list(loaded.functions)}")
+        return loaded
+
+    def resolve(self, path, function_name=None):
+        """
+        返回 (函数名, 函数对象)：优先使用模块中名为 function_name 的函数，否则使用第一个函数
+        模块中没有函数时抛出 ValueError
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            functions = self._load(path).functions
+        if function_name and function_name in functions:
+            return function_name, functions[function_name]
+        if not functions:
+            raise ValueError(f"No functions found in file {path}")
+        name = next(iter(functions))
+        return name, functions[name]
+
+    def invalidate(self, path=None):
+        """ 清单或某个算法文件被修改/删除后调用；path 为 None 时只重新读取清单 """
+        with self._lock:
+            self._entries_key = None
+            if path is not None:
+                self._modules.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'functions': len(self._entries),
+                'modules': len(self._modules),
+                'entry_loads': self.entry_loads,
+                'module_loads': self.module_loads,
+                'module_hits': self.module_hits,
+            }
@@ -783,6 +783,11 @@ def match_pattern(
     
     def process_channel(channel_data):
         """处理单个通道数据"""
+        # 隐式时间轴 X_axis={t0, dt, n}：匹配结果需要逐点的原始X值，在此展开
+        if 'X_value' not in channel_data and isinstance(channel_data.get('X_axis'), dict):
+            axis = channel_data['X_axis']
+            channel_data = dict(channel_data)
+            channel_data['X_value'] = (float(axis['t0']) + float(axis['dt']) * np.arange(int(axis['n']))).tolist()
         # 如果需要平滑，先对Y数据进行平滑处理
         x_arr = channel_data.get('X_value', None)
         y_arr = channel_data.get('Y_normalized', channel_data.get('Y_value', None))
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+共享内存信号缓冲区
+
+在进程之间传递通道数组（X_value / Y_value 等）时不做 pickle，也不复制:
+    - 创建方用 SharedSignalSet.share(array) 把数组复制到一个 multiprocessing.shared_memory 块，得到 SharedSignal 句柄。
+      句柄只含块名、dtype 和形状，可以随任务参数发送给其他进程
+    - 接收方用 handle.attach() 映射同一块内存，得到只读的 NumPy 数组，不复制数据
+    - 共享内存块由创建方负责释放: SharedSignalSet.close() 在所有接收方用完后 unlink 全部块
+
+接收方进程（工作进程）在启动时调用 untrack_attached_memory()。Python 3.13 之前映射已有的块也会登记到
+resource_tracker，独立的工作进程退出时可能误删创建方仍在使用的块。
+
+后端（algorithm_pool）和检测流水线（RunDetectAlgorithm）共用本模块，因此不依赖 Django，也不导入 api 包中的其他模块。
+"""
+
+import sys
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# 关闭时仍有数组视图引用的块，之后再次尝试关闭（避免在垃圾回收时报 BufferError）
+_lingering = []
+
+
+def untrack_attached_memory():
+    """ 在只映射、不创建共享内存块的工作进程中调用，映射的块不再登记到 resource_tracker """
+    if sys.version_info >= (3, 13) or getattr(resource_tracker.register, 'skips_shared_memory', False):
+        return
+    register = resource_tracker.register
+
+    def register_except_shared_memory(name, rtype):
+        if rtype != 'shared_memory':
+            register(name, rtype)
+
+    register_except_shared_memory.skips_shared_memory = True
+    resource_tracker.register = register_except_shared_memory
+
+
+def _close_lingering():
+    for block in list(_lingering):
+        try:
+            block.close()
+        except BufferError:
+            continue
+        _lingering.remove(block)
+
+
+class SharedSignal(namedtuple('SharedSignal', ['name', 'dtype', 'shape'])):
+    """ 共享内存中一个数组的句柄 """
+    __slots__ = ()
+
+    @property
+    def nbytes(self):
+        return int(np.prod(self.shape, dtype=np.int64)) * np.dtype(self.dtype).itemsize
+
+    def attach(self):
+        """ 映射共享内存，返回 SignalView；块已被释放时抛出 FileNotFoundError """
+        return SignalView(self)
+
+
+class SignalView:
+    """
+    接收方映射的共享内存数组，array 为只读视图
+    用完后调用 close()（或使用 with 语句）；仍有视图引用时推迟到之后再关闭映射
+    """
+
+    def __init__(self, handle):
+        self._block = shared_memory.SharedMemory(name=handle.name)
+        self.array = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=self._block.buf)
+        self.array.flags.writeable = False
+
+    def close(self):
+        self.array = None
+        block, self._block = self._block, None
+        if block is not None:
+            try:
+                block.close()
+            except BufferError:
+                _lingering.append(block)
+        _close_lingering()
+
+    def __enter__(self):
+        return self.array
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedSignalSet:
+    """ 创建方持有的一组共享内存块，close() 时全部释放 """
+
+    def __init__(self):
+        self._blocks = []
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self._blocks)
+
+    def share(self, array):
+        """ 把数值数组复制到新的共享内存块，返回 SharedSignal 句柄 """
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            raise TypeError(f"对象数组不能放入共享内存: {array.dtype}")
+        # 空数组也分配 1 字节，保证每个句柄都对应一个真实的块
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return SharedSignal(block.name, array.dtype.str, tuple(array.shape))
+
+    def close(self):
+        """ 关闭并删除全部共享内存块，已发出的句柄随之失效 """
+        blocks, self._blocks = self._blocks, []
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                _lingering.append(block)
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        _close_lingering()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,685 @@
+# -*- coding: utf-8 -*-
+"""
+进程内通道数据访问层
+
+读取 MDSplus 原始信号（磁盘缓存、时间窗口下推、定位索引、并发合并）并构建通道数据
+（采样率调整、统计信息、归一化、频谱），结果以 NumPy 数组加元数据的字典返回。
+
+channel-data 等 HTTP 接口只是在此之上做参数解析和序列化；表达式解析、导入函数执行、
+手绘查询等内部调用直接使用 get_channel()，不再经过 JSON 序列化和解析。
+"""
+
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+from api import time_axis
+from api.Mds import checkout_mds_conn, checkout_mds_tree
+from api.channel_locator import DEFAULT_LOCATOR_PATH, ChannelLocator
+from api.downsampling import DEFAULT_DOWNSAMPLE_ALGORITHM, DOWNSAMPLE_ALGORITHMS, downsample_to_frequency
+from api.signal_cache import DerivedResultCache, SignalCache
+from api.single_flight import SingleFlight
+from api.spectral import amplitude_spectrum, fast_length
+
+# 原始信号磁盘缓存，MDSplus 读取结果按 (树名, 炮号, 通道名, 时间上下文) 缓存
+signal_cache = SignalCache(
+    getattr(settings, 'SIGNAL_CACHE_DIR', settings.BASE_DIR / 'signal_cache'),
+    getattr(settings, 'SIGNAL_CACHE_MAX_BYTES', 20 * 1024 ** 3),
+)
+# 派生结果内存缓存（降采样结果、统计信息、归一化、频谱），按通道与采样参数缓存
+derived_cache = DerivedResultCache(getattr(settings, 'DERIVED_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+# 相同请求合并：channel_flight 合并完整的通道数据请求，mds_read_flight 合并原始信号读取
+channel_flight = SingleFlight()
+mds_read_flight = SingleFlight()
+# 通道定位索引 (炮号区间, 通道名) -> (树名, 子树)，由检测流水线和逐个尝试的结果填充
+channel_locator = ChannelLocator(getattr(settings, 'CHANNEL_LOCATOR_PATH', DEFAULT_LOCATOR_PATH))
+
+# 批量获取通道数据时并发发送 GetMany() 请求的最大线程数
+CHANNEL_BATCH_WORKERS = 6
+
+# 通道数据响应可按需返回的字段组，见 parse_channel_fields
+CHANNEL_FIELDS = ('x', 'y', 'stats', 'normalized', 'fft')
+
+# MDSplus 数据库配置，按 MDS_DB_LIST 顺序查找通道
+MDS_DB_LIST = ["exl50u", "eng50u"]
+MDS_DBS = {
+    'exl50': {
+        'name': 'exl50',
+        'addr': '192.168.20.11',
+        'path': '192.168.20.11::/media/ennfusion/trees/exl50',
+        'subtrees': ['FBC', 'PAI', 'PMNT']
+    },
+    'exl50u': {
+        'name': 'exl50u',
+        'addr': '192.168.20.11',
+        'path': '192.168.20.11::/media/ennfusion/trees/exl50u',
+        'subtrees': ['FBC', 'PAI', 'PMNT']
+    },
+    'eng50u': {
+        'name': 'eng50u',
+        'addr': '192.168.20.41',
+        'path': '192.168.20.41::/media/ennfusion/ENNMNT/trees/eng50u',
+        'subtrees': ['PMNT']
+    },
+    'ecrhlab': {
+        'name': 'ecrhlab',
+        'addr': '192.168.20.32',
+        'path': '192.168.20.32::/media/ecrhdb/trees/ecrhlab',
+        'subtrees': ['PAI']
+    },
+    'ts': {
+        'name': 'ts',
+        'addr': '192.168.20.28',
+        'path': '192.168.20.28::/media/ennts/trees/ts',
+        'subtrees': ['AI']
+    },
+}
+
+
+def parse_channel_key(channel_key):
+    """解析通道键（通道名_炮号，兼容炮号_通道名），返回 (channel_name, shot_number)"""
+    if not channel_key or '_' not in channel_key:
+        raise ValueError(f"Invalid channel_key format: '{channel_key}'")
+    channel_name, shot_number = channel_key.rsplit('_', 1)
+    try:
+        int(channel_name)
+        channel_name, shot_number = shot_number, channel_name
+    except ValueError:
+        pass
+    try:
+        shot_number = int(shot_number)
+    except ValueError:
+        raise ValueError(f"无法将炮号转换为整数: '{shot_number}'")
+    return channel_name, shot_number
+
+
+def _normalize_time_value(value):
+    """时间参数统一为数值，整数值的浮点数转为 int，保证 -2 与 -2.0 对应同一个缓存键"""
+    if value is None or value == '':
+        return None
+    value = float(value)
+    if not np.isfinite(value):
+        raise ValueError(f"无效的时间参数: {value}")
+    return int(value) if value.is_integer() else value
+
+
+def parse_time_window(params):
+    """
+    从请求参数中解析时间窗口 (t_start, t_end, delta)，未提供的参数为 None
+    t_start/t_end 单位为秒，delta 为重采样间隔（秒）
+    """
+    try:
+        t_start = _normalize_time_value(params.get('t_start'))
+        t_end = _normalize_time_value(params.get('t_end'))
+        delta = _normalize_time_value(params.get('delta'))
+    except (TypeError, ValueError):
+        raise ValueError('t_start/t_end/delta 必须为数值')
+    if t_start is not None and t_end is not None and t_start >= t_end:
+        raise ValueError(f"t_start({t_start}) 必须小于 t_end({t_end})")
+    if delta is not None and delta <= 0:
+        raise ValueError(f"delta({delta}) 必须大于0")
+    return t_start, t_end, delta
+
+
+def channel_time_context(channel_name, t_start=None, t_end=None, delta=None):
+    """
+    通道的时间上下文 (begin, end, delta)，MP/FLUX 通道默认读取 -7~5s，其他通道 -2~5s
+    传入 t_start/t_end/delta 时覆盖默认值，经 setTimeContext 下推到 MDSplus 服务端只读取该时间窗口
+    时间上下文同时是磁盘缓存键的一部分
+    """
+    if channel_name[:2] == 'MP' or channel_name[:4] == 'FLUX':
+        begin, end = -7, 5
+    else:
+        begin, end = -2, 5
+    return (
+        begin if t_start is None else t_start,
+        end if t_end is None else t_end,
+        delta,
+    )
+
+
+def slice_cached_window(DB, shot_number, channel_name, time_context):
+    """
+    时间窗口未命中缓存时，若该通道默认时间范围的完整信号已缓存且覆盖该窗口，
+    直接从缓存（内存映射）中二分查找切片，无需访问 MDSplus
+    """
+    begin, end, delta = time_context
+    full_context = channel_time_context(channel_name)
+    if delta is not None or time_context == full_context:
+        return None
+    if begin < full_context[0] or end > full_context[1]:
+        return None
+    full_key = (DB, shot_number, channel_name) + full_context
+    if not signal_cache.contains(full_key):
+        return None
+    cached = signal_cache.get(full_key)
+    if cached is None:
+        return None
+    data_x, data_y, unit = cached
+    start = int(np.searchsorted(data_x, begin, side='left'))
+    stop = int(np.searchsorted(data_x, end, side='right'))
+    return data_x[start:stop], data_y[start:stop], unit
+
+
+def channel_db_order(shot_number, channel_name, time_context=None):
+    """
+    确定查找通道的数据库顺序: 已有磁盘缓存的数据库 -> 定位索引给出的数据库 -> MDS_DB_LIST 中其余数据库
+    返回 (DB_list, located)，located 为定位索引精确命中的数据库（无精确记录时为 None）
+    """
+    contexts = [channel_time_context(channel_name)]
+    if time_context is not None and tuple(time_context) != contexts[0]:
+        contexts.insert(0, tuple(time_context))
+    cached_dbs = [DB for DB in MDS_DB_LIST
+                  if any(signal_cache.contains((DB, shot_number, channel_name) + ctx) for ctx in contexts)]
+    location = channel_locator.locate(channel_name, shot_number)
+    located = None
+    preferred = list(cached_dbs)
+    if location is not None and location[0] in MDS_DB_LIST:
+        if location[2]:
+            located = location[0]
+        if location[0] not in preferred:
+            preferred.append(location[0])
+    return preferred + [DB for DB in MDS_DB_LIST if DB not in preferred], located
+
+
+def record_channel_location(shot_number, channel_name, DB, located=None):
+    """逐个尝试找到通道后回填定位索引，下次直接打开该数据库"""
+    if DB == located:
+        return
+    channel_locator.record(shot_number, channel_name, DB)
+    channel_locator.save()
+
+
+def cached_channel_signal(DB, shot_number, channel_name, time_context, logs=None):
+    """
+    只从磁盘缓存读取通道原始信号（包括由已缓存的完整信号切片），未缓存时返回 None，不访问 MDSplus
+    返回 data_x, data_y, unit
+    """
+    logs = logs if logs is not None else []
+    cache_key = (DB, shot_number, channel_name) + tuple(time_context)
+    if signal_cache.contains(cache_key):
+        cached = signal_cache.get(cache_key)
+        if cached is not None:
+            logs.append(f"信号缓存命中: {DB}")
+            return cached
+    cached = slice_cached_window(DB, shot_number, channel_name, tuple(time_context))
+    if cached is not None:
+        logs.append(f"时间窗口由已缓存的完整信号切片得到: {DB}")
+    return cached
+
+
+def read_channel_signal(DB, db_config, shot_number, channel_name, time_context, logs=None):
+    """
+    读取通道原始信号，优先使用磁盘缓存，未命中时从MDSplus读取并写入缓存
+    返回 data_x, data_y, unit
+    """
+    logs = logs if logs is not None else []
+    cache_key = (DB, shot_number, channel_name) + tuple(time_context)
+    cached = cached_channel_signal(DB, shot_number, channel_name, time_context, logs)
+    if cached is not None:
+        return cached
+
+    def read_from_mds():
+        tree_start_time = time.time()
+        begin, end, delta = time_context
+        with checkout_mds_tree(shot_number, DB, db_config['path'], db_config['subtrees']) as tree:
+            logs.append(f"获取MdsTree对象耗时: {time.time() - tree_start_time:.2f}秒")
+            data_x, data_y, unit = tree.getData(channel_name, begin, end, delta)
+
+        # 只缓存有效数据，空结果可能是通道不在该树中
+        if len(data_x) != 0 and len(data_x) == len(data_y):
+            signal_cache.put(cache_key, np.asarray(data_x), np.asarray(data_y), unit)
+        return data_x, data_y, unit
+
+    # 不同采样参数的并发请求也会读取同一原始信号，按缓存键合并 MDSplus 读取
+    result, shared = mds_read_flight.do(cache_key, read_from_mds)
+    if shared:
+        logs.append(f"合并并发读取: {DB}")
+    return result
+
+
+def read_channel_signals(DB, db_config, shot_number, channel_names, time_context, logs=None):
+    """
+    一次 GetMany() 请求读取同一数据库、同一炮号、同一时间上下文下多个通道的原始信号，有效数据写入磁盘缓存
+    连接取自句柄池（checkout_mds_conn），相同的并发批量读取按 (数据库, 炮号, 通道集合, 时间上下文) 合并
+    返回 {通道名: (data_x, data_y, unit)}，只包含读到有效数据的通道（其余通道可能不在该树中）；
+    连接或请求失败时抛出异常
+    """
+    logs = logs if logs is not None else []
+    channel_names = tuple(sorted(set(channel_names)))
+
+    def read_from_mds():
+        read_start_time = time.time()
+        begin, end, delta = ['' if value is None else value for value in time_context]
+        with checkout_mds_conn(shot_number, DB, db_config['addr']) as conn:
+            fetched = conn.getManyChannels(shot_number, channel_names, begin, end, delta, isOpenTree=False)
+        logs.append(f"GetMany读取 {DB} 炮号 {shot_number} 的 {len(channel_names)} 个通道耗时: "
+                    f"{time.time() - read_start_time:.2f}秒")
+        signals = {}
+        for channel_name, value in fetched.items():
+            data_x, data_y, unit = np.asarray(value['data_x']), np.asarray(value['data_y']), value['unit']
+            # 只缓存有效数据，空结果可能是通道不在该树中
+            if len(data_x) == 0 or len(data_x) != len(data_y):
+                continue
+            signal_cache.put((DB, shot_number, channel_name) + tuple(time_context), data_x, data_y, unit)
+            signals[channel_name] = (data_x, data_y, unit)
+        return signals
+
+    result, shared = mds_read_flight.do(('GetMany', DB, shot_number, channel_names) + tuple(time_context), read_from_mds)
+    if shared:
+        logs.append(f"合并并发批量读取: {DB}")
+    return result
+
+
+def parse_channel_fields(value):
+    """
+    解析 fields= 投影参数，如 'y,stats'、'fft'；未指定或 'all' 时返回全部字段组
+    字段组: x(时间轴) y(数据) stats(统计信息) normalized(归一化数据) fft(频谱)
+    """
+    if value is None or value == '' or value == 'all':
+        return set(CHANNEL_FIELDS)
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = {str(v).strip() for v in value if str(v).strip()}
+    unknown = fields - set(CHANNEL_FIELDS)
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(sorted(unknown))}，可选: {', '.join(CHANNEL_FIELDS)}")
+    return fields
+
+
+def _resample_channel(data_x, data_y, sample_mode, sample_freq, downsample_algo, logs):
+    """按采样模式调整采样率，返回派生结果字典的基础部分"""
+    # 磁盘缓存返回的是内存映射数组，转为普通 ndarray 视图（不复制），便于后续运算与序列化
+    data_x = np.asarray(data_x)
+    data_y = np.asarray(data_y)
+
+    # 计算原始频率，由Hz转换为KHz
+    original_frequency = len(data_x) / (data_x[-1] - data_x[0]) if len(data_x) > 1 else 0
+    original_frequency_khz = original_frequency / 1000
+    logs.append(f"原始频率: {original_frequency_khz}KHz")
+
+    is_downsampled = False
+    is_upsampled = False
+
+    # 处理采样率调整
+    if sample_mode != 'full' and sample_freq > 0:
+        # 将sample_freq从KHz转换为Hz
+        target_freq_hz = sample_freq * 1000
+
+        # 如果目标频率小于原始频率，进行降采样
+        if target_freq_hz < original_frequency:
+            downsampling_start = time.time()
+            data_x, data_y = downsample_to_frequency(data_x, data_y, target_freq=target_freq_hz, algo=downsample_algo)
+            logs.append(f"降采样耗时: {time.time() - downsampling_start:.2f}秒")
+            is_downsampled = True
+        # 如果目标频率大于原始频率，进行插值采样
+        elif target_freq_hz > original_frequency:
+            upsampling_start = time.time()
+            # 为了避免混淆，创建一个专门的插值采样函数
+            data_x, data_y = upsample_to_frequency(data_x, data_y, target_freq=target_freq_hz)
+            logs.append(f"插值采样耗时: {time.time() - upsampling_start:.2f}秒")
+            is_upsampled = True
+
+    return {
+        'X_value': np.ascontiguousarray(data_x),
+        'Y_value': np.ascontiguousarray(data_y),
+        'is_downsampled': is_downsampled,
+        'is_upsampled': is_upsampled,
+        'originalFrequency': original_frequency_khz,
+    }
+
+
+def _compute_channel_stats(data_x, data_y):
+    """计算前端绘图需要的数据统计信息，返回 (stats, is_digital)"""
+    # 计算Y值的统计数据
+    y_min = float(np.min(data_y))
+    y_max = float(np.max(data_y))
+    y_mean = float(np.mean(data_y))
+    y_median = float(np.median(data_y))
+    y_std = float(np.std(data_y))
+
+    # 计算X轴范围
+    x_min = float(np.min(data_x))
+    x_max = float(np.max(data_x))
+
+    # 计算数据范围，用于Y轴缩放
+    y_range = y_max - y_min
+    y_range_padding = y_range * 0.2  # 添加20%的padding
+
+    # 判断通道类型
+    is_digital = False
+    if y_min >= 0 and y_max <= 1 and np.all(np.logical_or(np.isclose(data_y, 0), np.isclose(data_y, 1))):
+        is_digital = True
+
+    stats = {
+        'y_min': y_min,
+        'y_max': y_max,
+        'y_mean': y_mean,
+        'y_median': y_median,
+        'y_std': y_std,
+        'x_min': x_min,
+        'x_max': x_max,
+        'y_axis_min': y_min - y_range_padding,
+        'y_axis_max': y_max + y_range_padding
+    }
+    return stats, is_digital
+
+
+def _compute_channel_normalized(data_y):
+    """归一化数据（用于多通道对比）"""
+    y_abs_max = float(np.max(np.abs(data_y))) if len(data_y) else 0.0
+    if y_abs_max > 0:
+        return data_y / y_abs_max
+    return np.array(data_y)
+
+
+def _compute_channel_fft(data_x, data_y, logs):
+    """计算单边幅度谱，返回 (freq, amplitude)，见 api.spectral.amplitude_spectrum"""
+    fft_start_time = time.time()
+    N = len(data_y)
+    if N > 1:
+        # 采样间隔
+        dt = (data_x[-1] - data_x[0]) / (N - 1)
+        freq, amplitude = amplitude_spectrum(data_y, dt)
+
+        logs.append(f"采样频率: {1.0 / dt:.2f} Hz")
+        logs.append(f"频率分辨率: {freq[1] - freq[0]:.4f} Hz（变换长度 {fast_length(N)}）")
+        logs.append(f"最大频率: {freq[-1]:.2f} Hz")
+    else:
+        freq = np.array([])
+        amplitude = np.array([])
+    logs.append(f"FFT计算耗时: {time.time() - fft_start_time:.4f}秒")
+    logs.append(f"FFT点数: {len(freq)}")
+    return freq, amplitude
+
+
+def _freeze_arrays(derived):
+    """ 派生结果中的数组与所有调用方共享，设为只读，防止调用方原地修改污染缓存 """
+    for value in derived.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+
+def build_channel_payload(channel_name, data_x, data_y, unit, sample_mode='downsample', sample_freq=1000, logs=None, x_encoding='explicit',
+                          downsample_algo=DEFAULT_DOWNSAMPLE_ALGORITHM, fields=None, cache_key=None):
+    """
+    根据原始信号构建通道数据响应内容（采样率调整、统计信息、归一化、FFT）
+    get_channel_data 与批量接口共用
+    x_encoding='implicit' 时，均匀采样的时间轴以 X_axis={t0, dt, n} 返回，代替 X_value
+    downsample_algo 为降采样算法（extrema/minmax/lttb），见 api.downsampling
+    fields 为需要返回的字段组（见 CHANNEL_FIELDS），None 表示全部；未请求的派生字段不计算
+    cache_key 为原始信号缓存键，提供时降采样结果和已计算的派生字段缓存在内存中，后续请求直接复用
+    data_x 为 None 时只使用派生结果缓存，未命中返回 None
+    """
+    logs = logs if logs is not None else []
+    fields = set(CHANNEL_FIELDS) if fields is None else set(fields)
+    derived_key = None
+    derived = None
+    if cache_key is not None:
+        derived_key = tuple(cache_key) + (sample_mode, float(sample_freq), downsample_algo)
+        derived = derived_cache.get(derived_key)
+    if derived is None and data_x is None:
+        return None
+    updated = derived is None
+    if derived is None:
+        derived = _resample_channel(data_x, data_y, sample_mode, sample_freq, downsample_algo, logs)
+        derived['unit'] = str(unit) if unit is not None else 'Y'  # 确保单位是字符串类型
+    else:
+        logs.append("派生结果缓存命中")
+    data_x = derived['X_value']
+    data_y = derived['Y_value']
+
+    # 只计算请求的派生字段，已缓存的直接复用
+    calculate_start_time = time.time()
+    if 'stats' in fields and 'stats' not in derived:
+        derived['stats'], derived['is_digital'] = _compute_channel_stats(data_x, data_y)
+        updated = True
+    if 'normalized' in fields and 'Y_normalized' not in derived:
+        derived['Y_normalized'] = _compute_channel_normalized(data_y)
+        updated = True
+    if 'fft' in fields and 'freq' not in derived:
+        derived['freq'], derived['amplitude'] = _compute_channel_fft(data_x, data_y, logs)
+        updated = True
+    if 'x' in fields and x_encoding == 'implicit' and 'X_axis' not in derived:
+        # 隐式时间轴检测结果同样缓存，非均匀采样记为 None
+        derived['X_axis'] = time_axis.detect_uniform_axis(data_x)
+        updated = True
+    logs.append(f"计算派生字段耗时: {time.time() - calculate_start_time:.2f}秒")
+    if derived_key is not None and updated:
+        _freeze_arrays(derived)
+        derived_cache.put(derived_key, derived)
+
+    data = {
+        'channel_number': channel_name,
+        'X_unit': 's',
+        'Y_unit': derived['unit'],
+        'is_downsampled': derived['is_downsampled'],
+        'is_upsampled': derived['is_upsampled'],
+        'points': len(data_x),
+        'originalFrequency': derived['originalFrequency'],
+    }
+    if 'x' in fields:
+        if x_encoding == 'implicit' and derived.get('X_axis'):
+            data['X_axis'] = dict(derived['X_axis'])
+            logs.append(f"时间轴均匀采样，使用隐式表示: {data['X_axis']}")
+        else:
+            data['X_value'] = data_x
+    if 'y' in fields:
+        data['Y_value'] = data_y
+    if 'stats' in fields:
+        data['stats'] = dict(derived['stats'])
+        data['is_digital'] = derived['is_digital']
+    if 'normalized' in fields:
+        data['Y_normalized'] = derived['Y_normalized']
+    if 'fft' in fields:
+        data['freq'] = derived['freq']
+        data['amplitude'] = derived['amplitude']
+    return data
+
+
+def fetch_channel_payload(shot_number, channel_name, time_context, sample_mode='downsample', sample_freq=1000, x_encoding='explicit',
+                          downsample_algo=DEFAULT_DOWNSAMPLE_ALGORITHM, fields=None, logs=None):
+    """
+    查找通道并构建响应内容，未找到返回 None
+    已有磁盘缓存的数据库和定位索引给出的数据库优先查找，其余数据库按 MDS_DB_LIST 顺序逐个尝试
+    """
+    logs = logs if logs is not None else []
+    DB_list, located = channel_db_order(shot_number, channel_name, time_context)
+
+    for DB in DB_list:
+        cache_key = (DB, shot_number, channel_name) + time_context
+        # 相同采样参数的派生结果已缓存时，无需再读取原始信号
+        data = build_channel_payload(channel_name, None, None, None, sample_mode, sample_freq, logs, x_encoding, downsample_algo,
+                                     fields, cache_key)
+        if data is not None:
+            return data
+        data_start_time = time.time()
+        data_x, data_y, unit = read_channel_signal(DB, MDS_DBS[DB], shot_number, channel_name, time_context, logs)
+        logs.append(f"获取数据耗时: {time.time() - data_start_time:.2f}秒")
+        logs.append(f"原始数据量: X轴 {len(data_x)} 点, Y轴 {len(data_y)} 点")
+        if len(data_x) != 0:
+            record_channel_location(shot_number, channel_name, DB, located)
+            return build_channel_payload(channel_name, data_x, data_y, unit, sample_mode, sample_freq, logs, x_encoding, downsample_algo,
+                                         fields, cache_key)
+    return None
+
+
+def upsample_to_frequency(x_values, y_values, target_freq=1000):
+    """
+    对数据进行插值采样到指定频率
+    
+    Args:
+        x_values: 时间序列数据的X值（时间值）
+        y_values: 对应的Y值
+        target_freq: 目标频率，单位Hz
+        
+    Returns:
+        插值采样后的x_values和y_values
+    """
+    # 计算原始频率
+    time_span = max(x_values) - min(x_values)
+    original_freq = len(x_values) / time_span
+    
+    # 如果目标频率小于或等于原始频率，直接返回原始数据
+    if target_freq <= original_freq:
+        return x_values, y_values
+    
+    # 基于目标频率计算总采样点数
+    n_samples = int(time_span * target_freq)
+    
+    # 创建均匀分布的新时间点
+    new_times = np.linspace(min(x_values), max(x_values), n_samples)
+    
+    # 使用线性插值计算对应的Y值
+    new_values = np.interp(new_times, x_values, y_values)
+    
+    print(f"插值采样: 从 {len(x_values)} 点 增至 {len(new_times)} 点")
+    return new_times, new_values
+
+
+class ChannelNotFoundError(LookupError):
+    """ 所有数据库中都未找到通道数据 """
+
+
+def get_channel(channel_key, sample_mode='downsample', sample_freq=1000, x_encoding='explicit',
+                downsample_algo=DEFAULT_DOWNSAMPLE_ALGORITHM, t_start=None, t_end=None, delta=None, fields=None, logs=None):
+    """
+    进程内获取通道数据，返回字段与 channel-data 接口响应一致的字典，数值字段为 NumPy 数组
+
+    Args:
+        channel_key: 通道键（通道名_炮号）
+        sample_mode: 'downsample' 或 'full'
+        sample_freq: 目标采样频率（KHz）
+        x_encoding: 'explicit' 返回 X_value，'implicit' 对均匀采样通道返回 X_axis={t0, dt, n}
+        downsample_algo: 降采样算法，见 DOWNSAMPLE_ALGORITHMS
+        t_start, t_end, delta: 时间窗口（秒），None 表示通道默认值
+        fields: 需要的字段组，如 'x,y' 或 {'x', 'y'}，None 表示全部
+        logs: 可选的日志列表
+
+    Returns:
+        通道数据字典；数组为只读且可能与其他调用方共享，需要修改时先复制
+
+    Raises:
+        ValueError: 通道键或参数无效
+        ChannelNotFoundError: 所有数据库中都未找到该通道
+    """
+    logs = logs if logs is not None else []
+    channel_name, shot_number = parse_channel_key(channel_key)
+    if downsample_algo not in DOWNSAMPLE_ALGORITHMS:
+        raise ValueError(f"不支持的降采样算法: {downsample_algo}")
+    fields = parse_channel_fields(fields)
+    sample_freq = float(sample_freq)
+    time_context = channel_time_context(channel_name, t_start, t_end, delta)
+    logs.append(f"通道名: {channel_name}")
+    logs.append(f"时间上下文: {time_context}")
+
+    # 相同通道、时间窗口与采样参数的并发请求只执行一次读取和计算
+    flight_key = (shot_number, channel_name, time_context, sample_mode, sample_freq, downsample_algo, x_encoding,
+                  tuple(sorted(fields)))
+    data, shared = channel_flight.do(flight_key, lambda: fetch_channel_payload(
+        shot_number, channel_name, time_context, sample_mode, sample_freq, x_encoding, downsample_algo, fields, logs))
+    if shared:
+        logs.append("合并并发请求: 复用进行中的相同请求结果")
+    if data is None:
+        raise ChannelNotFoundError(f'未找到通道数据: {channel_key}')
+    # 合并的请求共享同一个结果，每个调用方拿到独立的字典
+    return dict(data)
+
+
+def get_channels(channel_keys, sample_mode='downsample', sample_freq=1000, x_encoding='explicit',
+                 downsample_algo=DEFAULT_DOWNSAMPLE_ALGORITHM, t_start=None, t_end=None, delta=None, fields=None, logs=None):
+    """
+    批量获取通道数据，参数与 get_channel 相同，返回 {通道键: 通道数据字典 或 {'error': 信息}}
+    已缓存（派生结果或原始信号）的通道直接构建；其余通道按 (炮号, 时间上下文) 分组，
+    每个数据库每组只发送一次 GetMany() 请求（read_channel_signals），各组并发读取。
+    第一轮每个通道只向首选数据库（缓存或定位索引给出的数据库）请求，未找到的通道再按 MDS_DB_LIST 顺序逐个尝试其余数据库
+    """
+    logs = logs if logs is not None else []
+    if downsample_algo not in DOWNSAMPLE_ALGORITHMS:
+        raise ValueError(f"不支持的降采样算法: {downsample_algo}")
+    fields = parse_channel_fields(fields)
+    sample_freq = float(sample_freq)
+    build_args = (sample_mode, sample_freq, logs, x_encoding, downsample_algo, fields)
+
+    results = {}
+    cache_hits = 0
+    pending = defaultdict(dict)  # {(shot_number, time_context): {channel_name: channel_key}}
+    first_dbs = {}    # {(shot_number, channel_name): 首先尝试的数据库}
+    located_dbs = {}  # {(shot_number, channel_name): 定位索引精确命中的数据库}
+    for channel_key in dict.fromkeys(channel_keys):
+        try:
+            channel_name, shot_number = parse_channel_key(channel_key)
+        except ValueError as e:
+            results[channel_key] = {'error': str(e)}
+            continue
+        time_context = channel_time_context(channel_name, t_start, t_end, delta)
+        DB_list, located = channel_db_order(shot_number, channel_name, time_context)
+        for DB in DB_list:
+            cache_key = (DB, shot_number, channel_name) + time_context
+            data = build_channel_payload(channel_name, None, None, None, *build_args, cache_key)
+            if data is None:
+                cached = cached_channel_signal(DB, shot_number, channel_name, time_context, logs)
+                if cached is not None:
+                    data = build_channel_payload(channel_name, *cached, *build_args, cache_key)
+            if data is not None:
+                results[channel_key] = data
+                cache_hits += 1
+                break
+        else:
+            pending[(shot_number, time_context)][channel_name] = channel_key
+            first_dbs[(shot_number, channel_name)] = DB_list[0]
+            located_dbs[(shot_number, channel_name)] = located
+
+    round_trips = 0
+    errors = {}  # {(shot_number, time_context): 最近一次读取失败的信息}
+    probe_rounds = [(DB, True) for DB in MDS_DB_LIST if DB in set(first_dbs.values())] + \
+        [(DB, False) for DB in MDS_DB_LIST]
+    for DB, first_round in probe_rounds:
+        requests_for_db = {group: [name for name in channel_map if (first_dbs[(group[0], name)] == DB) == first_round]
+                           for group, channel_map in pending.items()}
+        requests_for_db = {group: names for group, names in requests_for_db.items() if names}
+        if not requests_for_db:
+            continue
+
+        def read_group(item):
+            (shot_number, time_context), channel_names = item
+            try:
+                return read_channel_signals(DB, MDS_DBS[DB], shot_number, channel_names, time_context, logs), None
+            except Exception as e:
+                print(f"批量读取 {DB} 炮号 {shot_number} 失败: {str(e)}")
+                return {}, f"读取 {DB} 失败: {str(e)}"
+
+        groups = list(requests_for_db.items())
+        with ThreadPoolExecutor(max_workers=min(CHANNEL_BATCH_WORKERS, len(groups))) as executor:
+            group_results = list(executor.map(read_group, groups))
+        round_trips += len(groups)
+        for (group, _), (signals, error) in zip(groups, group_results):
+            shot_number, time_context = group
+            if error is not None:
+                errors[group] = error
+            channel_map = pending[group]
+            for channel_name, (data_x, data_y, unit) in signals.items():
+                if located_dbs[(shot_number, channel_name)] != DB:
+                    channel_locator.record(shot_number, channel_name, DB)
+                results[channel_map.pop(channel_name)] = build_channel_payload(
+                    channel_name, data_x, data_y, unit, *build_args, (DB, shot_number, channel_name) + time_context)
+            if not channel_map:
+                del pending[group]
+        if not pending:
+            break
+
+    if round_trips:
+        channel_locator.save()
+    for group, channel_map in pending.items():
+        for channel_key in channel_map.values():
+            results[channel_key] = {'error': errors.get(group, f'未找到通道数据: {channel_key}')}
+    logs.append(f"缓存命中 {cache_hits} 个通道, GetMany请求 {round_trips} 次")
+    return results
+
+
+def channel_to_lists(channel_data):
+    """ 将通道数据中的数组转换为列表（用于仍按列表处理数据的调用方，如用户导入的算法函数） """
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in channel_data.items()}
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+原始信号磁盘缓存
+
+MDSplus 中的炮号数据采集完成后不会再变化，因此可以把从 MDSplus 读取到的原始
+X/Y 数组以 .npy 文件形式缓存在本地磁盘上，读取时使用内存映射(mmap)，
+重复查看、表达式计算、手绘查询都可以直接以磁盘速度读取，而不必再次访问 MDSplus。
+
+缓存键: (树名, 炮号, 通道名, begin, end, delta)
+每个缓存条目由三个文件组成:
+    <base>.x.npy   时间轴
+    <base>.y.npy   数据
+    <base>.json    元数据(单位、字节数)，最后写入，存在即代表条目完整
+条目还可以附带由原始信号派生的附属数组（如 min/max 金字塔）:
+    <base>.<name>.npy  附属数组，其信息记录在元数据的 sidecars 字段中，随条目一起淘汰
+
+多个 Django/ASGI 进程以及计算任务子进程会共用同一个缓存目录，容量上限针对整个目录:
+每个进程只在内存中估算自己的写入量，写入量达到上限的 1/16 或估算总量超限时，
+在目录下的 .evict.lock 文件锁内重新扫描目录重建 LRU 顺序(以元数据文件修改时间为准)
+并淘汰最久未使用的条目。两次扫描之间的超出量最多约为 进程数 × 上限/16。
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不加文件锁，淘汰仍按目录扫描结果进行
+    fcntl = None
+
+# 本进程写入量达到容量上限的该比例时重新扫描目录
+RESCAN_FRACTION = 16
+
+
+def _format_key_part(value):
+    """ 将时间上下文参数转换为可用于文件名的字符串 """
+    if value is None or value == '':
+        return 'None'
+    return re.sub(r'[^0-9A-Za-z.\-]', '_', str(value))
+
+
+class SignalCache:
+    """ 基于 .npy 文件的原始信号缓存，按总字节数进行 LRU 淘汰 """
+
+    def __init__(self, cache_dir, max_bytes=20 * 1024 ** 3):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {base_path: nbytes}，按最近使用排序
+        self._total_bytes = 0
+        self._unscanned_bytes = 0  # 上次扫描目录后本进程写入的字节数
+        self._loaded = False
+        self.scans = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def _base_path(self, key):
+        """ 根据缓存键生成文件路径前缀 """
+        dbname, shot, channel_name = key[0], key[1], key[2]
+        context = '_'.join(_format_key_part(v) for v in key[3:])
+        safe_channel = re.sub(r'[^0-9A-Za-z_\-]', '_', str(channel_name).upper())
+        return os.path.join(self.cache_dir, str(dbname), str(shot), f'{safe_channel}@{context}')
+
+    def _load_index(self):
+        """ 首次使用时扫描缓存目录 """
+        if not self._loaded:
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        """ 扫描缓存目录（包括其他进程写入的条目），按元数据文件修改时间重建 LRU 顺序 """
+        found = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    if not name.endswith('.json'):
+                        continue
+                    meta_path = os.path.join(root, name)
+                    try:
+                        with open(meta_path, 'r', encoding='utf-8') as f:
+                            nbytes = int(json.load(f).get('nbytes', 0))
+                        found.append((os.path.getmtime(meta_path), meta_path[:-len('.json')], nbytes))
+                    except (OSError, ValueError):
+                        continue
+        self._entries.clear()
+        self._total_bytes = 0
+        for _, base, nbytes in sorted(found):
+            self._entries[base] = nbytes
+            self._total_bytes += nbytes
+        self._unscanned_bytes = 0
+        self._loaded = True
+        self.scans += 1
+
+    def _remove_files(self, base):
+        suffixes = ['.json', '.x.npy', '.y.npy']
+        try:
+            with open(base + '.json', 'r', encoding='utf-8') as f:
+                suffixes += [f'.{name}.npy' for name in json.load(f).get('sidecars', {})]
+        except (OSError, ValueError):
+            pass
+        for suffix in suffixes:
+            try:
+                os.remove(base + suffix)
+            except OSError:
+                pass
+
+    def _adopt(self, base):
+        """ 条目不在本进程索引中时，检查是否已由其他进程写入，存在则加入索引 """
+        if base in self._entries:
+            return True
+        try:
+            with open(base + '.json', 'r', encoding='utf-8') as f:
+                nbytes = int(json.load(f).get('nbytes', 0))
+        except (OSError, ValueError):
+            return False
+        self._entries[base] = nbytes
+        self._total_bytes += nbytes
+        return True
+
+    def _drop(self, base):
+        nbytes = self._entries.pop(base, None)
+        if nbytes is not None:
+            self._total_bytes -= nbytes
+
+    def _evict(self):
+        """
+        超过容量上限时淘汰最久未使用的条目
+        其他进程的写入不在本进程的统计中，因此先在文件锁内重新扫描目录再按整个目录的总量淘汰
+        """
+        if self._total_bytes <= self.max_bytes and self._unscanned_bytes * RESCAN_FRACTION < self.max_bytes:
+            return
+        lock_file = None
+        try:
+            if fcntl is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                lock_file = open(os.path.join(self.cache_dir, '.evict.lock'), 'w')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._rebuild_index()
+            while self._total_bytes > self.max_bytes and self._entries:
+                base, nbytes = self._entries.popitem(last=False)
+                self._total_bytes -= nbytes
+                self._remove_files(base)
+                self.evictions += 1
+        except OSError as e:
+            print(f"淘汰信号缓存失败: {self.cache_dir}, {e}")
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def contains(self, key):
+        """ 判断缓存中是否存在该条目（不计入命中统计） """
+        base = self._base_path(key)
+        with self._lock:
+            self._load_index()
+            return self._adopt(base) and os.path.exists(base + '.json')
+
+    def get(self, key):
+        """
+        读取缓存条目
+        返回 (data_x, data_y, unit)，数组为只读内存映射；未命中返回 None
+        """
+        base = self._base_path(key)
+        with self._lock:
+            self._load_index()
+            if not self._adopt(base):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(base)
+        try:
+            with open(base + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            data_x = np.load(base + '.x.npy', mmap_mode='r')
+            data_y = np.load(base + '.y.npy', mmap_mode='r')
+            os.utime(base + '.json')
+        except (OSError, ValueError):
+            # 文件可能已被其他进程淘汰
+            with self._lock:
+                self._drop(base)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data_x, data_y, meta.get('unit', '')
+
+    def put(self, key, data_x, data_y, unit=''):
+        """ 写入缓存条目，先写临时文件再原子替换，保证并发读取时不会读到半个文件 """
+        base = self._base_path(key)
+        data_x = np.ascontiguousarray(data_x)
+        data_y = np.ascontiguousarray(data_y)
+        nbytes = int(data_x.nbytes + data_y.nbytes)
+        if nbytes > self.max_bytes:
+            return False
+        tmp_suffix = f'.{uuid.uuid4().hex}.tmp'
+        try:
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            for suffix, array in (('.x.npy', data_x), ('.y.npy', data_y)):
+                with open(base + suffix + tmp_suffix, 'wb') as f:
+                    np.save(f, array)
+                os.replace(base + suffix + tmp_suffix, base + suffix)
+            meta = {
+                'unit': '' if unit is None else str(unit),
+                'nbytes': nbytes,
+                'points': int(len(data_y)),
+                'created': time.time(),
+            }
+            with open(base + '.json' + tmp_suffix, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(base + '.json' + tmp_suffix, base + '.json')
+        except OSError as e:
+            print(f"写入信号缓存失败: {base}, {e}")
+            return False
+
+        with self._lock:
+            self._load_index()
+            self._drop(base)
+            self._entries[base] = nbytes
+            self._total_bytes += nbytes
+            self._unscanned_bytes += nbytes
+            self.writes += 1
+            self._evict()
+        return True
+
+    def get_sidecar(self, key, name):
+        """
+        读取条目的附属数组
+        返回 (array, info)，数组为只读内存映射；条目或附属数组不存在时返回 None
+        """
+        base = self._base_path(key)
+        with self._lock:
+            self._load_index()
+            if not self._adopt(base):
+                return None
+        try:
+            with open(base + '.json', 'r', encoding='utf-8') as f:
+                info = json.load(f).get('sidecars', {}).get(name)
+            if info is None:
+                return None
+            array = np.load(f'{base}.{name}.npy', mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        return array, info
+
+    def put_sidecar(self, key, name, array, info=None):
+        """ 为已存在的条目写入附属数组，计入条目字节数参与 LRU 淘汰 """
+        base = self._base_path(key)
+        array = np.ascontiguousarray(array)
+        tmp_suffix = f'.{uuid.uuid4().hex}.tmp'
+        with self._lock:
+            self._load_index()
+            if not self._adopt(base):
+                return False
+            try:
+                with open(base + '.json', 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                path = f'{base}.{name}.npy'
+                with open(path + tmp_suffix, 'wb') as f:
+                    np.save(f, array)
+                os.replace(path + tmp_suffix, path)
+                sidecars = meta.setdefault('sidecars', {})
+                old_bytes = int(sidecars.get(name, {}).get('nbytes', 0))
+                sidecars[name] = dict(info or {}, nbytes=int(array.nbytes))
+                meta['nbytes'] = int(meta.get('nbytes', 0)) - old_bytes + int(array.nbytes)
+                with open(base + '.json' + tmp_suffix, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(base + '.json' + tmp_suffix, base + '.json')
+            except (OSError, ValueError) as e:
+                print(f"写入信号缓存附属数据失败: {base}.{name}, {e}")
+                return False
+            self._total_bytes += meta['nbytes'] - self._entries[base]
+            self._entries[base] = meta['nbytes']
+            self._entries.move_to_end(base)
+            self._unscanned_bytes += int(array.nbytes)
+            self._evict()
+        return True
+
+    def clear(self):
+        """ 清空所有缓存条目 """
+        with self._lock:
+            self._load_index()
+            for base in list(self._entries):
+                self._remove_files(base)
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """ 返回缓存统计信息 """
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'writes': self.writes,
+                'evictions': self.evictions,
+                'scans': self.scans,
+            }
+
+
+def _value_nbytes(value):
+    """ 估算缓存值占用的字节数（只统计 numpy 数组） """
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(_value_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_value_nbytes(v) for v in value)
+    return 0
+
+
+class DerivedResultCache:
+    """
+    派生结果内存缓存（降采样后的数组、统计信息、归一化数据、频谱等）
+    值为字典，调用方可按需向其中补充新的派生字段后重新 put，按总字节数进行 LRU 淘汰
+    """
+
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: (value, nbytes)}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def contains(self, key):
+        """ 是否已缓存（不计入命中统计，不调整 LRU 顺序） """
+        with self._lock:
+            return key in self._entries
+
+    def put(self, key, value):
+        nbytes = _value_nbytes(value)
+        if nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_bytes
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+多分辨率 min/max 抽取金字塔（M4 风格）
+
+对每个通道按桶大小 8, 64, 512, ... 逐级记录每个桶内的最小值、最大值及其在原始信号中的下标。
+金字塔在首次查看时由原始信号构建一次，随原始信号一起存入磁盘缓存。
+
+查看任意时间区间时，选取桶大小不超过 "区间点数 / 像素宽度" 的最粗一级，
+只需读取 O(像素宽度) 个桶即可得到每个像素列的最小值和最大值，
+与均匀抽样不同，任意尖峰都不会因缩放而丢失。
+
+金字塔数组形状为 (4, 总桶数)，各行依次为: 最小值, 最大值, 最小值下标, 最大值下标；
+各级在数组中的位置由 levels 描述: [{'bucket': 桶大小, 'offset': 起始列, 'count': 桶数}, ...]
+"""
+
+import numpy as np
+
+PYRAMID_FACTOR = 8
+# 最粗一级的桶数不少于该值时才继续向上构建
+PYRAMID_MIN_BUCKETS = 256
+# 构建时每次处理的桶数，限制临时数组大小
+_BUILD_CHUNK_BUCKETS = 1 << 18
+
+
+def _reduce_level(min_vals, max_vals, min_idx, max_idx, factor):
+    """ 将上一级（或原始信号）每 factor 个桶合并为一个桶 """
+    n = len(min_vals)
+    count = (n + factor - 1) // factor
+    out = np.empty((4, count), dtype=np.float64)
+    for start in range(0, count, _BUILD_CHUNK_BUCKETS):
+        stop = min(start + _BUILD_CHUNK_BUCKETS, count)
+        lo, hi = start * factor, min(stop * factor, n)
+        pad = (stop - start) * factor - (hi - lo)
+        # 末尾不足一个桶时用最后一个值补齐，补齐部分的下标被截断到最后一个有效位置
+        blocks = []
+        for values in (min_vals, max_vals):
+            chunk = np.asarray(values[lo:hi], dtype=np.float64)
+            if pad:
+                chunk = np.concatenate([chunk, np.full(pad, chunk[-1])])
+            blocks.append(chunk.reshape(-1, factor))
+        arg_min = np.argmin(blocks[0], axis=1)
+        arg_max = np.argmax(blocks[1], axis=1)
+        rows = np.arange(stop - start)
+        pos_min = np.minimum(lo + rows * factor + arg_min, n - 1)
+        pos_max = np.minimum(lo + rows * factor + arg_max, n - 1)
+        out[0, start:stop] = blocks[0][rows, arg_min]
+        out[1, start:stop] = blocks[1][rows, arg_max]
+        out[2, start:stop] = pos_min if min_idx is None else np.asarray(min_idx)[pos_min]
+        out[3, start:stop] = pos_max if max_idx is None else np.asarray(max_idx)[pos_max]
+    return out
+
+
+def build_pyramid(data_y, factor=PYRAMID_FACTOR, min_buckets=PYRAMID_MIN_BUCKETS):
+    """
+    由原始信号构建 min/max 金字塔
+    返回 (pyramid, levels)，原始信号太短时返回 (空数组, [])
+    """
+    data_y = np.asarray(data_y)
+    n = len(data_y)
+    levels = []
+    parts = []
+    if n < factor * min_buckets:
+        return np.empty((4, 0), dtype=np.float64), levels
+
+    # 第一级直接由原始信号构建
+    level = _reduce_level(data_y, data_y, None, None, factor)
+    bucket = factor
+    offset = 0
+    while True:
+        levels.append({'bucket': bucket, 'offset': offset, 'count': level.shape[1]})
+        parts.append(level)
+        offset += level.shape[1]
+        if level.shape[1] < factor * min_buckets:
+            break
+        level = _reduce_level(level[0], level[1], level[2], level[3], factor)
+        bucket *= factor
+    return np.concatenate(parts, axis=1), levels
+
+
+def choose_level(levels, span, pixel_width):
+    """ 选取桶大小不超过 span / pixel_width 的最粗一级，没有合适的级别时返回 None（使用原始数据） """
+    target = span / max(int(pixel_width), 1)
+    chosen = None
+    for level in levels:
+        if level['bucket'] <= target:
+            chosen = level
+    return chosen
+
+
+def _group_extrema(min_vals, max_vals, min_idx, max_idx, pixel_width):
+    """ 将连续的桶按像素列分组，返回每列最小值与最大值所在的原始下标 """
+    n = len(min_vals)
+    group = max(1, -(-n // int(pixel_width)))
+    pad = (-n) % group
+    if pad:
+        min_vals = np.concatenate([min_vals, np.full(pad, np.inf)])
+        max_vals = np.concatenate([max_vals, np.full(pad, -np.inf)])
+        min_idx = np.concatenate([min_idx, np.full(pad, min_idx[-1])])
+        max_idx = np.concatenate([max_idx, np.full(pad, max_idx[-1])])
+    rows = np.arange(len(min_vals) // group)
+    arg_min = np.argmin(min_vals.reshape(-1, group), axis=1)
+    arg_max = np.argmax(max_vals.reshape(-1, group), axis=1)
+    return min_idx.reshape(-1, group)[rows, arg_min], max_idx.reshape(-1, group)[rows, arg_max]
+
+
+def _edge_extrema(block, column, data_y, lo, hi):
+    """ 用原始数据 [lo, hi) 的最小值、最大值及其下标替换 block 中的一列 """
+    values = np.asarray(data_y[lo:hi], dtype=np.float64)
+    arg_min = int(np.argmin(values))
+    arg_max = int(np.argmax(values))
+    block[:, column] = (values[arg_min], values[arg_max], lo + arg_min, lo + arg_max)
+
+
+def view_indices(data_y, pyramid, levels, start, stop, pixel_width):
+    """
+    计算区间 [start, stop) 在 pixel_width 个像素列下需要绘制的原始数据下标（已排序、去重）
+    每列保留最小值点和最大值点，区间首尾点始终保留
+    返回 (indices, level)，level 为 None 表示直接使用了原始数据
+    """
+    start = max(int(start), 0)
+    stop = min(int(stop), len(data_y))
+    if stop <= start:
+        return np.empty(0, dtype=np.int64), None
+    span = stop - start
+    level = choose_level(levels, span, pixel_width)
+
+    if level is None:
+        if span <= 2 * pixel_width:
+            return np.arange(start, stop, dtype=np.int64), None
+        values = np.asarray(data_y[start:stop], dtype=np.float64)
+        local = np.arange(start, stop, dtype=np.float64)
+        min_idx, max_idx = _group_extrema(values, values, local, local, pixel_width)
+    else:
+        bucket = level['bucket']
+        first = level['offset'] + start // bucket
+        last = level['offset'] + min(-(-stop // bucket), level['count'])
+        block = np.array(pyramid[:, first:last], dtype=np.float64)
+        # 区间首尾不在桶边界上时，边界桶的极值可能落在区间外；这两个桶改由原始数据中位于区间内的部分计算
+        head_stop = min((start // bucket + 1) * bucket, stop)
+        if start % bucket:
+            _edge_extrema(block, 0, data_y, start, head_stop)
+        tail_start = max((stop - 1) // bucket * bucket, start)
+        if stop % bucket and stop < len(data_y):
+            _edge_extrema(block, -1, data_y, tail_start, stop)
+        min_idx, max_idx = _group_extrema(block[0], block[1], block[2], block[3], pixel_width)
+
+    indices = np.concatenate([[start, stop - 1], min_idx, max_idx]).astype(np.int64)
+    return np.unique(indices), level
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+相同请求合并（single-flight）
+
+多行视图打开、多个用户同时查看最新炮号时，服务端会在短时间内收到大量完全相同的通道数据请求。
+SingleFlight 保证同一个键同一时刻只有一个线程真正执行计算，其余并发请求等待并共享该结果
+（包括异常），计算结束后键即被移除，不做额外缓存。
+"""
+
+import threading
+
+
+class _Call:
+    """ 一次进行中的计算 """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """ 按键合并并发调用 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        执行 fn()，若相同 key 的调用正在进行则等待其完成并共享结果
+        返回 (result, shared)，shared 表示结果来自其他请求的计算
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+    def stats(self):
+        """ 返回合并统计信息 """
+        with self._lock:
+            total = self.executed + self.coalesced
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+                'coalesced_rate': self.coalesced / total if total else 0.0,
+            }
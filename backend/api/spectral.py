@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+频谱计算
+
+表达式内置函数 FFT / Welch / STFT 和通道数据的 fft 字段共用:
+    amplitude_spectrum  单边幅度谱（与原 np.fft.fft 实现的幅度约定一致: 不归一化，除直流和 Nyquist 外乘以2）
+    welch_spectrum      Welch 平均功率谱密度
+    stft_spectrogram    短时傅里叶变换幅度谱（时频谱）
+
+信号为实数，统一使用 rfft，只计算非负频率；变换长度补零到 next_fast_len，避免长度为大素数时退化为慢速 FFT。
+指定频率上限时在取模和缩放之前截断频率点，频率轴只生成需要的部分。
+
+本模块不依赖 Django。
+"""
+
+import numpy as np
+from scipy import fft as sp_fft
+from scipy import signal as sp_signal
+
+# Welch / STFT 默认参数
+DEFAULT_SEGMENT_LENGTH = 256
+DEFAULT_OVERLAP = 0.5
+DEFAULT_WINDOW = 'hann'
+
+
+def fast_length(n):
+    """ 不小于 n 的、实数 FFT 最快的变换长度 """
+    return sp_fft.next_fast_len(int(n), real=True)
+
+
+def _cut_bins(n_bins, n_fft, dt, max_freq):
+    """ 频率上限对应的频率点数（rfft 第 k 个点的频率为 k / (n_fft * dt)） """
+    if not max_freq or max_freq <= 0:
+        return n_bins
+    return int(min(n_bins, np.floor(max_freq * n_fft * dt * (1 + 1e-12)) + 1))
+
+
+def _segment_params(n, segment_length, overlap):
+    """ 校验并换算分段参数，overlap 为相邻分段重叠比例 [0, 1)，返回 (nperseg, noverlap) """
+    nperseg = int(segment_length)
+    if nperseg < 2:
+        raise ValueError(f"分段长度必须不小于2: {segment_length}")
+    if not 0 <= overlap < 1:
+        raise ValueError(f"重叠比例必须在 [0, 1) 之间: {overlap}")
+    if n < nperseg:
+        raise ValueError(f"数据点数({n})少于分段长度({nperseg})")
+    return nperseg, min(int(round(nperseg * overlap)), nperseg - 1)
+
+
+def amplitude_spectrum(values, dt, max_freq=None):
+    """
+    单边幅度谱，返回 (freq, amplitude)
+    变换长度为 fast_length(N)，补零后频率分辨率为 1 / (n_fft * dt)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n < 2:
+        return np.array([]), np.array([])
+    n_fft = fast_length(n)
+    spectrum = sp_fft.rfft(values, n=n_fft)
+    n_bins = _cut_bins(len(spectrum), n_fft, dt, max_freq)
+    amplitude = np.abs(spectrum[:n_bins])
+    # 单边谱: 除直流分量（以及偶数长度时的 Nyquist 分量）外乘以2
+    end = n_bins - 1 if n_fft % 2 == 0 and n_bins == n_fft // 2 + 1 else n_bins
+    amplitude[1:end] *= 2
+    freq = np.arange(n_bins, dtype=np.float64) / (n_fft * dt)
+    return freq, amplitude
+
+
+def welch_spectrum(values, dt, segment_length=DEFAULT_SEGMENT_LENGTH, overlap=DEFAULT_OVERLAP,
+                   max_freq=None, window=DEFAULT_WINDOW):
+    """ Welch 平均功率谱密度，返回 (freq, psd)，单位为 值^2/Hz """
+    values = np.asarray(values, dtype=np.float64)
+    nperseg, noverlap = _segment_params(len(values), segment_length, overlap)
+    n_fft = fast_length(nperseg)
+    freq, psd = sp_signal.welch(values, fs=1.0 / dt, window=window, nperseg=nperseg, noverlap=noverlap,
+                                nfft=n_fft, detrend='constant', scaling='density')
+    n_bins = _cut_bins(len(freq), n_fft, dt, max_freq)
+    return np.ascontiguousarray(freq[:n_bins]), np.ascontiguousarray(psd[:n_bins])
+
+
+def stft_spectrogram(values, dt, segment_length=DEFAULT_SEGMENT_LENGTH, overlap=DEFAULT_OVERLAP,
+                     max_freq=None, window=DEFAULT_WINDOW):
+    """
+    短时傅里叶变换幅度谱
+    返回 (times, freq, magnitude)，times 为各分段中心相对信号起点的时间，magnitude 形状为 (频率点数, 分段数)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    nperseg, noverlap = _segment_params(len(values), segment_length, overlap)
+    n_fft = fast_length(nperseg)
+    freq, times, magnitude = sp_signal.spectrogram(values, fs=1.0 / dt, window=window, nperseg=nperseg,
+                                                   noverlap=noverlap, nfft=n_fft, detrend='constant',
+                                                   scaling='spectrum', mode='magnitude')
+    n_bins = _cut_bins(len(freq), n_fft, dt, max_freq)
+    return times, np.ascontiguousarray(freq[:n_bins]), np.ascontiguousarray(magnitude[:n_bins])
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+fields= 投影与派生结果缓存的测试：按字段组构建的通道数据、缓存命中后返回的通道数据都与完整计算一致
+"""
+
+import os
+import unittest
+
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from api.signal_access import CHANNEL_FIELDS, build_channel_payload, derived_cache, parse_channel_fields  # noqa: E402
+from api.signal_cache import DerivedResultCache  # noqa: E402
+
+PAYLOAD_KEYS = {
+    'x': ('X_value',),
+    'y': ('Y_value',),
+    'stats': ('stats', 'is_digital'),
+    'normalized': ('Y_normalized',),
+    'fft': ('freq', 'amplitude'),
+}
+
+
+def make_signal(n=200000):
+    x = np.linspace(0.0, 2.0, n)
+    y = np.sin(2 * np.pi * 50 * x) + 0.1 * np.cos(2 * np.pi * 730 * x)
+    return x, y
+
+
+def assert_payload_equal(test, actual, expected, keys):
+    for key in keys:
+        if isinstance(expected[key], np.ndarray):
+            np.testing.assert_array_equal(actual[key], expected[key])
+        else:
+            test.assertEqual(actual[key], expected[key])
+
+
+class ChannelFieldsTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_channel_fields(None), set(CHANNEL_FIELDS))
+        self.assertEqual(parse_channel_fields('all'), set(CHANNEL_FIELDS))
+        self.assertEqual(parse_channel_fields(' y, stats ,'), {'y', 'stats'})
+        self.assertEqual(parse_channel_fields(['fft']), {'fft'})
+        with self.assertRaises(ValueError):
+            parse_channel_fields('y,bogus')
+
+    def test_projection_matches_full_payload(self):
+        x, y = make_signal()
+        full = build_channel_payload('ch', x, y, 'V', sample_freq=10)
+        common = ('channel_number', 'X_unit', 'Y_unit', 'is_downsampled', 'is_upsampled', 'points', 'originalFrequency')
+        for field, keys in PAYLOAD_KEYS.items():
+            partial = build_channel_payload('ch', x, y, 'V', sample_freq=10, fields={field})
+            assert_payload_equal(self, partial, full, common + keys)
+            others = {key for other in PAYLOAD_KEYS if other != field for key in PAYLOAD_KEYS[other]}
+            self.assertFalse(others & set(partial), field)
+
+
+class DerivedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        derived_cache.clear()
+
+    def tearDown(self):
+        derived_cache.clear()
+
+    def test_cached_payload_matches_uncached(self):
+        x, y = make_signal()
+        cache_key = ('db', 1, 'ch', None, None)
+        expected = build_channel_payload('ch', x, y, 'V', sample_freq=10)
+
+        # 先只请求 y，再按需补充其余字段，最后完全从缓存构建
+        build_channel_payload('ch', x, y, 'V', sample_freq=10, fields={'y'}, cache_key=cache_key)
+        build_channel_payload('ch', None, None, None, sample_freq=10, fields={'stats', 'fft'}, cache_key=cache_key)
+        logs = []
+        cached = build_channel_payload('ch', None, None, None, sample_freq=10, logs=logs, cache_key=cache_key)
+        self.assertIn("派生结果缓存命中", logs)
+        assert_payload_equal(self, cached, expected, list(expected))
+        self.assertFalse(cached['Y_value'].flags.writeable)
+
+        # 采样参数不同的请求不会命中
+        self.assertIsNone(build_channel_payload('ch', None, None, None, sample_freq=20, cache_key=cache_key))
+
+    def test_lru_eviction_by_bytes(self):
+        cache = DerivedResultCache(max_bytes=3 * 8000 + 100)
+        for key in 'abc':
+            self.assertTrue(cache.put(key, {'Y_value': np.zeros(1000)}))
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('d', {'Y_value': np.zeros(1000)})
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertFalse(cache.put('huge', {'Y_value': np.zeros(10000)}))
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (3, 1))
+        self.assertLessEqual(stats['total_bytes'], stats['max_bytes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+api.chunked_eval 的测试：分块求值的结果与 evaluate_plan 整体求值逐位一致
+"""
+
+import contextlib
+import io
+import os
+import unittest
+
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from api.chunked_eval import evaluate_plan_chunked  # noqa: E402
+from api.expression_parser import ExpressionParser  # noqa: E402
+from api.expression_plan import compile_expression, evaluate_plan  # noqa: E402
+
+
+def make_channels():
+    rng = np.random.default_rng(2)
+    return {
+        'IP_1000': {'X_axis': {'t0': 0.0, 'dt': 0.0001, 'n': 20001}, 'Y_value': rng.standard_normal(20001)},
+        'MP01_1000': {'X_axis': {'t0': 0.05, 'dt': 0.0007, 'n': 2500}, 'Y_value': rng.standard_normal(2500)},
+        'MP02_1000': {'X_axis': {'t0': 0.0, 'dt': 0.0001, 'n': 15000}, 'Y_value': rng.standard_normal(15000)},
+        'FLAG_1000': {'X_axis': {'t0': 0.0, 'dt': 0.0001, 'n': 20001},
+                      'Y_value': (rng.random(20001) > 0.5).astype(np.int64)},
+        'RAW_1000': {'X_value': np.sort(rng.random(1000)), 'Y_value': rng.standard_normal(1000)},
+    }
+
+
+def make_parser(channels, **kwargs):
+    return ExpressionParser(lambda key: dict(channels[key]), **kwargs)
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+EXPRESSIONS = [
+    'IP_1000 + MP01_1000',
+    'IP_1000 * MP02_1000 - 3',
+    '(IP_1000 - MP01_1000) / (MP02_1000 + MP01_1000)',
+    'FLAG_1000 & !MP01_1000 | IP_1000',
+    '2 / IP_1000',
+    '(IP_1000 + MP01_1000) * (IP_1000 + MP01_1000) - MP02_1000 * 0.5',
+]
+
+
+class ChunkedEvalTest(unittest.TestCase):
+
+    def test_bit_identical_to_evaluate_plan(self):
+        channels = make_channels()
+        for align, dt in (('coarsest', None), ('finest', None), ('truncate', None), ('coarsest', 0.00033)):
+            for expression in EXPRESSIONS:
+                plan = compile_expression(expression)
+                expected = quiet(evaluate_plan, plan, make_parser(channels, align_mode=align, align_dt=dt))
+                for chunk_points in (997, 4096, 1 << 20):
+                    actual = quiet(evaluate_plan_chunked, plan, make_parser(channels, align_mode=align, align_dt=dt),
+                                   chunk_points)
+                    with self.subTest(expression=expression, align=align, dt=dt, chunk_points=chunk_points):
+                        self.assertIsNotNone(actual)
+                        self.assertEqual(set(actual), set(expected))
+                        self.assertEqual(actual['Y_value'].dtype, expected['Y_value'].dtype)
+                        np.testing.assert_array_equal(actual['Y_value'], expected['Y_value'])
+                        for key in set(expected) - {'Y_value'}:
+                            self.assertEqual(actual[key], expected[key], key)
+
+    def test_progress(self):
+        channels = make_channels()
+        progress = []
+        quiet(evaluate_plan_chunked, compile_expression('IP_1000 * 2'), make_parser(channels), 5000,
+              on_chunk=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(1, 5), (2, 5), (3, 5), (4, 5), (5, 5)])
+
+    def test_not_applicable(self):
+        channels = make_channels()
+        for expression in ('IP_1000', '3', 'RAW_1000 * 2', 'FFT(IP_1000) * 2'):
+            self.assertIsNone(quiet(evaluate_plan_chunked, compile_expression(expression), make_parser(channels), 1000),
+                              expression)
+        # 结果点数少于 min_points
+        self.assertIsNone(quiet(evaluate_plan_chunked, compile_expression('IP_1000 * 2'), make_parser(channels), 1000,
+                                min_points=20002))
+
+    def test_constant_expression(self):
+        plan = compile_expression('1 + 2 * 4')
+        channels = make_channels()
+        self.assertEqual(quiet(evaluate_plan_chunked, plan, make_parser(channels), 1000),
+                         quiet(evaluate_plan, plan, make_parser(channels)))
+
+    def test_divide_by_zero_constant(self):
+        with self.assertRaises(ValueError):
+            quiet(evaluate_plan_chunked, compile_expression('IP_1000 / 0'), make_parser(make_channels()), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
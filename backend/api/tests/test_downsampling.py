@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+api.downsampling 的测试：与逐点循环的参考实现（原 extrema 实现、教科书 LTTB）逐位一致
+"""
+
+import math
+import unittest
+
+import numpy as np
+
+from api.downsampling import (DOWNSAMPLE_ALGORITHMS, downsample_to_frequency, lttb_downsample, minmax_downsample,
+                              window_extrema_indices)
+
+
+def reference_extrema_downsample(x_values, y_values, target_freq):
+    """ 原 views.downsample_to_frequency（逐窗口循环的特征保留降采样） """
+    if len(x_values) <= target_freq:
+        return x_values, y_values
+    time_span = max(x_values) - min(x_values)
+    n_samples = int(time_span * target_freq)
+    if n_samples >= len(x_values):
+        return x_values, y_values
+    sample_ratio = len(x_values) // n_samples
+    if sample_ratio <= 10:
+        indices = np.linspace(0, len(x_values) - 1, n_samples).astype(int)
+        return x_values[indices], y_values[indices]
+
+    base_indices = np.arange(0, len(x_values), sample_ratio)
+    if len(base_indices) > n_samples:
+        base_indices = base_indices[:n_samples]
+    window_size = max(min(sample_ratio // 2, 20), 2)
+    extrema_indices = []
+    for i in range(window_size, len(y_values) - window_size, window_size):
+        window = y_values[i - window_size:i + window_size]
+        if y_values[i] == max(window) or y_values[i] == min(window):
+            extrema_indices.append(i)
+
+    all_indices = np.unique(np.concatenate([base_indices, extrema_indices]))
+    if len(all_indices) > n_samples:
+        kept_extrema = np.array(extrema_indices)
+        remaining_slots = n_samples - len(kept_extrema)
+        if remaining_slots > 0:
+            candidates = base_indices[np.isin(base_indices, kept_extrema, invert=True)]
+            if len(candidates) > remaining_slots:
+                step = len(candidates) // remaining_slots
+                candidates = candidates[::step][:remaining_slots]
+            final_indices = np.sort(np.concatenate([kept_extrema, candidates]))
+        else:
+            step = len(kept_extrema) // n_samples
+            final_indices = kept_extrema[::step][:n_samples]
+    else:
+        final_indices = all_indices
+        if len(final_indices) < n_samples:
+            mask = np.ones(len(x_values), dtype=bool)
+            mask[final_indices] = False
+            remaining_indices = np.arange(len(x_values))[mask]
+            to_add = n_samples - len(final_indices)
+            if len(remaining_indices) > to_add:
+                step = len(remaining_indices) // to_add
+                extra_indices = remaining_indices[::step][:to_add]
+                final_indices = np.sort(np.concatenate([final_indices, extra_indices]))
+    return x_values[final_indices], y_values[final_indices]
+
+
+def reference_minmax_indices(y_values, n_samples):
+    """ 逐桶循环的 minmax 选点 """
+    n = len(y_values)
+    n_buckets = n_samples // 2
+    bucket_size = n // n_buckets
+    indices = []
+    for b in range(n_buckets):
+        lo = b * bucket_size
+        hi = n if b == n_buckets - 1 else lo + bucket_size
+        i_min = lo + int(np.argmin(y_values[lo:hi]))
+        i_max = lo + int(np.argmax(y_values[lo:hi]))
+        indices += sorted((i_min, i_max))
+    if n_samples % 2:
+        indices.append(n - 1)
+    return np.array(indices)
+
+
+def reference_lttb_indices(x, y, threshold):
+    """ 教科书 LTTB（Steinarsson 2013 参考实现的逐点移植）：三角形顶点为上一个桶选中的点 """
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    sampled = [0]
+    for i in range(threshold - 2):
+        avg_range_start = int(math.floor((i + 1) * every) + 1)
+        avg_range_end = min(int(math.floor((i + 2) * every) + 1), n)
+        avg_x = sum(x[avg_range_start:avg_range_end]) / (avg_range_end - avg_range_start)
+        avg_y = sum(y[avg_range_start:avg_range_end]) / (avg_range_end - avg_range_start)
+
+        range_offs = int(math.floor(i * every) + 1)
+        range_to = int(math.floor((i + 1) * every) + 1)
+        point_ax, point_ay = x[a], y[a]
+        max_area = -1.0
+        for j in range(range_offs, range_to):
+            area = math.fabs((point_ax - avg_x) * (y[j] - point_ay) - (point_ax - x[j]) * (avg_y - point_ay)) * 0.5
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(next_a)
+        a = next_a
+    sampled.append(n - 1)
+    return np.array(sampled)
+
+
+class ExtremaDownsampleTest(unittest.TestCase):
+
+    def test_matches_reference(self):
+        rng = np.random.default_rng(0)
+        for n, target_freq in [(200000, 1000), (50000, 3000), (123457, 777), (300000, 100), (20000, 2500)]:
+            x = np.linspace(-2, 5, n)
+            for y in (rng.standard_normal(n).cumsum(), np.round(rng.standard_normal(n).cumsum())):
+                expected = reference_extrema_downsample(x, y, target_freq)
+                actual = downsample_to_frequency(x, y, target_freq)
+                np.testing.assert_array_equal(actual[0], expected[0])
+                np.testing.assert_array_equal(actual[1], expected[1])
+
+    def test_window_extrema_indices(self):
+        rng = np.random.default_rng(1)
+        y = np.round(rng.standard_normal(5003) * 3)
+        for w in (2, 5, 20):
+            expected = [i for i in range(w, len(y) - w, w)
+                        if y[i] == y[i - w:i + w].max() or y[i] == y[i - w:i + w].min()]
+            np.testing.assert_array_equal(window_extrema_indices(y, w), expected)
+
+    def test_short_input_unchanged(self):
+        x = np.linspace(0, 1, 500)
+        y = np.sin(x)
+        for algo in DOWNSAMPLE_ALGORITHMS:
+            new_x, new_y = downsample_to_frequency(x, y, 1000, algo)
+            self.assertIs(new_x, x)
+            self.assertIs(new_y, y)
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            downsample_to_frequency(np.arange(10.0), np.arange(10.0), 1, 'nope')
+
+
+class MinmaxDownsampleTest(unittest.TestCase):
+
+    def test_matches_reference(self):
+        rng = np.random.default_rng(2)
+        y = rng.standard_normal(10007)
+        x = np.arange(len(y), dtype=np.float64)
+        for n_samples in (2, 3, 100, 101, 999):
+            new_x, new_y = minmax_downsample(x, y, n_samples)
+            expected = reference_minmax_indices(y, n_samples)
+            self.assertEqual(len(new_x), n_samples)
+            np.testing.assert_array_equal(new_x, x[expected])
+            np.testing.assert_array_equal(new_y, y[expected])
+
+    def test_keeps_global_extrema(self):
+        y = np.zeros(10000)
+        y[1234], y[8765] = 5.0, -7.0
+        _, new_y = minmax_downsample(np.arange(10000.0), y, 50)
+        self.assertEqual(new_y.max(), 5.0)
+        self.assertEqual(new_y.min(), -7.0)
+
+
+class LttbDownsampleTest(unittest.TestCase):
+
+    def test_matches_reference(self):
+        rng = np.random.default_rng(3)
+        for n, n_samples in [(1000, 3), (1000, 10), (5003, 200), (20000, 997), (50, 49), (10007, 5000)]:
+            x = np.sort(rng.uniform(0, 10, n))
+            y = rng.standard_normal(n).cumsum()
+            expected = reference_lttb_indices(x, y, n_samples)
+            new_x, new_y = lttb_downsample(x, y, n_samples)
+            np.testing.assert_array_equal(new_x, x[expected])
+            np.testing.assert_array_equal(new_y, y[expected])
+
+    def test_anchor_is_previous_selected_point(self):
+        # 桶为 [1, 4) 和 [4, 7)。第一个桶选中尖峰 1 后，第二个桶以尖峰为顶点、以末点为第三个顶点，
+        # 面积依次为 36、32、22，选中点 4；若以第一个桶的质心 (2, 11/3) 为顶点，面积为 16、17.3、13.7，会选中点 5
+        x = np.arange(8.0)
+        y = np.array([0.0, 10.0, 0.0, 1.0, -1.0, -2.0, -2.0, 0.0])
+        new_x, _ = lttb_downsample(x, y, 4)
+        np.testing.assert_array_equal(new_x, [0.0, 1.0, 4.0, 7.0])
+        np.testing.assert_array_equal(reference_lttb_indices(x, y, 4), [0, 1, 4, 7])
+
+    def test_shape(self):
+        x = np.linspace(0, 1, 100000)
+        y = np.sin(x * 200)
+        new_x, new_y = lttb_downsample(x, y, 1000)
+        self.assertEqual(len(new_x), 1000)
+        self.assertEqual(new_x[0], x[0])
+        self.assertEqual(new_x[-1], x[-1])
+        self.assertTrue(np.all(np.diff(new_x) > 0))
+
+    def test_nan_bucket_still_selects_point(self):
+        x = np.arange(1000.0)
+        y = np.sin(x / 10)
+        y[100:120] = np.nan
+        new_x, _ = lttb_downsample(x, y, 100)
+        self.assertEqual(len(new_x), 100)
+        self.assertTrue(np.all(np.diff(new_x) > 0))
+
+    def test_no_downsampling_needed(self):
+        x = np.arange(10.0)
+        new_x, _ = lttb_downsample(x, x, 10)
+        self.assertIs(new_x, x)
+
+
+if __name__ == '__main__':
+    unittest.main()
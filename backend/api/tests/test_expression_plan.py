@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+api.expression_plan 的测试：计划 DAG 求值与 ExpressionParser 逐词解析求值结果一致，共享子表达式只计算一次
+"""
+
+import contextlib
+import io
+import os
+import unittest
+
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from api.expression_parser import ExpressionParser  # noqa: E402
+from api.expression_plan import (compile_expression, evaluate_plan, expand_template, plan_cache_stats,  # noqa: E402
+                                 required_channel_keys, tokenize)
+from api.signal_cache import DerivedResultCache  # noqa: E402
+
+
+def make_channels():
+    rng = np.random.default_rng(1)
+    x = np.linspace(0.0, 1.0, 4001)
+    return {
+        'IP_1000': {'X_axis': {'t0': 0.0, 'dt': 0.00025, 'n': 4001}, 'Y_value': rng.standard_normal(4001)},
+        'MP01_1000': {'X_axis': {'t0': 0.1, 'dt': 0.001, 'n': 801}, 'Y_value': rng.standard_normal(801)},
+        'FLAG_1000': {'X_axis': {'t0': 0.0, 'dt': 0.00025, 'n': 4001}, 'Y_value': (rng.random(4001) > 0.5) * 1.0},
+        'RAW_1000': {'X_value': x + rng.random(4001) * 1e-5, 'Y_value': np.cos(x * 40)},
+    }
+
+
+class CountingParser(ExpressionParser):
+    """ 记录每种运算的执行次数 """
+
+    def __init__(self, channels, **kwargs):
+        self.fetches = []
+        self.operations = []
+
+        def get_channel(key):
+            self.fetches.append(key)
+            return dict(channels[key])
+        super().__init__(get_channel, **kwargs)
+
+    def add_operands(self, left, right):
+        self.operations.append('+')
+        return super().add_operands(left, right)
+
+    def multiply_operands(self, left, right):
+        self.operations.append('*')
+        return super().multiply_operands(left, right)
+
+    def call_builtin_function(self, function_name, args):
+        self.operations.append(function_name)
+        return super().call_builtin_function(function_name, args)
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def token_evaluate(parser, expression):
+    """ 原有的逐词解析求值 """
+    parser.tokenize(expression)
+    parser.current = 0
+    return parser.expression()
+
+
+def assert_result_equal(test, actual, expected):
+    test.assertEqual(set(actual), set(expected))
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray) or isinstance(actual[key], np.ndarray):
+            np.testing.assert_array_equal(actual[key], value, err_msg=key)
+        else:
+            test.assertEqual(actual[key], value, key)
+
+
+EXPRESSIONS = [
+    'IP_1000 + MP01_1000',
+    'IP_1000 * 2 - MP01_1000 / 4',
+    '(IP_1000 + MP01_1000) * (IP_1000 + MP01_1000)',
+    'FLAG_1000 & !IP_1000 | MP01_1000',
+    'RAW_1000 - IP_1000',
+    '2 * 3 + 1',
+    'FFT(IP_1000 + MP01_1000)',
+    'Welch(IP_1000, 256)',
+    'IP_1000 / 0.5',
+]
+
+
+class EvaluatePlanTest(unittest.TestCase):
+
+    def test_matches_token_evaluation(self):
+        channels = make_channels()
+        for align in ('coarsest', 'finest', 'truncate'):
+            for expression in EXPRESSIONS:
+                plan = compile_expression(expression)
+                self.assertIsNotNone(plan, expression)
+                expected = quiet(token_evaluate, CountingParser(channels, align_mode=align), expression)
+                actual = quiet(evaluate_plan, plan, CountingParser(channels, align_mode=align))
+                with self.subTest(expression=expression, align=align):
+                    assert_result_equal(self, actual, expected)
+
+    def test_errors_match_token_evaluation(self):
+        channels = make_channels()
+        for expression in ('IP_1000 / 0', 'IP_1000 + NOPE_1000'):
+            with self.assertRaises(ValueError) as expected:
+                quiet(token_evaluate, CountingParser(channels), expression)
+            with self.assertRaises(ValueError) as actual:
+                quiet(evaluate_plan, compile_expression(expression), CountingParser(channels))
+            self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_shared_subexpression_evaluated_once(self):
+        channels = make_channels()
+        expression = 'FFT(IP_1000 + MP01_1000) * FFT(IP_1000 + MP01_1000) + (IP_1000 + MP01_1000)'
+        parser = CountingParser(channels)
+        quiet(token_evaluate, parser, expression)
+        self.assertEqual(parser.operations.count('FFT'), 2)
+        self.assertEqual(parser.operations.count('+'), 4)
+
+        parser = CountingParser(channels)
+        plan = compile_expression(expression)
+        quiet(evaluate_plan, plan, parser)
+        self.assertEqual(parser.operations, ['+', 'FFT', '*', '+'])
+        self.assertEqual(sorted(parser.fetches), ['IP_1000', 'MP01_1000'])
+
+    def test_release_once_per_node(self):
+        channels = make_channels()
+        plan = compile_expression('(IP_1000 + MP01_1000) * (IP_1000 + MP01_1000) + IP_1000 * 3')
+        released = []
+        result = quiet(evaluate_plan, plan, CountingParser(channels),
+                       on_release=lambda node, value: released.append(node.key))
+        self.assertEqual(sorted(released), sorted(node.key for node in plan.nodes))
+        # 根节点最后释放，返回值是新字典
+        self.assertEqual(released[-1], plan.root.key)
+        self.assertIn('Y_value', result)
+
+    def test_result_cache(self):
+        channels = make_channels()
+        cache = DerivedResultCache()
+        context = (1000, 'full')
+        plan = compile_expression('(IP_1000 + MP01_1000) * 2')
+        first = quiet(evaluate_plan, plan, CountingParser(channels), cache, context)
+        self.assertEqual(required_channel_keys(plan, cache, context), [])
+
+        parser = CountingParser(channels)
+        second = quiet(evaluate_plan, plan, parser, cache, context)
+        assert_result_equal(self, second, first)
+        self.assertEqual((parser.operations, parser.fetches), ([], []))
+
+        # 只有未变化的子树命中缓存
+        other = compile_expression('(IP_1000 + MP01_1000) * FLAG_1000')
+        self.assertEqual(required_channel_keys(other, cache, context), ['FLAG_1000'])
+        self.assertEqual(required_channel_keys(other, cache, (1001, 'full')), ['IP_1000', 'MP01_1000', 'FLAG_1000'])
+
+
+class CompileExpressionTest(unittest.TestCase):
+
+    def test_hash_consing_and_cache(self):
+        plan = compile_expression('IP_1000+MP01_1000 + ( IP_1000 + MP01_1000 )')
+        self.assertEqual(plan.root.key, '((IP_1000+MP01_1000)+(IP_1000+MP01_1000))')
+        self.assertIs(plan.root.args[0], plan.root.args[1])
+        self.assertEqual(plan.channel_keys, ('IP_1000', 'MP01_1000'))
+        hits = plan_cache_stats()['hits']
+        self.assertIs(compile_expression('IP_1000 + MP01_1000 + (IP_1000 + MP01_1000)'), plan)
+        self.assertEqual(plan_cache_stats()['hits'], hits + 1)
+
+    def test_unsupported(self):
+        for expression in ('[Python]algo(IP_1000)', 'algo(IP_1000)', 'IP_1000 +', '(IP_1000', 'IP'):
+            self.assertIsNone(compile_expression(expression), expression)
+
+    def test_tokenize_and_template(self):
+        self.assertEqual(tokenize('[Python]f(IP_1, 2.5)&!x'),
+                         ['[Python]', 'f', '(', 'IP_1', ',', '2.5', ')', '&', '!', 'x'])
+        self.assertEqual(expand_template('IP_{shot} - MP01_{shot}', 7), 'IP_7 - MP01_7')
+        self.assertEqual(expand_template('FFT(IP) - MP01 + IP_999 * 2', 7), 'FFT ( IP_7 ) - MP01_7 + IP_999 * 2')
+
+
+if __name__ == '__main__':
+    unittest.main()
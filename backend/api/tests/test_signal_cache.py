@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+api.signal_cache 的测试：多个进程共用同一缓存目录时，容量上限针对整个目录生效
+"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from api.signal_cache import SignalCache
+
+ENTRY_POINTS = 1000
+ENTRY_BYTES = 2 * ENTRY_POINTS * 8
+
+
+def disk_bytes(cache_dir):
+    total = 0
+    for root, _, files in os.walk(cache_dir):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith('.npy'))
+    return total
+
+
+class SharedDirectoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.max_bytes = 4 * ENTRY_BYTES
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def put(self, cache, shot):
+        x = np.arange(ENTRY_POINTS, dtype=np.float64)
+        self.assertTrue(cache.put(('exl50u', shot, 'IP'), x, x * 2, 'kA'))
+
+    def test_limit_holds_across_instances(self):
+        # 两个实例模拟两个工作进程，各自的内存统计都不会单独超限
+        caches = [SignalCache(self.cache_dir, self.max_bytes) for _ in range(2)]
+        for shot in range(12):
+            self.put(caches[shot % 2], shot)
+            # .npy 文件带有文件头，按条目数判断
+            self.assertLessEqual(disk_bytes(self.cache_dir), 4 * (ENTRY_BYTES + 256))
+        remaining = sorted(int(name) for name in os.listdir(os.path.join(self.cache_dir, 'exl50u'))
+                           if os.listdir(os.path.join(self.cache_dir, 'exl50u', name)))
+        self.assertEqual(remaining, [8, 9, 10, 11])
+
+    def test_recently_read_entry_survives_other_process_writes(self):
+        first, second = SignalCache(self.cache_dir, self.max_bytes), SignalCache(self.cache_dir, self.max_bytes)
+        for shot in range(4):
+            self.put(first, shot)
+        time.sleep(0.01)
+        self.assertIsNotNone(first.get(('exl50u', 0, 'IP')))
+        self.put(second, 4)
+        self.assertIsNotNone(second.get(('exl50u', 0, 'IP')))
+        self.assertFalse(first.contains(('exl50u', 1, 'IP')))
+
+    def test_entry_written_by_other_instance_is_a_hit(self):
+        first, second = SignalCache(self.cache_dir, self.max_bytes), SignalCache(self.cache_dir, self.max_bytes)
+        second.stats()  # 先建立空索引
+        self.put(first, 1)
+        result = second.get(('exl50u', 1, 'IP'))
+        self.assertIsNotNone(result)
+        np.testing.assert_array_equal(result[1], np.arange(ENTRY_POINTS) * 2.0)
+        self.assertEqual(second.stats()['hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+api.signal_pyramid 的测试：由金字塔得到的绘制下标与直接在原始数据上逐桶计算 min/max 的结果一致
+"""
+
+import unittest
+
+import numpy as np
+
+from api.signal_pyramid import PYRAMID_FACTOR, build_pyramid, view_indices
+
+
+def reference_view(data_y, bucket, start, stop, pixel_width):
+    """ 在原始数据上按桶（截取到区间内）求最小值、最大值下标，再按像素列合并，与金字塔查询的分组方式相同 """
+    edges = list(range(start // bucket * bucket, stop, bucket)) + [stop]
+    edges[0] = start
+    mins, maxs, min_idx, max_idx = [], [], [], []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        values = data_y[lo:hi]
+        min_idx.append(lo + int(np.argmin(values)))
+        max_idx.append(lo + int(np.argmax(values)))
+        mins.append(values.min())
+        maxs.append(values.max())
+    group = max(1, -(-len(mins) // pixel_width))
+    indices = {start, stop - 1}
+    for g in range(0, len(mins), group):
+        indices.add(min_idx[g + int(np.argmin(mins[g:g + group]))])
+        indices.add(max_idx[g + int(np.argmax(maxs[g:g + group]))])
+    return np.array(sorted(indices))
+
+
+class ViewIndicesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(5)
+        cls.data_y = rng.standard_normal(300000).cumsum()
+        cls.pyramid, cls.levels = build_pyramid(cls.data_y)
+
+    def test_matches_raw_buckets(self):
+        rng = np.random.default_rng(6)
+        windows = [(0, len(self.data_y)), (8 * 64, 8 * 64 * 40), (12345, 298765), (1, len(self.data_y) - 1)]
+        windows += [tuple(sorted(rng.integers(0, len(self.data_y), 2))) for _ in range(30)]
+        for start, stop in windows:
+            for pixel_width in (100, 800):
+                indices, level = view_indices(self.data_y, self.pyramid, self.levels, start, stop, pixel_width)
+                if level is None:
+                    continue
+                with self.subTest(start=start, stop=stop, pixel_width=pixel_width, bucket=level['bucket']):
+                    np.testing.assert_array_equal(
+                        indices, reference_view(self.data_y, level['bucket'], start, stop, pixel_width))
+
+    def test_peak_just_inside_unaligned_boundaries(self):
+        data_y = np.zeros(100000)
+        # 尖峰在区间内（不是始终保留的首尾点），与区间外的更大尖峰位于同一个边界桶中
+        start, stop = 1000 * PYRAMID_FACTOR + 3, 7000 * PYRAMID_FACTOR + 5
+        data_y[start - 1] = 100.0
+        data_y[start + 1] = 5.0
+        data_y[stop - 2] = -5.0
+        data_y[stop] = -100.0
+        pyramid, levels = build_pyramid(data_y)
+        indices, level = view_indices(data_y, pyramid, levels, start, stop, 200)
+        self.assertIsNotNone(level)
+        self.assertGreater(level['bucket'], 3)
+        self.assertTrue(np.all((indices >= start) & (indices < stop)))
+        self.assertEqual(data_y[indices].max(), 5.0)
+        self.assertEqual(data_y[indices].min(), -5.0)
+
+    def test_short_window_uses_raw_data(self):
+        indices, level = view_indices(self.data_y, self.pyramid, self.levels, 100, 300, 800)
+        self.assertIsNone(level)
+        np.testing.assert_array_equal(indices, np.arange(100, 300))
+
+
+if __name__ == '__main__':
+    unittest.main()
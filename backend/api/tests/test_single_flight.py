@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+api.single_flight 的测试：并发的相同请求只执行一次，结果与逐个执行一致
+"""
+
+import threading
+import unittest
+
+from api.single_flight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def run_concurrently(self, flight, key, fn, count):
+        results = [None] * count
+        errors = [None] * count
+
+        def worker(i):
+            try:
+                results[i] = flight.do(key, fn)
+            except Exception as e:
+                errors[i] = e
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results, errors
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'Y_value': [1, 2, 3]}
+
+        leader, leader_results, _ = self.run_concurrently(flight, 'k', compute, 1)
+        self.assertTrue(started.wait(5))
+        threads, results, errors = self.run_concurrently(flight, 'k', compute, 8)
+        # 等待所有跟随者进入等待状态
+        while flight.stats()['coalesced'] < 8:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in leader + threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(errors, [None] * 8)
+        result, shared = leader_results[0]
+        self.assertFalse(shared)
+        for other, other_shared in results:
+            self.assertIs(other, result)
+            self.assertTrue(other_shared)
+        stats = flight.stats()
+        self.assertEqual((stats['executed'], stats['coalesced'], stats['in_flight']), (1, 8, 0))
+        self.assertAlmostEqual(stats['coalesced_rate'], 8 / 9)
+
+    def test_sequential_calls_are_not_cached(self):
+        flight = SingleFlight()
+        counter = iter(range(10))
+        self.assertEqual(flight.do('k', lambda: next(counter)), (0, False))
+        self.assertEqual(flight.do('k', lambda: next(counter)), (1, False))
+        self.assertEqual(flight.do('other', lambda: next(counter)), (2, False))
+        self.assertEqual(flight.stats()['executed'], 3)
+
+    def test_error_is_shared_and_key_removed(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise KeyError('missing')
+
+        leader, _, leader_errors = self.run_concurrently(flight, 'k', fail, 1)
+        self.assertTrue(started.wait(5))
+        threads, _, errors = self.run_concurrently(flight, 'k', fail, 3)
+        while flight.stats()['coalesced'] < 3:
+            threading.Event().wait(0.001)
+        release.set()
+        for thread in leader + threads:
+            thread.join(5)
+
+        self.assertIsInstance(leader_errors[0], KeyError)
+        for error in errors:
+            self.assertIs(error, leader_errors[0])
+        self.assertEqual(flight.stats()['in_flight'], 0)
+        self.assertEqual(flight.do('k', lambda: 'ok'), ('ok', False))
+
+
+if __name__ == '__main__':
+    unittest.main()
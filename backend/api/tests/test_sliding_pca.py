@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+api.sliding_pca 的测试：分批与不分批的结果都与原实现（逐个窗口构建窗口矩阵后用 sklearn PCA）一致
+"""
+
+import unittest
+
+import numpy as np
+
+from api import sliding_pca
+from api.sliding_pca import sliding_window_pca, window_count
+
+
+def reference_pca(values, n_components, window_size, stride=1):
+    """ 原实现: 逐个窗口复制出完整的窗口矩阵，再用 sklearn 的 PCA 计算 """
+    from sklearn.decomposition import PCA
+    n_windows = (len(values) - window_size) // stride + 1
+    window_data = np.zeros((n_windows, window_size))
+    for i in range(n_windows):
+        window_data[i] = values[i * stride:i * stride + window_size]
+    pca = PCA(n_components=min(n_components, window_size))
+    principal_components = pca.fit_transform(window_data)
+    return principal_components[:, 0], pca.explained_variance_ratio_
+
+
+def make_signal(n=6000, offset=0.0):
+    rng = np.random.default_rng(3)
+    t = np.arange(n) / 1000.0
+    return offset + np.sin(2 * np.pi * 13 * t) + 0.3 * np.sin(2 * np.pi * 91 * t) + 0.05 * rng.standard_normal(n)
+
+
+@unittest.skipIf(sliding_pca.PCA is None, "需要 scikit-learn")
+class SlidingPcaTest(unittest.TestCase):
+
+    def test_unbatched_matches_reference(self):
+        values = make_signal()
+        for window_size, stride in ((50, 1), (64, 7)):
+            expected, expected_ratio = reference_pca(values, 3, window_size, stride)
+            actual, ratio, batched = sliding_window_pca(values, 3, window_size, stride)
+            self.assertFalse(batched)
+            np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+            np.testing.assert_allclose(ratio, expected_ratio, rtol=1e-9)
+
+    def test_batched_matches_reference(self):
+        for offset in (0.0, 1e4):
+            values = make_signal(offset=offset)
+            for window_size, stride in ((50, 1), (64, 7), (30, 200)):
+                expected, expected_ratio = reference_pca(values, 2, window_size, stride)
+                batches = []
+                actual, ratio, batched = sliding_window_pca(values, 2, window_size, stride, batch_bytes=window_size * 8 * 7,
+                                                            on_batch=lambda: batches.append(1))
+                with self.subTest(offset=offset, window_size=window_size, stride=stride):
+                    self.assertTrue(batched)
+                    self.assertEqual(len(actual), window_count(len(values), window_size, stride))
+                    # 每批累加一次协方差、投影一次
+                    self.assertEqual(len(batches), 2 * -(-len(actual) // 7))
+                    scale = np.max(np.abs(expected))
+                    np.testing.assert_allclose(actual, expected, rtol=0, atol=scale * 1e-7)
+                    np.testing.assert_allclose(ratio, expected_ratio, rtol=1e-6, atol=1e-9)
+
+    def test_invalid_parameters(self):
+        values = make_signal(200)
+        for args in ((2, 300, 1), (2, 10, 0), (2, 0, 1), (0, 10, 1), (50, 100, 60)):
+            with self.assertRaises(ValueError, msg=str(args)):
+                sliding_window_pca(values, *args)
+
+    def test_window_count(self):
+        self.assertEqual(window_count(10, 11), 0)
+        self.assertEqual(window_count(10, 10), 1)
+        self.assertEqual(window_count(10, 3, 2), 4)
+        self.assertEqual(len(sliding_pca.sliding_windows(np.arange(10), 3, 2)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+api.spectral 的测试：幅度谱与原 np.fft.fft 实现一致，Welch / STFT 与 scipy.signal 直接计算一致
+"""
+
+import unittest
+
+import numpy as np
+from scipy import signal as sp_signal
+
+from api.spectral import amplitude_spectrum, fast_length, stft_spectrogram, welch_spectrum
+
+
+def reference_amplitude_spectrum(data_y, dt):
+    """ 原实现: 双边 np.fft.fft 取非负频率部分，除直流（和偶数长度时的 Nyquist）外乘以2 """
+    N = len(data_y)
+    amplitude_double_sided = np.abs(np.fft.fft(data_y))
+    freq_double_sided = np.fft.fftfreq(N, d=dt)
+    if N % 2 == 0:
+        n_positive = N // 2 + 1
+        freq = freq_double_sided[:n_positive]
+        amplitude = amplitude_double_sided[:n_positive].copy()
+        amplitude[1:-1] = amplitude[1:-1] * 2
+    else:
+        n_positive = (N + 1) // 2
+        freq = freq_double_sided[:n_positive]
+        amplitude = amplitude_double_sided[:n_positive].copy()
+        amplitude[1:] = amplitude[1:] * 2
+    # fftfreq 的最后一个非负频率在偶数长度时为 -fs/2，取其绝对值
+    return np.abs(freq), amplitude
+
+
+def make_signal(n, dt=1e-4):
+    rng = np.random.default_rng(4)
+    t = np.arange(n) * dt
+    return np.sin(2 * np.pi * 500 * t) + 0.5 * np.cos(2 * np.pi * 1700 * t) + 0.1 * rng.standard_normal(n)
+
+
+class AmplitudeSpectrumTest(unittest.TestCase):
+
+    def test_matches_reference_for_fast_lengths(self):
+        for n in (1000, 1024, 1125, 3):
+            self.assertEqual(fast_length(n), n)
+            values = make_signal(n)
+            freq, amplitude = amplitude_spectrum(values, 1e-4)
+            expected_freq, expected_amplitude = reference_amplitude_spectrum(values, 1e-4)
+            np.testing.assert_allclose(freq, expected_freq, rtol=1e-12)
+            np.testing.assert_allclose(amplitude, expected_amplitude, rtol=1e-9, atol=1e-9)
+
+    def test_zero_padded_to_fast_length(self):
+        for n in (1009, 9973, 10007):
+            n_fft = fast_length(n)
+            self.assertGreater(n_fft, n)
+            values = make_signal(n)
+            freq, amplitude = amplitude_spectrum(values, 1e-4)
+            padded = np.concatenate([values, np.zeros(n_fft - n)])
+            expected_freq, expected_amplitude = reference_amplitude_spectrum(padded, 1e-4)
+            np.testing.assert_allclose(freq, expected_freq, rtol=1e-12)
+            np.testing.assert_allclose(amplitude, expected_amplitude, rtol=1e-9, atol=1e-9)
+
+    def test_max_freq_cut(self):
+        values = make_signal(1000)
+        freq, amplitude = amplitude_spectrum(values, 1e-4)
+        for max_freq in (1000.0, 1010.0, 4999.0, 5000.0, 1e9):
+            cut_freq, cut_amplitude = amplitude_spectrum(values, 1e-4, max_freq)
+            n_bins = np.count_nonzero(freq <= max_freq)
+            np.testing.assert_array_equal(cut_freq, freq[:n_bins])
+            np.testing.assert_array_equal(cut_amplitude, amplitude[:n_bins])
+
+    def test_short_input(self):
+        for values in ([], [1.0]):
+            freq, amplitude = amplitude_spectrum(values, 1e-4)
+            self.assertEqual((len(freq), len(amplitude)), (0, 0))
+
+
+class SegmentSpectrumTest(unittest.TestCase):
+
+    def test_welch_matches_scipy(self):
+        values = make_signal(20000)
+        freq, psd = welch_spectrum(values, 1e-4, 256, 0.5)
+        expected_freq, expected_psd = sp_signal.welch(values, fs=1e4, window='hann', nperseg=256, noverlap=128)
+        np.testing.assert_allclose(freq, expected_freq)
+        np.testing.assert_allclose(psd, expected_psd, rtol=1e-9)
+
+        cut_freq, cut_psd = welch_spectrum(values, 1e-4, 256, 0.5, max_freq=2000)
+        np.testing.assert_array_equal(cut_freq, freq[freq <= 2000])
+        np.testing.assert_array_equal(cut_psd, psd[freq <= 2000])
+
+    def test_stft_matches_scipy(self):
+        values = make_signal(20000)
+        times, freq, magnitude = stft_spectrogram(values, 1e-4, 500, 0.25)
+        expected_freq, expected_times, expected = sp_signal.spectrogram(
+            values, fs=1e4, window='hann', nperseg=500, noverlap=125, scaling='spectrum', mode='magnitude')
+        self.assertEqual(fast_length(500), 500)
+        np.testing.assert_allclose(times, expected_times)
+        np.testing.assert_allclose(freq, expected_freq)
+        np.testing.assert_allclose(magnitude, expected, rtol=1e-9, atol=1e-12)
+
+        _, cut_freq, cut_magnitude = stft_spectrogram(values, 1e-4, 500, 0.25, max_freq=1000)
+        np.testing.assert_array_equal(cut_magnitude, magnitude[freq <= 1000])
+        self.assertEqual(len(cut_freq), cut_magnitude.shape[0])
+
+    def test_invalid_segments(self):
+        values = make_signal(100)
+        for segment_length, overlap in ((1, 0.5), (256, 0.5), (64, 1.0), (64, -0.1)):
+            with self.assertRaises(ValueError):
+                welch_spectrum(values, 1e-4, segment_length, overlap)
+            with self.assertRaises(ValueError):
+                stft_spectrogram(values, 1e-4, segment_length, overlap)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+api.time_axis 的测试：隐式时间轴与显式 X_value 等价，对齐结果与对显式时间数组做 np.interp 一致
+"""
+
+import unittest
+
+import numpy as np
+
+from api import time_axis
+
+
+def implicit(t0, dt, n, values=None):
+    channel = {'X_axis': {'t0': t0, 'dt': dt, 'n': n}}
+    if values is not None:
+        channel['Y_value'] = values
+    return channel
+
+
+def explicit(channel):
+    """ 与隐式通道等价的显式通道 """
+    return {'X_value': time_axis.expand_axis(channel['X_axis']), 'Y_value': channel.get('Y_value')}
+
+
+class UniformAxisTest(unittest.TestCase):
+
+    def test_detect_and_expand(self):
+        x = np.linspace(-2.0, 5.0, 70001)
+        axis = time_axis.detect_uniform_axis(x)
+        self.assertEqual(axis['n'], len(x))
+        self.assertEqual(axis['t0'], -2.0)
+        np.testing.assert_allclose(time_axis.expand_axis(axis), x, rtol=0, atol=axis['dt'] * 1e-6)
+
+    def test_non_uniform(self):
+        x = np.linspace(0.0, 1.0, 1001)
+        x[500] += (x[1] - x[0]) * 0.01
+        self.assertIsNone(time_axis.detect_uniform_axis(x))
+        self.assertIsNone(time_axis.detect_uniform_axis(np.array([1.0])))
+        self.assertIsNone(time_axis.detect_uniform_axis(np.array([1.0, 1.0, 1.0])))
+
+    def test_non_uniform_after_first_check_chunk(self):
+        n = time_axis._CHECK_CHUNK + 1000
+        x = np.arange(n, dtype=np.float64) * 1e-3
+        x[n - 500] += 1e-5
+        self.assertIsNone(time_axis.detect_uniform_axis(x))
+
+    def test_encode_decode_round_trip(self):
+        x = np.linspace(0.0, 2.0, 2001)
+        channel = {'X_value': x, 'Y_value': np.sin(x)}
+        self.assertTrue(time_axis.encode_x(channel))
+        self.assertNotIn('X_value', channel)
+        self.assertTrue(time_axis.is_implicit(channel))
+        self.assertEqual(time_axis.channel_length(channel), len(x))
+        self.assertAlmostEqual(time_axis.x_value_at(channel, 1000), x[1000])
+        time_axis.decode_x(channel)
+        np.testing.assert_allclose(channel['X_value'], x, rtol=0, atol=1e-12)
+
+        irregular = {'X_value': np.array([0.0, 0.1, 0.3]), 'Y_value': np.zeros(3)}
+        self.assertFalse(time_axis.encode_x(irregular))
+        self.assertIn('X_value', irregular)
+
+    def test_channel_helpers_match_explicit(self):
+        channel = implicit(0.5, 0.01, 300)
+        reference = explicit(channel)
+        self.assertEqual(time_axis.channel_length(channel), time_axis.channel_length(reference))
+        self.assertAlmostEqual(time_axis.channel_dt(channel), time_axis.channel_dt(reference))
+        self.assertEqual(time_axis.channel_span(channel), time_axis.channel_span(reference))
+        self.assertEqual(time_axis.truncate_x(channel, 10)['X_axis']['n'], 10)
+        np.testing.assert_array_equal(time_axis.truncate_x(reference, 10)['X_value'], reference['X_value'][:10])
+
+
+class AlignTest(unittest.TestCase):
+
+    def test_same_grid_truncates_without_copy(self):
+        left = implicit(0.0, 0.001, 1000, np.arange(1000.0))
+        right = implicit(0.0, 0.001, 800, np.arange(800.0) * 2)
+        fields, a, b = time_axis.align_pair(left, left['Y_value'], right, right['Y_value'])
+        self.assertEqual(fields, {'X_axis': {'t0': 0.0, 'dt': 0.001, 'n': 800}})
+        self.assertTrue(np.shares_memory(a, left['Y_value']))
+        np.testing.assert_array_equal(a, left['Y_value'][:800])
+        np.testing.assert_array_equal(b, right['Y_value'])
+
+    def test_resample_implicit_matches_interp(self):
+        rng = np.random.default_rng(0)
+        channel = implicit(-1.0, 0.002, 5000, rng.standard_normal(5000))
+        axis = {'t0': -0.5, 'dt': 0.0037, 'n': 2000}
+        grid = time_axis.expand_axis(axis)
+        expected = np.interp(grid, time_axis.expand_axis(channel['X_axis']), channel['Y_value'])
+        np.testing.assert_allclose(time_axis.resample_values(channel, channel['Y_value'], axis), expected,
+                                   rtol=1e-12, atol=1e-12)
+        reference = explicit(channel)
+        np.testing.assert_array_equal(time_axis.resample_values(reference, reference['Y_value'], axis), expected)
+
+    def test_mixed_rates(self):
+        fast = implicit(0.0, 0.001, 2001, np.sin(np.arange(2001) * 0.01))
+        slow = implicit(0.5, 0.004, 501, np.cos(np.arange(501) * 0.04))
+        for mode, dt in (('coarsest', 0.004), ('finest', 0.001)):
+            fields, a, b = time_axis.align_pair(fast, fast['Y_value'], slow, slow['Y_value'], mode)
+            axis = fields['X_axis']
+            self.assertEqual(axis['t0'], 0.5)
+            self.assertEqual(axis['dt'], dt)
+            self.assertAlmostEqual(time_axis.x_value_at(fields, axis['n'] - 1), 2.0)
+            grid = time_axis.expand_axis(axis)
+            np.testing.assert_allclose(a, np.interp(grid, time_axis.expand_axis(fast['X_axis']), fast['Y_value']),
+                                       atol=1e-12)
+            np.testing.assert_allclose(b, np.interp(grid, time_axis.expand_axis(slow['X_axis']), slow['Y_value']),
+                                       atol=1e-12)
+
+        # 左操作数为显式时间轴时结果也为显式
+        fields, _, _ = time_axis.align_pair(explicit(fast), fast['Y_value'], slow, slow['Y_value'])
+        self.assertIn('X_value', fields)
+
+    def test_explicit_dt_and_truncate(self):
+        fast = implicit(0.0, 0.001, 2001, np.arange(2001.0))
+        slow = implicit(0.5, 0.004, 501, np.arange(501.0))
+        fields, a, _ = time_axis.align_pair(fast, fast['Y_value'], slow, slow['Y_value'], 'coarsest', 0.01)
+        self.assertEqual(fields['X_axis']['dt'], 0.01)
+        self.assertEqual(len(a), fields['X_axis']['n'])
+        fields, a, b = time_axis.align_pair(fast, fast['Y_value'], slow, slow['Y_value'], 'truncate')
+        self.assertEqual(len(a), 501)
+        self.assertEqual(len(b), 501)
+
+    def test_no_overlap(self):
+        left = implicit(0.0, 0.001, 100, np.zeros(100))
+        right = implicit(1.0, 0.001, 100, np.zeros(100))
+        with self.assertRaises(ValueError):
+            time_axis.align_pair(left, left['Y_value'], right, right['Y_value'])
+
+    def test_parse_align(self):
+        self.assertEqual(time_axis.parse_align(), ('coarsest', None))
+        self.assertEqual(time_axis.parse_align('finest', '0.5'), ('finest', 0.5))
+        for mode, dt in (('nope', None), ('coarsest', 'abc'), ('coarsest', 0), ('coarsest', float('inf'))):
+            with self.assertRaises(ValueError):
+                time_axis.parse_align(mode, dt)
+
+
+if __name__ == '__main__':
+    unittest.main()
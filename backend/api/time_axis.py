@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+均匀时间轴的隐式表示
+
+MDSplus 中绝大多数通道是等间隔采样的，完整的 X_value 数组与 Y_value 等长，
+传输和内存占用都翻倍。对于等间隔采样的通道，可以只用 {t0, dt, n} 三个数描述时间轴:
+    X[i] = t0 + i * dt,  i = 0 .. n-1
+
+通道数据字典中隐式时间轴放在 'X_axis' 字段，此时不含 'X_value'；
+非均匀采样的通道仍然返回显式 X_value。
+
+多通道运算时两个操作数的时间轴可能不同（采样率、起止时间不同），align_pair 将两者
+对齐到同一时间轴:
+    coarsest  在重叠时间区间上以两者中较大的采样间隔建立均匀网格（默认）
+    finest    以较小的采样间隔建立均匀网格
+    truncate  按下标对齐并截断到较短的通道（不插值，仅适用于时间轴相同的通道）
+也可以用 align_dt 显式指定网格的采样间隔。两个时间轴本就相同时直接截断，不做插值。
+"""
+
+import numpy as np
+
+# 判定为均匀采样时允许的最大偏差（相对于采样间隔 dt 的比例）
+UNIFORM_TOLERANCE = 1e-3
+
+# 分块检查，避免对超长信号一次性生成同等长度的临时数组
+_CHECK_CHUNK = 1 << 20
+
+ALIGN_MODES = ('coarsest', 'finest', 'truncate')
+DEFAULT_ALIGN_MODE = 'coarsest'
+
+
+def detect_uniform_axis(x_values, tolerance=UNIFORM_TOLERANCE):
+    """
+    检测时间轴是否为均匀采样
+    若每个点与理想网格 t0 + i*dt 的偏差都不超过 tolerance*dt，返回 {'t0', 'dt', 'n'}，否则返回 None
+    """
+    x = np.asarray(x_values)
+    n = int(x.size)
+    if x.ndim != 1 or n < 2:
+        return None
+    t0 = float(x[0])
+    dt = (float(x[-1]) - t0) / (n - 1)
+    if not np.isfinite(dt) or dt <= 0:
+        return None
+    limit = abs(dt) * tolerance
+    for start in range(0, n, _CHECK_CHUNK):
+        chunk = np.asarray(x[start:start + _CHECK_CHUNK], dtype=np.float64)
+        ideal = t0 + dt * np.arange(start, start + chunk.size, dtype=np.float64)
+        if np.max(np.abs(chunk - ideal)) > limit:
+            return None
+    return {'t0': t0, 'dt': dt, 'n': n}
+
+
+def expand_axis(axis):
+    """ 将 {'t0', 'dt', 'n'} 展开为显式时间数组 """
+    n = int(axis['n'])
+    return float(axis['t0']) + float(axis['dt']) * np.arange(n, dtype=np.float64)
+
+
+def is_implicit(channel_data):
+    """ 判断通道数据是否使用隐式时间轴 """
+    return isinstance(channel_data, dict) and isinstance(channel_data.get('X_axis'), dict) \
+        and 'X_value' not in channel_data
+
+
+def channel_length(channel_data):
+    """ 返回通道时间轴长度，不展开隐式时间轴 """
+    if is_implicit(channel_data):
+        return int(channel_data['X_axis']['n'])
+    return len(channel_data.get('X_value', []))
+
+
+def channel_dt(channel_data):
+    """ 返回通道的平均采样间隔，隐式时间轴直接读取 dt """
+    if is_implicit(channel_data):
+        return float(channel_data['X_axis']['dt'])
+    x = channel_data.get('X_value', [])
+    if len(x) < 2:
+        return None
+    return (float(x[-1]) - float(x[0])) / (len(x) - 1)
+
+
+def channel_x_values(channel_data):
+    """ 返回通道的显式时间数组，隐式时间轴按需展开 """
+    if is_implicit(channel_data):
+        return expand_axis(channel_data['X_axis'])
+    return channel_data.get('X_value', [])
+
+
+def x_value_at(channel_data, index):
+    """ 返回第 index 个时间点，不展开隐式时间轴 """
+    if is_implicit(channel_data):
+        axis = channel_data['X_axis']
+        return float(axis['t0']) + float(axis['dt']) * index
+    return channel_data['X_value'][index]
+
+
+def truncate_x(channel_data, length):
+    """ 返回截断到前 length 个点的时间轴字段 {'X_axis': ...} 或 {'X_value': ...} """
+    if is_implicit(channel_data):
+        axis = dict(channel_data['X_axis'])
+        axis['n'] = min(int(axis['n']), int(length))
+        return {'X_axis': axis}
+    return {'X_value': channel_data['X_value'][:length]}
+
+
+def encode_x(channel_data, tolerance=UNIFORM_TOLERANCE):
+    """
+    原地将通道数据的 X_value 替换为隐式时间轴 X_axis
+    非均匀采样时保持不变；返回是否进行了替换
+    """
+    if 'X_value' not in channel_data:
+        return False
+    axis = detect_uniform_axis(channel_data['X_value'], tolerance)
+    if axis is None:
+        return False
+    del channel_data['X_value']
+    channel_data['X_axis'] = axis
+    return True
+
+
+def decode_x(channel_data, as_list=False):
+    """ 原地将隐式时间轴展开为 X_value（用于需要显式时间数组的前端/旧接口） """
+    if is_implicit(channel_data):
+        x_values = expand_axis(channel_data.pop('X_axis'))
+        channel_data['X_value'] = x_values.tolist() if as_list else x_values
+    return channel_data
+
+
+def parse_align(mode=None, dt=None):
+    """ 校验对齐参数，返回 (mode, dt)；dt 为 None 表示由 mode 决定网格间隔 """
+    mode = mode or DEFAULT_ALIGN_MODE
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"不支持的对齐方式: {mode}，可选: {', '.join(ALIGN_MODES)}")
+    if dt in (None, ''):
+        return mode, None
+    try:
+        dt = float(dt)
+    except (TypeError, ValueError):
+        raise ValueError(f"align_dt 必须是数字: {dt}")
+    if not np.isfinite(dt) or dt <= 0:
+        raise ValueError(f"align_dt 必须大于0: {dt}")
+    return mode, dt
+
+
+def channel_span(channel_data):
+    """ 返回通道的 (起始时间, 结束时间)，不展开隐式时间轴 """
+    n = channel_length(channel_data)
+    return float(x_value_at(channel_data, 0)), float(x_value_at(channel_data, n - 1))
+
+
+def same_grid(left, right, tolerance=UNIFORM_TOLERANCE):
+    """ 两个通道在共同长度内的时间点是否一致（偏差不超过 tolerance*dt） """
+    n = min(channel_length(left), channel_length(right))
+    if n < 2:
+        return True
+    dt = channel_dt(left)
+    if not dt:
+        return False
+    limit = abs(dt) * tolerance
+    if is_implicit(left) and is_implicit(right):
+        a, b = left['X_axis'], right['X_axis']
+        return abs(float(a['t0']) - float(b['t0'])) <= limit \
+            and abs(float(a['dt']) - float(b['dt'])) * (n - 1) <= limit
+    if left.get('X_value') is right.get('X_value'):
+        return True
+    x_left = np.asarray(channel_x_values(left)[:n], dtype=np.float64)
+    x_right = np.asarray(channel_x_values(right)[:n], dtype=np.float64)
+    return bool(np.max(np.abs(x_left - x_right)) <= limit)
+
+
+def common_axis(left, right, mode=DEFAULT_ALIGN_MODE, dt=None):
+    """
+    计算两个通道重叠时间区间上的公共均匀网格 {'t0', 'dt', 'n'}
+    dt 未指定时 coarsest 取两者中较大的采样间隔，finest 取较小者
+    """
+    start_left, end_left = channel_span(left)
+    start_right, end_right = channel_span(right)
+    t0 = max(start_left, start_right)
+    t1 = min(end_left, end_right)
+    if t1 < t0:
+        raise ValueError(f"通道时间范围没有重叠: [{start_left}, {end_left}] 与 [{start_right}, {end_right}]")
+    if dt is None:
+        dts = [d for d in (channel_dt(left), channel_dt(right)) if d]
+        if not dts:
+            return {'t0': t0, 'dt': 1.0, 'n': 1}
+        dt = max(dts) if mode == 'coarsest' else min(dts)
+    dt = float(dt)
+    # 容许浮点误差，使恰好落在区间末端的点被包含
+    n = int(np.floor((t1 - t0) / dt + UNIFORM_TOLERANCE)) + 1
+    return {'t0': t0, 'dt': dt, 'n': n}
+
+
+def resample_values(channel_data, values, axis):
+    """
+    将通道数值线性插值到均匀网格 axis 上
+    隐式时间轴直接计算网格点在源信号中的小数下标，显式时间轴使用 np.interp（内部二分查找），均为一次向量化计算
+    """
+    values = np.asarray(values)
+    grid = expand_axis(axis)
+    if not is_implicit(channel_data):
+        x_values = np.asarray(channel_x_values(channel_data), dtype=np.float64)
+        return np.interp(grid, x_values, values.astype(np.float64, copy=False))
+
+    source = channel_data['X_axis']
+    n_source = len(values)
+    if n_source < 2:
+        return np.full(len(grid), float(values[0]) if n_source else np.nan)
+    pos = np.clip((grid - float(source['t0'])) / float(source['dt']), 0, n_source - 1)
+    idx = np.minimum(pos.astype(np.int64), n_source - 2)
+    frac = pos - idx
+    return values[idx] * (1.0 - frac) + values[idx + 1] * frac
+
+
+def align_pair(left, left_values, right, right_values, mode=DEFAULT_ALIGN_MODE, dt=None):
+    """
+    将两个通道的数值对齐到同一时间轴，返回 (时间轴字段, 左侧数值, 右侧数值)
+    时间轴字段为 {'X_axis': ...} 或 {'X_value': ...}，表示方式与左操作数一致
+    mode='truncate' 或两个时间轴相同（且未指定 dt）时按下标截断到较短长度（切片视图，不复制）
+    """
+    if mode == 'truncate' or (dt is None and same_grid(left, right)):
+        n = min(channel_length(left), channel_length(right))
+        return truncate_x(left, n), left_values[:n], right_values[:n]
+    axis = common_axis(left, right, mode, dt)
+    fields = {'X_axis': axis} if is_implicit(left) else {'X_value': expand_axis(axis)}
+    return fields, resample_values(left, left_values, axis), resample_values(right, right_values, axis)
@@ -6,12 +6,20 @@ urlpatterns = [
     path('struct-tree', views.get_struct_tree),
 
     path('channel-data', views.get_channel_data),
+    path('channel-data/batch', views.get_channel_data_batch, name='get_channel_data_batch'),
+    path('channel-data/view', views.get_channel_view, name='get_channel_view'),
+    path('data-cache-status', views.get_data_cache_status, name='get_data_cache_status'),
     path('error-data', views.get_error_data),
     path('get-channels-errors', views.get_channels_errors, name='get_channels_errors'),
 
     path('operator-strs', views.operator_strs),
     path('operator-strs/init', views.init_calculation, name='init_calculation'),
+    path('operator-strs/batch', views.operator_strs_batch, name='operator_strs_batch'),
+    path('operator-strs/batch/<str:job_id>', views.get_calc_job, name='get_calc_job'),
+    path('operator-strs/batch/<str:job_id>/<int:shot>', views.get_calc_job_result, name='get_calc_job_result'),
     path('calculation-progress/<str:task_id>', views.get_calculation_progress, name='get_calculation_progress'),
+    path('calculation-result/<str:task_id>', views.get_calculation_result, name='get_calculation_result'),
+    path('calculation-cancel/<str:task_id>', views.cancel_calculation, name='cancel_calculation'),
     path('get-shot-number-index', views.get_shot_number_index, name='get_shot_number_index'),
     path('get-channel-type-index', views.get_channel_type_index, name='get-channel-type-index'),
     path('get-channel-name-index', views.get_channel_name_index, name='get-channel-name-index'),
@@ -7,7 +7,7 @@ import time
 import gzip
 import MDSplus # type: ignore
 import numpy as np
-from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404, StreamingHttpResponse
 import uuid
 import threading
 from django.utils import timezone
@@ -22,7 +22,19 @@ import zipfile
 from io import BytesIO
 
 from api.self_algorithm_utils import period_condition_anomaly
-from api.Mds import MdsTree
+from api.Mds import mds_tree_pool_stats
+from api.function_registry import FunctionRegistry
+from api.algorithm_pool import AlgorithmError, AlgorithmPool
+from api.expression_plan import BUILTIN_FUNCTIONS, plan_cache_stats
+from api.expression_parser import EXPRESSION_CHUNK_THRESHOLD, ExpressionParser, expression_result_cache, spectrum_cache
+from api.signal_access import (MDS_DBS, ChannelNotFoundError, channel_db_order, channel_flight, channel_locator,
+                               channel_time_context, channel_to_lists, derived_cache, get_channel, get_channels,
+                               mds_read_flight, parse_channel_fields, parse_channel_key, parse_time_window,
+                               read_channel_signal, record_channel_location, signal_cache)
+from api import calc_jobs, calc_tasks, time_axis
+from api.signal_pyramid import build_pyramid, view_indices
+from api.downsampling import DEFAULT_DOWNSAMPLE_ALGORITHM, DOWNSAMPLE_ALGORITHMS, downsample_to_frequency
+from api.wire_format import BINARY_CONTENT_TYPE, encode_binary_payload, wants_binary
 from api.verify_user import send_post_request
 from api.pattern_matching_Qetch import match_pattern  # 只导入模式匹配函数
 from pymongo import MongoClient, ASCENDING, UpdateMany
@@ -35,17 +47,6 @@ import os
 # 配置日志
 logger = logging.getLogger(__name__)
 
-# 导入科学计算库
-try:
-    from sklearn.decomposition import PCA
-    sklearn_available = True
-except ImportError:
-    sklearn_available = False
-    print("警告：sklearn未安装，PCA功能将不可用")
-
-# 存储计算任务状态的字典
-calculation_tasks = {}
-
 # MongoDB 配置：
 client = MongoClient("mongodb://localhost:27017")
 
@@ -639,114 +640,6 @@ def get_error_data(request):
     else:
         return OrJsonResponse({'error': 'Required parameters are missing'}, status=400)
 
-def downsample_to_frequency(x_values, y_values, target_freq=1000):
-    """
-    对数据进行高效降采样到指定频率，同时保留信号特征
-    
-    Args:
-        x_values: 时间序列数据的X值（时间值）
-        y_values: 对应的Y值
-        target_freq: 目标频率，默认1000Hz (1KHz)
-        
-    Returns:
-        降采样后的x_values和y_values
-    """
-    if len(x_values) <= target_freq:
-        return x_values, y_values
-    
-    # 确定数据的时间范围
-    time_start = min(x_values)
-    time_end = max(x_values)
-    time_span = time_end - time_start
-    
-    # 基于目标频率计算总采样点数
-    n_samples = int(time_span * target_freq)
-    
-    # 如果目标点数比原始点数多，直接返回原始数据
-    if n_samples >= len(x_values):
-        return x_values, y_values
-    
-    # 计算降采样比例
-    sample_ratio = len(x_values) // n_samples
-    
-    # 增强的特征保留降采样
-    if sample_ratio > 10:  # 对于高降采样比率
-        # 步骤1: 先进行均匀采样作为基础点集
-        base_indices = np.arange(0, len(x_values), sample_ratio)
-        if len(base_indices) > n_samples:
-            base_indices = base_indices[:n_samples]
-        
-        # 步骤2: 识别关键特征点 - 寻找局部极值
-        # 使用滑动窗口检测局部极值点，窗口大小根据降采样比例自适应调整
-        window_size = min(sample_ratio // 2, 20)  # 避免窗口过大
-        if window_size < 2:
-            window_size = 2
-            
-        # 计算局部极值点
-        extrema_indices = []
-        for i in range(window_size, len(y_values) - window_size, window_size):
-            window = y_values[i-window_size:i+window_size]
-            if y_values[i] == max(window) or y_values[i] == min(window):
-                # 如果是窗口内的极值点，添加到特征点列表
-                extrema_indices.append(i)
-        
-        # 步骤3: 合并基础点集和特征点集，确保不超过目标点数
-        all_indices = np.unique(np.concatenate([base_indices, extrema_indices]))
-        
-        # 如果合并后点数超过目标点数，优先保留特征点并进行下采样
-        if len(all_indices) > n_samples:
-            # 保留所有特征点
-            kept_extrema = np.array(extrema_indices)
-            # 计算剩余可用的点数
-            remaining_slots = n_samples - len(kept_extrema)
-            if remaining_slots > 0:
-                # 从基础点集中抽样填充剩余点位
-                mask = np.isin(base_indices, kept_extrema, invert=True)
-                candidates = base_indices[mask]
-                if len(candidates) > remaining_slots:
-                    # 均匀抽取剩余点位
-                    step = len(candidates) // remaining_slots
-                    base_selection = candidates[::step][:remaining_slots]
-                else:
-                    base_selection = candidates
-                # 合并特征点和基础点，并排序
-                final_indices = np.sort(np.concatenate([kept_extrema, base_selection]))
-            else:
-                # 如果特征点已经超过了目标点数，则进行均匀下采样
-                step = len(kept_extrema) // n_samples
-                final_indices = kept_extrema[::step][:n_samples]
-        else:
-            final_indices = all_indices
-            
-            # 如果点数仍不足，可以补充一些点
-            if len(final_indices) < n_samples:
-                # 创建掩码，标记未选中的点
-                mask = np.ones(len(x_values), dtype=bool)
-                mask[final_indices] = False
-                remaining_indices = np.arange(len(x_values))[mask]
-                
-                # 确定需要补充的点数
-                to_add = n_samples - len(final_indices)
-                if len(remaining_indices) > to_add:
-                    # 均匀选择额外点
-                    step = len(remaining_indices) // to_add
-                    extra_indices = remaining_indices[::step][:to_add]
-                    # 合并并排序
-                    final_indices = np.sort(np.concatenate([final_indices, extra_indices]))
-        
-        # 提取最终的采样点
-        new_times = x_values[final_indices]
-        new_values = y_values[final_indices]
-    else:
-        # 对于小幅度降采样，使用更简单的方法以保持速度
-        # 结合等间隔采样和线性插值，兼顾准确性和效率
-        indices = np.linspace(0, len(x_values)-1, n_samples).astype(int)
-        new_times = x_values[indices]
-        new_values = y_values[indices]
-    
-    print(f"特征保留降采样: 从 {len(x_values)} 点 降至 {len(new_times)} 点")
-    return new_times, new_values
-
 def compress_response(view_func):
     """
     装饰器：压缩响应内容
@@ -768,1657 +661,245 @@ def OrJsonResponse(data, status=200):
         status=status
     )
 
+def ChannelDataResponse(request, data, status=200):
+    """
+    通道数据响应：客户端通过 format=binary 或 Accept: application/x-ddp-channel 请求时返回二进制帧，
+    否则返回 JSON。二进制模式下 precision=float64 可保留数值数组的完整精度
+    """
+    if wants_binary(request):
+        value_dtype = 'float64' if request.GET.get('precision') == 'float64' else 'float32'
+        return HttpResponse(encode_binary_payload(data, value_dtype=value_dtype),
+                            content_type=BINARY_CONTENT_TYPE, status=status)
+    return OrJsonResponse(data, status=status)
+
+@require_GET
+def get_data_cache_status(request):
+    """获取服务端数据缓存的命中统计"""
+    return OrJsonResponse({
+        'success': True,
+        'data': {
+            'signal_cache': signal_cache.stats(),
+            'derived_cache': derived_cache.stats(),
+            'single_flight': {
+                'channel_data': channel_flight.stats(),
+                'mds_read': mds_read_flight.stats(),
+            },
+            'mds_tree_pool': mds_tree_pool_stats(),
+            'channel_locator': channel_locator.stats(),
+            'expression_plans': plan_cache_stats(),
+            'expression_results': expression_result_cache.stats(),
+            'spectra': spectrum_cache.stats(),
+            'imported_functions': function_registry.stats(),
+            'algorithm_pool': algorithm_pool.stats(),
+            'calc_tasks': calc_tasks.executor.stats(),
+        }
+    })
+
+def _print_log_table(title, logs, width=80):
+    """以表格形式打印日志，中文等宽字符按2个单位宽度对齐"""
+    # 计算字符串显示宽度的函数
+    def display_width(s):
+        return sum(2 if unicodedata.east_asian_width(c) in ['F', 'W'] else 1 for c in s)
+
+    # 根据显示宽度调整字符串格式化
+    def format_str(s, width, align='<'):
+        padding = max(width - display_width(s), 0)
+        if align == '^':  # 居中对齐
+            return ' ' * (padding // 2) + s + ' ' * (padding - padding // 2)
+        elif align == '>':  # 右对齐
+            return ' ' * padding + s
+        return s + ' ' * padding  # 左对齐
+
+    print(f"+{'-'*width}+")
+    title_padding = width - 2 - display_width(title)
+    print(f"| {' ' * (title_padding//2)}{title}{' ' * (title_padding - title_padding//2)} |")
+    print(f"+{'-'*width}+")
+    for log in logs:
+        if ":" in log:
+            key, value = log.split(":", 1)
+            # 固定键宽度为25，值宽度为width-27
+            print(f"| {format_str(key + ':', 25)}{format_str(value.strip(), width-27, '>')} |")
+        else:
+            print(f"| {format_str(log, width-2, '^')} |")
+    print(f"+{'-'*width}+")
+
 @require_GET
 def get_channel_data(request, channel_key=None):
     """
     获取通道数据
+    参数解析和序列化之外的逻辑（读取、缓存、采样、派生字段）见 api.signal_access.get_channel
     """
     start_time = time.time()
     try:
         if channel_key is None:
             channel_key = request.GET.get('channel_key')
-        else:
-            pass
-        
+        if not channel_key:
+            return OrJsonResponse({'error': 'channel_key or channel_type parameter is missing'}, status=400)
+
         # 获取采样参数，默认采用降采样
         sample_mode = request.GET.get('sample_mode', 'downsample')  # 可选值: 'full', 'downsample'
         sample_freq = float(request.GET.get('sample_freq', 1000))   # 默认1KHz，改为float类型
-        
+        # 时间轴编码: 'explicit' 返回完整 X_value，'implicit' 对均匀采样通道返回 X_axis={t0, dt, n}
+        x_encoding = request.GET.get('x_encoding', 'explicit')
+        # 降采样算法: 'extrema'（默认，特征保留）、'minmax'、'lttb'
+        downsample_algo = request.GET.get('downsample_algo', DEFAULT_DOWNSAMPLE_ALGORITHM)
+
         # 收集日志信息，最后统一打印
         logs = []
         logs.append(f"请求通道数据，通道键: '{channel_key}', 采样模式: {sample_mode}, 目标频率: {sample_freq} KHz")
-        
-        # channel_type = request.GET.get('channel_type')
-        if channel_key: # and channel_type:
-            if '_' in channel_key:
-                # 解析通道键格式
-                channel_name, shot_number = channel_key.rsplit('_', 1)
-                try:
-                    num = int(channel_name)
-                    channel_name, shot_number = shot_number, channel_name
-                    logs.append(f"格式交换: '{channel_name}_{shot_number}' (通道名_炮号)")
-                except ValueError:
-                    # 格式已正确为"通道名_炮号"
-                    logs.append(f"正确格式: '{channel_name}_{shot_number}' (通道名_炮号)")
-                    pass
-                    
-                try:
-                    shot_number = int(shot_number)
-                except ValueError:
-                    return OrJsonResponse({'error': f"无法将炮号转换为整数: '{shot_number}'"}, status=400)
-            else:
-                return OrJsonResponse({'error': 'Invalid channel_key format'}, status=400)
-            
-            DB_list = ["exl50u", "eng50u"]
-            DBS = {
-                'exl50': {
-                    'name': 'exl50',
-                    'addr': '192.168.20.11',
-                    'path': '192.168.20.11::/media/ennfusion/trees/exl50',
-                    'subtrees': ['FBC', 'PAI', 'PMNT']
-                },
-                'exl50u': {
-                    'name': 'exl50u',
-                    'addr': '192.168.20.11',
-                    'path': '192.168.20.11::/media/ennfusion/trees/exl50u',
-                    'subtrees': ['FBC', 'PAI', 'PMNT']
-                },
-                'eng50u': {
-                    'name': 'eng50u',
-                    'addr': '192.168.20.41',
-                    'path': '192.168.20.41::/media/ennfusion/ENNMNT/trees/eng50u',
-                    'subtrees': ['PMNT']
-                },
-                'ecrhlab': {
-                    'name': 'ecrhlab',
-                    'addr': '192.168.20.32',
-                    'path': '192.168.20.32::/media/ecrhdb/trees/ecrhlab',
-                    'subtrees': ['PAI']
-                },
-                'ts': {
-                    'name': 'ts',
-                    'addr': '192.168.20.28',
-                    'path': '192.168.20.28::/media/ennts/trees/ts',
-                    'subtrees': ['AI']
-                },
-            }
-            data = {}
-            logs.append(f"通道名: {channel_name}")
-            
-            db_start_time = time.time()
-            for DB in DB_list:
-                tree_start_time = time.time()
-
-                tree = MdsTree(shot_number, dbname=DB, path=DBS[DB]['path'], subtrees=DBS[DB]['subtrees'])
-                logs.append(f"创建MdsTree对象耗时: {time.time() - tree_start_time:.2f}秒")
-                
-                data_start_time = time.time()
-                if channel_name[:2] == 'MP' or channel_name[:4] == 'FLUX':
-                    data_x, data_y, unit = tree.getData(channel_name, -7, 5)
-                else:
-                    data_x, data_y, unit = tree.getData(channel_name)
-                logs.append(f"获取数据耗时: {time.time() - data_start_time:.2f}秒")
-                logs.append(f"原始数据量: X轴 {len(data_x)} 点, Y轴 {len(data_y)} 点")
-                
-                # 计算原始频率，由Hz转换为KHz
-                original_frequency = len(data_x) / (data_x[-1] - data_x[0]) if len(data_x) > 1 else 0
-                original_frequency_khz = original_frequency / 1000
-                logs.append(f"原始频率: {original_frequency_khz}KHz")
-                
-                if len(data_x) != 0:
-                    is_downsampled = False
-                    is_upsampled = False
-                    
-                    # 处理采样率调整
-                    if sample_mode != 'full' and sample_freq > 0:
-                        # 将sample_freq从KHz转换为Hz
-                        target_freq_hz = sample_freq * 1000
-                        
-                        # 如果目标频率小于原始频率，进行降采样
-                        if target_freq_hz < original_frequency:
-                            downsampling_start = time.time()
-                            data_x, data_y = downsample_to_frequency(data_x, data_y, target_freq=target_freq_hz)
-                            logs.append(f"降采样耗时: {time.time() - downsampling_start:.2f}秒")
-                            is_downsampled = True
-                        # 如果目标频率大于原始频率，进行插值采样
-                        elif target_freq_hz > original_frequency:
-                            upsampling_start = time.time()
-                            # 为了避免混淆，创建一个专门的插值采样函数
-                            data_x, data_y = upsample_to_frequency(data_x, data_y, target_freq=target_freq_hz)
-                            logs.append(f"插值采样耗时: {time.time() - upsampling_start:.2f}秒")
-                            is_upsampled = True
-                    
-                    # 计算前端绘图需要的数据统计信息
-                    calculate_start_time = time.time()
-                    
-                    # 计算Y值的统计数据
-                    y_min = float(np.min(data_y))
-                    y_max = float(np.max(data_y))
-                    y_mean = float(np.mean(data_y))
-                    y_median = float(np.median(data_y))
-                    y_std = float(np.std(data_y))
-                    
-                    # 计算X轴范围
-                    x_min = float(np.min(data_x))
-                    x_max = float(np.max(data_x))
-                    
-                    # 计算数据范围，用于Y轴缩放
-                    y_range = y_max - y_min
-                    y_range_padding = y_range * 0.2  # 添加20%的padding
-                    y_axis_min = y_min - y_range_padding
-                    y_axis_max = y_max + y_range_padding
-                    
-                    # 判断通道类型
-                    is_digital = False
-                    if y_min >= 0 and y_max <= 1 and np.all(np.logical_or(np.isclose(data_y, 0), np.isclose(data_y, 1))):
-                        is_digital = True
-                        
-                    # 归一化数据（用于多通道对比）
-                    y_abs_max = max(abs(y_min), abs(y_max))
-                    if y_abs_max > 0:
-                        y_normalized = list(data_y / y_abs_max)
-                    else:
-                        y_normalized = list(data_y)
-
-                    # ====== FFT 计算及计时 ======
-                    fft_start_time = time.time()
-                    N = len(data_y)
-                    if N > 1:
-                        # 采样间隔
-                        dt = (data_x[-1] - data_x[0]) / (N - 1)
-                        # 采样频率
-                        fs = 1.0 / dt
-                        
-                        # 执行FFT（与MATLAB保持一致的处理方式）
-                        fft_result = np.fft.fft(data_y)
-                        
-                        # 计算双边谱的幅度（不进行归一化，保持MATLAB的原始幅度）
-                        amplitude_double_sided = np.abs(fft_result)
-                        
-                        # 生成频率轴（双边谱）
-                        freq_double_sided = np.fft.fftfreq(N, d=dt)
-                        
-                        # 转换为单边谱（只保留正频率和零频率）
-                        if N % 2 == 0:  # 偶数长度
-                            # 正频率点数（包含零频率，不包含Nyquist频率的负频率对应）
-                            n_positive = N // 2 + 1
-                            freq = freq_double_sided[:n_positive]
-                            amplitude = amplitude_double_sided[:n_positive].copy()
-                            
-                            # 单边谱幅度处理：除直流和Nyquist分量外，其他分量乘以2
-                            amplitude[1:-1] = amplitude[1:-1] * 2
-                        else:  # 奇数长度
-                            n_positive = (N + 1) // 2
-                            freq = freq_double_sided[:n_positive]
-                            amplitude = amplitude_double_sided[:n_positive].copy()
-                            
-                            # 单边谱幅度处理：除直流分量外，其他分量乘以2
-                            amplitude[1:] = amplitude[1:] * 2
-                        
-                        # 如果需要归一化到N（可选），可以取消下面的注释
-                        # amplitude = amplitude / N
-                        
-                        logs.append(f"采样频率: {fs:.2f} Hz")
-                        logs.append(f"频率分辨率: {fs/N:.4f} Hz")
-                        logs.append(f"最大频率: {freq[-1]:.2f} Hz")
-                    else:
-                        freq = np.array([])
-                        amplitude = np.array([])
-                    fft_time = time.time() - fft_start_time
-                    logs.append(f"FFT计算耗时: {fft_time:.4f}秒")
-                    logs.append(f"FFT点数: {len(freq)}")
-                    # ====== END FFT ======
-
-                    logs.append(f"计算统计数据耗时: {time.time() - calculate_start_time:.2f}秒")
-                    
-                    data = {
-                        'channel_number': channel_name,
-                        'X_value': list(data_x),
-                        'Y_value': list(data_y),
-                        'X_unit': 's',
-                        'Y_unit': str(unit) if unit is not None else 'Y',  # 确保单位是字符串类型
-                        'is_downsampled': is_downsampled,
-                        'is_upsampled': is_upsampled,
-                        'points': len(data_x),
-                        'originalFrequency': original_frequency_khz,
-                        # 添加新的统计数据
-                        'stats': {
-                            'y_min': y_min,
-                            'y_max': y_max,
-                            'y_mean': y_mean,
-                            'y_median': y_median,
-                            'y_std': y_std,
-                            'x_min': x_min,
-                            'x_max': x_max,
-                            'y_axis_min': y_axis_min,
-                            'y_axis_max': y_axis_max
-                        },
-                        'is_digital': is_digital,
-                        'Y_normalized': y_normalized,
-                        # 新增FFT结果
-                        'freq': freq.tolist(),
-                        'amplitude': amplitude.tolist(),
-                    }
-                    
-                    # 使用orjson替代标准json进行序列化，大幅提升性能
-                    serialize_start_time = time.time()
-                    response = OrJsonResponse(data)
-                    logs.append(f"响应创建耗时: {time.time() - serialize_start_time:.2f}秒")
-                    
-                    logs.append(f"数据库遍历总耗时: {time.time() - db_start_time:.2f}秒")
-                    logs.append(f"总耗时: {time.time() - start_time:.2f}秒")
-                    
-                    # 打印表格形式的日志
-                    width = 80
-                    
-                    # 计算字符串显示宽度的函数
-                    def display_width(s):
-                        width = 0
-                        for c in s:
-                            # 东亚宽字符（中文、日文等）计为2个单位宽度
-                            if unicodedata.east_asian_width(c) in ['F', 'W']:
-                                width += 2
-                            else:
-                                width += 1
-                        return width
-                    
-                    # 根据显示宽度调整字符串格式化
-                    def format_str(s, width, align='<'):
-                        # 计算实际显示宽度
-                        disp_width = display_width(s)
-                        # 调整padding以适应显示宽度
-                        padding = width - disp_width
-                        if padding < 0:
-                            padding = 0
-                        
-                        if align == '^':  # 居中对齐
-                            left_padding = padding // 2
-                            right_padding = padding - left_padding
-                            return ' ' * left_padding + s + ' ' * right_padding
-                        elif align == '>':  # 右对齐
-                            return ' ' * padding + s
-                        else:  # 左对齐
-                            return s + ' ' * padding
-                    
-                    print(f"+{'-'*width}+")
-                    title = '请求通道数据概览'
-                    title_padding = width - 2 - display_width(title)
-                    print(f"| {' ' * (title_padding//2)}{title}{' ' * (title_padding - title_padding//2)} |")
-                    print(f"+{'-'*width}+")
-                    for log in logs:
-                        if ":" in log:
-                            key, value = log.split(":", 1)
-                            key_str = key + ':'
-                            value_str = value.strip()
-                            # 固定键宽度为25，值宽度为width-27
-                            formatted_key = format_str(key_str, 25)
-                            formatted_value = format_str(value_str, width-27, '>')
-                            print(f"| {formatted_key}{formatted_value} |")
-                        else:
-                            formatted_log = format_str(log, width-2, '^')
-                            print(f"| {formatted_log} |")
-                    print(f"+{'-'*width}+")
-                    
-                    return response
-                    
+        db_start_time = time.time()
+        try:
+            # 时间窗口（秒）下推到 MDSplus 只读取该区间；fields 指定返回的字段组，如 'y,stats'
+            t_start, t_end, delta = parse_time_window(request.GET)
+            data = get_channel(channel_key, sample_mode, sample_freq, x_encoding, downsample_algo, t_start, t_end, delta,
+                               request.GET.get('fields'), logs)
+        except ValueError as e:
+            return OrJsonResponse({'error': str(e)}, status=400)
+        except ChannelNotFoundError as e:
             logs.append(f"数据库遍历总耗时: {time.time() - db_start_time:.2f}秒")
             logs.append(f"总耗时: {time.time() - start_time:.2f}秒")
-            
-            # 打印表格形式的日志
-            width = 80
-            
-            # 计算字符串显示宽度的函数
-            def display_width(s):
-                width = 0
-                for c in s:
-                    # 东亚宽字符（中文、日文等）计为2个单位宽度
-                    if unicodedata.east_asian_width(c) in ['F', 'W']:
-                        width += 2
-                    else:
-                        width += 1
-                return width
-            
-            # 根据显示宽度调整字符串格式化
-            def format_str(s, width, align='<'):
-                # 计算实际显示宽度
-                disp_width = display_width(s)
-                # 调整padding以适应显示宽度
-                padding = width - disp_width
-                if padding < 0:
-                    padding = 0
-                
-                if align == '^':  # 居中对齐
-                    left_padding = padding // 2
-                    right_padding = padding - left_padding
-                    return ' ' * left_padding + s + ' ' * right_padding
-                elif align == '>':  # 右对齐
-                    return ' ' * padding + s
-                else:  # 左对齐
-                    return s + ' ' * padding
-            
-            print(f"+{'-'*width}+")
-            title = '请求通道数据概览'
-            title_padding = width - 2 - display_width(title)
-            print(f"| {' ' * (title_padding//2)}{title}{' ' * (title_padding - title_padding//2)} |")
-            print(f"+{'-'*width}+")
-            for log in logs:
-                if ":" in log:
-                    key, value = log.split(":", 1)
-                    key_str = key + ':'
-                    value_str = value.strip()
-                    # 固定键宽度为25，值宽度为width-27
-                    formatted_key = format_str(key_str, 25)
-                    formatted_value = format_str(value_str, width-27, '>')
-                    print(f"| {formatted_key}{formatted_value} |")
-                else:
-                    formatted_log = format_str(log, width-2, '^')
-                    print(f"| {formatted_log} |")
-            print(f"+{'-'*width}+")
-        else:
-            return OrJsonResponse({'error': 'channel_key or channel_type parameter is missing'}, status=400)
+            _print_log_table('请求通道数据概览', logs)
+            return OrJsonResponse({'error': str(e)}, status=404)
+
+        # 使用orjson替代标准json进行序列化，大幅提升性能
+        serialize_start_time = time.time()
+        response = ChannelDataResponse(request, data)
+        logs.append(f"响应创建耗时: {time.time() - serialize_start_time:.2f}秒")
+        logs.append(f"数据库遍历总耗时: {time.time() - db_start_time:.2f}秒")
+        logs.append(f"总耗时: {time.time() - start_time:.2f}秒")
+        _print_log_table('请求通道数据概览', logs)
+        return response
     except Exception as e:
-        # 打印错误信息
-        width = 80
-        
-        # 计算字符串显示宽度的函数
-        def display_width(s):
-            width = 0
-            for c in s:
-                # 东亚宽字符（中文、日文等）计为2个单位宽度
-                if unicodedata.east_asian_width(c) in ['F', 'W']:
-                    width += 2
-                else:
-                    width += 1
-            return width
-        
-        # 根据显示宽度调整字符串格式化
-        def format_str(s, width, align='<'):
-            # 计算实际显示宽度
-            disp_width = display_width(s)
-            # 调整padding以适应显示宽度
-            padding = width - disp_width
-            if padding < 0:
-                padding = 0
-            
-            if align == '^':  # 居中对齐
-                left_padding = padding // 2
-                right_padding = padding - left_padding
-                return ' ' * left_padding + s + ' ' * right_padding
-            elif align == '>':  # 右对齐
-                return ' ' * padding + s
-            else:  # 左对齐
-                return s + ' ' * padding
-                
-        print(f"+{'-'*width}+")
-        title = '错误信息概览'
-        title_padding = width - 2 - display_width(title)
-        print(f"| {' ' * (title_padding//2)}{title}{' ' * (title_padding - title_padding//2)} |")
-        print(f"+{'-'*width}+")
-        
-        error_msg = f"发生错误，总耗时: {time.time() - start_time:.2f}秒"
-        formatted_error = format_str(error_msg, width-2)
-        print(f"| {formatted_error} |")
-        print(f"+{'-'*width}+")
+        _print_log_table('错误信息概览', [f"发生错误，总耗时: {time.time() - start_time:.2f}秒"])
         import traceback
         traceback.print_exc()  # 打印完整的错误堆栈跟踪
         return OrJsonResponse({'error': str(e)}, status=500)
 
-# 添加一个插值采样函数
-def upsample_to_frequency(x_values, y_values, target_freq=1000):
+@csrf_exempt
+@require_POST
+def get_channel_data_batch(request):
     """
-    对数据进行插值采样到指定频率
-    
-    Args:
-        x_values: 时间序列数据的X值（时间值）
-        y_values: 对应的Y值
-        target_freq: 目标频率，单位Hz
-        
-    Returns:
-        插值采样后的x_values和y_values
+    批量获取通道数据
+    请求体: {"channel_keys": ["IP_4470", "MP01_4470", ...], "sample_mode": "downsample", "sample_freq": 1.0,
+            "x_encoding": "explicit", "downsample_algo": "extrema", "t_start": 0.1, "t_end": 0.15, "fields": "x,y"}
+    已缓存的通道直接返回，其余通道按炮号分组，每个树每组只发送一次 GetMany() 请求（见 signal_access.get_channels），
+    连接取自句柄池，相同的并发批量读取合并为一次
+    单个通道失败时只在该通道的结果中返回 error
     """
-    # 计算原始频率
-    time_span = max(x_values) - min(x_values)
-    original_freq = len(x_values) / time_span
-    
-    # 如果目标频率小于或等于原始频率，直接返回原始数据
-    if target_freq <= original_freq:
-        return x_values, y_values
-    
-    # 基于目标频率计算总采样点数
-    n_samples = int(time_span * target_freq)
-    
-    # 创建均匀分布的新时间点
-    new_times = np.linspace(min(x_values), max(x_values), n_samples)
-    
-    # 使用线性插值计算对应的Y值
-    new_values = np.interp(new_times, x_values, y_values)
-    
-    print(f"插值采样: 从 {len(x_values)} 点 增至 {len(new_times)} 点")
-    return new_times, new_values
-
-# 添加表达式解析类
-class ExpressionParser:
-    def __init__(self, get_channel_data_func):
-        self.get_channel_data_func = get_channel_data_func
-        self.tokens = []
-        self.current = 0
-        self.context_stack = []  # 用于跟踪解析上下文
-    
-    def parse(self, expression):
-        """解析表达式并计算结果"""
-        self.tokenize(expression)
-        self.current = 0
-        return self.expression()
-    
-    def tokenize(self, expression):
-        """将表达式分词 - 增强版支持函数前缀"""
-        # 去除多余的空格但保留函数调用中的逗号分隔符
-        expression = ' '.join(expression.split())
-
-        # 实现增强的分词器
-        self.tokens = []
-        i = 0
-
-        while i < len(expression):
-            char = expression[i]
-
-            # 跳过空格
-            if char == ' ':
-                i += 1
-                continue
-            
-            # 处理函数类型前缀 [Python] 或 [Matlab]
-            if char == '[':
-                start = i
-                # 查找配对的右括号
-                bracket_count = 1
-                i += 1
-                while i < len(expression) and bracket_count > 0:
-                    if expression[i] == '[':
-                        bracket_count += 1
-                    elif expression[i] == ']':
-                        bracket_count -= 1
-                    i += 1
-                
-                # 检查是否是函数类型前缀
-                prefix = expression[start:i]
-                if prefix in ['[Python]', '[Matlab]']:
-                    self.tokens.append(prefix)
-                else:
-                    # 如果不是已知的前缀，按字符处理
-                    self.tokens.append('[')
-                    i = start + 1
-                continue
-            
-            # 处理运算符和括号
-            if char in "+-*/(),&|!":
-                self.tokens.append(char)
-                i += 1
-            # 处理数字（包括小数）
-            elif char.isdigit() or char == '.':
-                start = i
-                # 继续读取数字和小数点
-                while i < len(expression) and (expression[i].isdigit() or expression[i] == '.'):
-                    i += 1
-                token = expression[start:i]
-                # 验证是否是有效的数字
-                try:
-                    float(token)
-                    self.tokens.append(token)
-                except ValueError:
-                    # 如果不是有效数字，按字符处理
-                    self.tokens.append(char)
-                    i = start + 1
-            # 处理标识符（通道标识符和函数名）
-            elif char.isalpha() or char == '_':
-                start = i
-                # 继续读取直到遇到非标识符字符
-                while i < len(expression) and (expression[i].isalnum() or expression[i] == '_'):
-                    i += 1
-                self.tokens.append(expression[start:i])
-            else:
-                i += 1
-
-        return self.tokens
-    
-    def expression(self):
-        """解析逻辑或运算（最低优先级）"""
-        return self.logical_or()
-
-    def logical_or(self):
-        """解析逻辑或运算 (|)"""
-        result = self.logical_and()
-
-        while self.current < len(self.tokens) and self.tokens[self.current] == '|':
-            operator = self.tokens[self.current]
-            self.current += 1
-            right = self.logical_and()
-            result = self.or_operands(result, right)
-
-        return result
-
-    def logical_and(self):
-        """解析逻辑与运算 (&)"""
-        result = self.arithmetic_expression()
-
-        while self.current < len(self.tokens) and self.tokens[self.current] == '&':
-            operator = self.tokens[self.current]
-            self.current += 1
-            right = self.arithmetic_expression()
-            result = self.and_operands(result, right)
-
-        return result
-
-    def arithmetic_expression(self):
-        """解析加减运算"""
-        result = self.term()
-
-        while self.current < len(self.tokens) and self.tokens[self.current] in ['+', '-']:
-            operator = self.tokens[self.current]
-            self.current += 1
-            right = self.term()
-
-            if operator == '+':
-                result = self.add_operands(result, right)
-            elif operator == '-':
-                result = self.subtract_operands(result, right)
-
-        return result
-
-    def add_operands(self, left, right):
-        """执行加法运算，支持通道数据与常量的运算"""
-        print(f"加法运算调试:")
-        left_y = left.get('Y_value', [])
-        right_y = right.get('Y_value', [])
-        left_y_len = len(left_y) if isinstance(left_y, list) else f"scalar({left_y})"
-        right_y_len = len(right_y) if isinstance(right_y, list) else f"scalar({right_y})"
-        print(f"  left: is_constant={left.get('is_constant')}, channel_name={left.get('channel_name')}, Y_len={left_y_len}")
-        print(f"  right: is_constant={right.get('is_constant')}, channel_name={right.get('channel_name')}, Y_len={right_y_len}")
-        
-        # 如果两个都是常量，返回常量结果
-        if left.get('is_constant', False) and right.get('is_constant', False):
-            result_value = left['Y_value'] + right['Y_value']
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"({left['channel_name']}+{right['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 如果右操作数是常量
-        if right.get('is_constant', False):
-            constant_value = right['Y_value']
-            result = left.copy()
-            # 确保左操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [y + constant_value for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', 'unknown')
-            right_name = right.get('channel_name', str(constant_value))
-            result['channel_name'] = f"({left_name}+{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 如果左操作数是常量
-        if left.get('is_constant', False):
-            constant_value = left['Y_value']
-            result = right.copy()
-            # 确保右操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [y + constant_value for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', str(constant_value))
-            right_name = right.get('channel_name', 'unknown')
-            result['channel_name'] = f"({left_name}+{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 两个都是通道数据
-        min_len = min(len(left['X_value']), len(right['X_value']))
-        result = left.copy()
-        result['X_value'] = left['X_value'][:min_len]
-        result['Y_value'] = left['Y_value'][:min_len]
-        right_y = right['Y_value'][:min_len]
-
-        # 执行加法
-        result['Y_value'] = [x + y for x, y in zip(result['Y_value'], right_y)]
-        
-        # 更新channel_name为表达式表示
-        left_name = left.get('channel_name', 'unknown')
-        right_name = right.get('channel_name', 'unknown')
-        result['channel_name'] = f"({left_name}+{right_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        print(f"加法运算结果: channel_name={result['channel_name']}, is_expression_result={result.get('is_expression_result')}")
-        
-        return result
-
-    def subtract_operands(self, left, right):
-        """执行减法运算，支持通道数据与常量的运算"""
-        # 如果两个都是常量，返回常量结果
-        if left.get('is_constant', False) and right.get('is_constant', False):
-            result_value = left['Y_value'] - right['Y_value']
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"({left['channel_name']}-{right['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 如果右操作数是常量
-        if right.get('is_constant', False):
-            constant_value = right['Y_value']
-            result = left.copy()
-            # 确保左操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [y - constant_value for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', 'unknown')
-            right_name = right.get('channel_name', str(constant_value))
-            result['channel_name'] = f"({left_name}-{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 如果左操作数是常量
-        if left.get('is_constant', False):
-            constant_value = left['Y_value']
-            result = right.copy()
-            # 确保右操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [constant_value - y for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', str(constant_value))
-            right_name = right.get('channel_name', 'unknown')
-            result['channel_name'] = f"({left_name}-{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 两个都是通道数据
-        min_len = min(len(left['X_value']), len(right['X_value']))
-        result = left.copy()
-        result['X_value'] = left['X_value'][:min_len]
-        result['Y_value'] = left['Y_value'][:min_len]
-        right_y = right['Y_value'][:min_len]
-
-        # 执行减法
-        result['Y_value'] = [x - y for x, y in zip(result['Y_value'], right_y)]
-        
-        # 更新channel_name为表达式表示
-        left_name = left.get('channel_name', 'unknown')
-        right_name = right.get('channel_name', 'unknown')
-        result['channel_name'] = f"({left_name}-{right_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        return result
-    
-    def term(self):
-        """解析乘除运算"""
-        result = self.factor()
-
-        while self.current < len(self.tokens) and self.tokens[self.current] in ['*', '/']:
-            operator = self.tokens[self.current]
-            self.current += 1
-            right = self.factor()
-
-            if operator == '*':
-                result = self.multiply_operands(result, right)
-            elif operator == '/':
-                result = self.divide_operands(result, right)
-
-        return result
-
-    def multiply_operands(self, left, right):
-        """执行乘法运算，支持通道数据与常量的运算"""
-        # 如果两个都是常量，返回常量结果
-        if left.get('is_constant', False) and right.get('is_constant', False):
-            result_value = left['Y_value'] * right['Y_value']
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"({left['channel_name']}*{right['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 如果右操作数是常量
-        if right.get('is_constant', False):
-            constant_value = right['Y_value']
-            result = left.copy()
-            # 确保左操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [y * constant_value for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', 'unknown')
-            right_name = right.get('channel_name', str(constant_value))
-            result['channel_name'] = f"({left_name}*{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 如果左操作数是常量
-        if left.get('is_constant', False):
-            constant_value = left['Y_value']
-            result = right.copy()
-            # 确保右操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [y * constant_value for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', str(constant_value))
-            right_name = right.get('channel_name', 'unknown')
-            result['channel_name'] = f"({left_name}*{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 两个都是通道数据
-        min_len = min(len(left['X_value']), len(right['X_value']))
-        result = left.copy()
-        result['X_value'] = left['X_value'][:min_len]
-        result['Y_value'] = left['Y_value'][:min_len]
-        right_y = right['Y_value'][:min_len]
-
-        # 执行乘法
-        result['Y_value'] = [x * y for x, y in zip(result['Y_value'], right_y)]
-        
-        # 更新channel_name为表达式表示
-        left_name = left.get('channel_name', 'unknown')
-        right_name = right.get('channel_name', 'unknown')
-        result['channel_name'] = f"({left_name}*{right_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        return result
-
-    def divide_operands(self, left, right):
-        """执行除法运算，支持通道数据与常量的运算"""
-        # 如果两个都是常量，返回常量结果
-        if left.get('is_constant', False) and right.get('is_constant', False):
-            if right['Y_value'] == 0:
-                raise ValueError("除数不能为0")
-            result_value = left['Y_value'] / right['Y_value']
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"({left['channel_name']}/{right['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 如果右操作数是常量
-        if right.get('is_constant', False):
-            constant_value = right['Y_value']
-            if constant_value == 0:
-                raise ValueError("除数不能为0")
-            result = left.copy()
-            # 确保左操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [y / constant_value for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', 'unknown')
-            right_name = right.get('channel_name', str(constant_value))
-            result['channel_name'] = f"({left_name}/{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 如果左操作数是常量
-        if left.get('is_constant', False):
-            constant_value = left['Y_value']
-            result = right.copy()
-            # 确保右操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            result['Y_value'] = [constant_value / y if y != 0 else float('inf') for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', str(constant_value))
-            right_name = right.get('channel_name', 'unknown')
-            result['channel_name'] = f"({left_name}/{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 两个都是通道数据
-        min_len = min(len(left['X_value']), len(right['X_value']))
-        result = left.copy()
-        result['X_value'] = left['X_value'][:min_len]
-        result['Y_value'] = left['Y_value'][:min_len]
-        right_y = right['Y_value'][:min_len]
-
-        # 执行除法，避免除以0
-        result['Y_value'] = [x / y if y != 0 else float('inf') for x, y in zip(result['Y_value'], right_y)]
-        
-        # 更新channel_name为表达式表示
-        left_name = left.get('channel_name', 'unknown')
-        right_name = right.get('channel_name', 'unknown')
-        result['channel_name'] = f"({left_name}/{right_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        return result
-
-    def and_operands(self, left, right):
-        """执行逻辑与运算，支持通道数据与常量的运算"""
-        print(f"逻辑与运算调试:")
-        left_y = left.get('Y_value', [])
-        right_y = right.get('Y_value', [])
-        left_y_len = len(left_y) if isinstance(left_y, list) else f"scalar({left_y})"
-        right_y_len = len(right_y) if isinstance(right_y, list) else f"scalar({right_y})"
-        print(f"  left: is_constant={left.get('is_constant')}, channel_name={left.get('channel_name')}, Y_len={left_y_len}")
-        print(f"  right: is_constant={right.get('is_constant')}, channel_name={right.get('channel_name')}, Y_len={right_y_len}")
-        
-        # 如果两个都是常量，返回常量结果
-        if left.get('is_constant', False) and right.get('is_constant', False):
-            result_value = 1 if (left['Y_value'] != 0 and right['Y_value'] != 0) else 0
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"({left['channel_name']}&{right['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 如果右操作数是常量
-        if right.get('is_constant', False):
-            constant_value = right['Y_value']
-            result = left.copy()
-            # 确保左操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            # 逻辑与：两个值都非0则为1，否则为0
-            result['Y_value'] = [1 if (y != 0 and constant_value != 0) else 0 for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', 'unknown')
-            right_name = right.get('channel_name', str(constant_value))
-            result['channel_name'] = f"({left_name}&{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 如果左操作数是常量
-        if left.get('is_constant', False):
-            constant_value = left['Y_value']
-            result = right.copy()
-            # 确保右操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            # 逻辑与：两个值都非0则为1，否则为0
-            result['Y_value'] = [1 if (y != 0 and constant_value != 0) else 0 for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', str(constant_value))
-            right_name = right.get('channel_name', 'unknown')
-            result['channel_name'] = f"({left_name}&{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 两个都是通道数据
-        min_len = min(len(left['X_value']), len(right['X_value']))
-        result = left.copy()
-        result['X_value'] = left['X_value'][:min_len]
-        result['Y_value'] = left['Y_value'][:min_len]
-        right_y = right['Y_value'][:min_len]
-
-        # 执行逻辑与：两个值都非0则为1，否则为0
-        result['Y_value'] = [1 if (x != 0 and y != 0) else 0 for x, y in zip(result['Y_value'], right_y)]
-        
-        # 更新channel_name为表达式表示
-        left_name = left.get('channel_name', 'unknown')
-        right_name = right.get('channel_name', 'unknown')
-        result['channel_name'] = f"({left_name}&{right_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        print(f"逻辑与运算结果: channel_name={result['channel_name']}, is_expression_result={result.get('is_expression_result')}")
-        
-        return result
-
-    def or_operands(self, left, right):
-        """执行逻辑或运算，支持通道数据与常量的运算"""
-        print(f"逻辑或运算调试:")
-        left_y = left.get('Y_value', [])
-        right_y = right.get('Y_value', [])
-        left_y_len = len(left_y) if isinstance(left_y, list) else f"scalar({left_y})"
-        right_y_len = len(right_y) if isinstance(right_y, list) else f"scalar({right_y})"
-        print(f"  left: is_constant={left.get('is_constant')}, channel_name={left.get('channel_name')}, Y_len={left_y_len}")
-        print(f"  right: is_constant={right.get('is_constant')}, channel_name={right.get('channel_name')}, Y_len={right_y_len}")
-        
-        # 如果两个都是常量，返回常量结果
-        if left.get('is_constant', False) and right.get('is_constant', False):
-            result_value = 1 if (left['Y_value'] != 0 or right['Y_value'] != 0) else 0
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"({left['channel_name']}|{right['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 如果右操作数是常量
-        if right.get('is_constant', False):
-            constant_value = right['Y_value']
-            result = left.copy()
-            # 确保左操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            # 逻辑或：至少一个值非0则为1，否则为0
-            result['Y_value'] = [1 if (y != 0 or constant_value != 0) else 0 for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', 'unknown')
-            right_name = right.get('channel_name', str(constant_value))
-            result['channel_name'] = f"({left_name}|{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 如果左操作数是常量
-        if left.get('is_constant', False):
-            constant_value = left['Y_value']
-            result = right.copy()
-            # 确保右操作数的Y_value是列表
-            if not isinstance(result['Y_value'], list):
-                result['Y_value'] = [result['Y_value']]
-            # 逻辑或：至少一个值非0则为1，否则为0
-            result['Y_value'] = [1 if (y != 0 or constant_value != 0) else 0 for y in result['Y_value']]
-            
-            # 更新channel_name为表达式表示
-            left_name = left.get('channel_name', str(constant_value))
-            right_name = right.get('channel_name', 'unknown')
-            result['channel_name'] = f"({left_name}|{right_name})"
-            result['is_expression_result'] = True
-            
-            return result
-
-        # 两个都是通道数据
-        min_len = min(len(left['X_value']), len(right['X_value']))
-        result = left.copy()
-        result['X_value'] = left['X_value'][:min_len]
-        result['Y_value'] = left['Y_value'][:min_len]
-        right_y = right['Y_value'][:min_len]
-
-        # 执行逻辑或：至少一个值非0则为1，否则为0
-        result['Y_value'] = [1 if (x != 0 or y != 0) else 0 for x, y in zip(result['Y_value'], right_y)]
-        
-        # 更新channel_name为表达式表示
-        left_name = left.get('channel_name', 'unknown')
-        right_name = right.get('channel_name', 'unknown')
-        result['channel_name'] = f"({left_name}|{right_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        print(f"逻辑或运算结果: channel_name={result['channel_name']}, is_expression_result={result.get('is_expression_result')}")
-        
-        return result
-
-    def not_operand(self, operand):
-        """执行逻辑非运算"""
-        print(f"逻辑非运算调试:")
-        operand_y = operand.get('Y_value', [])
-        operand_y_len = len(operand_y) if isinstance(operand_y, list) else f"scalar({operand_y})"
-        print(f"  operand: is_constant={operand.get('is_constant')}, channel_name={operand.get('channel_name')}, Y_len={operand_y_len}")
-        
-        # 如果是常量，返回常量结果
-        if operand.get('is_constant', False):
-            result_value = 1 if operand['Y_value'] == 0 else 0
-            return {
-                'X_value': [],
-                'Y_value': result_value,
-                'channel_name': f"(!{operand['channel_name']})",
-                'is_constant': True
-            }
-        
-        # 对于通道数据
-        result = operand.copy()
-        # 确保Y_value是列表
-        if not isinstance(result['Y_value'], list):
-            result['Y_value'] = [result['Y_value']]
-        
-        # 逻辑非：0变为1，非0变为0
-        result['Y_value'] = [1 if y == 0 else 0 for y in result['Y_value']]
-        
-        # 更新channel_name为表达式表示
-        operand_name = operand.get('channel_name', 'unknown')
-        result['channel_name'] = f"(!{operand_name})"
-        result['is_expression_result'] = True  # 标记为表达式结果
-        
-        print(f"逻辑非运算结果: channel_name={result['channel_name']}, is_expression_result={result.get('is_expression_result')}")
-        
-        return result
-    
-    def factor(self):
-        """解析括号、通道标识符、数字常量和函数调用（支持前缀），以及一元非运算符"""
-        if self.current < len(self.tokens):
-            token = self.tokens[self.current]
-
-            # 处理一元非运算符
-            if token == '!':
-                self.current += 1
-                operand = self.factor()
-                return self.not_operand(operand)
-
-            # 处理括号表达式
-            elif token == '(':
-                self.current += 1
-                result = self.expression()
-
-                # 必须有匹配的右括号
-                if self.current < len(self.tokens) and self.tokens[self.current] == ')':
-                    self.current += 1
-                    return result
-                else:
-                    raise ValueError("缺少右括号")
-
-            # 处理数字常量
-            elif self.is_number(token):
-                self.current += 1
-                # 返回数字常量，格式与通道数据一致
-                return {
-                    'X_value': [],  # 数字常量没有X轴数据
-                    'Y_value': float(token),  # 数字常量作为标量值
-                    'channel_name': str(token),
-                    'is_constant': True  # 标记为常量
-                }
-
-            # 处理函数类型前缀
-            elif token in ['[Python]', '[Matlab]']:
-                prefix = token
-                self.current += 1
-                
-                # 下一个token应该是函数名
-                if self.current < len(self.tokens):
-                    function_name = self.tokens[self.current]
-                    # 检查是否是函数调用（有左括号）
-                    if (self.current + 1 < len(self.tokens) and 
-                        self.tokens[self.current + 1] == '('):
-                        return self.parse_function_call(function_name, prefix)
-                    else:
-                        raise ValueError(f"期望在 {prefix} 后有函数调用")
-                else:
-                    raise ValueError(f"期望在 {prefix} 后有函数名")
-
-            # 处理通道标识符或函数调用（无前缀）
-            elif token.isalpha() or '_' in token:
-                # 检查是否是函数调用
-                if self.current + 1 < len(self.tokens) and self.tokens[self.current + 1] == '(':
-                    return self.parse_function_call(token)
-                else:
-                    self.current += 1
-                    # 处理通道标识符
-                    channel_key = token
-
-                    # 检查是否是通道键格式（通道名_炮号）
-                    if '_' in channel_key and len(channel_key.split('_')) == 2:
-                        # 根据上下文决定处理方式
-                        if self.should_return_channel_string():
-                            # 在导入函数参数中，返回通道名字符串
-                            print(f"导入函数参数 - 识别通道键: {channel_key}，返回通道名字符串")
-                            return {
-                                'X_value': [],
-                                'Y_value': channel_key,  # 使用通道名作为值
-                                'channel_name': channel_key,
-                                'is_constant': False,
-                                'is_channel_name': True  # 标记这是一个通道名参数
-                            }
-                        else:
-                            # 在表达式运算或内置函数中，获取实际通道数据
-                            print(f"表达式运算 - 识别通道键: {channel_key}，获取通道数据")
-                            result = self._get_channel_data_safely(channel_key)
-                            print(f"factor方法返回的通道数据: channel_name={result.get('channel_name')}, is_constant={result.get('is_constant')}")
-                            return result
-                    else:
-                        # 不是标准通道键格式，尝试获取通道数据
-                        return self._get_channel_data_safely(channel_key)
-    
-    def _get_channel_data_safely(self, channel_key):
-        """安全地获取通道数据，失败时回退到通道名字符串"""
+    start_time = time.time()
+    try:
+        data = json.loads(request.body)
+        channel_keys = data.get('channel_keys') or []
+        sample_mode = data.get('sample_mode', 'downsample')
+        sample_freq = float(data.get('sample_freq', 1000))
+        x_encoding = data.get('x_encoding', 'explicit')
+        downsample_algo = data.get('downsample_algo', DEFAULT_DOWNSAMPLE_ALGORITHM)
+        if downsample_algo not in DOWNSAMPLE_ALGORITHMS:
+            return OrJsonResponse({'error': f"不支持的降采样算法: {downsample_algo}"}, status=400)
         try:
-            # 直接使用传入的函数获取通道数据，传递None作为请求参数（由函数内部处理）
-            response = self.get_channel_data_func(None, channel_key)
-
-            if hasattr(response, 'content'):
-                # 对于HttpResponse对象
-                try:
-                    channel_data = json.loads(response.content.decode('utf-8'))
-                except Exception:
-                    raise ValueError(f"解析通道 {channel_key} 返回数据失败")
-            else:
-                # 对于JsonResponse对象
-                channel_data = response
-
-            # 检查返回的数据是否有效
-            if 'error' in channel_data:
-                raise ValueError(f"获取通道 {channel_key} 数据失败: {channel_data['error']}")
-
-            # 确保返回的数据包含所需的键
-            if 'X_value' not in channel_data or 'Y_value' not in channel_data:
-                raise ValueError(f"通道 {channel_key} 返回数据格式不正确，缺少 X_value 或 Y_value")
-
-            # 标记为通道数据
-            channel_data['is_constant'] = False
-            
-            # 确保channel_name字段正确设置
-            if 'channel_name' not in channel_data:
-                channel_data['channel_name'] = channel_key
-            
-            print(f"成功获取通道 {channel_key} 数据，数据点数: {len(channel_data.get('Y_value', []))}")
-            print(f"通道数据的channel_name: {channel_data.get('channel_name')}")
-            return channel_data
-        
-        except Exception as e:
-            # 获取通道数据失败时，根据上下文决定处理方式
-            if self.should_return_channel_string():
-                print(f"导入函数参数 - 获取通道 {channel_key} 数据失败: {str(e)}，回退到通道名字符串")
-                return {
-                    'X_value': [],
-                    'Y_value': channel_key,  # 使用通道名作为值
-                    'channel_name': channel_key,
-                    'is_constant': False,
-                    'is_channel_name': True  # 标记这是一个通道名参数
-                }
-            else:
-                # 在表达式运算中，失败就是失败
-                print(f"表达式运算 - 获取通道 {channel_key} 数据失败: {str(e)}")
-                raise ValueError(f"获取通道 {channel_key} 数据失败: {str(e)}")
-
-        raise ValueError(f"意外的标记: {self.tokens[self.current] if self.current < len(self.tokens) else 'EOF'}")
+            t_start, t_end, delta = parse_time_window(data)
+            fields = parse_channel_fields(data.get('fields'))
+        except ValueError as e:
+            return OrJsonResponse({'error': str(e)}, status=400)
+        if not isinstance(channel_keys, list) or len(channel_keys) == 0:
+            return OrJsonResponse({'error': 'channel_keys parameter is missing'}, status=400)
 
-    def is_number(self, token):
-        """检查token是否是数字"""
-        try:
-            float(token)
-            return True
-        except ValueError:
-            return False
-    
-    def parse_function_call(self, function_name, prefix=None):
-        """解析函数调用 - 增强版支持前缀和嵌套表达式"""
-        self.current += 1  # 跳过函数名
-        
-        if self.current >= len(self.tokens) or self.tokens[self.current] != '(':
-            raise ValueError(f"函数 {function_name} 缺少左括号")
-        
-        self.current += 1  # 跳过左括号
-        
-        # 推入函数调用上下文
-        context_info = {
-            'type': 'function_call',
-            'function_name': function_name,
-            'prefix': prefix,
-            'is_imported_function': bool(prefix or function_name not in ['FFT', 'Pca'])
-        }
-        self.context_stack.append(context_info)
-        
-        # 解析参数列表
-        args = []
-        arg_index = 0
-        while self.current < len(self.tokens) and self.tokens[self.current] != ')':
-            if self.tokens[self.current] == ',':
-                self.current += 1  # 跳过逗号
-                arg_index += 1
-                continue
-            
-            # 推入参数上下文
-            param_context = {
-                'type': 'function_argument',
-                'function_name': function_name,
-                'arg_index': arg_index,
-                'is_imported_function': context_info['is_imported_function']
-            }
-            self.context_stack.append(param_context)
-            
-            # 解析参数 - 支持完整的表达式（包括嵌套函数调用）
-            arg = self.expression()
-            
-            # 弹出参数上下文
-            self.context_stack.pop()
-            
-            args.append(arg)
-            
-            # 如果下一个token是逗号，继续解析下一个参数
-            if (self.current < len(self.tokens) and 
-                self.tokens[self.current] == ','):
-                continue
-            # 如果下一个token是右括号，结束参数解析
-            elif (self.current < len(self.tokens) and 
-                  self.tokens[self.current] == ')'):
-                break
-            else:
-                # 如果既不是逗号也不是右括号，可能有语法错误
-                if self.current < len(self.tokens):
-                    raise ValueError(f"函数 {function_name} 参数解析错误，意外的token: {self.tokens[self.current]}")
-                else:
-                    raise ValueError(f"函数 {function_name} 参数解析未完成")
-        
-        if self.current >= len(self.tokens) or self.tokens[self.current] != ')':
-            raise ValueError(f"函数 {function_name} 缺少右括号")
-        
-        self.current += 1  # 跳过右括号
-        
-        # 弹出函数调用上下文
-        self.context_stack.pop()
-        
-        # 调用相应的函数处理
-        return self.call_function(function_name, args, prefix)
-    
-    def should_return_channel_string(self):
-        """判断当前上下文是否应该返回通道名字符串而不是通道数据"""
-        # 检查是否在导入函数的参数中，且这个参数是单独的通道名
-        for context in reversed(self.context_stack):
-            if context.get('type') == 'function_argument':
-                # 如果是导入函数的参数
-                if context.get('is_imported_function', False):
-                    # 需要进一步检查是否是单独的通道名（非表达式）
-                    return self._is_single_channel_argument()
-        return False
-    
-    def _is_single_channel_argument(self):
-        """检查当前是否是单独的通道名参数（非表达式）"""
-        # 如果下一个token是运算符，说明这是表达式的一部分
-        if self.current < len(self.tokens):
-            next_token = self.tokens[self.current]
-            if next_token in ['+', '-', '*', '/', '(']:
-                return False  # 这是表达式，不是单独的通道名
-        
-        # 检查前一个token是否是运算符
-        if self.current > 1:
-            prev_token = self.tokens[self.current - 2]  # current已经+1了，所以-2
-            if prev_token in ['+', '-', '*', '/', ')']:
-                return False  # 这是表达式的一部分
-        
-        return True  # 看起来是单独的通道名
-    
-    def is_in_expression_context(self):
-        """判断是否在表达式运算上下文中（需要实际数据）"""
-        # 如果没有函数上下文，或者在内置函数中，都需要实际数据
-        for context in reversed(self.context_stack):
-            if context.get('type') == 'function_argument':
-                # 在内置函数参数中，需要实际数据
-                return not context.get('is_imported_function', False)
-        return True  # 默认需要实际数据
-    
-    def parse_function_argument(self):
-        """专门用于解析函数参数 - 对于导入函数，通道名参数返回字符串表示"""
-        if self.current < len(self.tokens):
-            token = self.tokens[self.current]
-
-            # 处理括号表达式
-            if token == '(':
-                self.current += 1
-                result = self.expression()
-
-                # 必须有匹配的右括号
-                if self.current < len(self.tokens) and self.tokens[self.current] == ')':
-                    self.current += 1
-                    return result
-                else:
-                    raise ValueError("缺少右括号")
-
-            # 处理数字常量
-            elif self.is_number(token):
-                self.current += 1
-                # 返回数字常量，格式与通道数据一致
-                return {
-                    'X_value': [],  # 数字常量没有X轴数据
-                    'Y_value': float(token),  # 数字常量作为标量值
-                    'channel_name': str(token),
-                    'is_constant': True  # 标记为常量
-                }
+        logs = []
+        results = get_channels(channel_keys, sample_mode, sample_freq, x_encoding, downsample_algo, t_start, t_end, delta,
+                               fields, logs)
+        failed = sum(1 for value in results.values() if 'error' in value)
+        print(f"批量获取通道数据: {len(results)} 个通道, {logs[-1]}, 失败 {failed} 个, "
+              f"总耗时 {time.time() - start_time:.2f}秒")
 
-            # 处理函数类型前缀
-            elif token in ['[Python]', '[Matlab]']:
-                prefix = token
-                self.current += 1
-                
-                # 下一个token应该是函数名
-                if self.current < len(self.tokens):
-                    function_name = self.tokens[self.current]
-                    # 检查是否是函数调用（有左括号）
-                    if (self.current + 1 < len(self.tokens) and 
-                        self.tokens[self.current + 1] == '('):
-                        return self.parse_function_call(function_name, prefix)
-                    else:
-                        raise ValueError(f"期望在 {prefix} 后有函数调用")
-                else:
-                    raise ValueError(f"期望在 {prefix} 后有函数名")
+        return OrJsonResponse({
+            'success': True,
+            'data': results,
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return OrJsonResponse({'error': str(e)}, status=500)
 
-            # 处理通道标识符或函数调用（无前缀）
-            elif token.isalpha() or '_' in token:
-                # 检查是否是函数调用
-                if self.current + 1 < len(self.tokens) and self.tokens[self.current + 1] == '(':
-                    return self.parse_function_call(token)
-                else:
-                    # 对于导入函数的参数，如果看起来是通道名，直接返回通道名字符串
-                    self.current += 1
-                    return {
-                        'X_value': [],
-                        'Y_value': token,  # 直接使用token作为值
-                        'channel_name': token,
-                        'is_constant': False,
-                        'is_channel_name': True  # 标记这是一个通道名参数
-                    }
+def load_channel_pyramid(cache_key, data_y):
+    """
+    获取通道的 min/max 金字塔，首次访问时由原始信号构建并存入磁盘缓存
+    返回 (pyramid, levels)
+    """
+    cached = signal_cache.get_sidecar(cache_key, 'pyramid')
+    if cached is not None:
+        pyramid, info = cached
+        return pyramid, info['levels']
+    build_start_time = time.time()
+    pyramid, levels = build_pyramid(data_y)
+    signal_cache.put_sidecar(cache_key, 'pyramid', pyramid, {'levels': levels})
+    print(f"构建金字塔 {cache_key}: {len(levels)} 级, 耗时 {time.time() - build_start_time:.2f}秒")
+    return pyramid, levels
 
-        raise ValueError(f"意外的标记: {self.tokens[self.current] if self.current < len(self.tokens) else 'EOF'}")
-    
-    def call_function(self, function_name, args, prefix=None):
-        """调用函数（内置函数或导入函数）"""
-        # 如果有前缀，说明是导入函数
-        if prefix:
-            return self.call_imported_function(function_name, args, prefix)
-        else:
-            # 检查是否是内置函数
-            if function_name in ['FFT', 'Pca']:
-                return self.call_builtin_function(function_name, args)
-            else:
-                # 可能是无前缀的导入函数，尝试调用
-                return self.call_imported_function(function_name, args, None)
-    
-    def call_builtin_function(self, function_name, args):
-        """调用内置函数"""
-        if function_name == 'FFT':
-            return self.fft_function(args)
-        elif function_name == 'Pca':
-            return self.pca_function(args)
-        else:
-            raise ValueError(f"未知的内置函数: {function_name}")
-    
-    def call_imported_function(self, function_name, args, prefix=None):
-        """调用导入函数 - 重写版本支持正确的参数处理"""
+@require_GET
+def get_channel_view(request):
+    """
+    按缩放级别获取通道数据
+    参数: channel_key, t_start, t_end（可选，默认整个通道）, pixel_width（默认1000）
+    从 min/max 金字塔中选取合适的级别，每个像素列返回最小值和最大值点，尖峰不会丢失
+    """
+    start_time = time.time()
+    try:
+        channel_key = request.GET.get('channel_key')
+        if not channel_key:
+            return OrJsonResponse({'error': 'channel_key parameter is missing'}, status=400)
         try:
-            # 从imported_functions.json中查找函数信息
-            if not os.path.exists(FUNCTIONS_FILE_PATH):
-                raise ValueError("导入函数配置文件不存在")
-
-            with open(FUNCTIONS_FILE_PATH, "r", encoding='utf-8') as f:
-                functions_data = json.load(f)
-
-            # 根据前缀确定函数类型
-            preferred_extension = None
-            if prefix == '[Python]':
-                preferred_extension = '.py'
-            elif prefix == '[Matlab]':
-                preferred_extension = '.m'
-
-            # 查找匹配的函数
-            all_matches = [d for d in functions_data if d.get('name') == function_name]
-
-            matched_func = None
-            if preferred_extension:
-                # 优先查找指定类型的函数
-                for func in all_matches:
-                    file_path = func.get('file_path', '')
-                    if file_path.endswith(preferred_extension):
-                        matched_func = func
-                        break
-
-            # 如果没找到指定类型的函数，使用第一个匹配的函数
-            if not matched_func and all_matches:
-                matched_func = all_matches[0]
-
-            if not matched_func:
-                raise ValueError(f"未找到导入函数: {function_name}")
-
-            # 构建函数调用的参数数据 - 重写版本
-            parameters = []
-            parameter_strings = []  # 用于构建函数调用字符串
-            
-            print(f"导入函数 {function_name} 参数调试:")
-            for i, arg in enumerate(args):
-                print(f"  参数 {i}: 类型={type(arg)}")
-                if isinstance(arg, dict):
-                    print(f"    字典键: {list(arg.keys())}")
-                    print(f"    is_constant: {arg.get('is_constant', 'None')}")
-                    print(f"    is_channel_name: {arg.get('is_channel_name', 'None')}")
-                    print(f"    is_expression_result: {arg.get('is_expression_result', 'None')}")
-                    print(f"    channel_name: {arg.get('channel_name', 'None')}")
-                    print(f"    function_type: {arg.get('function_type', 'None')}")
-            
-            for arg in args:
-                if arg.get('is_constant', False):
-                    # 常量参数直接使用数值
-                    param_value = arg['Y_value']
-                    parameters.append(param_value)
-                    parameter_strings.append(str(param_value))
-                    
-                elif arg.get('is_channel_name', False):
-                    # 通道名参数直接使用通道名字符串
-                    channel_name = arg['channel_name']
-                    parameters.append(channel_name)
-                    parameter_strings.append(channel_name)
-                    
-                elif arg.get('is_expression_result', False):
-                    # 这是表达式运算的结果，使用表达式字符串作为标识符
-                    expr_str = arg.get('channel_name', 'expression_result')
-                    parameters.append(expr_str)
-                    parameter_strings.append(expr_str)
-                    print(f"处理表达式结果参数: {expr_str}")
-                    
-                elif arg.get('function_type') == 'imported':
-                    # 这是一个导入函数的执行结果，传递函数调用字符串
-                    func_str = arg.get('channel_name', 'unknown_function')
-                    parameters.append(func_str)
-                    parameter_strings.append(func_str)
-                    
-                elif arg.get('function_type') == 'FFT':
-                    # 这是FFT函数的结果，传递函数调用字符串
-                    func_str = arg.get('channel_name', 'FFT_result')
-                    parameters.append(func_str)
-                    parameter_strings.append(func_str)
-                    
-                else:
-                    # 通道数据或其他类型 - 对于导入函数，应该传递通道名而不是数据
-                    if 'channel_name' in arg:
-                        channel_name = arg['channel_name']
-                        # 检查是否是通道键格式（通道名_炮号）
-                        if '_' in channel_name and not channel_name.startswith('('):
-                            # 这看起来像是通道键，直接使用
-                            parameters.append(channel_name)
-                            parameter_strings.append(channel_name)
-                        else:
-                            # 这是其他类型的数据，使用通道名或标识符
-                            parameters.append(channel_name)
-                            parameter_strings.append(channel_name)
-                    else:
-                        # 回退到未知标识符
-                        parameters.append('unknown')
-                        parameter_strings.append('unknown')
-
-            # 构建函数调用字符串
-            if prefix:
-                original_func_str = f"{prefix}{function_name}({','.join(parameter_strings)})"
-            else:
-                original_func_str = f"{function_name}({','.join(parameter_strings)})"
-
-            print(f"调用导入函数: {original_func_str}")
-            print(f"参数列表: {parameters}")
-
-            # 准备调用execute_function的数据
-            execute_data = {
-                "matched_function": matched_func,
-                "target_file_name": function_name,
-                "parameters": parameters,
-                "original_func_str": original_func_str
-            }
+            channel_name, shot_number = parse_channel_key(channel_key)
+            pixel_width = max(int(request.GET.get('pixel_width', 1000)), 1)
+            t_start = request.GET.get('t_start')
+            t_end = request.GET.get('t_end')
+            t_start = float(t_start) if t_start not in (None, '') else None
+            t_end = float(t_end) if t_end not in (None, '') else None
+        except ValueError as e:
+            return OrJsonResponse({'error': str(e)}, status=400)
 
-            # 调用execute_function执行导入函数
-            result = execute_function(execute_data)
-
-            if 'error' in result:
-                raise ValueError(f"执行导入函数失败: {result['error']}")
-
-            # 处理返回结果
-            if 'result' in result:
-                function_result = result['result']
-                # 确保返回格式与通道数据一致
-                if not isinstance(function_result, dict):
-                    # 如果返回的不是字典，转换为标准格式
-                    return {
-                        'X_value': [],
-                        'Y_value': function_result,
-                        'channel_name': original_func_str,
-                        'is_constant': True
-                    }
-                else:
-                    # 确保有必要的键
-                    if 'X_value' not in function_result:
-                        function_result['X_value'] = []
-                    if 'Y_value' not in function_result:
-                        function_result['Y_value'] = []
-                    if 'channel_name' not in function_result:
-                        function_result['channel_name'] = original_func_str
-                    
-                    function_result['is_constant'] = False
-                    function_result['function_type'] = 'imported'
-                    print(f"导入函数 {function_name} 执行成功，返回数据点数: {len(function_result.get('Y_value', []))}")
-                    return function_result
-            else:
-                raise ValueError("导入函数返回结果格式错误")
+        time_context = channel_time_context(channel_name)
+        DB_list, located = channel_db_order(shot_number, channel_name)
 
-        except Exception as e:
-            print(f"调用导入函数 {function_name} 失败: {str(e)}")
-            raise ValueError(f"调用导入函数 {function_name} 失败: {str(e)}")
-    
-    def fft_function(self, args):
-        """FFT函数实现"""
-        if len(args) < 1:
-            raise ValueError("FFT函数至少需要1个参数（通道数据）")
-        
-        # 获取通道数据
-        channel_data = args[0]
-        if channel_data.get('is_constant', False):
-            raise ValueError("FFT函数的第一个参数必须是通道数据，不能是常量")
-        
-        # 获取频率限制参数（可选）
-        frequency_limit = 1000.0  # 默认1000Hz
-        if len(args) > 1:
-            if args[1].get('is_constant', False):
-                frequency_limit = float(args[1]['Y_value'])
-            else:
-                raise ValueError("FFT函数的第二个参数（频率限制）必须是数值常量")
-        
-        # 执行FFT计算
-        x_values = np.array(channel_data['X_value'])
-        y_values = np.array(channel_data['Y_value'])
-        
-        if len(y_values) < 2:
-            raise ValueError("数据点数太少，无法进行FFT分析")
-        
-        # 计算采样间隔和频率
-        dt = (x_values[-1] - x_values[0]) / (len(x_values) - 1)
-        fs = 1.0 / dt
-        
-        # 执行FFT
-        fft_result = np.fft.fft(y_values)
-        amplitude = np.abs(fft_result)
-        freq = np.fft.fftfreq(len(y_values), d=dt)
-        
-        # 只保留正频率部分
-        positive_freq_indices = freq >= 0
-        freq_positive = freq[positive_freq_indices]
-        amplitude_positive = amplitude[positive_freq_indices]
-        
-        # 应用频率限制
-        if frequency_limit > 0:
-            freq_mask = freq_positive <= frequency_limit
-            freq_positive = freq_positive[freq_mask]
-            amplitude_positive = amplitude_positive[freq_mask]
-        
-        # 单边谱处理：除直流分量外，其他分量乘以2
-        if len(amplitude_positive) > 1:
-            amplitude_positive[1:] = amplitude_positive[1:] * 2
-        
-        return {
-            'X_value': freq_positive.tolist(),
-            'Y_value': amplitude_positive.tolist(),
-            'channel_name': f"FFT({channel_data.get('channel_name', 'unknown')})",
-            'X_unit': 'Hz',
-            'Y_unit': 'Amplitude',
-            'is_constant': False,
-            'function_type': 'FFT'
-        }
-    
-    def pca_function(self, args):
-        """PCA函数实现"""
-        if len(args) < 1:
-            raise ValueError("PCA函数至少需要1个参数（通道数据）")
-        
-        # 获取通道数据
-        channel_data = args[0]
-        if channel_data.get('is_constant', False):
-            raise ValueError("PCA函数的第一个参数必须是通道数据，不能是常量")
-        
-        # 获取主成分数量参数（可选）
-        n_components = 2  # 默认2个主成分
-        if len(args) > 1:
-            if args[1].get('is_constant', False):
-                n_components = int(args[1]['Y_value'])
-            else:
-                raise ValueError("PCA函数的第二个参数（主成分数量）必须是数值常量")
-        
-        # 获取窗口大小参数（可选）
-        window_size = 100  # 默认窗口大小
-        if len(args) > 2:
-            if args[2].get('is_constant', False):
-                window_size = int(args[2]['Y_value'])
-            else:
-                raise ValueError("PCA函数的第三个参数（窗口大小）必须是数值常量")
-        
-        # 执行PCA分析
-        x_values = np.array(channel_data['X_value'])
-        y_values = np.array(channel_data['Y_value'])
-        
-        if len(y_values) < window_size:
-            raise ValueError(f"数据点数({len(y_values)})少于窗口大小({window_size})")
-        
-        # 检查sklearn是否可用
-        if not sklearn_available:
-            raise ValueError("PCA功能需要安装scikit-learn库")
-        
-        # 创建滑动窗口数据矩阵
-        n_windows = len(y_values) - window_size + 1
-        window_data = np.zeros((n_windows, window_size))
-        
-        for i in range(n_windows):
-            window_data[i] = y_values[i:i + window_size]
-        
-        # 执行PCA
-        pca = PCA(n_components=min(n_components, window_size))
-        principal_components = pca.fit_transform(window_data)
-        
-        # 计算对应的时间轴（窗口中心时间）
-        window_centers = []
-        for i in range(n_windows):
-            center_idx = i + window_size // 2
-            window_centers.append(x_values[center_idx])
-        
-        # 返回第一主成分
-        return {
-            'X_value': window_centers,
-            'Y_value': principal_components[:, 0].tolist(),
-            'channel_name': f"PCA({channel_data.get('channel_name', 'unknown')})",
-            'X_unit': 's',
-            'Y_unit': 'PC1',
-            'is_constant': False,
-            'function_type': 'PCA',
-            'pca_info': {
-                'explained_variance_ratio': pca.explained_variance_ratio_.tolist(),
-                'n_components': n_components,
-                'window_size': window_size
+        for DB in DB_list:
+            data_x, data_y, unit = read_channel_signal(DB, MDS_DBS[DB], shot_number, channel_name, time_context)
+            if len(data_x) == 0:
+                continue
+            record_channel_location(shot_number, channel_name, DB, located)
+            pyramid, levels = load_channel_pyramid((DB, shot_number, channel_name) + time_context, data_y)
+
+            # 时间区间转换为下标区间，时间轴单调递增，二分查找即可
+            start = 0 if t_start is None else int(np.searchsorted(data_x, t_start, side='left'))
+            stop = len(data_x) if t_end is None else int(np.searchsorted(data_x, t_end, side='right'))
+            indices, level = view_indices(data_y, pyramid, levels, start, stop, pixel_width)
+
+            X_value = np.asarray(data_x[indices], dtype=np.float64)
+            Y_value = np.asarray(data_y[indices], dtype=np.float64)
+            data = {
+                'channel_number': channel_name,
+                'X_value': X_value,
+                'Y_value': Y_value,
+                'X_unit': 's',
+                'Y_unit': str(unit) if unit is not None else 'Y',
+                'points': len(indices),
+                'raw_points': stop - start,
+                'level_bucket': level['bucket'] if level else 1,
+                'is_downsampled': len(indices) < stop - start,
+                'stats': {
+                    'y_min': float(Y_value.min()) if len(Y_value) else None,
+                    'y_max': float(Y_value.max()) if len(Y_value) else None,
+                    'x_min': float(X_value[0]) if len(X_value) else None,
+                    'x_max': float(X_value[-1]) if len(X_value) else None,
+                },
             }
-        }
+            print(f"通道视图 {channel_key}: 区间 {stop - start} 点 -> {len(indices)} 点, "
+                  f"桶大小 {data['level_bucket']}, 耗时 {time.time() - start_time:.3f}秒")
+            return ChannelDataResponse(request, data)
 
+        return OrJsonResponse({'error': f'未找到通道数据: {channel_key}'}, status=404)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return OrJsonResponse({'error': str(e)}, status=500)
 
 def init_calculation(request):
     """初始化计算任务，返回唯一任务ID"""
@@ -2426,24 +907,12 @@ def init_calculation(request):
         data = json.loads(request.body)
         expression = data.get('expression', '')
         db_suffix = data.get('db_suffix', '')
-        
-        # 生成唯一任务ID
-        task_id = str(uuid.uuid4())
-        
-        # 初始化任务状态
-        calculation_tasks[task_id] = {
-            'status': 'initialized',
-            'step': '任务已创建',
-            'progress': 0,
-            'expression': expression,
-            'db_suffix': db_suffix,
-            'start_time': timezone.now().isoformat(),
-            'last_update': timezone.now().isoformat(),
-        }
-        
+
+        # 任务状态保存在共享的任务存储中，任意服务进程都可以查询进度
+        task_id = calc_tasks.task_store.create(expression=expression, db_suffix=db_suffix)['task_id']
+
         print(f"任务创建成功 - 任务ID: {task_id}, 表达式: {expression}, 数据库: {db_suffix}")
-        print(f"当前活跃任务数: {len(calculation_tasks)}")
-        
+
         return OrJsonResponse({'task_id': task_id, 'status': 'initialized'})
     except Exception as e:
         print(f"任务创建失败: {str(e)}")
@@ -2453,486 +922,389 @@ def init_calculation(request):
 
 @require_GET
 def get_calculation_progress(request, task_id):
-    """获取计算任务的进度"""
+    """获取计算任务的进度（客户端优先通过 ws/progress/ 订阅推送，见 api.websocket；过期任务由后台清理线程清理）"""
     try:
-        print(f"查询任务进度 - 任务ID: {task_id}")
-        print(f"当前活跃任务: {list(calculation_tasks.keys())}")
-        
-        if task_id not in calculation_tasks:
-            print(f"任务未找到 - 任务ID: {task_id}")
-            return OrJsonResponse({'error': '找不到指定的任务', 'task_id': task_id}, status=404)
-        
-        task_info = calculation_tasks[task_id]
-        print(f"任务状态 - ID: {task_id}, 步骤: {task_info['step']}, 进度: {task_info['progress']}%, 状态: {task_info['status']}")
-        
-        # 清理过期任务（超过30分钟的任务），但不包括当前查询的任务
-        current_time = timezone.now()
-        expired_tasks = []
-        for t_id in list(calculation_tasks.keys()):
-            if t_id != task_id:  # 不清理当前查询的任务
-                try:
-                    last_update = datetime.fromisoformat(calculation_tasks[t_id]['last_update'])
-                    if (current_time - last_update).total_seconds() > 1800:  # 30分钟
-                        expired_tasks.append(t_id)
-                except Exception as e:
-                    print(f"解析任务更新时间出错: {str(e)}")
-                    expired_tasks.append(t_id)
-        
-        # 清理过期任务
-        for expired_id in expired_tasks:
-            calculation_tasks.pop(expired_id, None)
-            print(f"清理过期任务: {expired_id}")
-        
-        return OrJsonResponse(task_info)
-    except Exception as e:
-        print(f"获取任务进度出错: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return OrJsonResponse({'error': str(e)}, status=500)
-
-def update_calculation_progress(task_id, step, progress, status='processing'):
-    """更新计算任务的进度（供内部使用）"""
-    if task_id in calculation_tasks:
-        calculation_tasks[task_id].update({
-            'status': status,
-            'step': step,
-            'progress': max(0, min(100, progress)),  # 确保进度在0-100范围内
-            'last_update': timezone.now().isoformat()
-        })
-        
-        # 添加详细日志以便调试
-        print(f"进度更新 - 任务ID: {task_id}, 步骤: {step}, 进度: {progress}%, 状态: {status}")
+        task_info = calc_tasks.task_store.load(task_id)
+    except ValueError as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+    if task_info is None:
+        print(f"任务未找到 - 任务ID: {task_id}")
+        return OrJsonResponse({'error': '找不到指定的任务', 'task_id': task_id}, status=404)
+    return OrJsonResponse(task_info)
 
 def operator_strs(request):
     """
     处理计算请求
+    计算由后台执行器执行（见 api.calc_tasks）。请求体中 async=true 时立即返回任务ID（202），
+    客户端通过 ws/progress/ 订阅进度（或 calculation-progress/<task_id> 查询）、calculation-result/<task_id> 获取结果、
+    calculation-cancel/<task_id> 取消；否则等待计算完成后直接返回结果
     """
     try:
         data = json.loads(request.body)
-        anomaly_func_str = data.get('anomaly_func_str')
-        channel_mess = data.get('channel_mess')
+    except ValueError:
+        return OrJsonResponse({'error': '请求体不是有效的JSON'}, status=400)
+    anomaly_func_str = data.get('anomaly_func_str')
+    if not anomaly_func_str:
+        return OrJsonResponse({'error': '缺少表达式 anomaly_func_str'}, status=400)
+    if data.get('sample_mode', 'downsample') not in ('downsample', 'full'):
+        return OrJsonResponse({'error': f"不支持的采样模式: {data.get('sample_mode')}，可选: downsample, full"}, status=400)
+    try:
+        time_axis.parse_align(data.get('align_mode'), data.get('align_dt'))
+        # 任务通常由 operator-strs/init 创建；未提供或已被清理时重新创建
         task_id = data.get('task_id')
-        # 获取采样率参数，如果未提供则默认为1.0 KHz
-        sample_freq = data.get('sample_freq', 1.0)
-        
-        # 立即打印调试信息
-        print(f"=== operator_strs 开始执行 ===")
-        print(f"接收到任务ID: {task_id}")
-        print(f"当前活跃任务: {list(calculation_tasks.keys())}")
-        print(f"任务ID是否存在: {task_id in calculation_tasks if task_id else False}")
-        
-        # 如果提供了任务ID，检查并更新进度
-        if task_id:
-            if task_id in calculation_tasks:
-                print(f"任务存在，开始更新进度...")
-                update_calculation_progress(task_id, '开始解析表达式', 5)
-            else:
-                print(f"警告：任务ID {task_id} 不存在于 calculation_tasks 中！")
-                # 重新创建任务（作为备用方案）
-                calculation_tasks[task_id] = {
-                    'status': 'processing',
-                    'step': '开始解析表达式',
-                    'progress': 5,
-                    'expression': anomaly_func_str,
-                    'start_time': timezone.now().isoformat(),
-                    'last_update': timezone.now().isoformat(),
-                }
-                print(f"重新创建任务: {task_id}")
-        else:
-            print("警告：没有提供任务ID")
-        
-        print(f"收到计算请求: {anomaly_func_str}")
-        print(f"采样率设置: {sample_freq} KHz")
-        # print(f"通道数据: {len(channel_mess) if isinstance(channel_mess, list) else 1} 个通道")
-
-        # 判定是否函数名是导入函数
-        end_idx = anomaly_func_str.find('(')
-
-        # 检查是否是带前缀的函数调用（如 [Python]FileName 或 [Matlab]FileName）
-        is_prefixed_function = False
-        actual_file_name = ""
-        file_extension = ""
-
-        if end_idx > 0 and ')' in anomaly_func_str[end_idx:]:
-            # 检查是否以 [Python] 或 [Matlab] 开头
-            if anomaly_func_str.startswith('[Python]') or anomaly_func_str.startswith('[Matlab]'):
-                is_prefixed_function = True
-                # 提取实际的文件名（去掉前缀）
-                if anomaly_func_str.startswith('[Python]'):
-                    actual_file_name = anomaly_func_str[8:end_idx]  # 去掉 "[Python]"
-                    file_extension = '.py'
-                elif anomaly_func_str.startswith('[Matlab]'):
-                    actual_file_name = anomaly_func_str[8:end_idx]  # 去掉 "[Matlab]"
-                    file_extension = '.m'
-
-        # 原有的函数调用判断逻辑（不带前缀的函数）
-        # 需要检查从开始到'('之间的所有字符是否构成有效的函数名（只能包含字母、数字、下划线）
-        is_function_call = False
-        if end_idx > 0 and ')' in anomaly_func_str[end_idx:]:
-            potential_function_name = anomaly_func_str[:end_idx]
-            # 检查是否是有效的函数名（只包含字母、数字、下划线，且以字母开头）
-            is_function_call = (potential_function_name.isidentifier() and 
-                              potential_function_name[0].isalpha() and
-                              not any(op in potential_function_name for op in ['+', '-', '*', '/', '&', '|', '!']))
-
-        # 如果是带前缀的函数调用，也认为是函数调用
+        if not task_id or calc_tasks.task_store.load(task_id) is None:
+            task_id = calc_tasks.task_store.create(task_id, expression=anomaly_func_str)['task_id']
+    except ValueError as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+
+    try:
+        future = calc_tasks.executor.submit(task_id, lambda ctx: _run_operator_strs(data, ctx))
+    except calc_tasks.TaskQueueFull as e:
+        calc_tasks.task_store.update(task_id, status='failed', step=str(e), error=str(e))
+        return OrJsonResponse({'error': str(e), 'task_id': task_id}, status=503)
+    print(f"计算任务已提交 - 任务ID: {task_id}, 表达式: {anomaly_func_str}")
+
+    if data.get('async'):
+        return OrJsonResponse({'task_id': task_id, 'status': 'queued'}, status=202)
+    status, body = future.result()
+    if status == 'completed':
+        return HttpResponse(body, content_type='application/json')
+    return OrJsonResponse({'error': body, 'task_id': task_id}, status=409 if status == 'cancelled' else 500)
+
+def _run_operator_strs(data, ctx):
+    """
+    执行 operator_strs 的计算（在 calc_tasks 执行器的线程中运行）
+    ctx 为 calc_tasks.TaskContext，用于报告阶段进度和响应取消；返回响应数据，出错时抛出异常
+    """
+    anomaly_func_str = data.get('anomaly_func_str')
+    channel_mess = data.get('channel_mess')
+    # 获取采样率参数，如果未提供则默认为1.0 KHz；sample_mode=full 时使用原始采样率
+    sample_freq = data.get('sample_freq', 1.0)
+    sample_mode = data.get('sample_mode', 'downsample')
+    # 分块求值: chunked=true/false 强制开启/关闭；未指定时 full 模式总是分块，其余模式结果点数较多时分块
+    chunked = data.get('chunked')
+    if chunked is None:
+        chunk_min_points = 0 if sample_mode == 'full' else EXPRESSION_CHUNK_THRESHOLD
+    else:
+        chunk_min_points = 0 if chunked else None
+    # 多通道运算的时间轴对齐方式（coarsest/finest/truncate）及可选的显式网格间隔
+    align_mode, align_dt = time_axis.parse_align(data.get('align_mode'), data.get('align_dt'))
+    ctx.stage('prepare', '开始解析表达式')
+
+    print(f"收到计算请求: {anomaly_func_str}")
+    print(f"采样率设置: {sample_freq} KHz")
+
+
+    # 判定是否函数名是导入函数
+    end_idx = anomaly_func_str.find('(')
+
+    # 检查是否是带前缀的函数调用（如 [Python]FileName 或 [Matlab]FileName）
+    is_prefixed_function = False
+    actual_file_name = ""
+    file_extension = ""
+
+    if end_idx > 0 and ')' in anomaly_func_str[end_idx:]:
+        # 检查是否以 [Python] 或 [Matlab] 开头
+        if anomaly_func_str.startswith('[Python]') or anomaly_func_str.startswith('[Matlab]'):
+            is_prefixed_function = True
+            # 提取实际的文件名（去掉前缀）
+            if anomaly_func_str.startswith('[Python]'):
+                actual_file_name = anomaly_func_str[8:end_idx]  # 去掉 "[Python]"
+                file_extension = '.py'
+            elif anomaly_func_str.startswith('[Matlab]'):
+                actual_file_name = anomaly_func_str[8:end_idx]  # 去掉 "[Matlab]"
+                file_extension = '.m'
+
+    # 原有的函数调用判断逻辑（不带前缀的函数）
+    # 需要检查从开始到'('之间的所有字符是否构成有效的函数名（只能包含字母、数字、下划线）
+    is_function_call = False
+    if end_idx > 0 and ')' in anomaly_func_str[end_idx:]:
+        potential_function_name = anomaly_func_str[:end_idx]
+        # 检查是否是有效的函数名（只包含字母、数字、下划线，且以字母开头）
+        is_function_call = (potential_function_name.isidentifier() and 
+                          potential_function_name[0].isalpha() and
+                          not any(op in potential_function_name for op in ['+', '-', '*', '/', '&', '|', '!']))
+
+    # 如果是带前缀的函数调用，也认为是函数调用
+    if is_prefixed_function:
+        is_function_call = True
+
+    # 创建通道键值映射，方便后续查找
+    channel_map = {}
+    if isinstance(channel_mess, list):
+        for channel in channel_mess:
+            # 使用"通道名_炮号"格式作为键
+            channel_key = f"{channel['channel_name']}_{channel['shot_number']}"
+            channel_map[channel_key] = channel
+    else:
+        # 兼容单通道情况
+        channel_key = f"{channel_mess['channel_name']}_{channel_mess['shot_number']}"
+        channel_map[channel_key] = channel_mess
+        
+    ctx.advance(1, 2, '数据准备完成')
+
+    # 检查是否是函数调用
+    if is_function_call:
+        # 如果是带前缀的函数调用，使用实际的文件名
         if is_prefixed_function:
-            is_function_call = True
-
-        # 创建通道键值映射，方便后续查找
-        channel_map = {}
-        if isinstance(channel_mess, list):
-            for channel in channel_mess:
-                # 使用"通道名_炮号"格式作为键
-                channel_key = f"{channel['channel_name']}_{channel['shot_number']}"
-                channel_map[channel_key] = channel
+            target_file_name = actual_file_name
+            target_extension = file_extension
         else:
-            # 兼容单通道情况
-            channel_key = f"{channel_mess['channel_name']}_{channel_mess['shot_number']}"
-            channel_map[channel_key] = channel_mess
-            
-        # 更新进度：数据准备完成
-        if task_id and task_id in calculation_tasks:
-            update_calculation_progress(task_id, '数据准备完成', 15)
-
-        # 检查是否是函数调用
-        if is_function_call:
-            # 如果是带前缀的函数调用，使用实际的文件名
-            if is_prefixed_function:
-                target_file_name = actual_file_name
-                target_extension = file_extension
-            else:
-                target_file_name = anomaly_func_str[:end_idx]
-                target_extension = None  # 不指定扩展名，会查找所有匹配的文件
-            print(f"识别到函数调用: {target_file_name} (原始字符串: {anomaly_func_str})")
+            target_file_name = anomaly_func_str[:end_idx]
+            target_extension = None  # 不指定扩展名，会查找所有匹配的文件
+        print(f"识别到函数调用: {target_file_name} (原始字符串: {anomaly_func_str})")
 
-            # 确保FUNCTIONS_FILE_PATH变量存在
-            functions_file_path = os.path.join(settings.MEDIA_ROOT, "imported_functions.json")
-            
-            if os.path.exists(functions_file_path):
-                with open(functions_file_path, "r", encoding='utf-8') as f:
-                    functions_data = json.load(f)
-                    # 添加详细调试信息
-                    print(f"从文件读取到的函数数据类型: {type(functions_data)}")
-                    print(f"函数数据长度: {len(functions_data) if isinstance(functions_data, list) else '不是列表'}")
-                    for i, item in enumerate(functions_data):
-                        print(f"条目 {i}: 类型={type(item)}, 内容={item}")
-            else:
-                functions_data = []
-                print("函数文件不存在，使用空列表")
-            
-            # 根据文件名和类型查找导入的函数
-            is_import_func = False
-            matched_function = None
-            for function in functions_data:
-                # 检查function是否为字典类型，过滤掉无效条目
-                if not isinstance(function, dict):
-                    print(f"警告：跳过无效的函数条目（不是字典类型）: {function}")
-                    continue
+        # 根据文件名和类型查找导入的函数
+        matched_function = function_registry.find_by_file(target_file_name, target_extension)
+        is_import_func = matched_function is not None
+
+        ctx.advance(2, 2, '函数识别完成')
+
+        if is_import_func:
                 
-                file_path = function.get('file_path', '')
-                # 提取文件名（不含扩展名）
-                file_basename = os.path.splitext(os.path.basename(file_path))[0]
+            func_data = {}
+            func_data['matched_function'] = matched_function  # 传递匹配的函数信息
+            func_data['target_file_name'] = target_file_name  # 传递目标文件名
+            func_data['original_func_str'] = anomaly_func_str  # 添加原始函数调用字符串
+            func_data['db_suffix'] = data.get('db_suffix')  # 从原始请求数据中获取数据库后缀
+            func_data['check'] = ctx.check  # 在算法进程池中执行时，任务取消会终止正在执行的算法
+            # 提取函数参数（无论是否带前缀，参数提取方式都一样）
+            params_str = anomaly_func_str[end_idx:].replace(" ", "").replace("(", "").replace(")", "")
+            func_data['parameters'] = params_str.split(',')
+
+            ##
+            # 智能参数转换：识别通道名（格式：通道名_炮号）和数字
+            ##
+            def convert_parameter(param):
+                """智能转换参数：如果是数字则转换为float，如果是通道名则保持字符串"""
+                param = param.strip()
                 
-                # 如果指定了扩展名，需要同时匹配文件名和扩展名
-                if target_extension:
-                    if file_basename == target_file_name and file_path.endswith(target_extension):
-                        is_import_func = True
-                        matched_function = function
-                        break
-                else:
-                    # 如果没有指定扩展名，只匹配文件名
-                    if file_basename == target_file_name:
-                        is_import_func = True
-                        matched_function = function
-                        break
-                    
-            # 更新进度：函数识别完成
-            if task_id and task_id in calculation_tasks:
-                update_calculation_progress(task_id, '函数识别完成', 25)
-
-            if is_import_func:
-                # 更新进度：开始执行导入函数
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, f'开始执行函数 {target_file_name}', 35)
-                    
-                func_data = {}
-                func_data['matched_function'] = matched_function  # 传递匹配的函数信息
-                func_data['target_file_name'] = target_file_name  # 传递目标文件名
-                func_data['original_func_str'] = anomaly_func_str  # 添加原始函数调用字符串
-                func_data['db_suffix'] = data.get('db_suffix')  # 从原始请求数据中获取数据库后缀
-                # 提取函数参数（无论是否带前缀，参数提取方式都一样）
-                params_str = anomaly_func_str[end_idx:].replace(" ", "").replace("(", "").replace(")", "")
-                func_data['parameters'] = params_str.split(',')
-
-                ##
-                # 智能参数转换：识别通道名（格式：通道名_炮号）和数字
-                ##
-                def convert_parameter(param):
-                    """智能转换参数：如果是数字则转换为float，如果是通道名则保持字符串"""
-                    param = param.strip()
-                    
-                    # 检查是否是通道名格式（包含下划线，且下划线后面是数字）
-                    if '_' in param:
-                        parts = param.split('_')
-                        if len(parts) == 2 and parts[1].isdigit():
-                            # 这是通道名格式，保持字符串
-                            return param
-                    
-                    # 尝试转换为数字
-                    try:
-                        # 先尝试转换为整数
-                        if param.isdigit() or (param.startswith('-') and param[1:].isdigit()):
-                            return int(param)
-                        # 再尝试转换为浮点数
-                        return float(param)
-                    except ValueError:
-                        # 如果都失败了，保持原始字符串
+                # 检查是否是通道名格式（包含下划线，且下划线后面是数字）
+                if '_' in param:
+                    parts = param.split('_')
+                    if len(parts) == 2 and parts[1].isdigit():
+                        # 这是通道名格式，保持字符串
                         return param
                 
-                # 对所有参数进行智能转换
-                func_data['parameters'] = [convert_parameter(param) for param in func_data['parameters']]
-
-                # 更新进度：函数参数解析完成
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '函数参数解析完成', 45)
+                # 尝试转换为数字
+                try:
+                    # 先尝试转换为整数
+                    if param.isdigit() or (param.startswith('-') and param[1:].isdigit()):
+                        return int(param)
+                    # 再尝试转换为浮点数
+                    return float(param)
+                except ValueError:
+                    # 如果都失败了，保持原始字符串
+                    return param
+            
+            # 对所有参数进行智能转换
+            func_data['parameters'] = [convert_parameter(param) for param in func_data['parameters']]
 
-                # 更新进度：执行函数中
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, f'执行函数 {target_file_name} 中', 60)
+            ctx.stage('compute', f'执行函数 {target_file_name} 中')
 
-                ret = execute_function(func_data)
-                
-                # 更新进度：函数执行完成
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '函数执行完成', 85)
-                    
-                # 标记计算完成，准备返回结果
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '计算完成，准备返回结果', 95)
-                    
-                # 最终完成状态会在前端处理结果后设置
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '计算完成', 100, 'completed')
-                    
-                return JsonResponse({"data": ret}, status=200)
-            else:
-                # 在这里检查是否是内置函数，如果是则使用表达式解析器处理
-                print("operator-strs:", anomaly_func_str)
-                
-                # 更新进度：开始特殊函数处理
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '开始特殊函数处理', 35)
-                
-                # 定义内置函数列表
-                builtin_functions = ['FFT', 'Pca']
+            ret = execute_function(func_data)
+            
+            ctx.advance(1, 1, '函数执行完成')
                 
-                # 检查是否是内置函数调用
-                is_builtin_function = False
-                for builtin_func in builtin_functions:
-                    if anomaly_func_str.startswith(builtin_func + '('):
-                        is_builtin_function = True
-                        break
+            return {"data": ret}
+        else:
+            # 在这里检查是否是内置函数，如果是则使用表达式解析器处理
+            print("operator-strs:", anomaly_func_str)
+            
+            # 检查是否是内置函数调用
+            is_builtin_function = False
+            for builtin_func in BUILTIN_FUNCTIONS:
+                if anomaly_func_str.startswith(builtin_func + '('):
+                    is_builtin_function = True
+                    break
+            
+            if is_builtin_function:
+                # 使用表达式解析器处理内置函数
+                print(f"识别到内置函数调用: {anomaly_func_str}")
                 
-                if is_builtin_function:
-                    # 使用表达式解析器处理内置函数
-                    print(f"识别到内置函数调用: {anomaly_func_str}")
-                    
-                    # 更新进度：处理内置函数
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, f'处理内置函数: {anomaly_func_str}', 45)
-                    
-                    try:
-                        # 创建表达式解析器
-                        parser = ExpressionParser(lambda req, key: get_channel_data(create_mock_request(key, sample_freq), key))
-                        
-                        # 更新进度：解析内置函数表达式
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, '解析内置函数表达式', 55)
-                        
-                        # 解析表达式
-                        result = parser.parse(anomaly_func_str)
-                        
-                        # 设置结果通道名
-                        result['channel_name'] = anomaly_func_str
-                        
-                        # 更新进度：内置函数计算完成
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, '内置函数计算完成', 85)
-                        
-                        # 标记计算完成
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, '计算完成', 100, 'completed')
-                        
-                        return JsonResponse({"data": {"result": result}}, status=200)
-                        
-                    except Exception as e:
-                        # 任务失败
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, f'内置函数处理出错: {str(e)}', 0, 'failed')
-                        raise ValueError(f"处理内置函数时出错: {str(e)}")
-                        
-                elif anomaly_func_str[:3] == 'Pca':
-                    # 保留旧的Pca处理逻辑，用于向后兼容
-                    print('使用旧版Pca处理逻辑')
+                try:
+                    # 创建表达式解析器
+                    parser = ExpressionParser(lambda key: get_channel(key, sample_mode=sample_mode, sample_freq=sample_freq,
+                                                            x_encoding='implicit', fields='x,y'),
+                                      cache_context=(float(sample_freq), sample_mode, 'implicit', align_mode, align_dt),
+                                      align_mode=align_mode, align_dt=align_dt, task=ctx, chunk_min_points=chunk_min_points,
+                                      function_registry=function_registry, execute_function=execute_function)
                     
-                    # 更新进度：开始PCA分析
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, '开始PCA分析', 45)
-                        
-                    anomaly_func_str = anomaly_func_str[3:]
-                    params_list = anomaly_func_str.replace(" ", "")[1:-1].split(',')
-                    [channel_name, period, condition_str, mode] = [params_list[0], ",".join(params_list[1:-2]),
-                                                                   params_list[-2], params_list[-1]]
-                    period = ast.literal_eval(period)
-                    print('xxx')
-                    # 使用第一个通道进行处理，保持向后兼容
-                    channel_to_use = channel_mess[0] if isinstance(channel_mess, list) else channel_mess
+                    # 解析表达式
+                    result = parser.parse(anomaly_func_str)
                     
-                    # 更新进度：PCA分析中
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, 'PCA分析计算中', 70)
-                        
-                    ret = period_condition_anomaly(channel_name, period, condition_str, mode, channel_to_use)
+                    # 设置结果通道名，前端需要显式时间轴
+                    result['channel_name'] = anomaly_func_str
+                    time_axis.decode_x(result)
                     
-                    # 更新进度：PCA分析完成
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, 'PCA分析完成', 90)
+                    return {"data": {"result": result}}
 
-                    print(ret)
-                    
-                    # 标记计算完成
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, '计算完成', 100, 'completed')
-                        
-                    return JsonResponse({"data": ret.tolist()}, status=200)
-                else:
-                    # 任务失败
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, f'未知的函数: {target_file_name}', 0, 'failed')
-                        
-                    raise ValueError(f"未知的函数: {target_file_name}")
-        else:
-            # 更新进度：开始表达式解析
-            if task_id and task_id in calculation_tasks:
-                update_calculation_progress(task_id, '开始表达式解析', 30)
-                
-            # 检查表达式是否包含括号或运算符
-            if '(' in anomaly_func_str or ')' in anomaly_func_str or any(op in anomaly_func_str for op in ['+', '-', '*', '/', '&', '|', '!']):
-                # 使用表达式解析器处理带括号和运算优先级的表达式
-                print(f"正在解析复杂表达式: {anomaly_func_str}")
-                
-                # 更新进度：解析复杂表达式
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '解析复杂表达式', 40)
+                except calc_tasks.TaskCancelled:
+                    raise
+                except Exception as e:
+                    raise ValueError(f"处理内置函数时出错: {str(e)}")
                     
-                # 修改表达式解析器初始化（新版本无需数据库选择）
-                parser = ExpressionParser(lambda req, key: get_channel_data(create_mock_request(key, sample_freq), key))
+            elif anomaly_func_str[:3] == 'Pca':
+                # 保留旧的Pca处理逻辑，用于向后兼容
+                print('使用旧版Pca处理逻辑')
                 
-                # 更新进度：获取通道数据
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '获取通道数据', 55)
+                ctx.stage('compute', '开始PCA分析')
                     
-                result = parser.parse(anomaly_func_str)
+                anomaly_func_str = anomaly_func_str[3:]
+                params_list = anomaly_func_str.replace(" ", "")[1:-1].split(',')
+                [channel_name, period, condition_str, mode] = [params_list[0], ",".join(params_list[1:-2]),
+                                                               params_list[-2], params_list[-1]]
+                period = ast.literal_eval(period)
+                print('xxx')
+                # 使用第一个通道进行处理，保持向后兼容
+                channel_to_use = channel_mess[0] if isinstance(channel_mess, list) else channel_mess
                 
-                # 更新进度：计算表达式结果
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '计算表达式结果', 75)
+                ret = period_condition_anomaly(channel_name, period, condition_str, mode, channel_to_use)
                 
-                # 设置结果通道名
-                result['channel_name'] = anomaly_func_str
-                
-                # 更新进度：表达式计算完成
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '表达式计算完成', 90)
+                ctx.advance(1, 1, 'PCA分析完成')
+
+                print(ret)
                 
-                # 标记计算完成
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, '计算完成', 100, 'completed')
-                    
-                return JsonResponse({"data": {"result": result}}, status=200)
+                return {"data": ret.tolist()}
             else:
-                # 处理单通道情况
-                channel_key = anomaly_func_str.strip()
-                
-                # 更新进度：查找通道数据
-                if task_id and task_id in calculation_tasks:
-                    update_calculation_progress(task_id, f'查找通道: {channel_key}', 40)
                     
-                if channel_key in channel_map:
-                    try:
-                        # 更新进度：获取通道数据
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, f'获取通道数据: {channel_key}', 60)
-                            
-                        # 创建包含采样率的请求对象（新版本无需数据库选择）
-                        mock_request = create_mock_request(channel_key, sample_freq)
-                        response = get_channel_data(mock_request, channel_key)
-                        channel_data = json.loads(response.content.decode('utf-8'))
-                        
-                        # 检查返回的数据是否有效
-                        if 'error' in channel_data:
-                            # 任务失败
-                            if task_id and task_id in calculation_tasks:
-                                update_calculation_progress(task_id, f'获取通道数据失败: {channel_data["error"]}', 0, 'failed')
-                                
-                            raise ValueError(f"获取通道 {channel_key} 数据失败: {channel_data['error']}")
-                        
-                        # 确保返回的数据包含所需的键
-                        if 'X_value' not in channel_data or 'Y_value' not in channel_data:
-                            # 任务失败
-                            if task_id and task_id in calculation_tasks:
-                                update_calculation_progress(task_id, f'通道数据格式错误: {channel_key}', 0, 'failed')
-                                
-                            raise ValueError(f"通道 {channel_key} 返回数据格式不正确，缺少 X_value 或 Y_value")
-                        
-                        # 设置通道名称
-                        channel_data['channel_name'] = channel_key
+                raise ValueError(f"未知的函数: {target_file_name}")
+    else:
+            
+        # 检查表达式是否包含括号或运算符
+        if '(' in anomaly_func_str or ')' in anomaly_func_str or any(op in anomaly_func_str for op in ['+', '-', '*', '/', '&', '|', '!']):
+            # 使用表达式解析器处理带括号和运算优先级的表达式
+            print(f"正在解析复杂表达式: {anomaly_func_str}")
+            
+            # 修改表达式解析器初始化（新版本无需数据库选择）
+            parser = ExpressionParser(lambda key: get_channel(key, sample_mode=sample_mode, sample_freq=sample_freq,
+                                                            x_encoding='implicit', fields='x,y'),
+                                      cache_context=(float(sample_freq), sample_mode, 'implicit', align_mode, align_dt),
+                                      align_mode=align_mode, align_dt=align_dt, task=ctx, chunk_min_points=chunk_min_points,
+                                      function_registry=function_registry, execute_function=execute_function)
+            
+            result = parser.parse(anomaly_func_str)
+            
+            # 设置结果通道名，前端需要显式时间轴
+            result['channel_name'] = anomaly_func_str
+            time_axis.decode_x(result)
+            
+            return {"data": {"result": result}}
+        else:
+            # 处理单通道情况
+            channel_key = anomaly_func_str.strip()
+            
+            if channel_key in channel_map:
+                ctx.stage('fetch', f'获取通道数据: {channel_key}')
+                try:
                         
-                        # 更新进度：处理通道数据
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, '处理通道数据完成', 85)
-                            
-                        # 标记计算完成
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, '计算完成', 100, 'completed')
-                            
-                        return JsonResponse({"data": {"result": channel_data}}, status=200)
-                    except Exception as e:
-                        # 任务失败
-                        if task_id and task_id in calculation_tasks:
-                            update_calculation_progress(task_id, f'处理通道数据出错: {str(e)}', 0, 'failed')
-                            
-                        raise ValueError(f"处理通道 {channel_key} 数据时出错: {str(e)}")
-                else:
-                    # 任务失败
-                    if task_id and task_id in calculation_tasks:
-                        update_calculation_progress(task_id, f'未找到通道: {channel_key}', 0, 'failed')
+                    # 进程内获取通道数据（新版本无需数据库选择），未找到时抛出异常
+                    channel_data = get_channel(channel_key, sample_mode=sample_mode, sample_freq=sample_freq)
+                    
+                    # 设置通道名称
+                    channel_data['channel_name'] = channel_key
+                    
+                    return {"data": {"result": channel_data}}
+                except Exception as e:
                         
-                    raise ValueError(f"未找到通道: {channel_key}")
-    except Exception as e:
-        # 如果提供了任务ID，标记任务失败
-        if 'task_id' in locals() and locals().get('task_id') and locals().get('task_id') in calculation_tasks:
-            update_calculation_progress(locals().get('task_id'), f'计算出错: {str(e)}', 0, 'failed')
-            
-        # 打印详细错误信息以便调试
-        import traceback
-        traceback.print_exc()
-        return JsonResponse({"error": str(e)}, status=500)
-
-# 添加一个创建模拟请求对象的辅助函数
-def create_mock_request(channel_key, sample_freq=1.0):
-    """创建模拟请求对象用于获取通道数据（新版本无需数据库选择）"""
-    class MockRequest:
-        def __init__(self, channel_key, sample_freq):
-            self.method = 'GET'  # 添加method属性，满足@require_GET装饰器要求
-            self.GET = {
-                'sample_mode': 'downsample',
-                'sample_freq': str(sample_freq)
-            }
-            self.channel_key = channel_key
-    
-    return MockRequest(channel_key, sample_freq)
+                    raise ValueError(f"处理通道 {channel_key} 数据时出错: {str(e)}")
+            else:
+                    
+                raise ValueError(f"未找到通道: {channel_key}")
+
+@require_POST
+def cancel_calculation(request, task_id):
+    """请求取消计算任务，执行任务的进程在下一个检查点中止"""
+    try:
+        cancelled = calc_tasks.task_store.request_cancel(task_id)
+    except ValueError as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+    task_info = calc_tasks.task_store.load(task_id)
+    if task_info is None:
+        return OrJsonResponse({'error': '找不到指定的任务', 'task_id': task_id}, status=404)
+    if not cancelled:
+        return OrJsonResponse({'error': f"任务已结束: {task_info['status']}", 'task_id': task_id}, status=409)
+    return OrJsonResponse(task_info)
+
+@require_GET
+def get_calculation_result(request, task_id):
+    """获取已完成计算任务的结果，格式与 operator-strs 同步返回的一致"""
+    try:
+        task_info = calc_tasks.task_store.load(task_id)
+    except ValueError as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+    if task_info is None:
+        return OrJsonResponse({'error': '找不到指定的任务', 'task_id': task_id}, status=404)
+    if task_info['status'] != 'completed':
+        return OrJsonResponse({'error': f"任务尚未完成: {task_info['status']}", 'task_id': task_id,
+                               'status': task_info['status']}, status=409)
+    body = calc_tasks.task_store.read_result(task_id)
+    if body is None:
+        return OrJsonResponse({'error': '任务结果已过期', 'task_id': task_id}, status=410)
+    return HttpResponse(body, content_type='application/json')
+
+@csrf_exempt
+@require_POST
+def operator_strs_batch(request):
+    """
+    在一组炮号上批量计算同一个表达式模板
+    请求体: anomaly_func_str 表达式模板（"IP - MP01" 自动补炮号，或使用 {shot} 占位符），
+           shots 炮号列表或 "起始-结束,炮号" 字符串，sample_freq / align_mode / align_dt 同 operator-strs，
+           stream=true 时以 NDJSON 流式返回，每完成一个炮号推送一行（含结果数据）
+    结果保存在任务存储中，可通过 operator-strs/batch/<job_id> 和 operator-strs/batch/<job_id>/<shot> 读取
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return OrJsonResponse({'error': '请求体不是有效的JSON'}, status=400)
+    template = (data.get('anomaly_func_str') or '').strip()
+    if not template:
+        return OrJsonResponse({'error': '缺少表达式模板 anomaly_func_str'}, status=400)
+    try:
+        shots = calc_jobs.parse_shots(data.get('shots'))
+        sample_freq = float(data.get('sample_freq', 1.0))
+        align_mode, align_dt = time_axis.parse_align(data.get('align_mode'), data.get('align_dt'))
+    except (TypeError, ValueError) as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+
+    job = calc_jobs.submit_job(template, shots, sample_freq, align_mode, align_dt)
+    print(f"批量计算任务 {job['job_id']}: {template}，共 {len(shots)} 个炮号")
+    if not data.get('stream'):
+        return OrJsonResponse({'success': True, 'data': job})
+
+    def events():
+        yield orjson.dumps({'job_id': job['job_id'], 'total': job['total'], 'status': 'running'}) + b'\n'
+        for summary in calc_jobs.job_store.iter_events(job['job_id']):
+            if summary['status'] == 'done':
+                result = calc_jobs.job_store.read_result(job['job_id'], summary['shot'])
+                if result is not None:
+                    summary['result'] = time_axis.decode_x(result)
+            yield orjson.dumps(summary, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+        yield orjson.dumps(calc_jobs.job_store.load(job['job_id'])) + b'\n'
+
+    return StreamingHttpResponse(events(), content_type='application/x-ndjson')
+
+@require_GET
+def get_calc_job(request, job_id):
+    """获取批量计算任务的状态及每个炮号的摘要"""
+    try:
+        job = calc_jobs.job_store.load(job_id)
+    except ValueError as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+    if job is None:
+        return OrJsonResponse({'error': '找不到指定的任务', 'job_id': job_id}, status=404)
+    return OrJsonResponse({'success': True, 'data': job})
+
+@require_GET
+def get_calc_job_result(request, job_id, shot):
+    """获取批量计算任务中单个炮号的结果，格式与 operator-strs 一致"""
+    try:
+        result = calc_jobs.job_store.read_result(job_id, shot)
+    except ValueError as e:
+        return OrJsonResponse({'error': str(e)}, status=400)
+    if result is None:
+        return OrJsonResponse({'error': f'炮号 {shot} 没有计算结果', 'job_id': job_id}, status=404)
+    return OrJsonResponse({"data": {"result": time_axis.decode_x(result)}})
 
 import importlib.util
 import inspect
@@ -2944,6 +1316,16 @@ import json
 
 FUNCTIONS_FILE_PATH = os.path.join(settings.MEDIA_ROOT, "imported_functions.json")
 
+# 导入函数清单与已加载的算法模块缓存
+function_registry = FunctionRegistry(FUNCTIONS_FILE_PATH, settings.MEDIA_ROOT)
+
+# 导入算法的隔离执行进程池，ALGORITHM_WORKERS 为 0 时在服务进程中直接执行
+algorithm_pool = AlgorithmPool(FUNCTIONS_FILE_PATH, settings.MEDIA_ROOT,
+                               getattr(settings, 'ALGORITHM_WORKERS', 2),
+                               call_timeout=getattr(settings, 'ALGORITHM_CALL_TIMEOUT', 300),
+                               memory_limit=getattr(settings, 'ALGORITHM_MEMORY_LIMIT', 2 * 1024 ** 3),
+                               queue_timeout=getattr(settings, 'ALGORITHM_QUEUE_TIMEOUT', 30))
+
 # Import MATLAB engine if available
 try:
     import matlab.engine # type: ignore
@@ -2995,6 +1377,7 @@ def update_functions_file(function_data):
     # Write updated data back to the JSON file
     with open(FUNCTIONS_FILE_PATH, "w", encoding='utf-8') as f:
         json.dump(existing_data, f, indent=4, ensure_ascii=False)
+    function_registry.invalidate()
 
 # Function to load Python functions with parameter names
 def load_python_functions(file_path):
@@ -3089,13 +1472,7 @@ def function_details(request, function_name):
 
 @csrf_exempt
 def view_imported_functions(request):
-    if os.path.exists(FUNCTIONS_FILE_PATH):
-        with open(FUNCTIONS_FILE_PATH, "r", encoding='utf-8') as f:
-            functions_data = json.load(f)
-    else:
-        functions_data = []
-
-    return JsonResponse({"imported_functions": functions_data})
+    return JsonResponse({"imported_functions": function_registry.entries()})
 
 
 
@@ -3210,37 +1587,13 @@ def execute_function(data):
         if not function_name:
             return {"error": "No function information provided"}
 
-        # 从imported_functions.json中查找函数信息
-        if not os.path.exists(FUNCTIONS_FILE_PATH):
+        # 从导入函数清单中查找函数信息
+        if not function_registry.exists():
             return {"error": "Functions file not found"}
 
-        with open(FUNCTIONS_FILE_PATH, "r", encoding='utf-8') as f:
-            functions_data = json.load(f)
-
-        # 根据原始函数调用字符串确定函数类型
-        original_func_str = data.get("original_func_str", "")
-        preferred_extension = None
-
-        if original_func_str.startswith('[Python]'):
-            preferred_extension = '.py'
-        elif original_func_str.startswith('[Matlab]'):
-            preferred_extension = '.m'
-
-        # 查找匹配的函数，优先选择指定类型的函数
-        all_matches = [d for d in functions_data if d.get('name') == function_name]
-
-        if preferred_extension:
-            # 优先查找指定类型的函数
-            for func in all_matches:
-                file_path = func.get('file_path', '')
-                if file_path.endswith(preferred_extension):
-                    matched_func = func
-                    break
-
-        # 如果没找到指定类型的函数，使用第一个匹配的函数
-        if not matched_func and all_matches:
-            matched_func = all_matches[0]
-
+        # 根据原始函数调用字符串的前缀优先选择对应类型的函数
+        prefix = next((p for p in ('[Python]', '[Matlab]') if original_func_str.startswith(p)), None)
+        matched_func = function_registry.find(function_name, prefix)
         if not matched_func:
             return {"error": f"Function '{function_name}' not found in imported functions"}
 
@@ -3272,12 +1625,10 @@ def execute_function(data):
                         print(f"检测到表达式参数: {param}")
                         
                         # 创建表达式解析器
-                        def get_channel_data_for_parser(req, key):
-                            mock_req = create_mock_request(key, 1.0)
-                            return get_channel_data(mock_req, key)
-                        parser = ExpressionParser(get_channel_data_for_parser)
+                        parser = ExpressionParser(lambda key: get_channel(key, sample_freq=1.0, fields='x,y'),
+                                                  function_registry=function_registry, execute_function=execute_function)
                         
-                        # 解析表达式得到结果
+                        # 解析表达式得到结果（数组，调用算法前再按需转换为列表）
                         channel_data = parser.parse(str(param))
                         
                         # 设置通道名称
@@ -3291,27 +1642,25 @@ def execute_function(data):
                         print(f"表达式解析成功: {param}")
                     else:
                         # 参数是单个通道名，直接获取通道数据
-                        mock_request = create_mock_request(param, 1.0)  # 使用默认采样率
-                        response = get_channel_data(mock_request, param)
-                        if hasattr(response, 'content'):
-                            channel_data = json.loads(response.content.decode('utf-8'))
-                        else:
-                            channel_data = response
-
-                        if 'error' in channel_data:
-                            return {"error": f"Failed to get channel data for {param}: {channel_data['error']}"}
+                        # 使用默认采样率
+                        try:
+                            channel_data = get_channel(param, sample_freq=1.0, fields='x,y')
+                        except (ValueError, ChannelNotFoundError) as e:
+                            return {"error": f"Failed to get channel data for {param}: {str(e)}"}
                         
                         # 保存单个通道数据，用于最终结果合并
                         result_data_copy = channel_data.copy()
                         result_data_copy['channel_name'] = str(param)
                         channel_data_for_result.append(result_data_copy)
 
-                    # 对于Python函数，直接传递字典；对于MATLAB函数，转换为struct
+                    # 对于Python函数传递字典（导入的算法按列表接收通道数据；由进程池执行时数组经共享内存传递，
+                    # 在工作进程中转换）；对于MATLAB函数，转换为struct
                     if full_file_path.endswith('.py'):
-                        processed_parameters.append(channel_data)
+                        processed_parameters.append(channel_data if algorithm_pool.enabled else channel_to_lists(channel_data))
                     else:
                         # MATLAB函数需要转换为struct
-                        fields_values = sum(([k, matlab.double(v) if isinstance(v, list) else v] for k, v in channel_data.items()), [])
+                        fields_values = sum(([k, matlab.double(v) if isinstance(v, list) else v]
+                                             for k, v in channel_to_lists(channel_data).items()), [])
                         processed_parameters.append(eng.feval('struct', *fields_values))
                 except Exception as e:
                     return {"error": f"Error processing channel parameter {param}: {str(e)}"}
@@ -3325,41 +1674,19 @@ def execute_function(data):
     if full_file_path.endswith('.py'):
         # 执行Python函数
         try:
-            print(f"尝试加载Python文件: {full_file_path}")
-            print(f"文件是否存在: {os.path.exists(full_file_path)}")
-            
-            # 动态加载Python模块
-            spec = importlib.util.spec_from_file_location("dynamic_module", full_file_path)
-            dynamic_module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(dynamic_module)
-
-            # 获取模块中所有的函数
-            available_functions = [name for name, obj in inspect.getmembers(dynamic_module) if inspect.isfunction(obj)]
-            print(f"模块中可用的函数: {available_functions}")
-            
-            # 选择要执行的函数
-            func = None
-            function_name_to_use = None
-            
-            # 如果有传递的目标文件名，尝试找到同名函数
-            if target_file_name:
-                if target_file_name in available_functions:
-                    func = getattr(dynamic_module, target_file_name)
-                    function_name_to_use = target_file_name
-                    print(f"找到同名函数: {target_file_name}")
-            
-            # 如果没有找到同名函数，使用第一个可用函数
-            if not func and available_functions:
-                function_name_to_use = available_functions[0]
-                func = getattr(dynamic_module, function_name_to_use)
-                print(f"使用第一个可用函数: {function_name_to_use}")
-            
-            # 如果还是没有找到函数，返回错误
-            if not func:
-                return {"error": f"No functions found in file {full_file_path}"}
-
-            print(f"执行函数: {function_name_to_use}，参数: {processed_parameters}")
-            result = func(*processed_parameters)
+            # 模块只在首次调用或文件内容变化时执行；优先使用与目标文件名同名的函数，否则使用第一个函数
+            if algorithm_pool.enabled:
+                # 在隔离的工作进程中执行，受超时和内存上限约束；任务被取消时终止该次调用
+                print(f"在算法进程池中执行: {full_file_path}")
+                function_name_to_use, result = algorithm_pool.call(full_file_path, target_file_name,
+                                                                   processed_parameters, check=data.get("check"))
+            else:
+                try:
+                    function_name_to_use, func = function_registry.resolve(full_file_path, target_file_name)
+                except ValueError as e:
+                    return {"error": str(e)}
+                print(f"执行函数: {function_name_to_use}，参数: {processed_parameters}")
+                result = func(*processed_parameters)
             print(f"函数执行成功，结果: {result}")
             
             # 如果有通道数据，将其合并到result中
@@ -3395,6 +1722,11 @@ def execute_function(data):
                 function_result = {"result": normalized_result}
             
             return function_result
+        except calc_tasks.TaskCancelled:
+            raise
+        except AlgorithmError as e:
+            print(f"执行Python函数时出错: {str(e)}")
+            return {"error": f"Error executing Python function: {str(e)}"}
         except Exception as e:
             import traceback
             error_traceback = traceback.format_exc()
@@ -3886,20 +2218,12 @@ def sketch_query(request):
             """为模式匹配专门定制的获取通道数据的函数（新版本无需数据库选择）"""
             channel_key = f"{channel['channel_name']}_{channel['shot_number']}"
             
-            # 使用统一的create_mock_request函数
-            mock_request = create_mock_request(channel_key, sampling_rate)
-            
-            # 直接调用views中的get_channel_data函数
-            response = get_channel_data(mock_request, channel_key)
-            
-            # 解析结果
-            if hasattr(response, 'content'):
-                try:
-                    return json.loads(response.content.decode('utf-8'))
-                except Exception as e:
-                    print(f"解析通道数据失败: {str(e)}")
-                    return None
-            return None
+            # 模式匹配只需要时间轴、数据和归一化数据，匹配算法按列表逐点处理
+            try:
+                return channel_to_lists(get_channel(channel_key, sample_freq=sampling_rate, fields='x,y,normalized'))
+            except Exception as e:
+                print(f"获取通道数据失败: {str(e)}")
+                return None
         
         # 获取通道数据，执行模式匹配
         start_time = time.time()
@@ -4258,6 +2582,7 @@ def delete_imported_function(request):
         # 4. 保存新列表
         with open(file_path, "w", encoding="utf-8") as f:
             json.dump(new_functions, f, ensure_ascii=False, indent=4)
+        function_registry.invalidate(file_abs if file_to_delete_path else None)
 
         return JsonResponse({'success': True})
     except Exception as e:
@@ -5044,6 +3369,10 @@ def func(Y_value, X_value=None):
         user_module = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(user_module)
         
+        # 隐式时间轴 {{'t0', 'dt', 'n'}} 展开为显式时间数组
+        if isinstance(X_value, dict):
+            X_value = X_value['t0'] + X_value['dt'] * np.arange(int(X_value['n']))
+        
         # 构造通道数据对象
         channel_data = {{
             'X_value': X_value if X_value is not None else np.arange(len(Y_value)),
@@ -5119,6 +3448,10 @@ def func(Y_value, X_value=None):
     适配器函数，用于调用用户导入的MATLAB算法
     """
     try:
+        # 隐式时间轴 {'t0', 'dt', 'n'} 展开为显式时间数组
+        if isinstance(X_value, dict):
+            X_value = X_value['t0'] + X_value['dt'] * np.arange(int(X_value['n']))
+        
         # 创建临时文件存储输入数据
         with tempfile.NamedTemporaryFile(suffix='.mat', delete=False) as temp_input:
             input_data = {
@@ -5260,9 +3593,11 @@ def func(Y_value, X_value=None):
     适配器函数，用于调用手绘模板匹配算法
     """
     try:
-        # 构造时间轴（如果没有提供）
+        # 构造时间轴（如果没有提供），隐式时间轴 {{'t0', 'dt', 'n'}} 展开为显式时间数组
         if X_value is None:
             X_value = np.arange(len(Y_value))
+        elif isinstance(X_value, dict):
+            X_value = X_value['t0'] + X_value['dt'] * np.arange(int(X_value['n']))
         
         # 对数据进行降采样到5KHz（按照用户要求）
         X_value_resampled, Y_value_resampled = downsample_to_5khz(X_value, Y_value)
@@ -5329,8 +3664,8 @@ def downsample_to_5khz(x_values, y_values):
     if n_samples >= len(x_values):
         return x_values, y_values
     
-    # 使用与views.py中相同的降采样方法
-    from backend.api.views import downsample_to_frequency
+    # 使用与通道数据接口相同的降采样方法（api.downsampling 不依赖 Django）
+    from backend.api.downsampling import downsample_to_frequency
     return downsample_to_frequency(x_values, y_values, target_freq=5000)
 '''
         
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+计算进度推送
+
+客户端连接 ws/progress/ 后发送订阅消息:
+    {"action": "subscribe", "task_id": "..."}
+    {"action": "unsubscribe", "task_id": "..."}
+服务端立即返回任务当前状态，之后每次状态更新推送一条:
+    {"type": "progress", "task": {...任务状态，同 calculation-progress 接口...}}
+任务结束（completed / failed / cancelled）后推送最后一条状态并自动退订。
+
+状态更新由 calc_tasks.TaskStore 发送到通道层组 calc_task_<task_id>。任务可能在其他服务进程中执行
+（InMemoryChannelLayer 不跨进程），因此订阅期间同时按 PROGRESS_WATCH_INTERVAL 秒读取任务状态文件作为补充，
+相同的状态不会重复推送。
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from api.calc_tasks import FINISHED_STATUSES, progress_group, task_store
+
+# 订阅期间读取任务状态文件的间隔（秒）
+PROGRESS_WATCH_INTERVAL = getattr(settings, 'PROGRESS_WATCH_INTERVAL', 1.0)
+
+
+class ProgressConsumer(AsyncJsonWebsocketConsumer):
+    """ 计算任务进度推送 """
+
+    async def connect(self):
+        self.watchers = {}    # {task_id: asyncio.Task}
+        self.last_sent = {}   # {task_id: (last_update, status)}
+        await self.accept()
+
+    async def disconnect(self, code):
+        for task_id in list(self.watchers):
+            await self._unsubscribe(task_id)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action') if isinstance(content, dict) else None
+        task_id = str(content.get('task_id', '')) if isinstance(content, dict) else ''
+        if action not in ('subscribe', 'unsubscribe') or not task_id:
+            await self.send_json({'type': 'error', 'error': "消息格式应为 {action: subscribe|unsubscribe, task_id}"})
+            return
+        if action == 'unsubscribe':
+            await self._unsubscribe(task_id)
+            return
+
+        try:
+            state = await sync_to_async(task_store.load)(task_id)
+        except ValueError as e:
+            state = None
+            print(f"订阅计算进度失败: {e}")
+        if state is None:
+            await self.send_json({'type': 'error', 'task_id': task_id, 'error': f"任务 {task_id} 不存在"})
+            return
+        if task_id not in self.watchers:
+            await self.channel_layer.group_add(progress_group(task_id), self.channel_name)
+            self.watchers[task_id] = asyncio.ensure_future(self._watch(task_id))
+        await self._send_state(state)
+
+    async def task_progress(self, event):
+        """ 通道层组消息 {'type': 'task.progress', 'task': state} """
+        await self._send_state(event['task'])
+
+    async def _watch(self, task_id):
+        """ 定期读取任务状态文件，补充其他进程中执行的任务的进度 """
+        try:
+            while task_id in self.watchers:
+                await asyncio.sleep(PROGRESS_WATCH_INTERVAL)
+                state = await sync_to_async(task_store.load)(task_id)
+                if state is None:
+                    await self.send_json({'type': 'error', 'task_id': task_id, 'error': f"任务 {task_id} 已被清理"})
+                    await self._unsubscribe(task_id, cancel_watch=False)
+                    return
+                await self._send_state(state)
+        except asyncio.CancelledError:
+            pass
+
+    async def _send_state(self, state):
+        """ 推送任务状态（跳过重复状态），任务结束后退订 """
+        task_id = state.get('task_id')
+        if task_id not in self.watchers:
+            return
+        marker = (state.get('last_update'), state.get('status'))
+        if self.last_sent.get(task_id) == marker:
+            return
+        self.last_sent[task_id] = marker
+        await self.send_json({'type': 'progress', 'task': state})
+        if state.get('status') in FINISHED_STATUSES:
+            await self._unsubscribe(task_id, cancel_watch=asyncio.current_task() is not self.watchers.get(task_id))
+
+    async def _unsubscribe(self, task_id, cancel_watch=True):
+        watcher = self.watchers.pop(task_id, None)
+        self.last_sent.pop(task_id, None)
+        if watcher is None:
+            return
+        if cancel_watch:
+            watcher.cancel()
+        await self.channel_layer.group_discard(progress_group(task_id), self.channel_name)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+通道数据二进制传输格式
+
+JSON 中的浮点数列表体积大、序列化和前端解析都慢，二进制模式直接发送小端序
+float32/float64 数组，附带一个很小的 JSON 头描述各数组的位置。
+
+帧格式（所有整数均为小端序）:
+    0      4 字节   魔数 b'DDPB'
+    4      4 字节   uint32 头部长度 H（已补齐，使数组区从 8 字节对齐处开始）
+    8      H 字节   UTF-8 JSON 头部
+    8+H    ...      数组区，每个数组起始位置 8 字节对齐
+
+头部格式:
+    {
+        "version": 1,
+        "meta": {...非数组字段...},
+        "arrays": {"Y_value": {"dtype": "float32", "offset": 0, "length": 1000}, ...}
+    }
+offset 为相对数组区起始位置的字节偏移。
+"""
+
+import struct
+
+import numpy as np
+import orjson
+
+BINARY_MAGIC = b'DDPB'
+BINARY_VERSION = 1
+BINARY_CONTENT_TYPE = 'application/x-ddp-channel'
+
+# 时间轴与频率轴需要保持 float64 精度，其余数值数组可按请求降为 float32
+FLOAT64_FIELDS = ('X_value', 'freq')
+
+
+def _align(size, alignment=8):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def wants_binary(request):
+    """ 根据 format= 参数或 Accept 请求头判断客户端是否请求二进制格式 """
+    params = getattr(request, 'GET', {}) or {}
+    fmt = params.get('format', '')
+    if fmt:
+        return fmt == 'binary'
+    accept = ''
+    if hasattr(request, 'headers'):
+        accept = request.headers.get('Accept', '') or ''
+    return BINARY_CONTENT_TYPE in accept or 'application/octet-stream' in accept
+
+
+def encode_binary_payload(payload, value_dtype='float32'):
+    """
+    将通道数据字典编码为二进制帧
+    payload 中的 numpy 数组（或数值列表）写入数组区，其余字段放入头部 meta
+    """
+    value_dtype = np.dtype(value_dtype).newbyteorder('<')
+    meta = {}
+    arrays = {}
+    for key, value in payload.items():
+        if isinstance(value, np.ndarray) or (isinstance(value, list) and key in ('X_value', 'Y_value', 'Y_normalized', 'freq', 'amplitude')):
+            dtype = np.dtype('<f8') if key in FLOAT64_FIELDS else value_dtype
+            arrays[key] = np.ascontiguousarray(value, dtype=dtype)
+        else:
+            meta[key] = value
+
+    layout = {}
+    offset = 0
+    for key, array in arrays.items():
+        layout[key] = {'dtype': array.dtype.name, 'offset': offset, 'length': int(array.size)}
+        offset = _align(offset + array.nbytes)
+
+    header = orjson.dumps({'version': BINARY_VERSION, 'meta': meta, 'arrays': layout},
+                          option=orjson.OPT_SERIALIZE_NUMPY)
+    header += b' ' * (_align(8 + len(header)) - 8 - len(header))
+
+    body = bytearray(8 + len(header) + offset)
+    body[0:4] = BINARY_MAGIC
+    body[4:8] = struct.pack('<I', len(header))
+    body[8:8 + len(header)] = header
+    base = 8 + len(header)
+    for key, array in arrays.items():
+        start = base + layout[key]['offset']
+        body[start:start + array.nbytes] = array.tobytes()
+    return bytes(body)
+
+
+def decode_binary_payload(data):
+    """ 解码二进制帧（供内部调用及调试使用），返回字典，数组字段为 numpy 数组 """
+    if data[0:4] != BINARY_MAGIC:
+        raise ValueError('不是有效的通道二进制数据')
+    header_len = struct.unpack('<I', data[4:8])[0]
+    header = orjson.loads(bytes(data[8:8 + header_len]))
+    base = 8 + header_len
+    result = dict(header.get('meta', {}))
+    for key, info in header.get('arrays', {}).items():
+        dtype = np.dtype(info['dtype']).newbyteorder('<')
+        result[key] = np.frombuffer(data, dtype=dtype, count=info['length'], offset=base + info['offset'])
+    return result
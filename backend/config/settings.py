@@ -60,11 +60,20 @@ INSTALLED_APPS = [
 
 ASGI_APPLICATION = 'config.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# 计算进度通过通道层推送；多个服务进程部署时设置 CHANNEL_REDIS_URL 使用 Redis 通道层（需安装 channels_redis）
+if os.environ.get('CHANNEL_REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['CHANNEL_REDIS_URL']]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -185,3 +194,43 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 
+
+# 原始信号磁盘缓存（MDSplus 数据采集完成后不再变化，可长期缓存）
+SIGNAL_CACHE_DIR = BASE_DIR / 'signal_cache'
+SIGNAL_CACHE_MAX_BYTES = 20 * 1024 ** 3  # 20GB
+# 派生结果内存缓存上限（降采样结果、统计信息、归一化、频谱）
+DERIVED_CACHE_MAX_BYTES = 512 * 1024 ** 2
+# 表达式子表达式求值结果内存缓存上限
+EXPRESSION_CACHE_MAX_BYTES = 256 * 1024 ** 2
+# 表达式分块求值: 每块的结果点数；sample_mode 不是 full 时结果点数达到该下限才分块
+EXPRESSION_CHUNK_POINTS = 1 << 20
+EXPRESSION_CHUNK_THRESHOLD = 4 << 20
+# 通道频谱（FFT/Welch/STFT）缓存上限
+SPECTRUM_CACHE_MAX_BYTES = 128 * 1024 ** 2
+
+# MDSplus 树句柄池: 最多保留的空闲句柄数、空闲超过该时间（秒）的句柄被关闭
+MDS_TREE_POOL_MAX_SIZE = 32
+MDS_TREE_POOL_IDLE_SECONDS = 300
+
+# 通道定位索引文件（检测流水线与后端共用），记录各炮号通道所在的树
+CHANNEL_LOCATOR_PATH = BASE_DIR / 'channel_locator.json'
+
+# 批量表达式计算任务的结果目录与进程池大小
+CALC_JOB_DIR = BASE_DIR / 'calc_jobs'
+CALC_BATCH_WORKERS = 4
+
+# operator-strs 计算任务: 状态与结果目录（多个服务进程共享）、并发数、排队上限、单任务数据量上限、保留策略
+CALC_TASK_DIR = BASE_DIR / 'calc_tasks'
+CALC_TASK_WORKERS = 4
+CALC_TASK_MAX_PENDING = 16
+CALC_TASK_MAX_MEMORY = 4 * 1024 ** 3
+CALC_TASK_TTL = 1800  # 30分钟
+CALC_TASK_RESULT_MAX_BYTES = 2 * 1024 ** 3
+CALC_TASK_SWEEP_INTERVAL = 60  # 后台清理过期任务的间隔（秒）
+
+# 导入算法的隔离执行进程池: 工作进程数（0 表示在服务进程中直接执行）、单次调用超时（秒）、
+# 每个工作进程可额外占用的内存、所有进程都忙时的排队超时（秒）
+ALGORITHM_WORKERS = 2
+ALGORITHM_CALL_TIMEOUT = 300
+ALGORITHM_MEMORY_LIMIT = 2 * 1024 ** 3
+ALGORITHM_QUEUE_TIMEOUT = 30
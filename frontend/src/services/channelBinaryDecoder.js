@@ -0,0 +1,74 @@
+// channelBinaryDecoder.js
+// 解码后端 channel-data 的二进制响应（format=binary 或 Accept: application/x-ddp-channel）
+// 帧格式: 'DDPB' 魔数 | uint32 头部长度 | JSON 头部 | 8 字节对齐的小端序数组区
+// 数组直接以 TypedArray 视图返回，不做复制，可在 Worker 中零拷贝 transfer
+
+const BINARY_MAGIC = "DDPB";
+
+const TYPED_ARRAYS = {
+  float32: Float32Array,
+  float64: Float64Array,
+};
+
+/**
+ * 解码通道数据二进制帧
+ * @param {ArrayBuffer} buffer axios 使用 responseType: 'arraybuffer' 得到的响应体
+ * @returns {Object} 与 JSON 响应字段一致的对象，数组字段为 TypedArray
+ */
+export function decodeChannelBinary(buffer) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(
+    view.getUint8(0),
+    view.getUint8(1),
+    view.getUint8(2),
+    view.getUint8(3)
+  );
+  if (magic !== BINARY_MAGIC) {
+    throw new Error("不是有效的通道二进制数据");
+  }
+
+  const headerLength = view.getUint32(4, true);
+  const headerText = new TextDecoder("utf-8").decode(
+    new Uint8Array(buffer, 8, headerLength)
+  );
+  const header = JSON.parse(headerText);
+  const base = 8 + headerLength;
+
+  const result = { ...(header.meta || {}) };
+  Object.entries(header.arrays || {}).forEach(([key, info]) => {
+    const ArrayType = TYPED_ARRAYS[info.dtype];
+    if (!ArrayType) {
+      throw new Error(`不支持的数据类型: ${info.dtype}`);
+    }
+    result[key] = new ArrayType(buffer, base + info.offset, info.length);
+  });
+  return result;
+}
+
+/**
+ * 判断响应是否为二进制通道数据
+ * @param {Object|Headers} headers axios 响应头或 fetch 的 Headers
+ * @returns {boolean}
+ */
+export function isChannelBinaryResponse(headers) {
+  if (!headers) return false;
+  const contentType =
+    (typeof headers.get === "function"
+      ? headers.get("content-type")
+      : headers["content-type"]) || "";
+  return contentType.includes("application/x-ddp-channel");
+}
+
+/**
+ * 将解码结果中的 TypedArray 转换为普通数组（在 Worker 中调用，不占用主线程）
+ * 图表和缓存代码按普通数组处理通道数据（map 成点对、Array.isArray、JSON 序列化）
+ * @param {Object} data decodeChannelBinary 的返回值
+ * @returns {Object}
+ */
+export function toPlainArrays(data) {
+  const result = {};
+  Object.entries(data).forEach(([key, value]) => {
+    result[key] = ArrayBuffer.isView(value) ? Array.from(value) : value;
+  });
+  return result;
+}
@@ -0,0 +1,104 @@
+// channelFetchService.js
+// 通过 channelFetchWorker 获取通道数据: Worker 请求二进制格式（float64）、解码并转换为普通数组后传回主线程
+// 浏览器不支持 Worker、Worker 出错或网络请求失败时改用 axios 的 JSON 请求
+
+import axios from "axios";
+
+class ChannelFetchService {
+  constructor() {
+    this.worker = null;
+    this.disabled = typeof window === "undefined" || !("Worker" in window);
+    this.pendingRequests = new Map();
+    this.requestId = 0;
+  }
+
+  /**
+   * 懒创建Worker
+   * @private
+   */
+  getWorker() {
+    if (this.worker || this.disabled) {
+      return this.worker;
+    }
+    try {
+      const workerUrl = new URL("../workers/channelFetchWorker.js", import.meta.url);
+      this.worker = new Worker(workerUrl, { type: "module" });
+      this.worker.onmessage = this.handleWorkerMessage.bind(this);
+      this.worker.onerror = (error) => {
+        console.error("通道数据 Worker 错误，改用 JSON 请求:", error);
+        this.disabled = true;
+        this.worker = null;
+        this.pendingRequests.forEach((callback) => {
+          callback.reject(new Error("Worker错误: " + (error.message || "未知错误")));
+        });
+        this.pendingRequests.clear();
+      };
+    } catch (error) {
+      console.warn("创建通道数据 Worker 失败，改用 JSON 请求:", error);
+      this.disabled = true;
+    }
+    return this.worker;
+  }
+
+  /**
+   * 处理Worker消息
+   * @private
+   */
+  handleWorkerMessage(event) {
+    const { id, success, status, data, error } = event.data;
+    const pendingRequest = this.pendingRequests.get(id);
+    if (!pendingRequest) return;
+    this.pendingRequests.delete(id);
+
+    if (success) {
+      pendingRequest.resolve(data);
+      return;
+    }
+    // 与 axios 的错误结构保持一致，调用方可以读取 error.response.status
+    const requestError = new Error(error || "请求失败");
+    if (status) {
+      requestError.response = { status, data };
+    }
+    pendingRequest.reject(requestError);
+  }
+
+  /**
+   * 在Worker中请求通道数据
+   * @private
+   */
+  fetchInWorker(worker, url, params) {
+    return new Promise((resolve, reject) => {
+      const id = this.requestId++;
+      this.pendingRequests.set(id, { resolve, reject });
+      worker.postMessage({ id, url, params });
+    });
+  }
+
+  /**
+   * 获取通道数据，返回与 JSON 响应字段一致的对象（数组字段为普通数组）
+   * @param {string} url channel-data 接口地址
+   * @param {Object} params 查询参数
+   * @returns {Promise<Object>}
+   */
+  async fetchChannelData(url, params) {
+    const worker = this.getWorker();
+    if (worker) {
+      try {
+        return await this.fetchInWorker(worker, url, params);
+      } catch (error) {
+        // 服务端返回的错误（如 404）直接抛出；网络或解码错误改用 JSON 请求
+        if (error.response) {
+          throw error;
+        }
+        console.warn("Worker 获取通道数据失败，改用 JSON 请求:", error);
+      }
+    }
+    const response = await axios.get(url, { params });
+    return response.data;
+  }
+}
+
+// 创建单例实例
+const channelFetchService = new ChannelFetchService();
+
+export default channelFetchService;
@@ -5,6 +5,7 @@ import colors from "./color.json"; // 导入 color.json 文件
 import axios from "axios";
 import { dataCache, isChannelSelected } from "./services/cacheManager";
 import indexedDBService from "./services/indexedDBService"; // 导入IndexedDB服务
+import channelFetchService from "./services/channelFetchService"; // 在Worker中获取并解码通道数据
 
 // 定义一个映射，用于存储每个 channel_key 分配的颜色
 const channelColorMap = new Map();
@@ -1020,12 +1021,11 @@ const store = createStore({
       // 创建请求的 Promise 并将其存储
       const requestPromise = new Promise(async (resolve, reject) => {
         try {
-          const response = await axios.get(
+          // 在Worker中请求二进制格式并解码，失败时回退到 JSON 请求
+          const originalData = await channelFetchService.fetchChannelData(
             `http://192.168.20.49:5000/api/channel-data`,
-            { params }
+            params
           );
-          // 获取原始数据
-          const originalData = response.data;
 
           // 直接使用后端返回的数据，不做额外处理
           // 使用后端预计算的统计数据
@@ -0,0 +1,58 @@
+// channelFetchWorker.js
+// 在Web Worker中请求 channel-data 接口并解析响应，主线程不再执行大体积的 JSON.parse
+// 优先请求二进制格式（format=binary），服务端返回 JSON 时（旧版本后端、错误响应）按 JSON 解析
+// 二进制数组默认以 float64 传输（precision=float64），与 JSON 响应精度一致；调用方可在 params 中传 precision=float32 减半数据量
+// 图表等代码按普通数组处理通道数据，TypedArray 到普通数组的转换也在 Worker 中完成，不占用主线程
+
+import {
+  decodeChannelBinary,
+  isChannelBinaryResponse,
+  toPlainArrays,
+} from "../services/channelBinaryDecoder.js";
+
+/**
+ * 请求并解析通道数据
+ * @param {string} url channel-data 接口地址
+ * @param {Object} params 查询参数
+ * @returns {Promise<{data: Object, buffer: ArrayBuffer|null, status: number}>}
+ */
+async function fetchChannel(url, params) {
+  const query = new URLSearchParams();
+  Object.entries({ precision: "float64", ...params, format: "binary" }).forEach(([key, value]) => {
+    if (value !== undefined && value !== null) {
+      query.append(key, value);
+    }
+  });
+
+  const response = await fetch(`${url}?${query.toString()}`, {
+    headers: { Accept: "application/x-ddp-channel, application/json" },
+  });
+
+  if (response.ok && isChannelBinaryResponse(response.headers)) {
+    const buffer = await response.arrayBuffer();
+    return { data: toPlainArrays(decodeChannelBinary(buffer)), status: response.status };
+  }
+
+  let data = null;
+  try {
+    data = await response.json();
+  } catch (error) {
+    data = null;
+  }
+  return { data, status: response.status, ok: response.ok };
+}
+
+self.onmessage = async function (event) {
+  const { id, url, params } = event.data;
+  try {
+    const { data, status, ok = true } = await fetchChannel(url, params);
+    if (!ok) {
+      self.postMessage({ id, success: false, status, data, error: `请求失败: ${status}` });
+      return;
+    }
+    self.postMessage({ id, success: true, status, data });
+  } catch (error) {
+    // 网络错误或解码失败，由主线程改用 JSON 请求
+    self.postMessage({ id, success: false, status: 0, error: error.message || "未知错误" });
+  }
+};